@@ -0,0 +1,188 @@
+"""
+Process-wide OAuth API clients used to call the other Open edX services.
+
+Every site gets one PooledOAuthAPIClient per process. The client keeps its connections alive in a
+pool shared by all the requests and threads of the process, and holds its access token until shortly
+before it expires instead of looking it up for every call.
+"""
+import datetime
+import threading
+from collections import defaultdict
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from edx_django_utils import monitoring as monitoring_utils
+from edx_rest_api_client.client import OAuthAPIClient, get_and_cache_oauth_access_token, get_oauth_access_token
+from requests.adapters import HTTPAdapter
+
+UPSTREAM_OTHER = 'other'
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_host(url):
+    """ Returns the host name and port the given URL connects to. """
+    parts = urlsplit(url)
+    return parts.hostname, parts.port or DEFAULT_PORTS.get(parts.scheme)
+
+
+class PooledOAuthAPIClient(OAuthAPIClient):
+    """
+    An OAuthAPIClient meant to be shared by all the requests of a process.
+
+    Connections to the upstream services are kept alive in a pool of OAUTH_API_CLIENT_POOL_MAXSIZE
+    connections per host, and the access token is refreshed OAUTH_API_CLIENT_TOKEN_REFRESH_MARGIN
+    seconds before it expires. Requests and token fetches are counted per upstream service, see get_metrics.
+
+    The cookies set by the upstream services are not kept, since the calls are made on behalf of every user.
+    """
+
+    def __init__(self, base_url, client_id, client_secret, upstreams=None, **kwargs):
+        """
+        Args:
+            base_url (str): base url of the LMS oauth endpoint.
+            client_id (str): Client ID
+            client_secret (str): Client secret
+            upstreams (dict): Names of the upstream services, e.g. 'lms', keyed by their base URL.
+        """
+        super(PooledOAuthAPIClient, self).__init__(base_url, client_id, client_secret, **kwargs)
+        adapter = HTTPAdapter(
+            pool_connections=settings.OAUTH_API_CLIENT_POOL_CONNECTIONS,
+            pool_maxsize=settings.OAUTH_API_CLIENT_POOL_MAXSIZE,
+        )
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        self.upstreams = {_get_host(url): name for url, name in (upstreams or {}).items() if url}
+        self.token_fetches = 0
+        self.requests_by_upstream = defaultdict(int)
+        self._token_expires_at = None
+        self._token_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+
+    def _is_token_fresh(self):
+        if not self.auth.token:
+            return False
+        refresh_margin = datetime.timedelta(seconds=settings.OAUTH_API_CLIENT_TOKEN_REFRESH_MARGIN)
+        return datetime.datetime.utcnow() < self._token_expires_at - refresh_margin
+
+    def _ensure_authentication(self):
+        """
+        Ensures that the client holds an access token that won't expire within the refresh margin.
+
+        The token is first looked up in the cache shared with the other processes. If the shared token
+        expires within the refresh margin too, a new one is fetched for this process.
+
+        Raises:
+            requests.RequestException if there is a problem retrieving the access token.
+        """
+        if self._is_token_fresh():
+            return
+
+        with self._token_lock:
+            if self._is_token_fresh():
+                return
+
+            oauth_url = self._base_url if not self.oauth_uri else self._base_url + self.oauth_uri
+            self.auth.token, self._token_expires_at = get_and_cache_oauth_access_token(
+                oauth_url,
+                self._client_id,
+                self._client_secret,
+                grant_type='client_credentials',
+                timeout=self._timeout,
+            )
+            if not self._is_token_fresh():
+                self.auth.token, self._token_expires_at = get_oauth_access_token(
+                    oauth_url,
+                    self._client_id,
+                    self._client_secret,
+                    grant_type='client_credentials',
+                    timeout=self._timeout,
+                )
+
+            with self._metrics_lock:
+                self.token_fetches += 1
+            monitoring_utils.set_custom_attribute('oauth_api_client_token_fetched', True)
+
+    def get_upstream(self, url):
+        """ Returns the name of the upstream service the given URL belongs to. """
+        return self.upstreams.get(_get_host(url), UPSTREAM_OTHER)
+
+    def request(self, method, url, headers=None, **kwargs):  # pylint: disable=arguments-differ
+        upstream = self.get_upstream(url)
+        with self._metrics_lock:
+            self.requests_by_upstream[upstream] += 1
+        monitoring_utils.set_custom_attribute('oauth_api_client_upstream', upstream)
+        return super(PooledOAuthAPIClient, self).request(method, url, headers=headers, **kwargs)
+
+    def get_metrics(self):
+        """
+        Returns the number of requests and of opened connections per upstream service, and the number of token fetches.
+
+        Requests sent over a connection that was already open are the difference between the two.
+        """
+        connections_by_upstream = defaultdict(int)
+        pools = self.get_adapter('https://').poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is not None:
+                host = (pool_key.key_host, pool_key.key_port)
+                connections_by_upstream[self.upstreams.get(host, UPSTREAM_OTHER)] += pool.num_connections
+
+        with self._metrics_lock:
+            upstreams = set(self.requests_by_upstream) | set(connections_by_upstream)
+            return {
+                'token_fetches': self.token_fetches,
+                'upstreams': {
+                    upstream: {
+                        'requests': self.requests_by_upstream[upstream],
+                        'connections': connections_by_upstream[upstream],
+                    } for upstream in upstreams
+                },
+            }
+
+
+def _get_client_settings(site_configuration):
+    """ Returns the settings a client for the given site is built with. """
+    return (
+        settings.BACKEND_SERVICE_EDX_OAUTH2_PROVIDER_URL,
+        settings.BACKEND_SERVICE_EDX_OAUTH2_KEY,
+        settings.BACKEND_SERVICE_EDX_OAUTH2_SECRET,
+        (
+            (site_configuration.lms_url_root, 'lms'),
+            (site_configuration.discovery_api_url, 'discovery'),
+            (site_configuration.enterprise_catalog_api_url, 'enterprise_catalog'),
+        ),
+    )
+
+
+def get_oauth_api_client(site_configuration):
+    """
+    Returns the OAuth API client of the given site for this process, creating it if needed.
+
+    The client is replaced when the OAuth credentials or the upstream URLs of the site change.
+    """
+    client_settings = _get_client_settings(site_configuration)
+    site_id = site_configuration.site_id
+    client_and_settings = _clients.get(site_id)
+    if client_and_settings is None or client_and_settings[1] != client_settings:
+        with _clients_lock:
+            client_and_settings = _clients.get(site_id)
+            if client_and_settings is None or client_and_settings[1] != client_settings:
+                provider_url, client_id, client_secret, upstreams = client_settings
+                client = PooledOAuthAPIClient(provider_url, client_id, client_secret, upstreams=dict(upstreams))
+                client_and_settings = (client, client_settings)
+                _clients[site_id] = client_and_settings
+    return client_and_settings[0]
+
+
+def clear_oauth_api_clients():
+    """ Closes and forgets the OAuth API clients of every site. """
+    with _clients_lock:
+        for client, _ in _clients.values():
+            client.close()
+        _clients.clear()
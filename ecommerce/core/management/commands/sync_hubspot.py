@@ -1,5 +1,9 @@
 """
 Django management command to Sync Product, Orders and Lines to Hubspot server.
+
+The baskets of each site are synced incrementally: every run only syncs the baskets created, submitted or
+given new lines since the previous successful run, as recorded by the HubspotSyncCursor of the site. The
+batches of objects are upserted concurrently, over a pooled session which retries failed requests with backoff.
 """
 
 
@@ -7,6 +11,7 @@ import json
 import logging
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from decimal import Decimal as D
 from urllib.parse import urljoin
@@ -14,14 +19,18 @@ from urllib.parse import urljoin
 import requests
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Q
+from django.db.models import Prefetch, Q
+from django.utils import timezone
 from oscar.core.loading import get_class, get_model
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, RequestException
+from urllib3.util.retry import Retry
 
 from ecommerce.extensions.fulfillment.status import ORDER
 
 Basket = get_model('basket', 'Basket')
 CartLine = get_model('basket', 'Line')
+HubspotSyncCursor = get_model('core', 'HubspotSyncCursor')
 Order = get_model('order', 'Order')
 OrderLine = get_model('order', 'Line')
 OrderNumberGenerator = get_class('order.utils', 'OrderNumberGenerator')
@@ -32,6 +41,13 @@ logger = logging.getLogger(__name__)
 
 
 DEFAULT_INITIAL_DAYS = 1
+DEFAULT_WORKERS = 4
+# Baskets changed within this delay before a run are left to the next run, so that the changes still being
+# committed when the run starts are not skipped.
+SYNC_DELAY = timedelta(minutes=5)
+RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 HUBSPOT_API_BASE_URL = 'https://api.hubapi.com'
 HUBSPOT_ECOMMERCE_SETTINGS = {
     'enabled': True,
@@ -181,6 +197,8 @@ EXPECTED_METHODS = ["GET", "POST", "PUT"]
 class Command(BaseCommand):
     help = 'Sync Product, Orders and Lines to Hubspot server.'
     initial_sync_days = None
+    workers = DEFAULT_WORKERS
+    session = None
 
     def _get_hubspot_enable_sites(self):
         """
@@ -195,10 +213,31 @@ class Command(BaseCommand):
         api_url = urljoin(f"{HUBSPOT_API_BASE_URL}/", f"{api_url}/{hubspot_object}")
         if method not in EXPECTED_METHODS:
             raise ValueError(f"Unexpected method {method}. Allowed methods are: {EXPECTED_METHODS}")
-        response = requests.request(method, api_url, json=body, params=kwargs)
+        response = self._get_session().request(method, api_url, json=body, params=kwargs)
         response.raise_for_status()
         return response.json()
 
+    def _get_session(self):
+        """
+        Returns the session the calls to hubspot are made with, creating it if needed.
+
+        The session keeps a connection alive for each worker, and retries the calls failing with a connection
+        error or a server error, waiting longer before each retry.
+        """
+        if self.session is None:
+            retry = Retry(
+                total=RETRIES,
+                backoff_factor=RETRY_BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=EXPECTED_METHODS,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_maxsize=self.workers, max_retries=retry)
+            self.session = requests.Session()
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        return self.session
+
     def _install_hubspot_ecommerce_bridge(self, site_configuration):
         """
         Installs hubspot bridge for given site_configuration.
@@ -266,7 +305,7 @@ class Command(BaseCommand):
     def _get_carts_extra_properties(self, cart):
         total_price = D(0.0)
         description = ''
-        lines = cart.all_lines()
+        lines = cart.lines.all()
         for line in lines:
             total_price += self._get_cart_line_prices(line, 'price_incl_tax')
             description += self._get_cart_line_information(line)
@@ -317,7 +356,8 @@ class Command(BaseCommand):
             }
             total_price, description = self._get_carts_extra_properties(cart)
             if cart.status == Basket.SUBMITTED:
-                order = Order.objects.filter(basket=cart).first()
+                # The orders of the cart are prefetched, most recent first.
+                order = cart.order_set.all()[0]
                 deal['propertyNameToValues'] = {
                     'deal_name': order.number,
                     'total_incl_tax': float(order.total_incl_tax),
@@ -350,10 +390,10 @@ class Command(BaseCommand):
                 'action': 'UPSERT',
                 'changeOccurredTimestamp': self._get_timestamp(),
                 'propertyNameToValues': {
-                    'order_id': str(line.basket.id),
+                    'order_id': str(line.basket_id),
                     'price_currency': str(line.price_currency),
                     'tax': float(line_price_incl_tax - line_price_excl_tax),
-                    'product_id': str(line.product.id),
+                    'product_id': str(line.product_id),
                     'price_incl_tax': float(line_price_incl_tax),
                     'price_excl_tax': float(line_price_excl_tax),
                     'quantity': line.quantity
@@ -382,47 +422,63 @@ class Command(BaseCommand):
             })
         return hubspot_products
 
+    def _upsert_hubspot_batch(self, object_type, objects, start, site_configuration):
+        """
+        Calls the sync message endpoint on the batch of BATCH_SIZE objects starting at start.
+        """
+        total = len(objects)
+        self.stdout.write(
+            'Syncing {object_type}s batch from {start} to {end} of total: {total} for site {site}'.format(
+                object_type=object_type,
+                start=start,
+                end=start + BATCH_SIZE,
+                total=total,
+                site=site_configuration.site.domain
+            )
+        )
+        self._hubspot_endpoint(
+            object_type,
+            'extensions/ecomm/v1/sync-messages/',
+            'PUT',
+            body=objects[start:start + BATCH_SIZE],
+            hapikey=site_configuration.hubspot_secret_key
+        )
+        self.stdout.write(
+            'Successfully synced {object_type}s batch from {start} to {end} of total: '
+            '{total} for site {site}'.format(
+                object_type=object_type,
+                start=start,
+                end=start + BATCH_SIZE,
+                total=total,
+                site=site_configuration.site.domain
+            )
+        )
+
     def _upsert_hubspot_objects(self, object_type, objects, site_configuration):
         """
         Calls the sync message endpoint on given objects (PRODUCT, DEAL
         and LINE_ITEM) and each request can has 200 (BATCH_SIZE) objects.
+
+        The batches are upserted concurrently by the workers. Returns True if every batch was upserted.
         """
-        try:
-            total = len(objects)
-            for start in range(0, total, BATCH_SIZE):
-                batch = objects[start:start + BATCH_SIZE]
-                self.stdout.write(
-                    'Syncing {object_type}s batch from {start} to {end} of total: {total} for site {site}'.format(
-                        object_type=object_type,
-                        start=start,
-                        end=start + BATCH_SIZE,
-                        total=total,
-                        site=site_configuration.site.domain
-                    )
-                )
-                self._hubspot_endpoint(
-                    object_type,
-                    'extensions/ecomm/v1/sync-messages/',
-                    'PUT',
-                    body=batch,
-                    hapikey=site_configuration.hubspot_secret_key
-                )
-                self.stdout.write(
-                    'Successfully synced {object_type}s batch from {start} to {end} of total: '
-                    '{total} for site {site}'.format(
-                        object_type=object_type,
-                        start=start,
-                        end=start + BATCH_SIZE,
-                        total=total,
-                        site=site_configuration.site.domain
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self._upsert_hubspot_batch, object_type, objects, start, site_configuration)
+                for start in range(0, len(objects), BATCH_SIZE)
+            ]
+
+        status = True
+        for future in futures:
+            try:
+                future.result()
+            except (HTTPError, RequestException) as ex:
+                self.stderr.write(
+                    'An error occurred while upserting {object_type} for site {site}: {message}'.format(
+                        object_type=object_type, site=site_configuration.site.domain, message=ex
                     )
                 )
-        except (HTTPError, RequestException) as ex:
-            self.stderr.write(
-                'An error occurred while upserting {object_type} for site {site}: {message}'.format(
-                    object_type=object_type, site=site_configuration.site.domain, message=ex
-                )
-            )
+                status = False
+        return status
 
     def _call_sync_errors_messages_endpoint(self, site_configuration):
         """
@@ -451,15 +507,41 @@ class Command(BaseCommand):
                 )
             )
 
-    def _get_unsynced_carts(self, site_configuration):
-        carts = Basket.objects.filter(site=site_configuration.site, lines__isnull=False)
-        start_date = datetime.now().date() - timedelta(self.initial_sync_days)
-        unsynced_carts = carts.filter(
-            Q(date_created__date=start_date) | Q(date_submitted__date=start_date)
-        )
+    def _get_sync_window(self, site_configuration):
+        """
+        Returns the dates between which the baskets to sync for given site_configuration were changed.
+
+        The window starts where the previous successful sync ended or, for the initial sync,
+        initial_sync_days before today.
+        """
+        cursor = HubspotSyncCursor.objects.filter(site=site_configuration.site).first()
+        if cursor:
+            start = cursor.last_synced
+        else:
+            start_date = datetime.now().date() - timedelta(self.initial_sync_days)
+            start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        return start, timezone.now() - SYNC_DELAY
+
+    def _get_unsynced_carts(self, site_configuration, start, end):
+        """
+        Returns the carts of given site_configuration which were created, submitted or given new lines
+        after start and up to end, along with their lines, owner and orders.
+        """
+        changed_lines = CartLine.objects.filter(date_created__gt=start, date_created__lte=end)
+        unsynced_carts = Basket.objects.filter(
+            Q(date_created__gt=start, date_created__lte=end) |
+            Q(date_submitted__gt=start, date_submitted__lte=end) |
+            Q(id__in=changed_lines.values('basket_id')),
+            site=site_configuration.site,
+            lines__isnull=False,
+        ).distinct().select_related('owner').prefetch_related(
+            Prefetch('lines', queryset=CartLine.objects.select_related('product__course').order_by('id')),
+            Prefetch('order_set', queryset=Order.objects.select_related('user').order_by('-date_placed')),
+        ).order_by('id')
+        unsynced_carts = list(unsynced_carts)
         self.stdout.write(
             'Pulled unsynced carts for site {site} from {start_date} and total count is total: {count}'.format(
-                site=site_configuration.site.domain, start_date=start_date, count=unsynced_carts.count()
+                site=site_configuration.site.domain, start_date=start, count=len(unsynced_carts)
             )
         )
         return unsynced_carts
@@ -468,36 +550,60 @@ class Command(BaseCommand):
         """
         Create lists of Order, OrderLine and Product objects and
         call upsert(PUT) sync-messages endpoint for each objects.
+
+        The sync cursor of the site is moved to the end of the synced window once every object is upserted.
         """
-        unsynced_carts = self._get_unsynced_carts(site_configuration)
+        start, end = self._get_sync_window(site_configuration)
+        if end <= start:
+            # The previous sync started less than SYNC_DELAY ago.
+            self.stdout.write('No data found to sync for site {site}'.format(site=site_configuration.site.domain))
+            return
+
+        unsynced_carts = self._get_unsynced_carts(site_configuration, start, end)
         if unsynced_carts:
             # we need to exclude the CartLines without product
             # because product is required in hubspot for LINE_ITEM.
-            unsynced_cart_lines = CartLine.objects.filter(basket__in=unsynced_carts).exclude(product=None)
-            unsynced_products = Product.objects.filter(basket_lines__in=unsynced_cart_lines)
-            unsynced_users = User.objects.filter(baskets__in=unsynced_carts)
-            self._upsert_hubspot_objects(
+            unsynced_cart_lines = [
+                line for cart in unsynced_carts for line in cart.lines.all() if line.product_id is not None
+            ]
+            unsynced_products = list({line.product_id: line.product for line in unsynced_cart_lines}.values())
+            unsynced_users = list({cart.owner_id: cart.owner for cart in unsynced_carts if cart.owner}.values())
+            # The objects are upserted in order, so that the deals and line items are synced after the
+            # contacts and products they are associated with.
+            synced = self._upsert_hubspot_objects(
                 CONTACT,
                 self._get_hubspot_contact_structure(unsynced_users),
                 site_configuration
-            )
-            self._upsert_hubspot_objects(
+            ) and self._upsert_hubspot_objects(
                 PRODUCT,
                 self._get_hubspot_product_structure(unsynced_products),
                 site_configuration
-            )
-            self._upsert_hubspot_objects(
+            ) and self._upsert_hubspot_objects(
                 DEAL,
                 self._get_hubspot_deal_structure(unsynced_carts, site_configuration.partner),
                 site_configuration
-            )
-            self._upsert_hubspot_objects(
+            ) and self._upsert_hubspot_objects(
                 LINE_ITEM,
                 self._get_hubspot_line_item_structure(unsynced_cart_lines),
                 site_configuration
             )
         else:
             self.stdout.write('No data found to sync for site {site}'.format(site=site_configuration.site.domain))
+            synced = True
+
+        if synced:
+            self._advance_sync_cursor(site_configuration.site, end)
+
+    @staticmethod
+    def _advance_sync_cursor(site, last_synced):
+        """
+        Moves the sync cursor of the given site forward to last_synced, unless a concurrent sync moved it further.
+        """
+        cursor, created = HubspotSyncCursor.objects.get_or_create(site=site, defaults={'last_synced': last_synced})
+        if not created:
+            HubspotSyncCursor.objects.filter(id=cursor.id, last_synced__lt=last_synced).update(
+                last_synced=last_synced, modified=timezone.now()
+            )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -507,12 +613,20 @@ class Command(BaseCommand):
             type=int,
             help='Number of days before today to start initial sync',
         )
+        parser.add_argument(
+            '--workers',
+            default=DEFAULT_WORKERS,
+            dest='workers',
+            type=int,
+            help='Number of batches upserted to hubspot concurrently',
+        )
 
     def handle(self, *args, **options):
         """
         Main command handler.
         """
         self.initial_sync_days = options['initial_sync_days']
+        self.workers = options['workers']
         try:
             site_configurations = self._get_hubspot_enable_sites()
             if not site_configurations:
@@ -527,3 +641,7 @@ class Command(BaseCommand):
         except Exception as ex:
             traceback.print_exc()
             raise CommandError('Command failed with traceback %s' % str(ex)) from ex
+        finally:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
@@ -3,11 +3,15 @@ Test the sync_hubspot management command
 """
 
 
+import json
+import threading
 from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import StringIO
 
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.utils import timezone
 from factory.django import get_model
 from mock import patch
 from requests.exceptions import HTTPError
@@ -20,8 +24,41 @@ from ecommerce.tests.testcases import TestCase
 
 SiteConfiguration = get_model('core', 'SiteConfiguration')
 Basket = get_model('basket', 'Basket')
+HubspotSyncCursor = get_model('core', 'HubspotSyncCursor')
 
 DEFAULT_INITIAL_DAYS = 1
+SYNC_MESSAGES_PATH = '/extensions/ecomm/v1/sync-messages/'
+
+
+class HubspotRequestHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the hubspot API, recording the requests it receives.
+
+    The first server.failures[path] requests to a path are answered with a server error.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        path = self.path.split('?')[0]
+        with self.server.lock:
+            self.server.requests.append((self.command, path, body))
+            failing = self.server.failures.get(path, 0) > 0
+            if failing:
+                self.server.failures[path] -= 1
+
+        response = json.dumps({'results': []}).encode('utf-8')
+        self.send_response(503 if failing else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    do_GET = do_POST = do_PUT = _respond
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
 
 
 class TestSyncHubspotCommand(TestCase):
@@ -74,6 +111,40 @@ class TestSyncHubspotCommand(TestCase):
         basket.date_submitted = self._get_date(days=1)
         basket.save()
 
+    def _start_hubspot_stand_in(self):
+        """
+        Starts a local stand-in for the hubspot API, and points the command to it.
+        """
+        server = ThreadingHTTPServer(('127.0.0.1', 0), HubspotRequestHandler)
+        server.requests = []
+        server.failures = {}
+        server.lock = threading.Lock()
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.start()
+        self.addCleanup(server_thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        for name, value in (
+                ('HUBSPOT_API_BASE_URL', 'http://127.0.0.1:{}'.format(server.server_port)),
+                ('RETRY_BACKOFF_FACTOR', 0),
+        ):
+            patcher = patch('ecommerce.core.management.commands.sync_hubspot.' + name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return server
+
+    def _get_synced_objects(self, server, object_type):
+        """
+        Returns the objects of given type the stand-in received, in all the sync messages.
+        """
+        return [
+            hubspot_object
+            for method, path, body in server.requests
+            if method == 'PUT' and path == SYNC_MESSAGES_PATH + object_type
+            for hubspot_object in body
+        ]
+
     def _mocked_sync_errors_messages_endpoint(self):
         """
         Returns mocked sync_errors_messages_endpoint's response
@@ -202,7 +273,7 @@ class TestSyncHubspotCommand(TestCase):
         6. Upsert(LINE ITEM)
         7. Sync-error
         """
-        with patch('ecommerce.core.management.commands.sync_hubspot.requests.request') as mock_client:
+        with patch('ecommerce.core.management.commands.sync_hubspot.requests.Session.request') as mock_client:
             output = self._get_command_output()
             self.assertEqual(mock_client.call_count, 7)
             self.assertIn('Successfully installed hubspot ecommerce bridge', output)
@@ -234,3 +305,84 @@ class TestSyncHubspotCommand(TestCase):
                 api_url="fake_url",
                 method=unsupported_method
             )
+
+    def test_incremental_sync(self):
+        """
+        Test the baskets are synced once, and only those changed since the previous sync are synced again.
+        """
+        server = self._start_hubspot_stand_in()
+        site = self.hubspot_site_configuration.site
+        self._get_command_output()
+
+        cursor = HubspotSyncCursor.objects.get(site=site)
+        self.assertEqual(len(self._get_synced_objects(server, 'DEAL')), 2)
+        self.assertEqual(len(self._get_synced_objects(server, 'LINE_ITEM')), 2)
+        self.assertLess(cursor.last_synced, timezone.now())
+
+        server.requests.clear()
+        output = self._get_command_output()
+        self.assertIn('No data found to sync for site {site}'.format(site=site.domain), output)
+        self.assertEqual(self._get_synced_objects(server, 'DEAL'), [])
+
+        # Add a line to a basket, and sync the changes made during the last hour.
+        HubspotSyncCursor.objects.filter(site=site).update(last_synced=timezone.now() - timedelta(hours=1))
+        basket = Basket.objects.filter(site=site, status=Basket.OPEN).first()
+        line = create_basket(site=site).lines.first()
+        line.basket = basket
+        line.date_created = timezone.now() - timedelta(minutes=30)
+        line.save()
+
+        server.requests.clear()
+        self._get_command_output()
+        deals = self._get_synced_objects(server, 'DEAL')
+        self.assertEqual([deal['integratorObjectId'] for deal in deals], [str(basket.id)])
+        self.assertEqual(len(self._get_synced_objects(server, 'LINE_ITEM')), 2)
+
+    def test_sync_cursor_not_moved_backward(self):
+        """
+        Test a sync started less than SYNC_DELAY after the previous one is skipped, and the cursor never moves back.
+        """
+        server = self._start_hubspot_stand_in()
+        site = self.hubspot_site_configuration.site
+        last_synced = timezone.now()
+        HubspotSyncCursor.objects.create(site=site, last_synced=last_synced)
+
+        output = self._get_command_output()
+        self.assertIn('No data found to sync for site {site}'.format(site=site.domain), output)
+        self.assertEqual(self._get_synced_objects(server, 'DEAL'), [])
+
+        sync_command()._advance_sync_cursor(site, last_synced - timedelta(minutes=5))  # pylint: disable=W0212
+        self.assertEqual(HubspotSyncCursor.objects.get(site=site).last_synced, last_synced)
+
+        sync_command()._advance_sync_cursor(site, last_synced + timedelta(minutes=5))  # pylint: disable=W0212
+        self.assertEqual(HubspotSyncCursor.objects.get(site=site).last_synced, last_synced + timedelta(minutes=5))
+
+    def test_upsert_retried(self):
+        """
+        Test the upserts failing with a server error are retried.
+        """
+        server = self._start_hubspot_stand_in()
+        server.failures[SYNC_MESSAGES_PATH + 'DEAL'] = 1
+        output = self._get_command_output(is_stderr=True)
+
+        self.assertNotIn('An error occurred while upserting', output)
+        deal_requests = [request for request in server.requests if request[1] == SYNC_MESSAGES_PATH + 'DEAL']
+        self.assertEqual(len(deal_requests), 2)
+        self.assertTrue(HubspotSyncCursor.objects.filter(site=self.hubspot_site_configuration.site).exists())
+
+    def test_failed_upsert_not_marked_synced(self):
+        """
+        Test the sync cursor is not moved when an upsert keeps failing, so the baskets are synced again.
+        """
+        server = self._start_hubspot_stand_in()
+        server.failures[SYNC_MESSAGES_PATH + 'DEAL'] = 10
+        output = self._get_command_output(is_stderr=True)
+
+        self.assertIn('An error occurred while upserting DEAL', output)
+        self.assertEqual(self._get_synced_objects(server, 'LINE_ITEM'), [])
+        self.assertFalse(HubspotSyncCursor.objects.filter(site=self.hubspot_site_configuration.site).exists())
+
+        server.failures.clear()
+        server.requests.clear()
+        self._get_command_output()
+        self.assertEqual(len(self._get_synced_objects(server, 'DEAL')), 2)
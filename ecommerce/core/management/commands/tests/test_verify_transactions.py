@@ -4,11 +4,15 @@ Tests for Django management command to verify ecommerce transactions.
 
 
 import datetime
+import json
 
 import ddt
+import mock
 import pytz
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from oscar.core.loading import get_class, get_model
 from oscar.test.factories import OrderFactory, OrderLineFactory, ProductFactory
 
@@ -252,3 +256,48 @@ class VerifyTransactionsTest(TestCase):
         self.assertIn(str(refund.id), exception)
         self.assertIn('"amount": 90.0', exception)
         self.assertIn('"amount": 100.0', exception)
+
+    def _verify_transactions_queries(self, *args):
+        with CaptureQueriesContext(connection) as context:
+            with self.assertRaises(CommandError) as cm:
+                call_command('verify_transactions', *args)
+        return len(context), str(cm.exception)
+
+    def test_constant_number_of_queries(self):
+        """ Verify the number of queries does not depend on the number of orders, nor on the chunk size. """
+        PaymentEventFactory(order=self.order, amount=80, event_type_id=self.payevent.id, date_created=self.timestamp)
+        query_count, __ = self._verify_transactions_queries()
+
+        orders = []
+        for __ in range(4):
+            order = OrderFactory(total_incl_tax=90, date_placed=self.timestamp)
+            OrderLineFactory(order=order, product=self.product, partner_sku='test_sku')
+            PaymentEventFactory(order=order, amount=90, event_type_id=self.payevent.id, date_created=self.timestamp)
+            PaymentEventFactory(order=order, amount=90, event_type_id=self.payevent.id, date_created=self.timestamp)
+            orders.append(order)
+
+        self.assertEqual(self._verify_transactions_queries()[0], query_count)
+
+        # Each additional chunk of orders with errors costs one query to fetch their payments.
+        chunked_query_count, exception = self._verify_transactions_queries('--chunk-size=2')
+        self.assertEqual(chunked_query_count, query_count + 2)
+        self.assertIn("The following order totals mismatch payments received", exception)
+        for order in orders:
+            self.assertIn('"order_id": {}'.format(order.id), exception)
+
+    def test_timings_logged(self):
+        """ Verify the time taken by each phase of the verification is logged. """
+        logger_name = 'ecommerce.core.management.commands.verify_transactions.logger'
+        with mock.patch(logger_name) as mock_logger:
+            with self.assertRaises(CommandError):
+                call_command('verify_transactions')
+
+        timings_calls = [
+            call for call in mock_logger.info.call_args_list if call[0][0] == "Verification timings: %s"
+        ]
+        self.assertEqual(len(timings_calls), 1)
+        timings = json.loads(timings_calls[0][0][1])
+        self.assertEqual(
+            set(timings),
+            {'count_orders', 'orders_no_payment', 'payment_totals', 'payment_details'}
+        )
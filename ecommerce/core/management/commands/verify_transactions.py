@@ -7,6 +7,12 @@ hour time window starting one hour in the past.
 For each order in the time window the command verifies exactly one payment of
 the expected value exists in the database.
 
+The orders are verified with a few set-based queries on the read replica rather
+than one by one: the orders without payments are selected with a subquery, and the
+number and totals of the payments and refunds of every order are aggregated in SQL.
+Only the orders failing verification are loaded, in chunks, along with their
+payments. The time taken by each phase is logged.
+
 If a PaymentEvent does not exist, multiple PaymentEvents exist, or the
 PaymentEvent amount is different from the order amount, then the order
 id and relevant payment information is logged in a list associated with
@@ -29,10 +35,12 @@ Example output:
 import datetime
 import json
 import logging
+import time
+from contextlib import contextmanager
 
 import pytz
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Sum
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
 from oscar.core.loading import get_class, get_model
 
 from ecommerce.core.constants import COURSE_ENTITLEMENT_PRODUCT_CLASS_NAME, SEAT_PRODUCT_CLASS_NAME
@@ -40,12 +48,14 @@ from ecommerce.core.utils import use_read_replica_if_available
 
 logger = logging.getLogger(__name__)
 Order = get_model('order', 'Order')
+OrderLine = get_model('order', 'Line')
 PaymentEvent = get_model('order', 'PaymentEvent')
 PaymentEventType = get_model('order', 'PaymentEventType')
 PaymentEventTypeName = get_class('order.constants', 'PaymentEventTypeName')
 
 DEFAULT_START_DELTA_TIME = 240
 DEFAULT_END_DELTA_TIME = 60
+DEFAULT_CHUNK_SIZE = 1000
 VALID_PRODUCT_CLASS_NAMES = [SEAT_PRODUCT_CLASS_NAME, COURSE_ENTITLEMENT_PRODUCT_CLASS_NAME]
 
 
@@ -53,6 +63,8 @@ class Command(BaseCommand):
     ERRORS_DICT = None
     PAID_EVENT_TYPE = None
     REFUNDED_EVENT_TYPE = None
+    chunk_size = DEFAULT_CHUNK_SIZE
+    timings = None
 
     help = 'Management command to verify ecommerce transactions and log if there is any imbalance.'
 
@@ -84,6 +96,13 @@ class Command(BaseCommand):
             action='store_true',
             help='Mismatched orders to go to Support'
         )
+        parser.add_argument(
+            '--chunk-size',
+            action='store',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Number of orders, or payments, fetched from the database at once.'
+        )
 
     def handle(self, *args, **options):
         logger.info("Verify transactions with options: %r", options)
@@ -91,6 +110,8 @@ class Command(BaseCommand):
         self.ERRORS_DICT = {}
         self.PAID_EVENT_TYPE = PaymentEventType.objects.get(name=PaymentEventTypeName.PAID)
         self.REFUNDED_EVENT_TYPE = PaymentEventType.objects.get(name=PaymentEventTypeName.REFUNDED)
+        self.chunk_size = options['chunk_size']
+        self.timings = {}
 
         support = options['support']
         start_delta = options['start_delta']
@@ -101,35 +122,95 @@ class Command(BaseCommand):
         end = datetime.datetime.now(pytz.utc) - datetime.timedelta(minutes=end_delta)
         logger.info("Start time: %s  --  End time: %s", start, end)
 
-        orders = use_read_replica_if_available(Order.objects.all()
-                                               .filter(date_placed__gte=start, date_placed__lt=end)
-                                               .prefetch_related('payment_events__event_type'))
-        logger.info("Number of orders to verify: %s", orders.count())
-        if orders.count() == 0:
+        orders = use_read_replica_if_available(
+            Order.objects.filter(date_placed__gte=start, date_placed__lt=end).order_by('id')
+        )
+        with self.timed('count_orders'):
+            order_count = orders.count()
+        logger.info("Number of orders to verify: %s", order_count)
+        if order_count == 0:
             logger.info("No orders, DONE")
             return
 
-        if support:
-            self.handle_support(orders)
-        else:
-            self.handle_alert(orders, threshold)
-
-    def process_errors(self, orders):
+        try:
+            if support:
+                self.handle_support(orders, order_count)
+            else:
+                self.handle_alert(orders, order_count, threshold)
+        finally:
+            logger.info("Verification timings: %s", json.dumps(self.timings))
+
+    @contextmanager
+    def timed(self, phase):
+        """ Records the time, in seconds, taken by the given phase of the verification. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = round(time.perf_counter() - start, 3)
+
+    def process_errors(self, order_count):
         # FIXME: it is possible for an order to have more than one error, so this really should
         # count "unique orders with errors", not number of errors
         error_count = sum([len(v["errors"]) for v in self.ERRORS_DICT.values()])
         exit_errors = json.dumps(self.ERRORS_DICT)
-        error_rate = float(error_count) / orders.count()
+        error_rate = float(error_count) / order_count
 
         logger.info("Summary: %d errors, %.1f %%", error_count, error_rate * 100.0)
 
         return error_count, exit_errors, error_rate
 
-    def handle_alert(self, orders, threshold):
-        for order in orders:
-            self.validate_order(order)
+    def handle_alert(self, orders, order_count, threshold):
+        with self.timed('orders_no_payment'):
+            for order in self.get_orders_without_payment(orders).iterator(chunk_size=self.chunk_size):
+                self.add_error(
+                    "orders_no_payment",
+                    "The following orders are without payments",
+                    order
+                )
+
+        with self.timed('payment_totals'):
+            # If a coupon is used to purchase a product for the full price, there will be no PaymentEvent,
+            # these orders are verified above.
+            anomalies = self.annotate_payment_totals(orders).filter(
+                # We do not support multi-payment today, so flag this for review.
+                Q(payment_count__gt=1) |
+                # If the payment total and the order total do not match, flag for review.
+                (Q(payment_count=1) & ~Q(payment_total=F('total_incl_tax'))) |
+                Q(refund_total__gt=F('payment_total'))
+            )
+            anomalies = list(anomalies.iterator(chunk_size=self.chunk_size))
+
+        with self.timed('payment_details'):
+            payments_by_order = self.get_payment_events(anomalies)
+            for order in anomalies:
+                payments, refunds = payments_by_order.get(order.id, ([], []))
+                if order.payment_count > 1:
+                    self.add_error(
+                        "orders_multi_payment",
+                        "The following orders had multiple payments",
+                        order,
+                        payments
+                    )
+                elif order.payment_count == 1 and order.payment_total != order.total_incl_tax:
+                    # FIXME: validate_order should be changed to log _all_ errors related to an order
+                    self.add_error(
+                        "orders_mismatched_totals",
+                        "The following order totals mismatch payments received",
+                        order,
+                        payments
+                    )
+
+                if order.refund_total is not None and order.payment_total is not None and \
+                        order.refund_total > order.payment_total:
+                    self.add_error(
+                        "orders_refund_exceeded",
+                        "The following orders had excessive refunds",
+                        order,
+                        refunds
+                    )
 
-        error_count, exit_errors, error_rate = self.process_errors(orders)
+        error_count, exit_errors, error_rate = self.process_errors(order_count)
 
         if threshold == 0 or threshold >= 1:
             threshold = int(threshold)
@@ -142,80 +223,93 @@ class Command(BaseCommand):
         if self.ERRORS_DICT:
             logger.warning("Errors in transactions within threshold (%r): %s", threshold, exit_errors)
 
-    def handle_support(self, orders):
-        for order in orders:
-            all_payment_events = order.payment_events
-            payments = all_payment_events.filter(event_type=self.PAID_EVENT_TYPE)
-
+    def handle_support(self, orders, order_count):
+        with self.timed('payment_totals'):
             # If the payment total and the order total do not match, flag for review.
-            if payments.count() == 1 and payments[0].amount != order.total_incl_tax:
-                mismatch_total = float(payments[0].amount - order.total_incl_tax)
-                # FIXME: validate_order should be changed to log _all_ errors related to an order
-                # If payment amount > order amount, a refund is required from Support
-                if mismatch_total > 0:
-                    error_dict = {
-                        "order_number": order.number,
-                        "order_id": order.id,
-                        "order_amount": float(order.total_incl_tax),
-                        # Assuming just one payment since we do not support multi-payment
-                        "payment_id": payments[0].id,
-                        "payment_amount": float(payments[0].amount),
-                        "user_email": order.guest_email,
-                        "refund_amount": mismatch_total
-                    }
-                    self.add_error(
-                        "orders_mismatched_totals_support",
-                        "There was a mismatch in the totals in the following order that require a refund",
-                        error_dict=error_dict,
-                    )
-
-        error_count, exit_errors, error_rate = self.process_errors(orders)
-        if error_count and error_rate > 0:
-            raise CommandError("Errors in transactions: {errors}".format(errors=exit_errors))
-
-    def validate_order(self, order):
-        all_payment_events = order.payment_events
-        refunds = all_payment_events.filter(event_type=self.REFUNDED_EVENT_TYPE)
-        payments = all_payment_events.filter(event_type=self.PAID_EVENT_TYPE)
-
-        # If a coupon is used to purchase a product for the full price, there will be no PaymentEvent
-        # so we must also verify that order had a price > 0.
-        if payments.count() == 0:
-            if self.order_requires_payment(order) and order.total_incl_tax > 0:
+            # If payment amount > order amount, a refund is required from Support
+            mismatches = self.annotate_payment_totals(orders).filter(
+                payment_count=1,
+                payment_total__gt=F('total_incl_tax'),
+            )
+            mismatches = list(mismatches.iterator(chunk_size=self.chunk_size))
+
+        with self.timed('payment_details'):
+            payments_by_order = self.get_payment_events(mismatches)
+            for order in mismatches:
+                # Assuming just one payment since we do not support multi-payment
+                payment = payments_by_order[order.id][0][0]
+                error_dict = {
+                    "order_number": order.number,
+                    "order_id": order.id,
+                    "order_amount": float(order.total_incl_tax),
+                    "payment_id": payment.id,
+                    "payment_amount": float(payment.amount),
+                    "user_email": order.guest_email,
+                    "refund_amount": float(payment.amount - order.total_incl_tax)
+                }
                 self.add_error(
-                    "orders_no_payment",
-                    "The following orders are without payments",
-                    order
+                    "orders_mismatched_totals_support",
+                    "There was a mismatch in the totals in the following order that require a refund",
+                    error_dict=error_dict,
                 )
 
-        # We do not support multi-payment today, so flag this for review.
-        elif payments.count() > 1:
-            self.add_error(
-                "orders_multi_payment",
-                "The following orders had multiple payments",
-                order,
-                payments
-            )
+        error_count, exit_errors, error_rate = self.process_errors(order_count)
+        if error_count and error_rate > 0:
+            raise CommandError("Errors in transactions: {errors}".format(errors=exit_errors))
 
-        # If the payment total and the order total do not match, flag for review.
-        elif payments.aggregate(total=Sum('amount')).get('total') != order.total_incl_tax:
-            # FIXME: validate_order should be changed to log _all_ errors related to an order
-            self.add_error(
-                "orders_mismatched_totals",
-                "The following order totals mismatch payments received",
-                order,
-                payments
-            )
+    def get_orders_without_payment(self, orders):
+        """
+        Returns the orders, with a price > 0, which have no payment and contain a product paid immediately.
+        """
+        # We only expect immediate payments for Seats and Entitlements.
+        # Filter out orders that were flagged as being without payment for other product types
+        lines_requiring_payment = OrderLine.objects.filter(order=OuterRef('pk')).filter(
+            Q(product__product_class__name__in=VALID_PRODUCT_CLASS_NAMES) |
+            Q(product__parent__product_class__name__in=VALID_PRODUCT_CLASS_NAMES)
+        )
+        payments = PaymentEvent.objects.filter(order=OuterRef('pk'), event_type=self.PAID_EVENT_TYPE)
+        return orders.filter(
+            Exists(lines_requiring_payment),
+            ~Exists(payments),
+            total_incl_tax__gt=0,
+        ).only('id', 'number', 'total_incl_tax')
+
+    def annotate_payment_totals(self, orders):
+        """
+        Annotates the orders with the number and total of their payments, and the total of their refunds.
+
+        The totals are None for the orders without payments, or refunds.
+        """
+        paid = Q(payment_events__event_type=self.PAID_EVENT_TYPE)
+        refunded = Q(payment_events__event_type=self.REFUNDED_EVENT_TYPE)
+        return orders.only('id', 'number', 'total_incl_tax', 'guest_email').annotate(
+            payment_count=Count('payment_events', filter=paid),
+            payment_total=Sum('payment_events__amount', filter=paid),
+            refund_total=Sum('payment_events__amount', filter=refunded),
+        )
 
-        refund_total = refunds.aggregate(total=Sum('amount')).get('total')
-        payment_total = payments.aggregate(total=Sum('amount')).get('total')
-        if refund_total is not None and refund_total > payment_total:
-            self.add_error(
-                "orders_refund_exceeded",
-                "The following orders had excessive refunds",
-                order,
-                refunds
+    def get_payment_events(self, orders):
+        """
+        Returns the payments and the refunds of the given orders, keyed by order id.
+
+        The payment events are fetched in chunks of orders.
+        """
+        payments_by_order = {}
+        order_ids = [order.id for order in orders]
+        for index in range(0, len(order_ids), self.chunk_size):
+            payment_events = use_read_replica_if_available(
+                PaymentEvent.objects.filter(
+                    order_id__in=order_ids[index:index + self.chunk_size],
+                    event_type__in=(self.PAID_EVENT_TYPE, self.REFUNDED_EVENT_TYPE),
+                ).select_related('event_type').order_by('id')
             )
+            for payment_event in payment_events:
+                payments, refunds = payments_by_order.setdefault(payment_event.order_id, ([], []))
+                if payment_event.event_type_id == self.PAID_EVENT_TYPE.id:
+                    payments.append(payment_event)
+                else:
+                    refunds.append(payment_event)
+        return payments_by_order
 
     def add_error(self, tag, msg, order=None, payments=None, error_dict=None):
         if tag not in self.ERRORS_DICT:
@@ -243,13 +337,3 @@ class Command(BaseCommand):
                 for p in payments
             ]
         return d
-
-    def order_requires_payment(self, order):
-        # We only expect immediate payments for Seats and Entitlements.
-        # Filter out orders that were flagged as being without payment for other product types
-        # FIXME: there are better ways to do this
-        for line in order.lines.all():
-            name = line.product.get_product_class().name
-            if name in VALID_PRODUCT_CLASS_NAMES:
-                return True
-        return False
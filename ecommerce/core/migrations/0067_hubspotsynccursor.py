@@ -0,0 +1,30 @@
+# Generated by Django 3.2.23 on 2026-10-19 00:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        ('core', '0066_remove_account_microfrontend_url_field_from_SiteConfiguration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HubspotSyncCursor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('last_synced', models.DateTimeField(help_text='Baskets changed up to this date have been synced to Hubspot.', verbose_name='Last Synced')),
+                ('site', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hubspot_sync_cursor', to='sites.site')),
+            ],
+            options={
+                'get_latest_by': 'modified',
+                'abstract': False,
+            },
+        ),
+    ]
@@ -10,14 +10,15 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
+from django_extensions.db.models import TimeStampedModel
 from edx_django_utils import monitoring as monitoring_utils
 from edx_rbac.models import UserRole, UserRoleAssignment
-from edx_rest_api_client.client import OAuthAPIClient
 from jsonfield.fields import JSONField
 from requests.exceptions import ConnectionError as ReqConnectionError
 from requests.exceptions import RequestException, Timeout
 from simple_history.models import HistoricalRecords
 
+from ecommerce.core.api_clients import get_oauth_api_client
 from ecommerce.core.constants import ALL_ACCESS_CONTEXT, ALLOW_MISSING_LMS_USER_ID
 from ecommerce.core.exceptions import MissingLmsUserIdException
 from ecommerce.core.utils import log_message_and_raise_validation_error
@@ -388,16 +389,13 @@ class SiteConfiguration(models.Model):
     @property
     def oauth_api_client(self):
         """
-        This client is authenticated with the configured oauth settings and automatically cached.
+        This client is authenticated with the configured oauth settings and shared by the whole process,
+        along with its connection pool and access token.
 
         Returns:
             requests.Session: API client
         """
-        return OAuthAPIClient(
-            settings.BACKEND_SERVICE_EDX_OAUTH2_PROVIDER_URL,
-            settings.BACKEND_SERVICE_EDX_OAUTH2_KEY,
-            settings.BACKEND_SERVICE_EDX_OAUTH2_SECRET,
-        )
+        return get_oauth_api_client(self)
 
     @cached_property
     def embargo_api_url(self):
@@ -728,6 +726,23 @@ class BusinessClient(models.Model):
         super(BusinessClient, self).save(*args, **kwargs)
 
 
+class HubspotSyncCursor(TimeStampedModel):
+    """
+    Date up to which the baskets of a site have been synced to Hubspot.
+
+    The sync_hubspot command only syncs the baskets changed after this date, and moves it forward once they are synced.
+    """
+
+    site = models.OneToOneField('sites.Site', related_name='hubspot_sync_cursor', on_delete=models.CASCADE)
+    last_synced = models.DateTimeField(
+        verbose_name=_('Last Synced'),
+        help_text=_('Baskets changed up to this date have been synced to Hubspot.'),
+    )
+
+    def __str__(self):
+        return '{site}: {last_synced}'.format(site=self.site.domain, last_synced=self.last_synced)
+
+
 class EcommerceFeatureRole(UserRole):
     """
     User role definitions specific to Ecommerce.
@@ -0,0 +1,120 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import responses
+from django.test import override_settings
+
+from ecommerce.core.api_clients import clear_oauth_api_clients, get_oauth_api_client
+from ecommerce.tests.testcases import TestCase
+
+
+class KeepAliveRequestHandler(BaseHTTPRequestHandler):
+    """ Answers every GET with an empty JSON object, keeping the connection open. """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        body = json.dumps({}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class OAuthAPIClientTests(TestCase):
+    def setUp(self):
+        super(OAuthAPIClientTests, self).setUp()
+        self.addCleanup(clear_oauth_api_clients)
+
+    def test_client_shared_per_site(self):
+        """ Verify the same client is returned for a site until its OAuth settings change. """
+        client = get_oauth_api_client(self.site_configuration)
+        self.assertIs(get_oauth_api_client(self.site_configuration), client)
+
+        with override_settings(BACKEND_SERVICE_EDX_OAUTH2_KEY='another-key'):
+            self.assertIsNot(get_oauth_api_client(self.site_configuration), client)
+
+    @responses.activate
+    def test_token_reused(self):
+        """ Verify the access token is fetched once, and counted, for the requests of every upstream. """
+        self.mock_access_token_response()
+        responses.add(responses.GET, self.site_configuration.build_lms_url('/api/test/'), json={})
+        responses.add(responses.GET, self.site_configuration.discovery_api_url + 'test/', json={})
+        client = get_oauth_api_client(self.site_configuration)
+
+        client.get(self.site_configuration.build_lms_url('/api/test/'))
+        client.get(self.site_configuration.build_lms_url('/api/test/'))
+        client.get(self.site_configuration.discovery_api_url + 'test/')
+
+        metrics = client.get_metrics()
+        self.assertEqual(metrics['token_fetches'], 1)
+        self.assertEqual(metrics['upstreams']['lms']['requests'], 2)
+        self.assertEqual(metrics['upstreams']['discovery']['requests'], 1)
+        self.assertEqual(len(responses.calls), 4)
+
+    @responses.activate
+    def test_cookies_not_kept(self):
+        """ Verify the cookies set by an upstream service are not sent with the next calls. """
+        self.mock_access_token_response()
+        url = self.site_configuration.build_lms_url('/api/test/')
+        responses.add(responses.GET, url, json={}, headers={'Set-Cookie': 'sessionid=learner; Path=/'})
+        client = get_oauth_api_client(self.site_configuration)
+
+        client.get(url)
+        client.get(url)
+
+        self.assertEqual(len(client.cookies), 0)
+        self.assertNotIn('Cookie', responses.calls[-1].request.headers)
+
+    @responses.activate
+    def test_token_refreshed_before_expiry(self):
+        """ Verify a new access token is fetched when the current one expires within the refresh margin. """
+        self.mock_access_token_response(access_token='expiring')
+        self.mock_access_token_response(access_token='refreshed')
+        client = get_oauth_api_client(self.site_configuration)
+        self.assertEqual(client.get_jwt_access_token(), 'expiring')
+
+        with override_settings(OAUTH_API_CLIENT_TOKEN_REFRESH_MARGIN=3600):
+            self.assertEqual(client.get_jwt_access_token(), 'refreshed')
+
+        self.assertEqual(client.get_metrics()['token_fetches'], 2)
+
+    @responses.activate
+    def test_expiring_shared_token_not_used(self):
+        """ Verify a new access token is fetched when the one in the shared cache expires within the margin. """
+        self.mock_access_token_response(access_token='expiring', expires_in=30)
+        self.mock_access_token_response(access_token='fresh')
+        client = get_oauth_api_client(self.site_configuration)
+
+        self.assertEqual(client.get_jwt_access_token(), 'fresh')
+        self.assertEqual(client.get_jwt_access_token(), 'fresh')
+        self.assertEqual(len(responses.calls), 2)
+        expires_at = client._token_expires_at  # pylint: disable=protected-access
+        self.assertGreater(expires_at, datetime.datetime.utcnow() + datetime.timedelta(seconds=60))
+
+    @responses.activate
+    def test_connections_reused(self):
+        """ Verify the requests to an upstream reuse the connection opened by the first one. """
+        server = HTTPServer(('127.0.0.1', 0), KeepAliveRequestHandler)
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.start()
+        self.addCleanup(server_thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        lms_url_root = 'http://127.0.0.1:{}'.format(server.server_port)
+        responses.add_passthru(lms_url_root)
+        self.mock_access_token_response()
+        self.site_configuration.lms_url_root = lms_url_root
+        self.site_configuration.save()
+        client = get_oauth_api_client(self.site_configuration)
+
+        for _ in range(3):
+            client.get(lms_url_root + '/api/test/').raise_for_status()
+
+        self.assertEqual(client.get_metrics()['upstreams']['lms'], {'requests': 3, 'connections': 1})
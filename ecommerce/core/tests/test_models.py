@@ -9,12 +9,12 @@ from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.exceptions import ValidationError
 from django.test import override_settings
-from edx_rest_api_client.client import OAuthAPIClient
 from requests.exceptions import ConnectionError as ReqConnectionError
 from social_django.models import UserSocialAuth
 from testfixtures import LogCapture
 from waffle.testutils import override_flag
 
+from ecommerce.core.api_clients import PooledOAuthAPIClient
 from ecommerce.core.models import (
     BusinessClient,
     EcommerceFeatureRole,
@@ -373,7 +373,12 @@ class SiteConfigurationTests(TestCase):
         token = self.mock_access_token_response()
         site_config = SiteConfigurationFactory()
         client = site_config.oauth_api_client
-        self.assertEqual(type(client), OAuthAPIClient)
+        self.assertEqual(type(client), PooledOAuthAPIClient)
+        self.assertEqual(client.get_jwt_access_token(), token)
+        self.assertEqual(len(responses.calls), 1)
+
+        # The client, and its token, are shared by every access for the site.
+        self.assertIs(SiteConfiguration.objects.get(id=site_config.id).oauth_api_client, client)
         self.assertEqual(client.get_jwt_access_token(), token)
         self.assertEqual(len(responses.calls), 1)
 
@@ -2,10 +2,11 @@
 
 import ddt
 import responses
-from edx_django_utils.cache import TieredCache
+from edx_django_utils.cache import DEFAULT_REQUEST_CACHE, TieredCache
 from mock import patch
 from opaque_keys.edx.keys import CourseKey
 from requests.exceptions import ConnectionError as ReqConnectionError
+from responses import matchers
 
 from ecommerce.core.utils import get_cache_key
 from ecommerce.coupons.tests.mixins import DiscoveryMockMixin
@@ -13,6 +14,7 @@ from ecommerce.courses.tests.factories import CourseFactory
 from ecommerce.courses.utils import (
     get_certificate_type_display_value,
     get_course_catalogs,
+    get_course_info_for_products,
     get_course_info_from_catalog,
     mode_for_product
 )
@@ -109,6 +111,63 @@ class UtilsTests(DiscoveryTestMixin, DiscoveryMockMixin, TestCase):
             _ = get_course_info_from_catalog(self.request.site, product)
             self.assertEqual(mocked_set_all_tiers.call_count, 2)
 
+    @responses.activate
+    def test_get_course_info_for_products(self):
+        """
+        Verify the course information of several products is read from the cache at once, and the missing
+        course runs and courses are fetched with one Discovery request each and cached.
+        """
+        self.mock_access_token_response()
+        discovery_api_url = self.site_configuration.discovery_api_url
+        cached_seat, *seats = [
+            CourseFactory(partner=self.partner).create_or_update_seat('verified', None, 100) for _ in range(3)
+        ]
+        entitlements = [
+            create_or_update_course_entitlement('verified', 100, self.partner, uuid, 'Entitlement {}'.format(uuid))
+            for uuid in ('aaaaaaaa-0000-0000-0000-000000000000', 'bbbbbbbb-0000-0000-0000-000000000000')
+        ]
+
+        cached_course_run = {'key': cached_seat.attr.course_key, 'title': 'Cached'}
+        TieredCache.set_all_tiers(
+            get_cache_key(site_domain=self.site.domain, resource='course_runs-{}'.format(cached_seat.attr.course_key)),
+            cached_course_run,
+        )
+        course_runs = [{'key': seat.attr.course_key, 'title': seat.title} for seat in seats]
+        courses = [{'uuid': entitlement.attr.UUID, 'key': entitlement.title} for entitlement in entitlements]
+        responses.add(
+            responses.GET, '{}course_runs/'.format(discovery_api_url),
+            json={'count': 2, 'next': None, 'results': course_runs},
+            match=[matchers.query_param_matcher({
+                'keys': ','.join(sorted(seat.attr.course_key for seat in seats)),
+                'page_size': '2',
+                'partner': self.partner.short_code,
+            })],
+        )
+        responses.add(
+            responses.GET, '{}courses/'.format(discovery_api_url),
+            json={'count': 2, 'next': None, 'results': courses},
+            match=[matchers.query_param_matcher({
+                'uuids': ','.join(entitlement.attr.UUID for entitlement in entitlements),
+                'page_size': '2',
+            })],
+        )
+
+        products = [cached_seat] + seats + entitlements
+        expected = dict(zip(
+            [product.id for product in products], [cached_course_run] + course_runs + courses
+        ))
+        self.assertEqual(get_course_info_for_products(self.request.site, products), expected)
+        self.assertEqual(len(responses.calls), 3)
+
+        # Only the shared cache remains for the next request.
+        DEFAULT_REQUEST_CACHE.clear()
+        for seat, course_run in zip(seats, course_runs):
+            self.assertEqual(get_course_info_from_catalog(self.request.site, seat), course_run)
+        self.assertEqual(get_course_info_for_products(self.request.site, products[1:]), {
+            product_id: info for product_id, info in expected.items() if product_id != cached_seat.id
+        })
+        self.assertEqual(len(responses.calls), 3)
+
     @ddt.data(
         ('honor', 'Honor'),
         ('verified', 'Verified'),
@@ -2,8 +2,9 @@
 from urllib.parse import urljoin
 
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
-from edx_django_utils.cache import TieredCache
+from edx_django_utils.cache import DEFAULT_REQUEST_CACHE, TieredCache
 from opaque_keys.edx.keys import CourseKey
 
 from ecommerce.core.utils import deprecated_traverse_pagination, get_cache_key
@@ -111,6 +112,95 @@ def get_course_info_from_catalog(site, product):
     return response
 
 
+def _get_course_info_resource(product):
+    """ Returns the Discovery resource, and the identifier in it, holding the course information of the product. """
+    if product.is_course_entitlement_product:
+        return 'courses', str(product.attr.UUID)
+    return 'course_runs', str(CourseKey.from_string(product.attr.course_key))
+
+
+def _get_discovery_responses(site, resource, filter_name, resource_ids):
+    """
+    Return the information of the given resources from a single Discovery list request.
+
+    Arguments:
+        site (Site): Site object containing Site Configuration data
+        resource (str): 'courses' or 'course_runs'
+        filter_name (str): Query parameter filtering the resource by its identifiers
+        resource_ids (list): Identifiers of the resources to be retrieved
+
+    Returns:
+        list: information of the found resources
+    """
+    params = {filter_name: ','.join(resource_ids), 'page_size': len(resource_ids)}
+    if resource == 'course_runs':
+        params['partner'] = site.siteconfiguration.partner.short_code
+
+    api_client = site.siteconfiguration.oauth_api_client
+    discovery_api_url = urljoin(f"{site.siteconfiguration.discovery_api_url}/", f"{resource}/")
+
+    response = api_client.get(discovery_api_url, params=params)
+    response.raise_for_status()
+    return deprecated_traverse_pagination(response.json(), api_client, discovery_api_url)
+
+
+def get_course_info_for_products(site, products):
+    """
+    Get the course or course_run information of several products at once, from the cache or Discovery Service.
+
+    Cached information is read with one lookup, and the missing courses and course runs are fetched with one
+    Discovery request each and cached under the same keys as get_course_info_from_catalog.
+
+    Arguments:
+        site (Site): Site object containing Site Configuration data
+        products (iterable): Seat, enrollment code or course entitlement products
+
+    Returns:
+        dict: Course or course run information keyed by product ID. Products unknown to Discovery are omitted.
+
+    Raises:
+        HTTPError: requests exception "HTTPError"
+    """
+    product_resources = {product.id: _get_course_info_resource(product) for product in products}
+    cache_keys = {
+        get_cache_key(site_domain=site.domain, resource="{}-{}".format(resource, resource_id)): (resource, resource_id)
+        for resource, resource_id in product_resources.values()
+    }
+
+    course_infos = {}
+    missing_keys = []
+    for cache_key, resource in cache_keys.items():
+        cached_response = DEFAULT_REQUEST_CACHE.get_cached_response(cache_key)
+        if cached_response.is_found:
+            course_infos[resource] = cached_response.value
+        else:
+            missing_keys.append(cache_key)
+    for cache_key, value in cache.get_many(missing_keys).items():
+        DEFAULT_REQUEST_CACHE.set(cache_key, value)
+        course_infos[cache_keys[cache_key]] = value
+
+    for resource, filter_name, identifier in (('course_runs', 'keys', 'key'), ('courses', 'uuids', 'uuid')):
+        resource_ids = sorted(
+            resource_id for key_resource, resource_id in cache_keys.values()
+            if key_resource == resource and (resource, resource_id) not in course_infos
+        )
+        if not resource_ids:
+            continue
+
+        results = _get_discovery_responses(site, resource, filter_name, resource_ids)
+        found = {str(result[identifier]): result for result in results}
+        for resource_id in resource_ids:
+            if resource_id in found:
+                course_infos[(resource, resource_id)] = found[resource_id]
+                cache_key = get_cache_key(site_domain=site.domain, resource="{}-{}".format(resource, resource_id))
+                TieredCache.set_all_tiers(cache_key, found[resource_id], settings.COURSES_API_CACHE_TIMEOUT)
+
+    return {
+        product_id: course_infos[resource]
+        for product_id, resource in product_resources.items() if resource in course_infos
+    }
+
+
 def get_course_catalogs(site, resource_id=None):
     """
     Get details related to course catalogs from Discovery Service.
@@ -1,27 +1,31 @@
 
 
 import logging
+from collections import defaultdict
 from decimal import Decimal
 from uuid import UUID
 
 import crum
 from django.contrib import messages
-from django.db.models import Sum
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext as _
+from edx_django_utils.cache import RequestCache
 from oscar.core.loading import get_model
 from requests.exceptions import ConnectionError as ReqConnectionError
 from requests.exceptions import HTTPError, Timeout
 
-from ecommerce.courses.utils import get_course_info_from_catalog
-from ecommerce.enterprise.api import catalog_contains_course_runs, get_enterprise_id_for_user
+from ecommerce.courses.utils import get_course_info_for_products, get_course_info_from_catalog
+from ecommerce.enterprise.api import (
+    catalog_contains_course_runs,
+    fetch_enterprise_catalogs_for_content_items,
+    get_enterprise_id_for_user
+)
 from ecommerce.enterprise.utils import get_or_create_enterprise_customer_user
 from ecommerce.extensions.basket.utils import ENTERPRISE_CATALOG_ATTRIBUTE_TYPE
-from ecommerce.extensions.fulfillment.status import ORDER
 from ecommerce.extensions.offer.constants import OFFER_ASSIGNMENT_REVOKED, OFFER_REDEEMED
 from ecommerce.extensions.offer.mixins import ConditionWithoutRangeMixin, SingleItemConsumptionConditionMixin
 from ecommerce.extensions.offer.models import OFFER_PRIORITY_ENTERPRISE
 from ecommerce.extensions.offer.utils import get_benefit_type, get_discount_value
-from ecommerce.extensions.refund.status import REFUND
 
 BasketAttribute = get_model('basket', 'BasketAttribute')
 BasketAttributeType = get_model('basket', 'BasketAttributeType')
@@ -30,23 +34,26 @@ Condition = get_model('offer', 'Condition')
 ConditionalOffer = get_model('offer', 'ConditionalOffer')
 OfferAssignment = get_model('offer', 'OfferAssignment')
 Order = get_model('order', 'Order')
-OrderDiscount = get_model('order', 'OrderDiscount')
-Refund = get_model('refund', 'Refund')
 StockRecord = get_model('partner', 'StockRecord')
+UserDiscountLedger = get_model('offer', 'UserDiscountLedger')
 Voucher = get_model('voucher', 'Voucher')
 logger = logging.getLogger(__name__)
 
+ENTERPRISE_BASKET_FACTS_NAMESPACE = 'enterprise_basket_facts'
+
 
 def sum_user_discounts_for_offer(user, offer):
-    refunded_order_ids = Refund.objects.filter(
-        user_id=user.id, status=REFUND.COMPLETE
-    ).values_list('order_id', flat=True)
+    """
+    Returns the discount the user got from the offer, read from their discount ledger.
+    """
+    return UserDiscountLedger.get_amount(offer, user)
 
-    sum_user_discounts = OrderDiscount.objects.filter(
-        offer_id=offer.id, order__user_id=user.id, order__status=ORDER.COMPLETE
-    ).exclude(order_id__in=refunded_order_ids).aggregate(Sum('amount'))['amount__sum'] or Decimal(0.00)
 
-    return sum_user_discounts
+def get_user_discounts_by_offer(user):
+    """
+    Returns the discounts the user got from offers, read from their discount ledgers, keyed by offer ID.
+    """
+    return dict(UserDiscountLedger.objects.filter(user_id=user.id).values_list('offer_id', 'amount'))
 
 
 def is_offer_max_user_discount_available(basket, offer):
@@ -56,7 +63,7 @@ def is_offer_max_user_discount_available(basket, offer):
         return True
     discount_value = _get_basket_discount_value(basket, offer)
 
-    sum_user_discounts_for_this_offer = sum_user_discounts_for_offer(basket.owner, offer)
+    sum_user_discounts_for_this_offer = EnterpriseBasketFacts.for_basket(basket).get_user_discount(offer)
     new_total_discount = discount_value + sum_user_discounts_for_this_offer
     if new_total_discount <= offer.max_user_discount:
         return True
@@ -80,7 +87,7 @@ def is_offer_max_discount_available(basket, offer):
 
 def _get_basket_discount_value(basket, offer):
     """Calculate the discount value based on benefit type and value"""
-    sum_basket_lines = basket.all_lines().aggregate(total=Sum('stockrecord__price'))['total'] or Decimal(0.0)
+    sum_basket_lines = EnterpriseBasketFacts.for_basket(basket).sum_line_prices
     # calculate discount value that will be covered by the offer
     benefit_type = get_benefit_type(offer.benefit)
     benefit_value = offer.benefit.value
@@ -98,6 +105,179 @@ def _get_basket_discount_value(basket, offer):
     return discount_value
 
 
+class EnterpriseBasketFacts:
+    """
+    What the enterprise conditions need to know about a basket, computed once for all the offers evaluated.
+
+    Use `for_basket` to get the facts shared by everything running in the current request. They are computed
+    again once the lines or the owner of the basket change.
+    """
+
+    def __init__(self, basket, key):
+        self.basket = basket
+        self.key = key
+        self._catalog_memberships = {}
+
+    @staticmethod
+    def _get_key(basket):
+        lines = tuple((line.id or id(line), line.product_id, line.quantity) for line in basket.all_lines())
+        return basket.owner_id, lines
+
+    @classmethod
+    def for_basket(cls, basket):
+        """ Returns the facts about the given basket, computing them once per request. """
+        request_cache = RequestCache(ENTERPRISE_BASKET_FACTS_NAMESPACE)
+        key = cls._get_key(basket)
+        cached_response = request_cache.get_cached_response(id(basket))
+        if cached_response.is_found and cached_response.value.basket is basket and cached_response.value.key == key:
+            return cached_response.value
+
+        facts = cls(basket, key)
+        request_cache.set(id(basket), facts)
+        return facts
+
+    @cached_property
+    def contains_program_entitlement(self):
+        """ Whether the basket contains a course entitlement which isn't for an Executive Education (2U) course. """
+        return any(
+            line.product.is_course_entitlement_product and not line.product.is_executive_education_2u_product
+            for line in self.basket.all_lines()
+        )
+
+    @cached_property
+    def line_course_ids(self):
+        """
+        The course of every line of the basket, as (line, course ID, error) tuples.
+
+        The course ID is the course key of an entitlement, the course run ID of a seat, and None for a product
+        not related to a course. The error is the exception raised while getting the course of an entitlement.
+        """
+        entitlement_products = [
+            line.product for line in self.basket.all_lines() if line.product.is_course_entitlement_product
+        ]
+        if len(entitlement_products) > 1:
+            try:
+                # Retrieve, and cache, the courses of all the entitlements at once.
+                get_course_info_for_products(self.basket.site, entitlement_products)
+            except (ReqConnectionError, HTTPError, Timeout):
+                # Each entitlement falls back to retrieving its own course below.
+                logger.warning(
+                    'Unable to retrieve the courses of the course entitlement products [%s] at once.',
+                    ', '.join(str(product.attr.UUID) for product in entitlement_products),
+                )
+
+        line_course_ids = []
+        for line in self.basket.all_lines():
+            if line.product.is_course_entitlement_product:
+                try:
+                    response = get_course_info_from_catalog(self.basket.site, line.product)
+                except (ReqConnectionError, KeyError, HTTPError, Timeout) as exc:
+                    line_course_ids.append((line, None, exc))
+                else:
+                    line_course_ids.append((line, response['key'], None))
+            else:
+                course = line.product.course
+                line_course_ids.append((line, course.id if course else None, None))
+        return line_course_ids
+
+    @cached_property
+    def user_enterprise(self):
+        """ The UUID of the enterprise customer of the basket owner. """
+        return get_enterprise_id_for_user(self.basket.site, self.basket.owner)
+
+    @cached_property
+    def catalog(self):
+        """ The UUID of the enterprise catalog the basket is for, if any. """
+        return EnterpriseCustomerCondition._get_enterprise_catalog_uuid_from_basket(  # pylint: disable=protected-access
+            self.basket
+        )
+
+    @cached_property
+    def sum_line_prices(self):
+        """ The sum of the prices of the basket lines. """
+        return sum(
+            (line.stockrecord.price for line in self.basket.all_lines() if line.stockrecord.price is not None),
+            Decimal(0.0)
+        )
+
+    @cached_property
+    def user_discounts(self):
+        """ The discounts of the basket owner, keyed by offer ID, see get_user_discounts_by_offer. """
+        return get_user_discounts_by_offer(self.basket.owner)
+
+    def get_user_discount(self, offer):
+        """ Returns the sum of the discounts the basket owner got from the offer. """
+        return self.user_discounts.get(offer.id) or Decimal(0.00)
+
+    def catalog_contains_course_runs(self, course_ids, enterprise_customer_uuid, enterprise_customer_catalog_uuid):
+        """
+        Returns whether the catalog, or any catalog of the enterprise customer if none is given, contains all the
+        given courses.
+
+        Raises:
+            ConnectionError, HTTPError, Timeout, KeyError: if the enterprise catalog service could not be reached.
+        """
+        key = (tuple(course_ids), enterprise_customer_uuid, enterprise_customer_catalog_uuid)
+        if key not in self._catalog_memberships:
+            self._catalog_memberships[key] = catalog_contains_course_runs(
+                self.basket.site, course_ids, enterprise_customer_uuid,
+                enterprise_customer_catalog_uuid=enterprise_customer_catalog_uuid
+            )
+        return self._catalog_memberships[key]
+
+    def prefetch_catalog_memberships(self, offers):
+        """
+        Finds out at once which catalogs of the given enterprise offers contain the courses of the basket.
+
+        The enterprise catalog service is asked once for every enterprise customer with offers for two catalogs
+        or more, rather than once for every catalog. Failures are only logged, each offer asks for its own
+        catalog when its condition is evaluated.
+        """
+        catalogs_by_customer = defaultdict(set)
+        for offer in offers:
+            condition = offer.condition
+            if not (condition.enterprise_customer_uuid and condition.enterprise_customer_catalog_uuid):
+                continue
+            if offer.offer_type == ConditionalOffer.SITE and self.contains_program_entitlement:
+                continue
+            catalogs_by_customer[str(condition.enterprise_customer_uuid)].add(
+                str(condition.enterprise_customer_catalog_uuid)
+            )
+
+        catalogs_by_customer = {
+            customer: catalogs for customer, catalogs in catalogs_by_customer.items() if len(catalogs) > 1
+        }
+        # Only the offers for the enterprise customer of the basket owner, and for the catalog of the basket if
+        # there is one, can be satisfied.
+        if not catalogs_by_customer or not self.basket.all_lines() or self.catalog:
+            return
+        if self.user_enterprise:
+            catalogs_by_customer = {
+                customer: catalogs for customer, catalogs in catalogs_by_customer.items()
+                if customer == self.user_enterprise
+            }
+
+        course_ids = [course_id for __, course_id, __ in self.line_course_ids]
+        if None in course_ids:
+            # No enterprise offer can be satisfied.
+            return
+
+        for customer, catalogs in catalogs_by_customer.items():
+            try:
+                catalog_list = fetch_enterprise_catalogs_for_content_items(self.basket.site, course_ids, customer)
+            except (ReqConnectionError, KeyError, HTTPError, Timeout) as exc:
+                logger.warning(
+                    'Failed to prefetch the enterprise catalogs containing the courses [%s] for enterprise [%s]. '
+                    'Message: %s',
+                    ','.join(course_ids), customer, exc
+                )
+                continue
+
+            containing_catalogs = {str(catalog) for catalog in catalog_list}
+            for catalog in catalogs:
+                self._catalog_memberships[(tuple(course_ids), customer, catalog)] = catalog in containing_catalogs
+
+
 class EnterpriseCustomerCondition(ConditionWithoutRangeMixin, SingleItemConsumptionConditionMixin, Condition):
     class Meta:
         app_label = 'enterprise'
@@ -136,40 +316,40 @@ class EnterpriseCustomerCondition(ConditionWithoutRangeMixin, SingleItemConsumpt
         enterprise_name_in_condition = str(self.enterprise_customer_name)
         username = basket.owner.username
 
+        facts = EnterpriseBasketFacts.for_basket(basket)
+
+        # Enterprise offers cannot be used to purchase entitlements (for programs)
+        # except for Executive Education (2U) courses
+        if offer.offer_type == ConditionalOffer.SITE and facts.contains_program_entitlement:
+            return False
+
         # This variable will hold both course keys and course run identifiers.
         course_ids = []
 
-        for line in basket.all_lines():
+        for line, course_id, error in facts.line_course_ids:
             if line.product.is_course_entitlement_product:
-                # Enterprise offers cannot be used to purchase entitlements (for programs)
-                # except for Executive Education (2U) courses
-                if offer.offer_type == ConditionalOffer.SITE and not line.product.is_executive_education_2u_product:
-                    return False
-
-                try:
-                    response = get_course_info_from_catalog(basket.site, line.product)
-                except (ReqConnectionError, KeyError, HTTPError, Timeout) as exc:
-                    logger.exception(
+                if error:
+                    logger.error(
                         '[Code Redemption Failure] Unable to apply enterprise offer because basket '
                         'contains a course entitlement product but we failed to get course info from  '
                         'course entitlement product.'
                         'User: %s, Offer: %s, Message: %s, Enterprise: %s, Catalog: %s, Course UUID: %s',
                         username,
                         offer.id,
-                        exc,
+                        error,
                         enterprise_in_condition,
                         enterprise_catalog,
-                        line.product.attr.UUID
+                        line.product.attr.UUID,
+                        exc_info=error
                     )
                     return False
-                else:
-                    course_ids.append(response['key'])
 
-                    # Skip to the next iteration.
-                    continue
+                course_ids.append(course_id)
+
+                # Skip to the next iteration.
+                continue
 
-            course = line.product.course
-            if not course:
+            if not course_id:
                 # Basket contains products not related to a course_run.
                 # Only log for non-site offers to avoid noise.
                 if offer.offer_type != ConditionalOffer.SITE:
@@ -183,10 +363,10 @@ class EnterpriseCustomerCondition(ConditionWithoutRangeMixin, SingleItemConsumpt
                                    enterprise_catalog)
                 return False
 
-            course_ids.append(course.id)
+            course_ids.append(course_id)
 
         courses_in_basket = ','.join(course_ids)
-        user_enterprise = get_enterprise_id_for_user(basket.site, basket.owner)
+        user_enterprise = facts.user_enterprise
         if user_enterprise and enterprise_in_condition != user_enterprise:
             # Learner is not linked to the EnterpriseCustomer associated with this condition.
             if offer.offer_type == ConditionalOffer.VOUCHER:
@@ -224,7 +404,7 @@ class EnterpriseCustomerCondition(ConditionWithoutRangeMixin, SingleItemConsumpt
         # Verify that the current conditional offer is related to the provided
         # enterprise catalog, this will also filter out offers which don't
         # have `enterprise_customer_catalog_uuid` value set on the condition.
-        catalog = self._get_enterprise_catalog_uuid_from_basket(basket)
+        catalog = facts.catalog
         if catalog:
             if offer.condition.enterprise_customer_catalog_uuid != catalog:
                 logger.warning('Unable to apply enterprise offer %s because '
@@ -234,9 +414,8 @@ class EnterpriseCustomerCondition(ConditionWithoutRangeMixin, SingleItemConsumpt
                 return False
 
         try:
-            catalog_contains_course = catalog_contains_course_runs(
-                basket.site, course_ids, enterprise_in_condition,
-                enterprise_customer_catalog_uuid=enterprise_catalog
+            catalog_contains_course = facts.catalog_contains_course_runs(
+                course_ids, enterprise_in_condition, enterprise_catalog
             )
         except (ReqConnectionError, KeyError, HTTPError, Timeout) as exc:
             logger.exception('[Code Redemption Failure] Unable to apply enterprise offer because '
@@ -306,7 +485,7 @@ class EnterpriseCustomerCondition(ConditionWithoutRangeMixin, SingleItemConsumpt
             'catalog'
         ) if basket.strategy.request else None
 
-        if not catalog:
+        if not catalog and basket.id:
             # For actual baskets get `catalog` from basket attribute
             enterprise_catalog_attribute, __ = BasketAttributeType.objects.get_or_create(
                 name=ENTERPRISE_CATALOG_ATTRIBUTE_TYPE
@@ -348,7 +527,7 @@ class AssignableEnterpriseCustomerCondition(EnterpriseCustomerCondition):
         if condition_satisfied is False:
             return False
 
-        voucher = basket.vouchers.first()
+        voucher = offer.get_voucher() or basket.vouchers.first()
 
         # get assignments for the basket owner and basket voucher
         user_with_code_assignments = OfferAssignment.objects.filter(
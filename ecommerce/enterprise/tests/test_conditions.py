@@ -13,7 +13,12 @@ from requests.exceptions import ConnectionError as ReqConnectionError
 
 from ecommerce.coupons.tests.mixins import CouponMixin, DiscoveryMockMixin
 from ecommerce.courses.tests.factories import CourseFactory
-from ecommerce.enterprise.conditions import EnterpriseCustomerCondition, sum_user_discounts_for_offer
+from ecommerce.enterprise.conditions import (
+    EnterpriseBasketFacts,
+    EnterpriseCustomerCondition,
+    get_user_discounts_by_offer,
+    sum_user_discounts_for_offer
+)
 from ecommerce.enterprise.tests.mixins import EnterpriseServiceMockMixin
 from ecommerce.entitlements.utils import create_or_update_course_entitlement
 from ecommerce.extensions.api.serializers import CouponCodeAssignmentSerializer
@@ -512,6 +517,59 @@ class EnterpriseCustomerConditionTests(EnterpriseServiceMockMixin, DiscoveryTest
         sum_user_discounts = sum_user_discounts_for_offer(self.user, offer)
         assert sum_user_discounts == 0
 
+    def test_get_user_discounts_by_offer(self):
+        offers = factories.EnterpriseOfferFactory.create_batch(2, partner=self.partner, max_user_discount=150)
+        order = OrderFactory(user=self.user, status=ORDER.COMPLETE)
+        OrderDiscountFactory(order=order, offer_id=offers[0].id, amount=10)
+        OrderDiscountFactory(order=order, offer_id=offers[0].id, amount=30)
+        OrderDiscountFactory(order=order, offer_id=offers[1].id, amount=20)
+
+        refunded_order = OrderFactory(user=self.user, status=ORDER.COMPLETE)
+        OrderDiscountFactory(order=refunded_order, offer_id=offers[1].id, amount=40)
+        RefundFactory(order=refunded_order, user=self.user, status=REFUND.COMPLETE)
+
+        with self.assertNumQueries(1):
+            user_discounts = get_user_discounts_by_offer(self.user)
+        assert user_discounts == {offers[0].id: 40, offers[1].id: 20}
+
+    @responses.activate
+    def test_is_satisfied_for_offers_of_many_catalogs(self):
+        """
+        Verify the enterprise offers of a customer share the basket facts, and the catalogs containing the courses
+        of the basket are fetched once for all the offers.
+        """
+        enterprise_customer_uuid = self.condition.enterprise_customer_uuid
+        offers = [
+            factories.EnterpriseOfferFactory(
+                partner=self.partner,
+                condition=factories.EnterpriseCustomerConditionFactory(
+                    enterprise_customer_uuid=enterprise_customer_uuid
+                ),
+                max_user_discount=150,
+            )
+            for __ in range(20)
+        ]
+        basket = BasketFactory(site=self.site, owner=self.user)
+        basket.add_product(self.course_run_1.seat_products[0])
+        self.mock_enterprise_learner_api(
+            learner_id=self.user.id,
+            enterprise_customer_uuid=str(enterprise_customer_uuid),
+            course_run_id=self.course_run_1.id,
+        )
+        catalog_list = [str(offer.condition.enterprise_customer_catalog_uuid) for offer in offers[:5]]
+
+        with mock.patch('ecommerce.enterprise.conditions.fetch_enterprise_catalogs_for_content_items',
+                        return_value=catalog_list) as mock_fetch_catalogs, \
+                mock.patch('ecommerce.enterprise.conditions.catalog_contains_course_runs') as mock_contains:
+            EnterpriseBasketFacts.for_basket(basket).prefetch_catalog_memberships(offers)
+            is_satisfied = [offers[0].is_condition_satisfied(basket)]
+            with self.assertNumQueries(0):
+                is_satisfied += [offer.is_condition_satisfied(basket) for offer in offers[1:]]
+
+        assert is_satisfied == [True] * 5 + [False] * 15
+        mock_fetch_catalogs.assert_called_once_with(self.site, [self.course_run_1.id], str(enterprise_customer_uuid))
+        mock_contains.assert_not_called()
+
     @ddt.data(
         {
             'discount_type': Benefit.PERCENTAGE,
@@ -0,0 +1,207 @@
+"""
+Process-wide dispatcher sending the events given to track_braze_event to Braze.
+
+Events are put on a bounded queue by the request threads, and sent to the Braze /users/track endpoint in
+batches by a background thread, over a session which keeps its connections alive. The events still queued
+are sent when the process exits.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+import requests
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of events Braze accepts in a single /users/track request.
+BRAZE_MAX_EVENTS_PER_REQUEST = 75
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+class BrazeEventDispatcher:
+    """
+    Sends events to Braze from a background thread.
+
+    At most BRAZE_EVENT_QUEUE_SIZE events wait to be sent, the events enqueued when the queue is full are dropped.
+    The background thread sends the queued events as soon as they are enqueued, up to
+    BRAZE_MAX_EVENTS_PER_REQUEST events per request. The number of events enqueued, sent, dropped and failed to
+    be sent are counted, and logged after each batch is sent, see get_metrics.
+    """
+
+    def __init__(self, endpoint, api_key, queue_size, timeout):
+        """
+        Args:
+            endpoint (str): Host name of the Braze REST endpoint.
+            api_key (str): Braze API key.
+            queue_size (int): Maximum number of events waiting to be sent.
+            timeout (float): Timeout, in seconds, of the requests to Braze.
+        """
+        self.settings = (endpoint, api_key, queue_size, timeout)
+        self.url = 'https://{url}/users/track'.format(url=endpoint)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = 'Bearer ' + api_key
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counters = {'enqueued': 0, 'sent': 0, 'dropped': 0, 'failed': 0}
+        self._counters_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _count(self, counter, value=1):
+        with self._counters_lock:
+            self.counters[counter] += value
+
+    def _start(self):
+        with self._thread_lock:
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = threading.Thread(target=self._run, name='braze-event-dispatcher', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, event):
+        """
+        Queues an event to be sent to Braze.
+
+        Returns:
+            bool: False if the event was dropped because the queue is full.
+        """
+        if self._thread is None:
+            self._start()
+
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self._count('dropped')
+            logger.warning('Dropped event [%s] for Braze: the queue of events to send is full.', event['name'])
+            return False
+
+        self._count('enqueued')
+        return True
+
+    def _get_batch(self, block=True, timeout=None):
+        """ Removes up to BRAZE_MAX_EVENTS_PER_REQUEST events from the queue, waiting for the first one if block. """
+        try:
+            batch = [self.queue.get(block=block, timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < BRAZE_MAX_EVENTS_PER_REQUEST:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, events):
+        """ Sends a batch of events to Braze, marks them as done in the queue, and logs the counters. """
+        try:
+            self._post(events)
+        finally:
+            for __ in events:
+                self.queue.task_done()
+
+        metrics = self.get_metrics()
+        logger.info(
+            'Braze event dispatcher: %d events enqueued, %d sent, %d dropped, %d failed to be sent, %d queued.',
+            metrics['enqueued'], metrics['sent'], metrics['dropped'], metrics['failed'], metrics['queued'],
+        )
+
+    def _post(self, events):
+        try:
+            response = self.session.post(self.url, json={'events': events}, timeout=self.timeout)
+        # Log out the exception since it could be a symptom we might want to look into.
+        except requests.exceptions.RequestException:
+            self._count('failed', len(events))
+            logger.exception('Failed to send event to Braze due to request exception.')
+            return
+
+        try:
+            response.raise_for_status()
+        # Just going to log it out. If we miss the events, it's unfortunate, but not worth raising an error
+        except requests.exceptions.HTTPError:
+            self._count('failed', len(events))
+            # https://www.braze.com/docs/api/errors/
+            try:
+                message = response.json().get('message', 'Unknown error')
+            except ValueError:
+                message = 'Unknown error'
+            for event in events:
+                logger.debug('Failed to send event [%s] to Braze: %s', event['name'], message)
+            return
+
+        self._count('sent', len(events))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._get_batch(timeout=1)
+            if batch:
+                self._send(batch)
+
+    def flush(self):
+        """ Sends the queued events from the calling thread, and waits until every event enqueued has been sent. """
+        batch = self._get_batch(block=False)
+        while batch:
+            self._send(batch)
+            batch = self._get_batch(block=False)
+        self.queue.join()
+
+    def shutdown(self):
+        """ Stops the background thread and sends the events still queued. """
+        self._stopped.set()
+        with self._thread_lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(self.timeout)
+        self.flush()
+        self.session.close()
+
+    def get_metrics(self):
+        """ Returns the number of events enqueued, sent, dropped and failed to be sent, and the queue length. """
+        with self._counters_lock:
+            return dict(self.counters, queued=self.queue.qsize())
+
+
+def _get_dispatcher_settings():
+    return (
+        getattr(settings, 'BRAZE_EVENT_REST_ENDPOINT', None),
+        getattr(settings, 'BRAZE_API_KEY', None) or '',
+        settings.BRAZE_EVENT_QUEUE_SIZE,
+        settings.BRAZE_EVENT_TIMEOUT,
+    )
+
+
+def get_braze_event_dispatcher():
+    """
+    Returns the Braze event dispatcher of this process, creating it if needed.
+
+    The dispatcher is replaced, after sending its queued events, when the Braze settings change.
+    """
+    global _dispatcher  # pylint: disable=global-statement
+    dispatcher_settings = _get_dispatcher_settings()
+    dispatcher = _dispatcher
+    if dispatcher is None or dispatcher.settings != dispatcher_settings:
+        with _dispatcher_lock:
+            if _dispatcher is None or _dispatcher.settings != dispatcher_settings:
+                if _dispatcher is not None:
+                    _dispatcher.shutdown()
+                _dispatcher = BrazeEventDispatcher(*dispatcher_settings)
+            dispatcher = _dispatcher
+    return dispatcher
+
+
+def shutdown_braze_event_dispatcher(**kwargs):  # pylint: disable=unused-argument
+    """ Sends the events still queued, and stops the Braze event dispatcher of this process. """
+    global _dispatcher  # pylint: disable=global-statement
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.shutdown()
+            _dispatcher = None
+
+
+atexit.register(shutdown_braze_event_dispatcher)
+worker_process_shutdown.connect(shutdown_braze_event_dispatcher)
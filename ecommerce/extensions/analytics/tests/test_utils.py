@@ -14,6 +14,11 @@ from requests.exceptions import RequestException
 
 from ecommerce.core.models import User  # pylint: disable=unused-import
 from ecommerce.courses.tests.factories import CourseFactory
+from ecommerce.extensions.analytics.braze import (
+    BRAZE_MAX_EVENTS_PER_REQUEST,
+    get_braze_event_dispatcher,
+    shutdown_braze_event_dispatcher
+)
 from ecommerce.extensions.analytics.utils import (
     ECOM_TRACKING_ID_FMT,
     get_google_analytics_client_id,
@@ -203,6 +208,7 @@ class UtilsTest(DiscoveryTestMixin, BasketMixin, TransactionTestCase):
     @responses.activate
     def test_track_braze_event_with_response_error(self):
         """ If the response receives an error, the function should log a debug message and NOT send an event."""
+        self.addCleanup(shutdown_braze_event_dispatcher)
         braze_url = 'https://{url}/users/track'.format(url=getattr(settings, 'BRAZE_EVENT_REST_ENDPOINT'))
         responses.add(
             responses.POST, braze_url,
@@ -210,23 +216,26 @@ class UtilsTest(DiscoveryTestMixin, BasketMixin, TransactionTestCase):
             content_type='application/json',
             status=500,
         )
-        with mock.patch('ecommerce.extensions.analytics.utils.logger.debug') as mock_debug:
+        with mock.patch('ecommerce.extensions.analytics.braze.logger.debug') as mock_debug:
             user = self.create_user()
             track_braze_event(user, 'edx.bi.ecommerce.cart.viewed', {})
+            get_braze_event_dispatcher().flush()
             mock_debug.assert_called_with('Failed to send event [%s] to Braze: %s',
                                           'edx.bi.ecommerce.cart.viewed', 'Braze encountered an error.')
+        self.assertEqual(get_braze_event_dispatcher().get_metrics()['failed'], 1)
 
     @override_settings(
         BRAZE_EVENT_REST_ENDPOINT='rest.braze.com',
         BRAZE_API_KEY='test-api-key',
     )
-    @responses.activate
     def test_track_braze_event_with_request_error(self):
         """ If the request receives an error, the function should log an exception message and NOT send an event."""
-        with mock.patch('ecommerce.extensions.analytics.utils.requests.post', side_effect=RequestException):
-            with mock.patch('ecommerce.extensions.analytics.utils.logger.exception') as mock_exception:
+        self.addCleanup(shutdown_braze_event_dispatcher)
+        with mock.patch.object(get_braze_event_dispatcher().session, 'post', side_effect=RequestException):
+            with mock.patch('ecommerce.extensions.analytics.braze.logger.exception') as mock_exception:
                 user = self.create_user()
                 track_braze_event(user, 'edx.bi.ecommerce.cart.viewed', {})
+                get_braze_event_dispatcher().flush()
                 mock_exception.assert_called_with('Failed to send event to Braze due to request exception.')
 
     @override_settings(
@@ -235,14 +244,85 @@ class UtilsTest(DiscoveryTestMixin, BasketMixin, TransactionTestCase):
     )
     @responses.activate
     def test_track_braze_event_success(self):
-        """ If the braze settings aren't set, the function should log a debug message and NOT send an event."""
+        """ If the braze settings are set, the event should be sent to Braze. """
+        self.addCleanup(shutdown_braze_event_dispatcher)
         braze_url = 'https://{url}/users/track'.format(url=getattr(settings, 'BRAZE_EVENT_REST_ENDPOINT'))
         responses.add(
             responses.POST, braze_url,
             json={'events_processed': 1, 'message': 'success'},
             content_type='application/json',
         )
-        with mock.patch('ecommerce.extensions.analytics.utils.logger.debug') as mock_debug:
+        with mock.patch('ecommerce.extensions.analytics.braze.logger.debug') as mock_debug:
             user = self.create_user()
             self.assertIsNone(track_braze_event(user, 'edx.bi.ecommerce.cart.viewed', {'prop': 123}))
+            get_braze_event_dispatcher().flush()
             mock_debug.assert_not_called()
+
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(responses.calls[0].request.headers['Authorization'], 'Bearer test-api-key')
+        event = json.loads(responses.calls[0].request.body)['events'][0]
+        self.assertEqual(event['name'], 'edx.bi.ecommerce.cart.viewed')
+        self.assertEqual(event['properties'], {'prop': 123})
+
+    @override_settings(
+        BRAZE_EVENT_REST_ENDPOINT='rest.braze.com',
+        BRAZE_API_KEY='test-api-key',
+    )
+    @responses.activate
+    def test_track_braze_events_batched(self):
+        """ Verify the events queued together are sent in as few requests as Braze accepts, and counted. """
+        self.addCleanup(shutdown_braze_event_dispatcher)
+        braze_url = 'https://{url}/users/track'.format(url=getattr(settings, 'BRAZE_EVENT_REST_ENDPOINT'))
+        responses.add(responses.POST, braze_url, json={'message': 'success'}, content_type='application/json')
+        user = self.create_user()
+        dispatcher = get_braze_event_dispatcher()
+        # Queue the events without starting the background thread, as if they were tracked while it was busy.
+        dispatcher._thread = mock.Mock()  # pylint: disable=protected-access
+
+        for index in range(BRAZE_MAX_EVENTS_PER_REQUEST + 5):
+            track_braze_event(user, 'edx.bi.ecommerce.cart.viewed', {'index': index})
+        with mock.patch('ecommerce.extensions.analytics.braze.logger.info') as mock_info:
+            dispatcher.flush()
+            mock_info.assert_called_with(
+                'Braze event dispatcher: %d events enqueued, %d sent, %d dropped, %d failed to be sent, %d queued.',
+                BRAZE_MAX_EVENTS_PER_REQUEST + 5, BRAZE_MAX_EVENTS_PER_REQUEST + 5, 0, 0, 0,
+            )
+            self.assertEqual(mock_info.call_count, 2)
+
+        self.assertEqual(
+            [len(json.loads(call.request.body)['events']) for call in responses.calls],
+            [BRAZE_MAX_EVENTS_PER_REQUEST, 5]
+        )
+        self.assertEqual(
+            dispatcher.get_metrics(),
+            {'enqueued': BRAZE_MAX_EVENTS_PER_REQUEST + 5, 'sent': BRAZE_MAX_EVENTS_PER_REQUEST + 5, 'dropped': 0,
+             'failed': 0, 'queued': 0}
+        )
+
+    @override_settings(
+        BRAZE_EVENT_REST_ENDPOINT='rest.braze.com',
+        BRAZE_API_KEY='test-api-key',
+        BRAZE_EVENT_QUEUE_SIZE=2,
+    )
+    @responses.activate
+    def test_track_braze_event_queue_full(self):
+        """ Verify the events tracked while the queue is full are dropped, and the queued ones sent on shutdown. """
+        braze_url = 'https://{url}/users/track'.format(url=getattr(settings, 'BRAZE_EVENT_REST_ENDPOINT'))
+        responses.add(responses.POST, braze_url, json={'message': 'success'}, content_type='application/json')
+        user = self.create_user()
+        dispatcher = get_braze_event_dispatcher()
+        dispatcher._thread = mock.Mock()  # pylint: disable=protected-access
+
+        with mock.patch('ecommerce.extensions.analytics.braze.logger.warning') as mock_warning:
+            for __ in range(3):
+                track_braze_event(user, 'edx.bi.ecommerce.cart.viewed', {})
+            mock_warning.assert_called_once_with(
+                'Dropped event [%s] for Braze: the queue of events to send is full.', 'edx.bi.ecommerce.cart.viewed'
+            )
+
+        shutdown_braze_event_dispatcher()
+        self.assertEqual(len(json.loads(responses.calls[0].request.body)['events']), 2)
+        self.assertEqual(
+            dispatcher.get_metrics(),
+            {'enqueued': 2, 'sent': 2, 'dropped': 1, 'failed': 0, 'queued': 0}
+        )
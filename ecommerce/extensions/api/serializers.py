@@ -12,8 +12,9 @@ from dateutil.parser import parse
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.db.models import Count, Q, Sum, prefetch_related_objects
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery, Sum, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from opaque_keys.edx.keys import CourseKey
@@ -30,7 +31,6 @@ from ecommerce.core.constants import (
 )
 from ecommerce.core.url_utils import get_ecommerce_url
 from ecommerce.core.utils import log_message_and_raise_validation_error
-from ecommerce.coupons.utils import is_coupon_available
 from ecommerce.courses.models import Course
 from ecommerce.enterprise.benefits import BENEFIT_MAP as ENTERPRISE_BENEFIT_MAP
 from ecommerce.enterprise.conditions import sum_user_discounts_for_offer
@@ -54,7 +54,7 @@ from ecommerce.extensions.api.v2.constants import (
     REFUND_ORDER_EMAIL_GREETING,
     REFUND_ORDER_EMAIL_SUBJECT
 )
-from ecommerce.extensions.catalogue.utils import attach_vouchers_to_coupon_product
+from ecommerce.extensions.catalogue.utils import attach_vouchers_to_coupon_product, get_prefetched_attribute_values
 from ecommerce.extensions.checkout.views import ReceiptResponseView
 from ecommerce.extensions.offer.constants import (
     ASSIGN,
@@ -77,7 +77,11 @@ from ecommerce.extensions.offer.utils import (
     send_assigned_offer_reminder_email,
     send_revoked_offer_email
 )
-from ecommerce.extensions.voucher.utils import create_enterprise_vouchers
+from ecommerce.extensions.voucher.utils import (
+    create_enterprise_vouchers,
+    get_available_slots_expression,
+    get_prefetched_best_offer
+)
 from ecommerce.invoice.models import Invoice
 from ecommerce.programs.custom import class_path
 
@@ -103,6 +107,7 @@ ProductAttributeValue = get_model('catalogue', 'ProductAttributeValue')
 ProductCategory = get_model('catalogue', 'ProductCategory')
 Refund = get_model('refund', 'Refund')
 Selector = get_class('partner.strategy', 'Selector')
+Source = get_model('payment', 'Source')
 StockRecord = get_model('partner', 'StockRecord')
 Voucher = get_model('voucher', 'Voucher')
 VoucherApplication = get_model('voucher', 'VoucherApplication')
@@ -203,6 +208,28 @@ def retrieve_enterprise_customer_catalog(coupon):
     return None
 
 
+def _aggregate_by_coupon(vouchers, aggregate):
+    """ Return a subquery of the given aggregate over the vouchers of the coupon of the outer query. """
+    return vouchers.order_by().values('coupon_vouchers__coupon').annotate(aggregate=aggregate).values('aggregate')
+
+
+def _is_prefetched(instance, relation):
+    return relation in getattr(instance, '_prefetched_objects_cache', {})
+
+
+def _get_condition_name(condition):
+    """
+    Same as Condition.name, reusing the range loaded with the condition rather than querying it again
+    from the proxy of the condition.
+    """
+    proxy = condition.proxy()
+    if proxy is condition:
+        return condition.name
+    if condition.range_id:
+        proxy.range = condition.range
+    return proxy.name
+
+
 def _flatten(attrs):
     """Transform a list of attribute names and values into a dictionary keyed on the names."""
     return {attr['name']: attr['value'] for attr in attrs}
@@ -351,8 +378,9 @@ class ProductSerializer(ProductPaymentInfoMixin, serializers.HyperlinkedModelSer
 
     def get_attribute_values(self, product):
         request = self.context.get('request')
+        attribute_values = get_prefetched_attribute_values(product)
         serializer = ProductAttributeValueSerializer(
-            product.attr,
+            product.attr if attribute_values is None else attribute_values,
             many=True,
             read_only=True,
             context={'request': request}
@@ -404,6 +432,25 @@ class LineSerializer(serializers.ModelSerializer):
         )
 
 
+class OrderListSerializer(serializers.ListSerializer):  # pylint: disable=abstract-method
+    """
+    Serializes a list of orders, loading the offers and vouchers of their discounts with one query each.
+
+    Order discounts only store the IDs of their offer and voucher, so these can't be prefetched with the orders.
+    """
+
+    def to_representation(self, data):
+        orders = list(data.all() if isinstance(data, models.Manager) else data)
+        discounts = [discount for order in orders for discount in order.discounts.all()]
+
+        offer_ids = {discount.offer_id for discount in discounts if discount.offer_id}
+        voucher_ids = {discount.voucher_id for discount in discounts if discount.voucher_id}
+        self.child.discount_offers = ConditionalOffer.objects.select_related('condition__range').in_bulk(offer_ids)
+        self.child.discount_vouchers = Voucher.objects.prefetch_related('offers__benefit').in_bulk(voucher_ids)
+
+        return super(OrderListSerializer, self).to_representation(orders)
+
+
 class OrderSerializer(serializers.ModelSerializer):
     """Serializer for parsing order data."""
     basket_discounts = serializers.SerializerMethodField()
@@ -423,24 +470,77 @@ class OrderSerializer(serializers.ModelSerializer):
     total_before_discounts_incl_tax = serializers.SerializerMethodField()
     order_product_ids = serializers.SerializerMethodField()
 
+    def __init__(self, *args, **kwargs):
+        super(OrderSerializer, self).__init__(*args, **kwargs)
+        # Filled by OrderListSerializer with the offers and vouchers of the discounts of the serialized orders.
+        self.discount_offers = {}
+        self.discount_vouchers = {}
+        self._enterprise_learner_portal_url = None
+        self._enterprise_learner_portal_url_loaded = False
+
+    @staticmethod
+    def prefetch_queryset(queryset):
+        """
+        Return the given order queryset with every relation read by this serializer loaded upfront,
+        so that the number of queries needed to serialize the orders does not depend on how many there are.
+        """
+        lines = Line.objects.select_related(
+            'product__course', 'product__product_class', 'product__parent__product_class'
+        )
+        sources = Source.objects.select_related('source_type')
+        return queryset.select_related('basket', 'billing_address', 'user').prefetch_related(
+            Prefetch('lines', queryset=lines),
+            'lines__attributes',
+            'lines__product__stockrecords',
+            'lines__product__attribute_values__attribute',
+            'lines__product__parent__attribute_values__attribute',
+            'discounts',
+            Prefetch('sources', queryset=sources),
+            'basket__basketattribute_set__attribute_type',
+            'basket__vouchers__applications',
+            'basket__vouchers__offers__benefit',
+            'basket__vouchers__offers__condition',
+        )
+
+    def to_representation(self, instance):
+        # Initialize the attributes of prefetched products before any field reads them.
+        for line in instance.lines.all():
+            get_prefetched_attribute_values(line.product)
+        return super(OrderSerializer, self).to_representation(instance)
+
+    def _get_discount_offer(self, discount):
+        if discount.offer_id in self.discount_offers:
+            return self.discount_offers[discount.offer_id]
+        return discount.offer
+
+    def _get_discount_voucher(self, discount):
+        if discount.voucher_id in self.discount_vouchers:
+            return self.discount_vouchers[discount.voucher_id]
+        return discount.voucher
+
+    def _get_voucher_benefit(self, voucher):
+        # Same as Voucher.benefit, indexing into all() rather than calling first() to reuse prefetched offers.
+        offers = voucher.offers.all()
+        return offers[0].benefit if offers else None
+
     def get_basket_discounts(self, obj):
         basket_discounts = []
         try:
-            discounts = obj.basket_discounts
-            if discounts:
-                for discount in discounts:
-                    basket_discount = {
-                        'amount': discount.amount,
-                        'benefit_value': discount.voucher.benefit.value if discount.voucher else None,
-                        'code': discount.voucher_code,
-                        'condition_name': discount.offer.condition.name if discount.offer else None,
-                        'contains_offer': bool(discount.offer),
-                        'currency': obj.currency,
-                        'enterprise_customer_name':
-                            discount.offer.condition.enterprise_customer_name if discount.offer else None,
-                        'offer_type': discount.offer.offer_type if discount.offer else None,
-                    }
-                    basket_discounts.append(basket_discount)
+            discounts = [discount for discount in obj.discounts.all() if discount.is_basket_discount]
+            for discount in discounts:
+                offer = self._get_discount_offer(discount)
+                voucher = self._get_discount_voucher(discount)
+                basket_discount = {
+                    'amount': discount.amount,
+                    'benefit_value': self._get_voucher_benefit(voucher).value if voucher else None,
+                    'code': discount.voucher_code,
+                    'condition_name': _get_condition_name(offer.condition) if offer else None,
+                    'contains_offer': bool(offer),
+                    'currency': obj.currency,
+                    'enterprise_customer_name': offer.condition.enterprise_customer_name if offer else None,
+                    'offer_type': offer.offer_type if offer else None,
+                }
+                basket_discounts.append(basket_discount)
         except (AttributeError, TypeError, ValueError):
             logger.exception(
                 '[Receipt MFE] Failed to retrieve basket discounts for [%s]',
@@ -513,6 +613,13 @@ class OrderSerializer(serializers.ModelSerializer):
         return payment_method
 
     def get_enterprise_learner_portal_url(self, obj):
+        # The URL only depends on the request, so it is looked up once for all the serialized orders.
+        if not self._enterprise_learner_portal_url_loaded:
+            self._enterprise_learner_portal_url = self._get_enterprise_learner_portal_url(obj)
+            self._enterprise_learner_portal_url_loaded = True
+        return self._enterprise_learner_portal_url
+
+    def _get_enterprise_learner_portal_url(self, obj):
         try:
             request = self.context['request']
             enterprise_customer_user = ReceiptResponseView().get_metadata_for_enterprise_user(request)
@@ -532,13 +639,15 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def get_total_before_discounts_incl_tax(self, obj):
         try:
-            return str(obj.total_before_discounts_incl_tax)
+            # Sum the lines, which are usually prefetched, rather than aggregating them in the database.
+            basket_total = sum(line.line_price_before_discounts_incl_tax for line in obj.lines.all())
+            return str(basket_total + obj.shipping_incl_tax)
         except ValueError:
             return None
 
     def get_order_product_ids(self, obj):
         try:
-            return ','.join(map(str, obj.lines.values_list('product_id', flat=True)))
+            return ','.join(str(line.product_id) for line in obj.lines.all())
         except (AttributeError, ValueError):
             logger.exception(
                 '[Receipt MFE] Failed to retrieve order product IDs for order [%s]',
@@ -581,6 +690,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'user',
             'vouchers',
         )
+        list_serializer_class = OrderListSerializer
 
 
 class BasketSerializer(serializers.ModelSerializer):
@@ -962,8 +1072,8 @@ class VoucherSerializer(serializers.ModelSerializer):
         return obj.is_available_to_user(user=request.user)
 
     def get_benefit(self, obj):
-        benefit = obj.best_offer.benefit
-        return BenefitSerializer(benefit).data
+        best_offer = get_prefetched_best_offer(obj) if _is_prefetched(obj, 'offers') else obj.best_offer
+        return BenefitSerializer(best_offer.benefit).data
 
     def get_redeem_url(self, obj):
         url = get_ecommerce_url('/coupons/offer/')
@@ -978,6 +1088,17 @@ class VoucherSerializer(serializers.ModelSerializer):
         )
 
 
+class CodeUsageListSerializer(serializers.ListSerializer):  # pylint: disable=abstract-method
+    """
+    Serializes a page of code usages, loading the vouchers, assignments and redemptions of the page in bulk.
+    """
+
+    def to_representation(self, data):
+        usages = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.load_usages(usages)
+        return super(CodeUsageListSerializer, self).to_representation(usages)
+
+
 class CodeUsageSerializer(serializers.Serializer):  # pylint: disable=abstract-method
     code = serializers.SerializerMethodField()
     assigned_to = serializers.SerializerMethodField()
@@ -988,6 +1109,9 @@ class CodeUsageSerializer(serializers.Serializer):  # pylint: disable=abstract-m
     revocation_date = serializers.SerializerMethodField()
     is_public = serializers.SerializerMethodField()
 
+    class Meta:
+        list_serializer_class = CodeUsageListSerializer
+
     def __init__(self, *args, **kwargs):
         """
         Takes an optional `ignore_fields` argument that allows
@@ -1001,11 +1125,60 @@ class CodeUsageSerializer(serializers.Serializer):  # pylint: disable=abstract-m
             for field_name in ignore_fields:
                 self.fields.pop(field_name, None)
 
+        self.vouchers = {}
+        self.assignments = {}
+        self.code_assignment_counts = {}
+        self.user_assignment_counts = {}
+        self.user_application_counts = {}
+
+    def load_usages(self, usages):
+        """
+        Loads the vouchers, assignments and redemptions of the given usages with a fixed number of queries.
+        """
+        codes = {self.get_code(usage) for usage in usages}
+        emails = {self.get_assigned_to(usage) for usage in usages} - {None, ''}
+
+        vouchers = Voucher.objects.filter(code__in=codes).prefetch_related('offers__condition')
+        self.vouchers.update((voucher.code, voucher) for voucher in vouchers)
+
+        assignment_counts = OfferAssignment.objects.filter(
+            code__in=codes,
+            status__in=[OFFER_ASSIGNED, OFFER_ASSIGNMENT_EMAIL_PENDING, OFFER_ASSIGNMENT_EMAIL_BOUNCED],
+        ).order_by().values('code', 'user_email').annotate(count=Count('id'))
+        for code in codes:
+            self.code_assignment_counts[code] = 0
+        for assignment_count in assignment_counts:
+            code, user_email = assignment_count['code'], assignment_count['user_email']
+            self.code_assignment_counts[code] += assignment_count['count']
+            self.user_assignment_counts[(code, user_email)] = assignment_count['count']
+
+        if not emails:
+            return
+
+        # Same as OfferAssignment.objects.filter(code=code, user_email=user_email).first() for every usage.
+        assignments = OfferAssignment.objects.filter(code__in=codes, user_email__in=emails).order_by('pk')
+        for assignment in assignments:
+            self.assignments.setdefault((assignment.code, assignment.user_email), assignment)
+
+        application_counts = VoucherApplication.objects.filter(
+            voucher__code__in=codes,
+            user__email__in=emails,
+        ).order_by().values('voucher__code', 'user__email').annotate(count=Count('id'))
+        self.user_application_counts.update(
+            ((application_count['voucher__code'], application_count['user__email']), application_count['count'])
+            for application_count in application_counts
+        )
+
+    def to_representation(self, instance):
+        if self.get_code(instance) not in self.vouchers:
+            self.load_usages([instance])
+        return super(CodeUsageSerializer, self).to_representation(instance)
+
     def _get_assignment(self, obj):
         assigned_to = self.get_assigned_to(obj)
         code = self.get_code(obj)
         if assigned_to and code:
-            return OfferAssignment.objects.filter(code=code, user_email=assigned_to).first()
+            return self.assignments.get((code, assigned_to))
         return None
 
     def get_assignment_date(self, obj):
@@ -1034,8 +1207,8 @@ class CodeUsageSerializer(serializers.Serializer):  # pylint: disable=abstract-m
         return obj.get('user_email')
 
     def get_redemptions(self, obj):
-        voucher = Voucher.objects.get(code=self.get_code(obj))
-        offer = voucher.best_offer
+        voucher = self.vouchers[self.get_code(obj)]
+        offer = get_prefetched_best_offer(voucher)
         redemption_count = voucher.num_orders
 
         if voucher.usage == Voucher.SINGLE_USE:
@@ -1051,18 +1224,17 @@ class CodeUsageSerializer(serializers.Serializer):  # pylint: disable=abstract-m
         }
 
     def get_is_public(self, obj):
-        voucher = Voucher.objects.get(code=self.get_code(obj))
+        voucher = self.vouchers[self.get_code(obj)]
         return voucher.is_public
 
     def num_assignments(self, code, user_email=None):
-        offer_assignments = OfferAssignment.objects.filter(
-            code=code,
-            status__in=[OFFER_ASSIGNED, OFFER_ASSIGNMENT_EMAIL_PENDING, OFFER_ASSIGNMENT_EMAIL_BOUNCED],
-        )
         if user_email:
-            offer_assignments = offer_assignments.filter(user_email=user_email)
+            return self.user_assignment_counts.get((code, user_email), 0)
+
+        return self.code_assignment_counts[code]
 
-        return offer_assignments.count()
+    def num_applications(self, code, user_email):
+        return self.user_application_counts.get((code, user_email), 0)
 
 
 class NotAssignedCodeUsageSerializer(CodeUsageSerializer):  # pylint: disable=abstract-method
@@ -1097,10 +1269,7 @@ class PartialRedeemedCodeUsageSerializer(CodeUsageSerializer):  # pylint: disabl
             return super(PartialRedeemedCodeUsageSerializer, self).get_redemptions(obj)
 
         num_assignments = self.num_assignments(code=self.get_code(obj), user_email=self.get_assigned_to(obj))
-        num_applications = VoucherApplication.objects.filter(
-            voucher__code=self.get_code(obj),
-            user__email=self.get_assigned_to(obj)
-        ).count()
+        num_applications = self.num_applications(code=self.get_code(obj), user_email=self.get_assigned_to(obj))
         return {'used': num_applications, 'total': num_assignments + num_applications}
 
 
@@ -1113,10 +1282,7 @@ class RedeemedCodeUsageSerializer(CodeUsageSerializer):  # pylint: disable=abstr
         return obj.get('user__email')
 
     def get_redemptions(self, obj):
-        num_applications = VoucherApplication.objects.filter(
-            voucher__code=self.get_code(obj),
-            user__email=self.get_assigned_to(obj)
-        ).count()
+        num_applications = self.num_applications(code=self.get_code(obj), user_email=self.get_assigned_to(obj))
         return {'used': num_applications, 'total': num_applications}
 
 
@@ -1348,36 +1514,67 @@ class OfferAssignmentEmailTemplatesSerializer(serializers.ModelSerializer):
 class EnterpriseCouponOverviewListSerializer(serializers.ModelSerializer):
     """
     Serializer for Enterprise Coupons list overview.
+
+    The coupons must be annotated with annotate_queryset, which computes the overview of every coupon of a page
+    in the same SQL query.
     """
 
-    def _get_num_unassigned(self, vouchers):
-        """
-        Return number of available assignments.
+    @staticmethod
+    def annotate_queryset(queryset):
         """
-        all_slots_available = 0
-        enterprise_offer = vouchers.first().enterprise_offer
+        Annotate the coupons of the given queryset with the aggregates of their vouchers read by this serializer.
 
-        assignments = OfferAssignment.objects.filter(code__in=vouchers.values_list('code', flat=True)).exclude(
+        Like the coupon itself, the dates, usage and offers of a coupon are read from its first voucher.
+        """
+        vouchers = Voucher.objects.filter(coupon_vouchers__coupon=OuterRef('pk'))
+        first_voucher = vouchers.order_by('-date_created')
+        first_voucher_offers = ConditionalOffer.objects.filter(
+            vouchers=OuterRef('first_voucher_id')
+        ).order_by('-priority', 'pk')
+        enterprise_offer = first_voucher_offers.filter(condition__enterprise_customer_uuid__isnull=False)
+        range_offer = first_voucher_offers.filter(condition__range__isnull=False)
+
+        # Same as Voucher.calculate_available_slots, for every voucher of the coupon.
+        num_assignments = OfferAssignment.objects.filter(code=OuterRef('code')).exclude(
             status__in=[OFFER_REDEEMED, OFFER_ASSIGNMENT_REVOKED]
-        ).values('code').annotate(num_assignments=Count('code')).order_by('code')
-
-        vouchers_num_assignments = {item['code']: item['num_assignments'] for item in assignments}
-
-        for voucher in vouchers:
-            num_assignments = vouchers_num_assignments.get(voucher.code, 0)
-            voucher_slots_available = voucher.calculate_available_slots(
-                enterprise_offer.max_global_applications,
-                num_assignments
-            )
-            if voucher_slots_available > 0:
-                all_slots_available += voucher_slots_available
-
-        return all_slots_available
+        ).order_by().values('code').annotate(count=Count('id')).values('count')
+        voucher_slots = vouchers.annotate(
+            num_assignments=Coalesce(Subquery(num_assignments), 0),
+        ).annotate(
+            slots=get_available_slots_expression(OuterRef('enterprise_offer_max_global_applications'))
+        ).filter(slots__gt=0)
+
+        num_errors = OfferAssignment.objects.filter(
+            code=OuterRef('code'), status=OFFER_ASSIGNMENT_EMAIL_BOUNCED
+        ).order_by().values('code').annotate(count=Count('id')).values('count')
+        voucher_errors = vouchers.annotate(num_errors=Coalesce(Subquery(num_errors), 0))
+
+        return queryset.annotate(
+            num_codes=Coalesce(Subquery(_aggregate_by_coupon(vouchers, Count('id'))), 0),
+            num_uses=Subquery(_aggregate_by_coupon(vouchers, Sum('num_orders'))),
+            first_voucher_id=Subquery(first_voucher.values('id')[:1]),
+            first_voucher_start_datetime=Subquery(first_voucher.values('start_datetime')[:1]),
+            first_voucher_end_datetime=Subquery(first_voucher.values('end_datetime')[:1]),
+            first_voucher_usage=Subquery(first_voucher.values('usage')[:1]),
+        ).annotate(
+            enterprise_offer_max_global_applications=Subquery(
+                enterprise_offer.values('max_global_applications')[:1]
+            ),
+            enterprise_offer_catalog_uuid=Subquery(
+                enterprise_offer.values('condition__enterprise_customer_catalog_uuid')[:1]
+            ),
+            range_catalog_uuid=Subquery(range_offer.values('condition__range__enterprise_customer_catalog')[:1]),
+        ).annotate(
+            num_unassigned=Coalesce(Subquery(_aggregate_by_coupon(voucher_slots, Sum('slots'))), 0),
+            num_errors=Coalesce(Subquery(_aggregate_by_coupon(voucher_errors, Sum('num_errors'))), 0),
+        )
 
     def _get_errors(self, coupon):
         """
         Returns a list of OfferAssignment errors associated with coupon.
         """
+        if not coupon.num_errors:
+            return []
         codes = coupon.attr.coupon_vouchers.vouchers.values_list('code', flat=True)
         offer_assignments_with_error = OfferAssignment.objects.filter(
             code__in=codes,
@@ -1386,39 +1583,33 @@ class EnterpriseCouponOverviewListSerializer(serializers.ModelSerializer):
         return OfferAssignmentSerializer(offer_assignments_with_error, many=True).data
 
     # Max number of codes available (Maximum Coupon Usage).
-    def _get_max_uses(self, voucher, voucher_usage, voucher_count):
-        offer = voucher.best_offer
-
+    def _get_max_uses(self, coupon):
         max_uses_per_code = None
-        if voucher_usage == Voucher.SINGLE_USE:
+        if coupon.first_voucher_usage == Voucher.SINGLE_USE:
             max_uses_per_code = 1
-        elif offer.max_global_applications:
-            max_uses_per_code = offer.max_global_applications
+        elif coupon.enterprise_offer_max_global_applications:
+            max_uses_per_code = coupon.enterprise_offer_max_global_applications
         else:
             max_uses_per_code = OFFER_MAX_USES_DEFAULT
 
-        return max_uses_per_code * voucher_count
+        return max_uses_per_code * coupon.num_codes
 
     def to_representation(self, coupon):  # pylint: disable=arguments-differ
         representation = super(EnterpriseCouponOverviewListSerializer, self).to_representation(coupon)
 
-        vouchers = coupon.attr.coupon_vouchers.vouchers.all()
-        voucher = vouchers.first()
-        usage = voucher.usage
-        count = vouchers.count()
-        num_orders = vouchers.aggregate(Sum('num_orders'))
-
+        start_datetime = coupon.first_voucher_start_datetime
+        end_datetime = coupon.first_voucher_end_datetime
         data = {
-            'start_date': voucher.start_datetime,
-            'end_date': voucher.end_datetime,
-            'num_uses': num_orders['num_orders__sum'],
-            'usage_limitation': usage,
-            'num_codes': count,
-            'max_uses': self._get_max_uses(voucher, usage, count),
-            'num_unassigned': self._get_num_unassigned(vouchers),
+            'start_date': start_datetime,
+            'end_date': end_datetime,
+            'num_uses': coupon.num_uses,
+            'usage_limitation': coupon.first_voucher_usage,
+            'num_codes': coupon.num_codes,
+            'max_uses': self._get_max_uses(coupon),
+            'num_unassigned': coupon.num_unassigned,
             'errors': self._get_errors(coupon),
-            'available': is_coupon_available(coupon),
-            'enterprise_catalog_uuid': retrieve_enterprise_customer_catalog(coupon),
+            'available': start_datetime < timezone.now() < end_datetime,
+            'enterprise_catalog_uuid': coupon.range_catalog_uuid or coupon.enterprise_offer_catalog_uuid,
         }
 
         return dict(representation, **data)
@@ -6,12 +6,15 @@ import json
 import urllib
 from collections import namedtuple
 from decimal import Decimal
+from uuid import uuid4
 
 import ddt
 import mock
 import responses
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from edx_rest_framework_extensions.auth.jwt.cookies import jwt_cookie_name
 from oscar.core.loading import get_model
@@ -30,6 +33,8 @@ from ecommerce.extensions.basket.constants import EMAIL_OPT_IN_ATTRIBUTE
 from ecommerce.extensions.payment import exceptions as payment_exceptions
 from ecommerce.extensions.payment.models import PaymentProcessorResponse
 from ecommerce.extensions.payment.processors.cybersource import Cybersource
+from ecommerce.extensions.refund.status import REFUND
+from ecommerce.extensions.refund.tests.factories import RefundFactory
 from ecommerce.extensions.test.factories import (
     PercentageDiscountBenefitWithoutRangeFactory,
     ProgramCourseRunSeatsConditionFactory,
@@ -547,6 +552,20 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data, expected)
 
+    def test_basket_calculate_without_writes(self):
+        """ Verify the basket is calculated in memory, without writing to the database """
+        voucher, _ = prepare_voucher(_range=self.range)
+        basket_count = Basket.objects.count()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + '&code={code}'.format(code=voucher.code))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_incl_tax'], Decimal('0.00'))
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(Basket.objects.count(), basket_count)
+
     def test_basket_calculate_fixed_coupon(self):
         """ Verify successful basket calculation for a fixed price voucher """
         discount = 5
@@ -591,8 +610,8 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
         self.assertEqual(response.status_code, 200)
 
     @responses.activate
-    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resource_for_user')
-    def test_basket_calculate_by_staff_user_other_username(self, mock_get_lms_resource_for_user):
+    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resources_for_user')
+    def test_basket_calculate_by_staff_user_other_username(self, mock_get_lms_resources_for_user):
         """Verify a staff user passing a valid username gets a response about the other user"""
         products, url = self.setup_other_user_basket_calculate()
 
@@ -605,16 +624,16 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
 
         response = self.client.get(url)
 
-        self.assertTrue(mock_get_lms_resource_for_user.called, msg='LMS calls should be made for non-anonymous case.')
+        self.assertTrue(mock_get_lms_resources_for_user.called, msg='LMS calls should be made for non-anonymous case.')
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data, expected)
 
     @responses.activate
     @mock.patch('ecommerce.extensions.api.v2.views.baskets.logger.exception')
-    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resource_for_user')
+    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resources_for_user')
     def test_basket_calculate_by_staff_user_other_username_non_atomic(
-            self, mock_get_lms_resource_for_user, mock_logger
+            self, mock_get_lms_resources_for_user, mock_logger
     ):
         """
         Verify a staff user passing a valid username gets a response about the
@@ -631,7 +650,7 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
 
         response = self.client.get(url)
 
-        self.assertTrue(mock_get_lms_resource_for_user.called, msg='LMS calls should be made for non-anonymous case.')
+        self.assertTrue(mock_get_lms_resources_for_user.called, msg='LMS calls should be made for non-anonymous case.')
         self.assertFalse(mock_logger.called, msg='No message should be logged when there is no exception.')
 
         self.assertEqual(response.status_code, 200)
@@ -639,9 +658,9 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
 
     @responses.activate
     @mock.patch('ecommerce.extensions.api.v2.views.baskets.logger.exception')
-    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resource_for_user')
+    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resources_for_user')
     def test_basket_calculate_by_staff_user_other_username_non_atomic_exception(
-            self, mock_get_lms_resource_for_user, mock_logger
+            self, mock_get_lms_resources_for_user, mock_logger
     ):
         """
         Verify logging occurs when an exception happens when a staff user
@@ -650,12 +669,12 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
         """
         _, url = self.setup_other_user_basket_calculate()
 
-        mock_get_lms_resource_for_user.side_effect = Exception('Forced exception to test logging.')
+        mock_get_lms_resources_for_user.side_effect = Exception('Forced exception to test logging.')
 
         with self.assertRaises(Exception):
             self.client.get(url)
 
-        self.assertTrue(mock_get_lms_resource_for_user.called, msg='LMS calls should be made for non-anonymous case.')
+        self.assertTrue(mock_get_lms_resources_for_user.called, msg='LMS calls should be made for non-anonymous case.')
         self.assertTrue(mock_logger.called, msg='A message should have been logged for the exception.')
 
     def setup_other_user_basket_calculate(self):
@@ -685,8 +704,8 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
         return products, url
 
     @responses.activate
-    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resource_for_user')
-    def test_basket_calculate_anonymous_skip_lms(self, mock_get_lms_resource_for_user):
+    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resources_for_user')
+    def test_basket_calculate_anonymous_skip_lms(self, mock_get_lms_resources_for_user):
         """Verify a call for an anonymous user skips calls to LMS for entitlements and enrollments"""
         products, url = self._setup_anonymous_basket_calculate()
 
@@ -699,7 +718,7 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
 
         response = self.client.get(url)
 
-        self.assertFalse(mock_get_lms_resource_for_user.called, msg='LMS calls should be skipped for anonymous case.')
+        self.assertFalse(mock_get_lms_resources_for_user.called, msg='LMS calls should be skipped for anonymous case.')
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data, expected)
@@ -716,7 +735,7 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
             self.assertEqual(response.status_code, 200)
             mock_track.assert_not_called()
 
-    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket_atomic')
+    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket')
     def test_basket_calculate_anonymous_caching(self, mock_calculate_basket):
         """Verify a request made with the is_anonymous parameter is cached"""
         url_with_one_sku = self._generate_sku_url(self.products[0:1], username=None)
@@ -776,25 +795,19 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
         self.assertFalse(mock_calculate_basket.called, msg='The cache should be hit.')
         self.assertEqual(response.data, expected)
 
-    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket_atomic')
-    def test_basket_calculate_no_query_parameters(self, mock_calculate_basket_atomic):
+    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket')
+    def test_basket_calculate_no_query_parameters(self, mock_calculate_basket):
         """Verify a request made without query parameters uses the request user"""
         expected = {'Test Succeeded': True}
-        mock_calculate_basket_atomic.return_value = expected
+        mock_calculate_basket.return_value = expected
 
         url_with_one_sku_no_anon = self._generate_sku_url(self.products[0:1], add_query_params=False)
 
         # Call BasketCalculate to test that we do not hit the cache
         response = self.client.get(url_with_one_sku_no_anon)
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(mock_calculate_basket_atomic.called, msg='The cache should be missed.')
-        self.assertEqual(response.data, expected)
-        mock_calculate_basket_atomic.reset_mock()
-
-        # Call BasketCalculate again to test that we do not hit the cache
-        response = self.client.get(url_with_one_sku_no_anon)
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue(mock_calculate_basket_atomic.called, msg='The cache should be missed.')
+        self.assertTrue(mock_calculate_basket.called, msg='The cache should be missed.')
+        self.assertEqual(mock_calculate_basket.call_args[0][0], self.user)
         self.assertEqual(response.data, expected)
 
     @responses.activate
@@ -813,7 +826,7 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
         self.assertTrue(mock_logger.called)
 
     @responses.activate
-    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket_atomic')
+    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket')
     def test_conflicting_user_anonymous_params(self, mock_calculate_basket):
         """
         Verify that when the request contains both a username and an is_anonymous parameter, a Bad Request response
@@ -829,28 +842,49 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
         self.assertFalse(mock_calculate_basket.called)
 
     @responses.activate
-    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket_atomic')
-    def test_basket_calculate_with_anonymous_caching_disabled(self, mock_calculate_basket_atomic):
-        """Verify a request made by a staff user is not cached"""
+    @mock.patch('ecommerce.extensions.api.v2.views.baskets.BasketCalculateView._calculate_temporary_basket')
+    def test_basket_calculate_user_caching(self, mock_calculate_basket):
+        """
+        Verify a request made for a user is cached per voucher and catalog, until the user places or refunds an order
+        """
         expected = {'Test Succeeded': True}
-        mock_calculate_basket_atomic.return_value = {'Test Succeeded': True}
+        mock_calculate_basket.return_value = expected
 
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(mock_calculate_basket_atomic.called)
+        self.assertTrue(mock_calculate_basket.called, msg='The cache should be missed.')
         self.assertEqual(response.data, expected)
-
-        mock_calculate_basket_atomic.reset_mock()
+        mock_calculate_basket.reset_mock()
 
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(mock_calculate_basket_atomic.called, msg='The cache should be missed.')
+        self.assertFalse(mock_calculate_basket.called, msg='The cache should be hit.')
         self.assertEqual(response.data, expected)
 
+        for query in ('&code=FOO', '&catalog=' + str(uuid4())):
+            response = self.client.get(self.url + query)
+            self.assertTrue(mock_calculate_basket.called, msg='The cache should be missed.')
+            mock_calculate_basket.reset_mock()
+
+        # Another user doesn't get the results cached for this one.
+        other_user = self.create_user()
+        response = self.client.get(self._generate_sku_url(self.products, username=other_user.username))
+        self.assertTrue(mock_calculate_basket.called, msg='The cache should be missed.')
+        mock_calculate_basket.reset_mock()
+
+        order = factories.create_order(user=self.user)
+        response = self.client.get(self.url)
+        self.assertTrue(mock_calculate_basket.called, msg='The cache should be missed after an order is placed.')
+        mock_calculate_basket.reset_mock()
+
+        RefundFactory(order=order, user=self.user, status=REFUND.COMPLETE)
+        response = self.client.get(self.url)
+        self.assertTrue(mock_calculate_basket.called, msg='The cache should be missed after an order is refunded.')
+
     @responses.activate
-    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resource_for_user')
+    @mock.patch('ecommerce.programs.conditions.ProgramCourseRunSeatsCondition._get_lms_resources_for_user')
     @mock.patch('ecommerce.extensions.api.v2.views.baskets.logger.exception')
-    def test_basket_calculate_by_staff_user_invalid_username(self, mock_get_lms_resource_for_user, mock_logger):
+    def test_basket_calculate_by_staff_user_invalid_username(self, mock_get_lms_resources_for_user, mock_logger):
         """Verify that a staff user passing an invalid username gets a response the anonymous
             basket and an error is logged about a non existent user """
         self.site_configuration.enable_partial_program = True
@@ -877,7 +911,7 @@ class BasketCalculateViewTests(ProgramTestMixin, ThrottlingMixin, TestCase):
             response = self.client.get(url)
 
             self.assertFalse(
-                mock_get_lms_resource_for_user.called, msg='LMS calls should be skipped for anonymous case.'
+                mock_get_lms_resources_for_user.called, msg='LMS calls should be skipped for anonymous case.'
             )
 
             self.assertEqual(response.status_code, 200)
@@ -14,8 +14,10 @@ import pytz
 import responses
 import rules  # pylint: disable=unused-import
 from django.conf import settings
+from django.db import connection
 from django.db.models.signals import post_delete
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.http import urlencode  # pylint: disable=unused-import
@@ -1182,6 +1184,30 @@ class EnterpriseCouponViewSetRbacTests(
             codes
         )
 
+    @ddt.data(VOUCHER_NOT_ASSIGNED, VOUCHER_NOT_REDEEMED, VOUCHER_PARTIAL_REDEEMED, VOUCHER_REDEEMED)
+    def test_coupon_codes_detail_query_count(self, code_filter):
+        """
+        Test that the number of queries of the code details does not depend on the number of codes in the page.
+        """
+        coupon_post_data = dict(self.data, voucher_type=Voucher.MULTI_USE, quantity=4, max_uses=10)
+        coupon_id = self.get_response('POST', ENTERPRISE_COUPONS_LINK, coupon_post_data).json()['coupon_id']
+        vouchers = Product.objects.get(id=coupon_id).attr.coupon_vouchers.vouchers.all()
+        for index, voucher in enumerate(vouchers):
+            assigned_email = 'assigned{}@example.com'.format(index)
+            partial_email = 'partial{}@example.com'.format(index)
+            self.assign_user_to_code(coupon_id, [{'email': assigned_email}, {'email': partial_email}], [voucher.code])
+            self.use_voucher(voucher, self.create_user(email=partial_email))
+            self.use_voucher(voucher, self.create_user(email='redeemed{}@example.com'.format(index)))
+
+        endpoint = '/api/v2/enterprise/coupons/{}/codes/?code_filter={}&page_size={}'
+        with CaptureQueriesContext(connection) as single_code_queries:
+            response = self.get_response('GET', endpoint.format(coupon_id, code_filter, 1)).json()
+            self.assertEqual(len(response['results']), 1)
+
+        with self.assertNumQueries(len(single_code_queries)):
+            response = self.get_response('GET', endpoint.format(coupon_id, code_filter, 4)).json()
+            self.assertEqual(len(response['results']), 4)
+
     # @FIXME: commenting out until test is fixed in ENT-5824
     def test_implicit_permission_coupon_overview(self):
         """
@@ -1890,6 +1916,100 @@ class EnterpriseCouponViewSetRbacTests(
         assert len(results) == 1
         assert results[0]['id'] == effective_coupon.id
 
+    def _get_coupon_overview(self, enterprise_customer_uuid, **query_params):
+        self.set_jwt_cookie(
+            system_wide_role=SYSTEM_ENTERPRISE_LEARNER_ROLE, context=enterprise_customer_uuid
+        )
+        response = self.get_response(
+            'GET',
+            reverse(
+                'api:v2:enterprise-coupons-overview',
+                kwargs={'enterprise_id': enterprise_customer_uuid},
+            ),
+            query_params,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_coupon_overview_data(self):
+        """
+        Test that the overview aggregates the vouchers, offers and assignments of every coupon.
+        """
+        enterprise_customer_uuid = self.data['enterprise_customer']['id']
+        catalog_uuid = 'aaaaaaaa-2c44-487b-9b6a-24eee973f9a4'
+        multi_use_coupon = self.create_coupon(
+            title='Multi use coupon',
+            enterprise_customer=enterprise_customer_uuid,
+            enterprise_customer_catalog=catalog_uuid,
+            max_uses=5,
+            quantity=3,
+            voucher_type=Voucher.MULTI_USE,
+        )
+        single_use_coupon = self.create_coupon(
+            title='Single use coupon',
+            enterprise_customer=enterprise_customer_uuid,
+            enterprise_customer_catalog=catalog_uuid,
+            quantity=2,
+            voucher_type=Voucher.SINGLE_USE,
+        )
+
+        vouchers = multi_use_coupon.attr.coupon_vouchers.vouchers.order_by('id')
+        offer = vouchers[0].enterprise_offer
+        for email in ('user1@example.com', 'user2@example.com'):
+            OfferAssignment.objects.create(offer=offer, code=vouchers[0].code, user_email=email)
+        bounced_assignment = OfferAssignment.objects.create(
+            offer=offer, code=vouchers[1].code, user_email='user3@example.com', status=OFFER_ASSIGNMENT_EMAIL_BOUNCED
+        )
+        OfferAssignment.objects.create(
+            offer=offer, code=vouchers[1].code, user_email='user4@example.com', status=OFFER_ASSIGNMENT_REVOKED
+        )
+        Voucher.objects.filter(id=vouchers[2].id).update(num_orders=1)
+
+        results = {
+            result['title']: result for result in self._get_coupon_overview(enterprise_customer_uuid)['results']
+        }
+
+        multi_use_overview = results[multi_use_coupon.title]
+        self.assertEqual(multi_use_overview['num_codes'], 3)
+        self.assertEqual(multi_use_overview['num_uses'], 1)
+        self.assertEqual(multi_use_overview['max_uses'], 15)
+        # The revoked assignment frees its slot, the bounced one does not.
+        self.assertEqual(multi_use_overview['num_unassigned'], (5 - 2) + (5 - 1) + (5 - 1))
+        self.assertEqual(multi_use_overview['usage_limitation'], Voucher.MULTI_USE)
+        self.assertEqual(
+            multi_use_overview['errors'],
+            [{'id': bounced_assignment.id, 'user_email': 'user3@example.com', 'code': vouchers[1].code}]
+        )
+        self.assertTrue(multi_use_overview['available'])
+        self.assertEqual(multi_use_overview['enterprise_catalog_uuid'], catalog_uuid)
+
+        single_use_overview = results[single_use_coupon.title]
+        self.assertEqual(single_use_overview['num_codes'], 2)
+        self.assertEqual(single_use_overview['num_uses'], 0)
+        self.assertEqual(single_use_overview['max_uses'], 2)
+        self.assertEqual(single_use_overview['num_unassigned'], 2)
+        self.assertEqual(single_use_overview['errors'], [])
+
+    def test_coupon_overview_query_count(self):
+        """
+        Test that the number of queries of the overview does not depend on the number of coupons.
+        """
+        enterprise_customer_uuid = self.data['enterprise_customer']['id']
+        for index in range(5):
+            self.create_coupon(
+                title='Coupon {}'.format(index),
+                enterprise_customer=enterprise_customer_uuid,
+                enterprise_customer_catalog='aaaaaaaa-2c44-487b-9b6a-24eee973f9a4',
+                quantity=2,
+            )
+        self._get_coupon_overview(enterprise_customer_uuid, page_size=1)
+
+        with CaptureQueriesContext(connection) as single_coupon_queries:
+            self.assertEqual(len(self._get_coupon_overview(enterprise_customer_uuid, page_size=1)['results']), 1)
+
+        with self.assertNumQueries(len(single_coupon_queries)):
+            self.assertEqual(len(self._get_coupon_overview(enterprise_customer_uuid, page_size=5)['results']), 5)
+
     # @ddt.data(
     #     (
     #         '85b08dde-0877-4474-a4e9-8408fe47ce88',
@@ -10,7 +10,9 @@ import pytz
 import responses
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
+from django.db import connection
 from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from opaque_keys.edx.keys import CourseKey
 from oscar.core.loading import get_class, get_model
@@ -39,6 +41,7 @@ Benefit = get_model('offer', 'Benefit')
 Order = get_model('order', 'Order')
 Product = get_model('catalogue', 'Product')
 ShippingEventType = get_model('order', 'ShippingEventType')
+Voucher = get_model('voucher', 'Voucher')
 post_checkout = get_class('checkout.signals', 'post_checkout')
 User = get_user_model()
 
@@ -240,6 +243,37 @@ class OrderListViewTests(AccessTokenMixin, ThrottlingMixin, TestCase):
         self.assertIn('course_organization', content['results'][0]['lines'][0])
         self.assertEqual(CourseKey.from_string(course_id).org, content['results'][0]['lines'][0]['course_organization'])
 
+    def test_orders_query_count(self):
+        """ The number of queries should not depend on the number of orders in the page. """
+        products = [
+            CourseFactory(id='course-v1:org+course+run{}'.format(index), partner=self.partner).create_or_update_seat(
+                'verified', True, 100
+            )
+            for index in range(100)
+        ]
+        voucher, __ = prepare_voucher(
+            _range=factories.RangeFactory(products=products), benefit_value=10, usage=Voucher.MULTI_USE
+        )
+        source_type = factories.SourceTypeFactory()
+        for product in products:
+            basket = factories.BasketFactory(owner=self.user, site=self.site)
+            basket.add_product(product)
+            basket.vouchers.add(voucher)
+            Applicator().apply(basket, user=basket.owner, request=self.request)
+            order = create_order(basket=basket, user=self.user)
+            factories.SourceFactory(order=order, source_type=source_type, card_type='visa', label='1234')
+
+        # Warm up the caches filled by the first request, e.g. waffle flags.
+        self.client.get(self.path, {'page_size': 1}, HTTP_AUTHORIZATION=self.token)
+
+        with CaptureQueriesContext(connection) as single_order_queries:
+            response = self.client.get(self.path, {'page_size': 1}, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['results']), 1)
+
+        with self.assertNumQueries(len(single_order_queries)):
+            response = self.client.get(self.path, {'page_size': 100}, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['results']), 100)
+
     def test_with_other_users_orders(self):
         """ The view should only return orders for the authenticated users. """
         other_user = self.create_user()
@@ -7,7 +7,9 @@ import ddt
 import mock
 import pytz
 import responses
+from django.db import connection
 from django.http import Http404
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 from opaque_keys.edx.keys import CourseKey
@@ -215,6 +217,31 @@ class VoucherViewSetTests(DiscoveryMockMixin, DiscoveryTestMixin, LmsApiMockMixi
             self.assertTrue(offer['multiple_credit_providers'])
             self.assertIsNone(offer['credit_provider_price'])
 
+    @responses.activate
+    @ddt.data('verified', 'credit')
+    def test_offers_query_count(self, seat_type):
+        """ Verify the number of queries made to build the offers does not depend on the number of products. """
+        self.mock_access_token_response()
+        products, request, voucher = self.prepare_get_offers_response(quantity=4, seat_type=seat_type)
+        OrderFactory(user=self.user).lines.add(OrderLineFactory(product=products[0], partner_sku='test_sku'))
+        results = []
+        for product in products:
+            self.mock_eligibility_api(request, self.user, product.course_id)
+            results.append({'key': product.course_id, 'start': '2016-05-01T00:00:00Z', 'title': product.title})
+
+        view = VoucherViewSet()
+        with CaptureQueriesContext(connection) as single_product_queries:
+            offers = view.convert_catalog_response_to_offers(request, voucher, {'results': results[-1:]})
+            self.assertEqual(len(offers), 1)
+
+        with self.assertNumQueries(len(single_product_queries)) as queries:
+            offers = view.convert_catalog_response_to_offers(request, voucher, {'results': results})
+            self.assertEqual(len(offers), 3 if seat_type == 'credit' else 4)
+
+        # The stock records are only queried when prefetched with the products.
+        stock_record_queries = [query for query in queries if 'FROM "partner_stockrecord"' in query['sql']]
+        self.assertEqual(len(stock_record_queries), 1)
+
     def test_omitting_expired_courses(self):
         """Verify professional courses who's enrollment end datetime have passed are omitted."""
         no_enrollment_end_seat = CourseFactory(partner=self.partner).create_or_update_seat('professional', False, 100)
@@ -361,19 +388,9 @@ class VoucherViewOffersEndpointTests(DiscoveryMockMixin, CouponMixin, DiscoveryT
 
         self.assertEqual(response.status_code, 200)
 
-    @ddt.data(
-        (
-            StockRecord.objects.none(),
-            'ecommerce.extensions.api.v2.views.vouchers.StockRecord.objects.filter'
-        ),
-        (
-            Product.objects.none(),
-            'ecommerce.extensions.api.v2.views.vouchers.Product.objects.filter'
-        )
-    )
-    @ddt.unpack
+    @ddt.data(True, False)
     @responses.activate
-    def test_voucher_offers_listing_catalog_query_exception(self, return_value, method):
+    def test_voucher_offers_listing_catalog_query_exception(self, missing_stock_records):
         """
         Verify the endpoint returns status 200 and an empty list of course offers
         when all product Courses and Stock Records are not found
@@ -389,9 +406,16 @@ class VoucherViewOffersEndpointTests(DiscoveryMockMixin, CouponMixin, DiscoveryT
         voucher, __ = prepare_voucher(_range=new_range)
         request = self.prepare_offers_listing_request(voucher.code)
 
-        with mock.patch(method, mock.Mock(return_value=return_value)):
+        if missing_stock_records:
+            seat.stockrecords.all().delete()
             offers = VoucherViewSet().get_offers(request=request, voucher=voucher)['results']
-            self.assertEqual(len(offers), 0)
+        else:
+            with mock.patch(
+                'ecommerce.extensions.api.v2.views.vouchers.Product.objects.filter',
+                mock.Mock(return_value=Product.objects.none())
+            ):
+                offers = VoucherViewSet().get_offers(request=request, voucher=voucher)['results']
+        self.assertEqual(len(offers), 0)
 
     @responses.activate
     def test_voucher_offers_listing_catalog_query(self):
@@ -27,7 +27,7 @@ from ecommerce.extensions.api.permissions import IsStaffOrOwner
 from ecommerce.extensions.api.serializers import BasketSerializer, OrderSerializer
 from ecommerce.extensions.api.throttles import ServiceUserThrottle
 from ecommerce.extensions.basket.constants import TEMPORARY_BASKET_CACHE_KEY
-from ecommerce.extensions.basket.utils import attribute_cookie_data
+from ecommerce.extensions.basket.utils import attribute_cookie_data, get_basket_calculate_cache_version
 from ecommerce.extensions.checkout.mixins import EdxOrderPlacementMixin
 from ecommerce.extensions.partner.shortcuts import get_partner_for_site
 from ecommerce.extensions.payment import exceptions as payment_exceptions
@@ -35,6 +35,7 @@ from ecommerce.extensions.payment.helpers import get_default_processor_class, ge
 
 Applicator = get_class('offer.applicator', 'Applicator')
 Basket = get_model('basket', 'Basket')
+InMemoryBasket = get_model('basket', 'InMemoryBasket')
 logger = logging.getLogger(__name__)
 Order = get_model('order', 'Order')
 OrderNumberGenerator = get_class('order.utils', 'OrderNumberGenerator')
@@ -372,51 +373,39 @@ class BasketCalculateView(generics.GenericAPIView):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    def _calculate_temporary_basket_atomic(self, user, request, products, voucher, skus, code):
-        response = None
+    def _calculate_temporary_basket(self, user, request, products, voucher, skus, code):
         try:
-            # We wrap this in an atomic operation so we never commit this to the db.
-            # This is to avoid merging this temporary basket with a real user basket.
-            with transaction.atomic():
-                basket = Basket(owner=user, site=request.site)
-                basket.strategy = Selector().strategy(user=user, request=request)
-                bundle_id = request.GET.get('bundle')
-
-                for product in products:
-                    basket.add_product(product, 1)
-
-                if voucher:
-                    basket.vouchers.add(voucher)
-
-                # Calculate any discounts on the basket.
-                Applicator().apply(basket, user=user, request=request, bundle_id=bundle_id)
-
-                discounts = []
-                if basket.offer_discounts:
-                    discounts = basket.offer_discounts
-                if basket.voucher_discounts:
-                    discounts.extend(basket.voucher_discounts)
-
-                response = {
-                    'total_incl_tax_excl_discounts': round(basket.total_incl_tax_excl_discounts, 2),
-                    'total_incl_tax': round(basket.total_incl_tax, 2),
-                    'currency': basket.currency
-                }
-                raise api_exceptions.TemporaryBasketException
-        except api_exceptions.TemporaryBasketException:
-            pass
+            # The basket is held in memory, so that it is never merged with a real user basket, and that
+            # calculating it doesn't write to the db.
+            basket = InMemoryBasket(owner=user, site=request.site)
+            basket.strategy = Selector().strategy(user=user, request=request)
+            bundle_id = request.GET.get('bundle')
+
+            for product in products:
+                basket.add_product(product, 1)
+
+            if voucher:
+                basket.in_memory_vouchers.add(voucher)
+
+            # Calculate any discounts on the basket.
+            Applicator().apply(basket, user=user, request=request, bundle_id=bundle_id)
+
+            return {
+                'total_incl_tax_excl_discounts': round(basket.total_incl_tax_excl_discounts, 2),
+                'total_incl_tax': round(basket.total_incl_tax, 2),
+                'currency': basket.currency
+            }
         except:  # pylint: disable=bare-except
             logger.exception(
                 'Failed to calculate basket discount for SKUs [%s] and voucher [%s].',
                 skus, code
             )
             raise
-        return response
 
     def get(self, request):  # pylint: disable=too-many-statements
         """ Calculate basket totals given a list of sku's
 
-        Create a temporary basket add the sku's and apply an optional voucher code.
+        Create an in-memory basket add the sku's and apply an optional voucher code.
         Then calculate the total price less discounts. If a voucher code is not
         provided apply a voucher in the Enterprise entitlements available
         to the user.
@@ -507,7 +496,6 @@ class BasketCalculateView(generics.GenericAPIView):
                 api_exceptions.LMS_USER_ID_NOT_FOUND_USER_MESSAGE
             )
 
-        cache_key = None
         bundle_id = request.GET.get('bundle')
         if use_default_basket:
             # For an anonymous user we can directly get the cached price, because
@@ -519,12 +507,28 @@ class BasketCalculateView(generics.GenericAPIView):
                 skus=skus,
                 bundle_id=bundle_id
             )
-            cached_response = TieredCache.get_cached_response(cache_key)
-            if cached_response.is_found:
-                return Response(cached_response.value)
+            cache_timeout = settings.ANONYMOUS_BASKET_CALCULATE_CACHE_TIMEOUT
+        else:
+            # The price for a user also depends on the voucher and enterprise catalog applied, and on the
+            # products they already purchased, so it is cached until they place an order.
+            cache_key = get_cache_key(
+                site_domain=request.site,
+                resource_name='calculate',
+                skus=skus,
+                bundle_id=bundle_id,
+                code=code,
+                catalog=request.GET.get('catalog'),
+                user_id=basket_owner.id,
+                version=get_basket_calculate_cache_version(basket_owner)
+            )
+            cache_timeout = settings.BASKET_CALCULATE_CACHE_TIMEOUT
+
+        cached_response = TieredCache.get_cached_response(cache_key)
+        if cached_response.is_found:
+            return Response(cached_response.value)
 
-        response = self._calculate_temporary_basket_atomic(basket_owner, request, products, voucher, skus, code)
-        if response and use_default_basket:
-            TieredCache.set_all_tiers(cache_key, response, settings.ANONYMOUS_BASKET_CALCULATE_CACHE_TIMEOUT)
+        response = self._calculate_temporary_basket(basket_owner, request, products, voucher, skus, code)
+        if response:
+            TieredCache.set_all_tiers(cache_key, response, cache_timeout)
 
         return Response(response)
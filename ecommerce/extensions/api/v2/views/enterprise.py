@@ -4,7 +4,8 @@ from urllib.parse import urlparse
 import django_filters
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q, prefetch_related_objects
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -67,6 +68,8 @@ from ecommerce.extensions.offer.constants import (
     OFFER_ASSIGNMENT_EMAIL_PENDING,
     OFFER_ASSIGNMENT_EMAIL_SUBJECT_LIMIT,
     OFFER_ASSIGNMENT_EMAIL_TEMPLATE_FIELD_LIMIT,
+    OFFER_ASSIGNMENT_REVOKED,
+    OFFER_REDEEMED,
     VOUCHER_IS_PRIVATE,
     VOUCHER_IS_PUBLIC,
     VOUCHER_NOT_ASSIGNED,
@@ -78,6 +81,7 @@ from ecommerce.extensions.offer.models import delete_file_from_s3_with_key
 from ecommerce.extensions.offer.utils import update_assignments_for_multi_use_per_customer
 from ecommerce.extensions.voucher.utils import (
     create_enterprise_vouchers,
+    get_available_slots_expression,
     update_voucher_offer,
     update_voucher_with_enterprise_offer
 )
@@ -246,7 +250,10 @@ class EnterpriseCouponViewSet(CouponViewSet):
                 coupon_vouchers__vouchers__end_datetime__gt=now
             )
 
-        return coupons.distinct()
+        coupons = coupons.distinct()
+        if self.action == 'overview':
+            coupons = EnterpriseCouponOverviewListSerializer.annotate_queryset(coupons)
+        return coupons
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -461,38 +468,60 @@ class EnterpriseCouponViewSet(CouponViewSet):
         serializer = serializer_class(queryset, **serializer_kwargs)
         return Response(serializer.data)
 
+    def _get_enterprise_offer_id(self, code):
+        """
+        Returns a subquery for the id of the enterprise offer of the voucher with the given code,
+        the same offer as Voucher.enterprise_offer.
+        """
+        return Subquery(ConditionalOffer.objects.filter(
+            vouchers__code=code,
+            condition__enterprise_customer_uuid__isnull=False,
+        ).order_by('-priority', 'pk').values('pk')[:1])
+
     def _get_not_assigned_usages(self, vouchers):
         """
         Returns a queryset containing Vouchers with slots that have not been assigned.
         Unique Vouchers will be included in the final queryset for all types.
         """
-
-        prefetch_related_objects(vouchers, 'offers', 'offers__condition', 'offers__offerassignment_set')
-        vouchers_with_slots = []
-        for voucher in vouchers:
-            slots_available = voucher.slots_available_for_assignment
-            if slots_available == 0:
-                continue
-
-            vouchers_with_slots.append(voucher.id)
-
-        return Voucher.objects.filter(id__in=vouchers_with_slots).values('code').order_by('code')
+        enterprise_offers = ConditionalOffer.objects.filter(pk=OuterRef('enterprise_offer_id'))
+        num_assignments = OfferAssignment.objects.filter(
+            offer=OuterRef('enterprise_offer_id'),
+            code=OuterRef('code'),
+        ).exclude(
+            status__in=[OFFER_REDEEMED, OFFER_ASSIGNMENT_REVOKED]
+        ).order_by().values('code').annotate(count=Count('id')).values('count')
+
+        # Same as Voucher.slots_available_for_assignment, which is None for vouchers without an enterprise offer.
+        return vouchers.annotate(
+            enterprise_offer_id=self._get_enterprise_offer_id(OuterRef('code')),
+        ).annotate(
+            max_global_applications=Subquery(enterprise_offers.values('max_global_applications')),
+            num_assignments=Coalesce(Subquery(num_assignments), 0),
+        ).annotate(
+            slots=get_available_slots_expression(F('max_global_applications')),
+        ).filter(
+            Q(enterprise_offer_id__isnull=True) | ~Q(slots=0)
+        ).values('code').order_by('code')
 
     def _get_not_redeemed_usages(self, vouchers):
         """
         Returns a queryset containing unique code and user_email pairs from OfferAssignments.
         Only code and user_email pairs that have no corresponding VoucherApplication are returned.
         """
-        prefetch_related_objects(vouchers, 'applications', 'applications__user', 'offers', 'offers__condition',
-                                 'offers__offerassignment_set')
-        not_redeemed_assignments = []
-        for voucher in vouchers:
-            assignments = voucher.not_redeemed_assignment_ids
-            if assignments:
-                not_redeemed_assignments.extend(assignments)
-
+        applications = VoucherApplication.objects.filter(
+            voucher__code=OuterRef('code'),
+            user__email=OuterRef('user_email'),
+        )
         return OfferAssignment.objects.filter(
-            id__in=not_redeemed_assignments
+            code__in=vouchers.values('code'),
+        ).annotate(
+            enterprise_offer_id=self._get_enterprise_offer_id(OuterRef('code')),
+        ).filter(
+            offer=F('enterprise_offer_id'),
+        ).exclude(
+            status__in=[OFFER_REDEEMED, OFFER_ASSIGNMENT_REVOKED],
+        ).exclude(
+            Exists(applications),
         ).values('code', 'user_email').order_by('user_email').distinct()
 
     def _get_partial_redeemed_usages(self, vouchers):
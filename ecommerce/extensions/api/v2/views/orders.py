@@ -60,6 +60,12 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend,)
     filterset_class = OrderFilter
 
+    def get_queryset(self):
+        queryset = super(OrderViewSet, self).get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = serializers.OrderSerializer.prefetch_queryset(queryset)
+        return queryset
+
     def filter_queryset(self, queryset):
         queryset = super(OrderViewSet, self).filter_queryset(queryset)
 
@@ -8,6 +8,7 @@ import django_filters
 import pytz
 from dateutil.parser import parse
 from dateutil.utils import default_tzinfo
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
 from opaque_keys.edx.keys import CourseKey
@@ -26,6 +27,7 @@ from ecommerce.enterprise.utils import get_enterprise_catalog
 from ecommerce.extensions.api import serializers
 from ecommerce.extensions.api.permissions import IsOffersOrIsAuthenticatedAndStaff
 from ecommerce.extensions.api.v2.views import NonDestroyableModelViewSet
+from ecommerce.extensions.catalogue.utils import get_prefetched_attribute_values
 
 logger = logging.getLogger(__name__)
 Order = get_model('order', 'Order')
@@ -109,7 +111,9 @@ class VoucherViewSet(NonDestroyableModelViewSet):
             course_seat_types(str): Comma-separated list of accepted seat types.
 
         Returns:
-            Querysets of products and stock records retrieved from results.
+            The products retrieved from results, with their attributes and stock records loaded,
+            the stock records of these products keyed by product ID, and the course run metadata
+            keyed by course run key.
         """
         course_run_metadata = {}
 
@@ -143,14 +147,30 @@ class VoucherViewSet(NonDestroyableModelViewSet):
             elif is_course_run_enrollable(result):
                 course_run_metadata[result['key']] = result
 
-        products = []
-        for seat_type in course_seat_types.split(','):
-            products.extend(Product.objects.filter(
-                course_id__in=list(course_run_metadata.keys()),
-                attributes__name='certificate_type',
-                attribute_values__value_text=seat_type
-            ))
-        stock_records = StockRecord.objects.filter(product__in=products)
+        seat_types = course_seat_types.split(',')
+        products = list(Product.objects.filter(
+            course_id__in=list(course_run_metadata.keys()),
+            attributes__name='certificate_type',
+            attribute_values__value_text__in=seat_types
+        ).select_related(
+            'parent__product_class', 'product_class'
+        ).prefetch_related(
+            'stockrecords', 'attribute_values__attribute', 'parent__attribute_values__attribute'
+        ))
+        for product in products:
+            get_prefetched_attribute_values(product)
+
+        def seat_type_order(product):
+            # Products are listed by seat type, in the order of course_seat_types.
+            certificate_type = getattr(product.attr, 'certificate_type', None)
+            return seat_types.index(certificate_type) if certificate_type in seat_types else len(seat_types)
+
+        products.sort(key=seat_type_order)
+
+        stock_records = {}
+        for product in products:
+            for stock_record in product.stockrecords.all():
+                stock_records.setdefault(stock_record.product_id, stock_record)
         return products, stock_records, course_run_metadata
 
     def convert_catalog_response_to_offers(self, request, voucher, response):
@@ -169,6 +189,23 @@ class VoucherViewSet(NonDestroyableModelViewSet):
             response['results'], course_seat_types
         )
         contains_verified_course = ('verified' in course_seat_types)
+        courses = Course.objects.in_bulk({product.course_id for product in products})
+
+        credit_products = [
+            product for product in products
+            if course_seat_types == 'credit' or product.attr.certificate_type == 'credit'
+        ]
+        purchased_product_ids = set()
+        credit_provider_counts = {}
+        if credit_products:
+            purchased_product_ids = set(Order.objects.filter(
+                user=request.user, lines__product__in=credit_products
+            ).values_list('lines__product_id', flat=True))
+            credit_provider_counts = dict(Product.objects.filter(
+                parent__in={product.parent_id for product in credit_products},
+                attributes__name='credit_provider'
+            ).order_by().values('parent').annotate(count=Count('id')).values_list('parent', 'count'))
+
         for product in products:
             logger.info('[Voucher Offers] Constructing offer data. Product: [%s]', product.id)
             # Omit unavailable seats from the offer results so that one seat does not cause an
@@ -179,32 +216,27 @@ class VoucherViewSet(NonDestroyableModelViewSet):
 
             course_id = product.course_id
             course_catalog_data = course_run_metadata[course_id]
+            stock_record = stock_records.get(product.id)
             if course_seat_types == 'credit' or product.attr.certificate_type == 'credit':
                 logger.info('[Voucher Offers] Constructing offer data for credit.')
                 # Omit credit seats for which the user is not eligible or which the user already bought.
                 if not request.user.is_eligible_for_credit(product.course_id, request.site.siteconfiguration):
                     continue
-                if Order.objects.filter(user=request.user, lines__product=product).exists():
+                if product.id in purchased_product_ids:
                     continue
-                credit_seats = Product.objects.filter(parent=product.parent, attributes__name='credit_provider')
 
-                if credit_seats.count() > 1:
+                if credit_provider_counts.get(product.parent_id, 0) > 1:
                     multiple_credit_providers = True
                     credit_provider_price = None
                 else:
                     multiple_credit_providers = False
-                    credit_provider_price = StockRecord.objects.get(product=product).price
+                    credit_provider_price = stock_record.price if stock_record else None
 
-            try:
-                stock_record = stock_records.get(product__id=product.id)
-            except StockRecord.DoesNotExist:
-                stock_record = None
+            if stock_record is None:
                 logger.error('Stock Record for product %s not found.', product.id)
 
-            try:
-                course = Course.objects.get(id=course_id)
-            except Course.DoesNotExist:  # pragma: no cover
-                course = None
+            course = courses.get(course_id)
+            if course is None:  # pragma: no cover
                 logger.error('Course %s not found.', course_id)
 
             if course_catalog_data and course and stock_record:
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.23 on 2026-10-19 00:32
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basket', '0017_alter_lineattribute_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InMemoryBasket',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('basket.basket',),
+        ),
+    ]
@@ -123,6 +123,104 @@ class Basket(AbstractBasket):
             num_lines=self.num_lines)
 
 
+class InMemoryRelation(list):
+    """
+    The lines or vouchers of an InMemoryBasket.
+
+    Answers the calls the offers make to the related managers of a basket, e.g. lines.first() or vouchers.all().
+    """
+
+    def all(self):
+        return self
+
+    def first(self):
+        return self[0] if self else None
+
+    def count(self):  # pylint: disable=arguments-differ
+        return len(self)
+
+    def exists(self):
+        return bool(self)
+
+    def add(self, *objs):
+        self.extend(obj for obj in objs if obj not in self)
+
+
+class InMemoryBasket(Basket):
+    """
+    A basket which holds its lines and vouchers in memory, and is never saved.
+
+    It is used to calculate the price of products with the offers that apply to them, without writing the
+    basket and its lines to the database. Its vouchers are added to in_memory_vouchers rather than vouchers.
+    """
+
+    class Meta:
+        proxy = True
+
+    def __init__(self, *args, **kwargs):
+        super(InMemoryBasket, self).__init__(*args, **kwargs)
+        self.in_memory_lines = InMemoryRelation()
+        self.in_memory_vouchers = InMemoryRelation()
+
+    def save(self, *args, **kwargs):
+        raise NotImplementedError('An in-memory basket cannot be saved.')
+
+    def delete(self, *args, **kwargs):
+        raise NotImplementedError('An in-memory basket cannot be deleted.')
+
+    @property
+    def lines(self):
+        return self.in_memory_lines
+
+    def all_lines(self):
+        return self.in_memory_lines
+
+    @property
+    def is_empty(self):
+        return not self.in_memory_lines
+
+    @property
+    def contains_a_voucher(self):
+        return self.in_memory_vouchers.exists()
+
+    def contains_voucher(self, code):
+        return any(voucher.code == code for voucher in self.in_memory_vouchers)
+
+    def add_product(self, product, quantity=1, options=None):
+        """
+        Add the indicated product to the lines in memory.
+
+        Unlike Basket.add_product, neither the basket nor the line are saved, and no event is tracked.
+        """
+        options = options or []
+        stock_info = self.get_stock_info(product, options)
+        if not stock_info.price.exists:
+            raise ValueError('Strategy hasn\'t found a price for product %s' % product)
+        if stock_info.stockrecord is None:
+            raise ValueError('Strategy hasn\'t found any stock record for product %s' % product)
+
+        line_reference = self._create_line_reference(product, stock_info.stockrecord, options)
+        self.reset_offer_applications()
+        for line in self.in_memory_lines:
+            if line.line_reference == line_reference:
+                line.quantity = max(0, line.quantity + quantity)
+                return line, False
+
+        line = Line(
+            basket=self,
+            line_reference=line_reference,
+            product=product,
+            stockrecord=stock_info.stockrecord,
+            quantity=quantity,
+            price_excl_tax=stock_info.price.excl_tax,
+            price_currency=stock_info.price.currency,
+        )
+        if stock_info.price.is_tax_known:
+            line.price_incl_tax = stock_info.price.incl_tax
+        self.in_memory_lines.append(line)
+        return line, True
+
+
 class BasketAttributeType(models.Model):
     """
     Used to keep attribute types for BasketAttribute
@@ -18,7 +18,9 @@ from ecommerce.tests.factories import SiteConfigurationFactory, UserFactory
 from ecommerce.tests.testcases import TransactionTestCase
 
 Basket = get_model('basket', 'Basket')
+InMemoryBasket = get_model('basket', 'InMemoryBasket')
 OrderNumberGenerator = get_class('order.utils', 'OrderNumberGenerator')
+Selector = get_class('partner.strategy', 'Selector')
 
 
 class BasketTests(CatalogMixin, BasketMixin, TransactionTestCase):
@@ -193,6 +195,21 @@ class BasketTests(CatalogMixin, BasketMixin, TransactionTestCase):
             basket.flush()
             self.assertEqual(mock_track.call_count, 0)
 
+    def test_in_memory_basket_not_saved(self):
+        """ Verify an in-memory basket holds its lines in memory, and cannot be saved or deleted. """
+        course = CourseFactory(partner=self.partner)
+        seat = course.create_or_update_seat('verified', True, 100)
+        basket = InMemoryBasket(owner=self.create_user(), site=self.site)
+        basket.strategy = Selector().strategy()
+
+        basket.add_product(seat)
+        self.assertEqual([line.product for line in basket.all_lines()], [seat])
+        with self.assertRaises(NotImplementedError):
+            basket.save()
+        with self.assertRaises(NotImplementedError):
+            basket.delete()
+        self.assertFalse(Basket.objects.exists())
+
     def _create_basket_with_product(self):
         basket = create_basket(empty=True, site=self.site)
         course = CourseFactory(partner=self.partner)
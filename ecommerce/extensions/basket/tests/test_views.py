@@ -530,6 +530,28 @@ class PaymentApiViewTests(PaymentApiResponseTestMixin, BasketMixin, DiscoveryMoc
                 title=u'PaymentApiViewTests',
             )
 
+    def test_course_info_retrieved_at_once(self):
+        """ Verify the course runs of all the seats in the basket are retrieved with one Discovery request. """
+        other_course = CourseFactory(name='Other PaymentApiViewTests', partner=self.partner)
+        basket = self.create_basket_and_add_product(self.create_seat(self.course))
+        basket.add_product(self.create_seat(other_course))
+        self.mock_access_token_response()
+        discovery_api_url = self.site_configuration.discovery_api_url
+        responses.add(responses.GET, '{}course_runs/'.format(discovery_api_url), json={
+            'count': 2,
+            'next': None,
+            'results': [{'key': course.id, 'title': course.name} for course in (self.course, other_course)],
+        })
+
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(product['title'] for product in response.json()['products']),
+            sorted([self.course.name, other_course.name])
+        )
+        discovery_calls = [call for call in responses.calls if call.request.url.startswith(discovery_api_url)]
+        self.assertEqual(len(discovery_calls), 1)
+
     @override_settings(
         BRAZE_EVENT_REST_ENDPOINT='rest.braze.com',
         BRAZE_API_KEY='test-api-key',
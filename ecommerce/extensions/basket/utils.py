@@ -3,6 +3,7 @@
 import datetime
 import json
 import logging
+import uuid
 from urllib.parse import unquote, urlencode
 
 import newrelic.agent
@@ -12,10 +13,12 @@ from django.conf import settings
 from django.contrib import messages
 from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
+from edx_django_utils.cache import TieredCache
 from oscar.apps.basket.signals import voucher_addition
 from oscar.core.loading import get_class, get_model
 
 from ecommerce.core.url_utils import absolute_url
+from ecommerce.core.utils import get_cache_key
 from ecommerce.courses.utils import mode_for_product
 from ecommerce.extensions.analytics.utils import track_segment_event
 from ecommerce.extensions.basket.constants import (
@@ -633,3 +636,28 @@ def set_email_preference_on_basket(request, basket):
         attribute_type=BasketAttributeType.objects.get(name=EMAIL_OPT_IN_ATTRIBUTE),
         defaults={'value_text': request.GET.get('email_opt_in') == 'true'},
     )
+
+
+def _get_basket_calculate_version_key(user):
+    return get_cache_key(resource_name='calculate_version', user_id=user.id)
+
+
+def get_basket_calculate_cache_version(user):
+    """
+    Returns the version of the basket calculations cached for the user.
+
+    The version changes when the user places an order, see clear_basket_calculate_cache.
+    """
+    version_key = _get_basket_calculate_version_key(user)
+    cached_response = TieredCache.get_cached_response(version_key)
+    if cached_response.is_found:
+        return cached_response.value
+
+    version = uuid.uuid4().hex
+    TieredCache.set_all_tiers(version_key, version, settings.BASKET_CALCULATE_CACHE_TIMEOUT)
+    return version
+
+
+def clear_basket_calculate_cache(user):
+    """ Forgets the basket calculations cached for the user. """
+    TieredCache.delete_all_tiers(_get_basket_calculate_version_key(user))
@@ -30,7 +30,11 @@ from rest_framework.views import APIView
 
 from ecommerce.core.exceptions import SiteConfigurationError
 from ecommerce.core.url_utils import absolute_redirect, get_lms_course_about_url, get_lms_url
-from ecommerce.courses.utils import get_certificate_type_display_value, get_course_info_from_catalog
+from ecommerce.courses.utils import (
+    get_certificate_type_display_value,
+    get_course_info_for_products,
+    get_course_info_from_catalog
+)
 from ecommerce.enterprise.utils import (
     CONSENT_FAILED_PARAM,
     construct_enterprise_course_consent_url,
@@ -118,6 +122,8 @@ class BasketLogicMixin:
             'is_enrollment_code_purchase': False
         }
 
+        self._cache_course_info(lines)
+
         lines_data = []
         for line in lines:
             product = line.product
@@ -240,6 +246,29 @@ class BasketLogicMixin:
                     response=HttpResponseRedirect(redirect_url)
                 )
 
+    @newrelic.agent.function_trace()
+    def _cache_course_info(self, lines):
+        """
+        Retrieves the course information of all the course related lines at once, so that _get_course_data
+        finds it in the cache instead of calling the Discovery Service once per line.
+        """
+        products = [
+            line.product for line in lines
+            if line.product.is_seat_product or line.product.is_course_entitlement_product or
+            line.product.is_enrollment_code_product
+        ]
+        if len(products) < 2:
+            return
+
+        try:
+            get_course_info_for_products(self.request.site, products)
+        except (ReqConnectionError, RequestException, Timeout):
+            # Each line falls back to retrieving its own course information.
+            logger.warning(
+                'Failed to retrieve data from Discovery Service for the products [%s] of the basket.',
+                ', '.join(str(product.id) for product in products),
+            )
+
     @newrelic.agent.function_trace()
     def _get_course_data(self, product):
         """
@@ -228,6 +228,34 @@ def generate_sku(product, partner):
     return digest.upper()
 
 
+def get_prefetched_attribute_values(product):
+    """
+    Same as Product.get_attribute_values, computed from the prefetched attribute values of the product and its
+    parent. The attributes of the product are initialized from them as well, so that reading product.attr does
+    not query the database. Returns None if the attribute values were not prefetched.
+    """
+    if 'attribute_values' not in getattr(product, '_prefetched_objects_cache', {}):
+        return None
+    if product.is_child and 'attribute_values' not in getattr(product.parent, '_prefetched_objects_cache', {}):
+        return None
+
+    attribute_values = list(product.attribute_values.all())
+    if product.is_child:
+        codes = {attribute_value.attribute.code for attribute_value in attribute_values}
+        attribute_values += [
+            attribute_value for attribute_value in product.parent.attribute_values.all()
+            if attribute_value.attribute.code not in codes
+        ]
+    attribute_values.sort(key=lambda attribute_value: attribute_value.pk)
+
+    if not product.attr.initialized:
+        attrs = product.attr.__dict__
+        for attribute_value in attribute_values:
+            attrs.setdefault(attribute_value.attribute.code, attribute_value.value)
+        product.attr.initialized = True
+    return attribute_values
+
+
 def get_or_create_catalog(name, partner, stock_record_ids):
     """
     Returns the catalog which has the same name, partner and stock records.
@@ -236,7 +236,9 @@ class ReceiptResponseView(ThankYouView):
         return get_object_or_404(Order, **kwargs)
 
     def get_payment_method(self, order):
-        source = order.sources.first()
+        # Index into all() rather than calling first(), so that prefetched sources are reused.
+        sources = order.sources.all()
+        source = sources[0] if sources else None
         if source:
             if source.card_type:
                 return '{type} {number}'.format(
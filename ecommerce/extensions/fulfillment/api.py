@@ -8,10 +8,15 @@ can successfully fulfill the product. Success can be reported back based on each
 
 
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from importlib import import_module
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.timezone import now
+from oscar.apps.order.exceptions import InvalidLineStatus
 
 from ecommerce.extensions.fulfillment import exceptions
 from ecommerce.extensions.fulfillment.status import LINE, ORDER
@@ -20,6 +25,96 @@ from ecommerce.extensions.refund.status import REFUND_LINE
 logger = logging.getLogger(__name__)
 
 
+class FulfillmentModuleRegistry:
+    """
+    The fulfillment modules declared in the FULFILLMENT_MODULES setting, loaded once per process.
+
+    Lines are routed to the modules in the order of the setting. Only the modules which may support the
+    product class of a line, see BaseFulfillmentModule.product_class_names, are asked whether they support it.
+    """
+
+    def __init__(self, module_paths):
+        self.module_classes = []
+        for cls_path in module_paths:
+            try:
+                module_path, _, name = cls_path.rpartition('.')
+                self.module_classes.append(getattr(import_module(module_path), name))
+            except (ImportError, ValueError, AttributeError):
+                logger.exception("Could not load module at [%s]", cls_path)
+
+        self.modules = [module_class() for module_class in self.module_classes]
+        self._modules_by_product_class = {}
+
+    def _get_candidate_modules(self, product_class_name):
+        modules = self._modules_by_product_class.get(product_class_name)
+        if modules is None:
+            modules = [
+                module for module in self.modules
+                if module.product_class_names is None or product_class_name in module.product_class_names
+            ]
+            self._modules_by_product_class[product_class_name] = modules
+        return modules
+
+    def get_modules_for_line(self, line):
+        """ Returns the modules which can fulfill the given line, in the order of the setting. """
+        product_class_name = line.product.get_product_class().name
+        return [module for module in self._get_candidate_modules(product_class_name) if module.supports_line(line)]
+
+    def get_lines_by_module(self, lines):
+        """
+        Routes each of the given lines to the first module which can fulfill it.
+
+        Returns:
+            An OrderedDict of the lines of every module, in the order of the setting, and the list of the lines
+            no module can fulfill.
+        """
+        lines_by_module = OrderedDict((module, []) for module in self.modules)
+        unsupported_lines = []
+        for line in lines:
+            product_class_name = line.product.get_product_class().name
+            for module in self._get_candidate_modules(product_class_name):
+                if module.supports_line(line):
+                    lines_by_module[module].append(line)
+                    break
+            else:
+                unsupported_lines.append(line)
+
+        return OrderedDict(item for item in lines_by_module.items() if item[1]), unsupported_lines
+
+
+@lru_cache(maxsize=None)
+def get_fulfillment_module_registry():
+    """ Returns the registry of the fulfillment modules declared in settings. """
+    return FulfillmentModuleRegistry(getattr(settings, 'FULFILLMENT_MODULES', []))
+
+
+@receiver(setting_changed)
+def reset_fulfillment_module_registry(setting, **kwargs):  # pylint: disable=unused-argument
+    if setting == 'FULFILLMENT_MODULES':
+        get_fulfillment_module_registry.cache_clear()
+
+
+def set_lines_status(lines, new_status):
+    """
+    Same as calling Line.set_status for each of the given lines, checking first that the new status is valid for
+    all of them.
+
+    Raises:
+        InvalidLineStatus if the new status is not valid for one of the lines. No line is updated then.
+    """
+    changed_lines = [line for line in lines if line.status != new_status]
+    for line in changed_lines:
+        if new_status not in line.available_statuses():
+            raise InvalidLineStatus(
+                "'{new_status}' is not a valid status (current status: '{status}')".format(
+                    new_status=new_status, status=line.status
+                )
+            )
+
+    for line in changed_lines:
+        line.set_status(new_status)
+
+
 def fulfill_order(order, lines, email_opt_in=False):
     """ Fulfills line items in an Order
 
@@ -46,34 +141,31 @@ def fulfill_order(order, lines, email_opt_in=False):
         logger.error(error_msg)
         raise exceptions.IncorrectOrderStatusError(error_msg)
 
-    # Construct a dict of lines by their product type.
-    line_items = list(lines.all())
+    line_items = list(lines.select_related('product__product_class', 'product__parent__product_class'))
 
     try:
-        # Iterate over the Fulfillment Modules defined in our configuration and determine if they support
-        # any of the lines in the order. Fulfill line items in the order they are designated by the configuration.
+        # Route each line to the first Fulfillment Module defined in our configuration which supports it, and
+        # fulfill the lines of each module in the order they are designated by the configuration.
         # Remaining line items should be marked with a fulfillment error since we have no configuration that
         # allows them to be fulfilled.
-        for module_class in get_fulfillment_modules():
-            module = module_class()
-            supported_lines = module.get_supported_lines(line_items)
-            if supported_lines:
-                line_items = list(set(line_items) - set(supported_lines))
-                module.fulfill_product(order, supported_lines, email_opt_in=email_opt_in)
+        lines_by_module, unsupported_lines = get_fulfillment_module_registry().get_lines_by_module(line_items)
+        for module, supported_lines in lines_by_module.items():
+            module.fulfill_product(order, supported_lines, email_opt_in=email_opt_in)
 
         # Check to see if any line items in the order have not been accounted for by a FulfillmentModule
         # Any product does not line up with a module, we have to mark a fulfillment error.
-        for line in line_items:
+        for line in unsupported_lines:
             product_type = line.product.get_product_class().name
             logger.error("Product Type [%s] does not have an associated Fulfillment Module. It cannot be fulfilled.",
                          product_type)
-            line.set_status(LINE.FULFILLMENT_CONFIGURATION_ERROR)
+        set_lines_status(unsupported_lines, LINE.FULFILLMENT_CONFIGURATION_ERROR)
     except Exception:  # pylint: disable=broad-except
         logger.exception('An unexpected error occurred while fulfilling order [%s].', order.number)
     finally:
         # Check if all lines are successful, or there were errors, and set the status of the Order.
+        # The modules set the status of the lines they were given, there is no need to load them again.
         order_status = ORDER.COMPLETE
-        for line in lines.all():
+        for line in line_items:
             if line.status != LINE.COMPLETE:
                 logger.error('There was an error while fulfilling order [%s]', order.number)
                 order_status = ORDER.FULFILLMENT_ERROR
@@ -94,18 +186,7 @@ def fulfill_order(order, lines, email_opt_in=False):
 
 def get_fulfillment_modules():
     """ Retrieves all fulfillment modules declared in settings. """
-    module_paths = getattr(settings, 'FULFILLMENT_MODULES', [])
-    modules = []
-
-    for cls_path in module_paths:
-        try:
-            module_path, _, name = cls_path.rpartition('.')
-            module = getattr(import_module(module_path), name)
-            modules.append(module)
-        except (ImportError, ValueError, AttributeError):
-            logger.exception("Could not load module at [%s]", cls_path)
-
-    return modules
+    return list(get_fulfillment_module_registry().module_classes)
 
 
 def get_fulfillment_modules_for_line(line):
@@ -115,7 +196,7 @@ def get_fulfillment_modules_for_line(line):
     Arguments
         line (Line): Line to be considered for fulfillment.
     """
-    return [module for module in get_fulfillment_modules() if module().supports_line(line)]
+    return [type(module) for module in get_fulfillment_module_registry().get_modules_for_line(line)]
 
 
 def revoke_fulfillment_for_refund(refund):
@@ -134,14 +215,18 @@ def revoke_fulfillment_for_refund(refund):
         for refund_line in refund.lines.all():
             refund_line.set_status(REFUND_LINE.COMPLETE)
     else:
-        # TODO (CCB): As our list of product types and fulfillment modules grows, this may become slow,
-        # and should be updated. Runtime is O(n^2).
-        for refund_line in refund.lines.all():
+        registry = get_fulfillment_module_registry()
+        refund_lines = refund.lines.select_related(
+            'order_line__order__user',
+            'order_line__product__product_class',
+            'order_line__product__parent__product_class',
+        )
+        for refund_line in refund_lines:
             order_line = refund_line.order_line
-            modules = get_fulfillment_modules_for_line(order_line)
+            modules = registry.get_modules_for_line(order_line)
 
             for module in modules:
-                if module().revoke_line(order_line):
+                if module.revoke_line(order_line):
                     refund_line.set_status(REFUND_LINE.COMPLETE)
                 else:
                     succeeded = False
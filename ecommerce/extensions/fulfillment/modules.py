@@ -9,6 +9,7 @@ import abc
 import datetime
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urlencode, urljoin
 
 import requests
@@ -20,14 +21,18 @@ from oscar.core.loading import get_model
 from requests.exceptions import ConnectionError as ReqConnectionError  # pylint: disable=ungrouped-imports
 from requests.exceptions import Timeout
 from rest_framework import status
+from threadlocals.threadlocals import get_current_request, set_thread_variable
 
 from ecommerce.core.constants import (
+    COUPON_PRODUCT_CLASS_NAME,
+    COURSE_ENTITLEMENT_PRODUCT_CLASS_NAME,
     DONATIONS_FROM_CHECKOUT_TESTS_PRODUCT_TYPE_NAME,
     ENROLLMENT_CODE_PRODUCT_CLASS_NAME,
     HUBSPOT_FORMS_INTEGRATION_ENABLE,
-    ISO_8601_FORMAT
+    ISO_8601_FORMAT,
+    SEAT_PRODUCT_CLASS_NAME
 )
-from ecommerce.core.url_utils import get_lms_enrollment_api_url, get_lms_entitlement_api_url
+from ecommerce.core.url_utils import get_lms_enrollment_api_url, get_lms_entitlement_api_url, get_lms_url
 from ecommerce.courses.models import Course
 from ecommerce.courses.utils import get_course_info_from_catalog, mode_for_product
 from ecommerce.enterprise.conditions import BasketAttributeType
@@ -64,6 +69,10 @@ class BaseFulfillmentModule(metaclass=abc.ABCMeta):  # pragma: no cover
     All modules should extend the FulfillmentModule and adhere to the defined contract.
     """
 
+    # Names of the product classes of the lines this module may support. The lines of other product classes
+    # are not offered to the module. None if the module may support lines of any product class.
+    product_class_names = None
+
     @abc.abstractmethod
     def supports_line(self, line):
         """
@@ -132,6 +141,8 @@ class DonationsFromCheckoutTestFulfillmentModule(BaseFulfillmentModule):
     If that test, or any follow up tests around donations at checkout are not implemented, this module will be reverted.
     Don't use this code for your own purposes, thanks.
     """
+    product_class_names = (DONATIONS_FROM_CHECKOUT_TESTS_PRODUCT_TYPE_NAME,)
+
     def supports_line(self, line):
         """
         Returns True if the given Line has a donation product.
@@ -189,10 +200,9 @@ class EnrollmentFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmentModule
         usage (string): A description of why data is being posted to the enrollment API. This will be included in log
             messages if the LMS user id cannot be found.
     """
+    product_class_names = (SEAT_PRODUCT_CLASS_NAME,)
 
-    def _post_to_enrollment_api(self, data, user, usage):
-        enrollment_api_url = get_lms_enrollment_api_url()
-        timeout = settings.ENROLLMENT_FULFILLMENT_TIMEOUT
+    def _get_enrollment_api_headers(self, user, usage):
         headers = {
             'Content-Type': 'application/json',
             'X-Edx-Api-Key': settings.EDX_API_KEY
@@ -206,8 +216,130 @@ class EnrollmentFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmentModule
         if ip:
             headers['X-Forwarded-For'] = ip
 
+        return headers
+
+    def _post_to_enrollment_api(self, data, user, usage):
+        enrollment_api_url = get_lms_enrollment_api_url()
+        timeout = settings.ENROLLMENT_FULFILLMENT_TIMEOUT
+        headers = self._get_enrollment_api_headers(user, usage)
         return requests.post(enrollment_api_url, data=json.dumps(data), headers=headers, timeout=timeout)
 
+    @staticmethod
+    def _get_enrollment_result(response):
+        """ Returns the status code of an Enrollment API response, and the reason of the failure if it failed. """
+        if response.status_code == status.HTTP_200_OK:
+            return response.status_code, None
+        try:
+            reason = response.json().get('message')
+        except Exception:  # pylint: disable=broad-except
+            reason = '(No detail provided.)'
+        return response.status_code, reason
+
+    def _post_enrollment(self, data, user):
+        """
+        Posts a single enrollment to the Enrollment API.
+
+        Returns:
+            The result of the enrollment, see _get_enrollment_result, or the network error or timeout raised
+            while posting it.
+        """
+        try:
+            response = self._post_to_enrollment_api(data, user=user, usage='fulfill enrollment')
+        except (ReqConnectionError, Timeout) as error:
+            return error
+        return self._get_enrollment_result(response)
+
+    def _post_to_bulk_enrollment_api(self, enrollments, user):
+        """
+        Posts several enrollments to the bulk enrollment endpoint of the LMS, see ENROLLMENT_FULFILLMENT_BULK_API_PATH.
+
+        Returns:
+            The result of every enrollment, in the same order, see _post_enrollment.
+        """
+        try:
+            response = requests.post(
+                get_lms_url(settings.ENROLLMENT_FULFILLMENT_BULK_API_PATH),
+                data=json.dumps(enrollments),
+                headers=self._get_enrollment_api_headers(user, 'fulfill enrollment'),
+                timeout=settings.ENROLLMENT_FULFILLMENT_ORDER_DEADLINE
+            )
+        except (ReqConnectionError, Timeout) as error:
+            return [error] * len(enrollments)
+
+        bulk_result = self._get_enrollment_result(response)
+        if bulk_result[0] != status.HTTP_200_OK:
+            return [bulk_result] * len(enrollments)
+
+        try:
+            results = [(result['status'], result.get('message')) for result in response.json()]
+        except Exception:  # pylint: disable=broad-except
+            results = []
+        if len(results) != len(enrollments):
+            logger.error('The bulk enrollment endpoint returned an invalid response for user [%s].', user.username)
+            reason = '(No detail provided.)'
+            return [(status.HTTP_500_INTERNAL_SERVER_ERROR, reason)] * len(enrollments)
+        return results
+
+    def _post_enrollments(self, order, enrollments):
+        """
+        Posts the enrollments of an order to the Enrollment API.
+
+        The enrollments are posted to the bulk enrollment endpoint if one is configured, concurrently by
+        ENROLLMENT_FULFILLMENT_MAX_WORKERS threads if there are several, or else one after the other. Enrollments
+        posted in bulk or concurrently must complete within ENROLLMENT_FULFILLMENT_ORDER_DEADLINE seconds, those
+        which do not fail with a timeout.
+
+        Arguments:
+            order (Order): The order being fulfilled.
+            enrollments (list): The POST data of every enrollment.
+
+        Returns:
+            The result of every enrollment, in the same order, see _post_enrollment.
+        """
+        if len(enrollments) > 1 and settings.ENROLLMENT_FULFILLMENT_BULK_API_PATH:
+            return self._post_to_bulk_enrollment_api(enrollments, order.user)
+
+        max_workers = min(settings.ENROLLMENT_FULFILLMENT_MAX_WORKERS, len(enrollments))
+        if max_workers <= 1:
+            return [self._post_enrollment(data, order.user) for data in enrollments]
+
+        request = get_current_request()
+
+        def post_enrollment(data):
+            # The URL of the Enrollment API is built for the site of the current request.
+            set_thread_variable('request', request)
+            return self._post_enrollment(data, order.user)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = [executor.submit(post_enrollment, data) for data in enrollments]
+        done, __ = wait(futures, timeout=settings.ENROLLMENT_FULFILLMENT_ORDER_DEADLINE)
+        # Do not wait for the enrollments still in progress, they are reported as timed out.
+        executor.shutdown(wait=False)
+        results = []
+        for future in futures:
+            if future in done:
+                results.append(future.result())
+            else:
+                future.cancel()
+                results.append(Timeout('The enrollment did not complete within the deadline of the order.'))
+        return results
+
+    @staticmethod
+    def _set_enrollment_error(order, line, error):
+        """ Sets the status of a line which could not be enrolled because of a network error or a timeout. """
+        if isinstance(error, ReqConnectionError):
+            logger.error(
+                "Unable to fulfill line [%d] of order [%s] due to a network problem", line.id, order.number
+            )
+            order.notes.create(message='Fulfillment of order failed due to a network problem.', note_type='Error')
+            line.set_status(LINE.FULFILLMENT_NETWORK_ERROR)
+        else:
+            logger.error(
+                "Unable to fulfill line [%d] of order [%s] due to a request time out", line.id, order.number
+            )
+            order.notes.create(message='Fulfillment of order failed due to a request time out.', note_type='Error')
+            line.set_status(LINE.FULFILLMENT_TIMEOUT_ERROR)
+
     def _add_enterprise_data_to_enrollment_api_post(self, data, order):
         """ Augment enrollment api POST data with enterprise specific data.
 
@@ -305,6 +437,16 @@ class EnrollmentFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmentModule
 
             return order, lines
 
+        # The enterprise data only depends on the order, it is the same for every line.
+        enterprise_data = {}
+        enterprise_error = None
+        try:
+            logger.info("Adding enterprise data to enrollment api post for order [%s]", order.number)
+            self._add_enterprise_data_to_enrollment_api_post(enterprise_data, order)
+        except (ReqConnectionError, Timeout) as error:
+            enterprise_error = error
+
+        enrollments = []
         for line in lines:
             try:
                 mode = mode_for_product(line.product)
@@ -347,56 +489,50 @@ class EnrollmentFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmentModule
                         'value': provider
                     }
                 )
+            if enterprise_error is not None:
+                self._set_enrollment_error(order, line, enterprise_error)
+                continue
+            data.update(enterprise_data)
             try:
-                logger.info("Adding enterprise data to enrollment api post for order [%s]", order.number)
-                self._add_enterprise_data_to_enrollment_api_post(data, order)
                 logger.info("Updating orderline with enterprise discount metadata for order [%s]", order.number)
                 self.update_orderline_with_enterprise_discount_metadata(order, line)
+            except (ReqConnectionError, Timeout) as error:
+                self._set_enrollment_error(order, line, error)
+                continue
+            enrollments.append((line, data, course_key, mode, provider))
 
-                # Post to the Enrollment API. The LMS will take care of posting a new EnterpriseCourseEnrollment to
-                # the Enterprise service if the user+course has a corresponding EnterpriseCustomerUser.
-                logger.info("Posting to enrollment api for order [%s]", order.number)
-                response = self._post_to_enrollment_api(data, user=order.user, usage='fulfill enrollment')
-                logger.info("Finished posting to enrollment api for order [%s]", order.number)
-
-                if response.status_code == status.HTTP_200_OK:
-                    line.set_status(LINE.COMPLETE)
-
-                    audit_log(
-                        'line_fulfilled',
-                        order_line_id=line.id,
-                        order_number=order.number,
-                        product_class=line.product.get_product_class().name,
-                        course_id=course_key,
-                        mode=mode,
-                        user_id=order.user.id,
-                        credit_provider=provider,
-                    )
-                else:
-                    try:
-                        data = response.json()
-                        reason = data.get('message')
-                    except Exception:  # pylint: disable=broad-except
-                        reason = '(No detail provided.)'
-
-                    logger.error(
-                        "Fulfillment of line [%d] on order [%s] failed with status code [%d]: %s",
-                        line.id, order.number, response.status_code, reason
-                    )
-                    order.notes.create(message=reason, note_type='Error')
-                    line.set_status(LINE.FULFILLMENT_SERVER_ERROR)
-            except ReqConnectionError:
-                logger.error(
-                    "Unable to fulfill line [%d] of order [%s] due to a network problem", line.id, order.number
+        # Post to the Enrollment API. The LMS will take care of posting a new EnterpriseCourseEnrollment to
+        # the Enterprise service if the user+course has a corresponding EnterpriseCustomerUser.
+        logger.info("Posting to enrollment api for order [%s]", order.number)
+        results = self._post_enrollments(order, [data for __, data, __, __, __ in enrollments])
+        logger.info("Finished posting to enrollment api for order [%s]", order.number)
+
+        for (line, __, course_key, mode, provider), result in zip(enrollments, results):
+            if isinstance(result, Exception):
+                self._set_enrollment_error(order, line, result)
+                continue
+
+            status_code, reason = result
+            if status_code == status.HTTP_200_OK:
+                line.set_status(LINE.COMPLETE)
+
+                audit_log(
+                    'line_fulfilled',
+                    order_line_id=line.id,
+                    order_number=order.number,
+                    product_class=line.product.get_product_class().name,
+                    course_id=course_key,
+                    mode=mode,
+                    user_id=order.user.id,
+                    credit_provider=provider,
                 )
-                order.notes.create(message='Fulfillment of order failed due to a network problem.', note_type='Error')
-                line.set_status(LINE.FULFILLMENT_NETWORK_ERROR)
-            except Timeout:
+            else:
                 logger.error(
-                    "Unable to fulfill line [%d] of order [%s] due to a request time out", line.id, order.number
+                    "Fulfillment of line [%d] on order [%s] failed with status code [%d]: %s",
+                    line.id, order.number, status_code, reason
                 )
-                order.notes.create(message='Fulfillment of order failed due to a request time out.', note_type='Error')
-                line.set_status(LINE.FULFILLMENT_TIMEOUT_ERROR)
+                order.notes.create(message=reason, note_type='Error')
+                line.set_status(LINE.FULFILLMENT_SERVER_ERROR)
         logger.info("Finished fulfilling 'Seat' product types for order [%s]", order.number)
         return order, lines
 
@@ -446,6 +582,7 @@ class EnrollmentFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmentModule
 
 class CouponFulfillmentModule(BaseFulfillmentModule):
     """ Fulfillment Module for coupons. """
+    product_class_names = (COUPON_PRODUCT_CLASS_NAME,)
 
     def supports_line(self, line):
         """
@@ -504,6 +641,8 @@ class CouponFulfillmentModule(BaseFulfillmentModule):
 
 
 class EnrollmentCodeFulfillmentModule(BaseFulfillmentModule):
+    product_class_names = (ENROLLMENT_CODE_PRODUCT_CLASS_NAME,)
+
     def supports_line(self, line):
         """
         Check whether the product in line is an Enrollment code.
@@ -763,6 +902,7 @@ class CourseEntitlementFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmen
     """ Fulfillment Module for granting students an entitlement.
     Allows the entitlement of a student via purchase of a 'Course Entitlement'.
     """
+    product_class_names = (COURSE_ENTITLEMENT_PRODUCT_CLASS_NAME,)
 
     def supports_line(self, line):
         return line.product.is_course_entitlement_product and not line.product.is_executive_education_2u_product
@@ -8,6 +8,7 @@ from testfixtures import LogCapture
 
 from ecommerce.extensions.fulfillment import api, exceptions
 from ecommerce.extensions.fulfillment.api import (
+    get_fulfillment_module_registry,
     get_fulfillment_modules,
     get_fulfillment_modules_for_line,
     revoke_fulfillment_for_refund
@@ -55,6 +56,17 @@ class FulfillmentApiTests(FulfillmentTestMixin, TestCase):
         self.assertEqual(ORDER.FULFILLMENT_ERROR, self.order.status)
         self.assertEqual(LINE.FULFILLMENT_CONFIGURATION_ERROR, self.order.lines.all()[0].status)
 
+    @override_settings(FULFILLMENT_MODULES=['ecommerce.extensions.fulfillment.tests.modules.FulfillNothingModule', ])
+    def test_fulfill_order_unknown_product_type_history(self):
+        """ Verify the status of the lines which cannot be fulfilled is recorded in their history. """
+        line = self.order.lines.first()
+        history_count = line.history.count()
+
+        api.fulfill_order(self.order, self.order.lines)
+
+        self.assertEqual(line.history.count(), history_count + 1)
+        self.assertEqual(line.history.first().status, LINE.FULFILLMENT_CONFIGURATION_ERROR)
+
     @override_settings(FULFILLMENT_MODULES=['ecommerce.extensions.fulfillment.tests.modules.NotARealModule', ])
     def test_fulfill_order_incorrect_module(self):
         """Test an incorrect Fulfillment Module."""
@@ -63,15 +75,48 @@ class FulfillmentApiTests(FulfillmentTestMixin, TestCase):
         self.assertEqual(LINE.FULFILLMENT_CONFIGURATION_ERROR, self.order.lines.all()[0].status)
 
     @override_settings(FULFILLMENT_MODULES=['ecommerce.extensions.fulfillment.tests.modules.FakeFulfillmentModule', ])
-    @patch('ecommerce.extensions.fulfillment.tests.modules.FakeFulfillmentModule.get_supported_lines')
+    @patch('ecommerce.extensions.fulfillment.tests.modules.FakeFulfillmentModule.supports_line')
     def test_fulfill_order_invalid_module(self, mocked_method):
         """Verify an exception is logged when an unexpected error occurs."""
-        mocked_method.return_value = Exception
+        mocked_method.side_effect = Exception
         with patch('ecommerce.extensions.fulfillment.api.logger.exception') as mock_logger:
             api.fulfill_order(self.order, self.order.lines)
             self.assertEqual(ORDER.FULFILLMENT_ERROR, self.order.status)
             self.assertTrue(mock_logger.called)
 
+    @override_settings(FULFILLMENT_MODULES=['ecommerce.extensions.fulfillment.tests.modules.FakeFulfillmentModule',
+                                            'ecommerce.extensions.fulfillment.tests.modules.RevocationFailureModule'])
+    def test_fulfill_order_routes_lines_once(self):
+        """ Verify each line is offered to the modules until one supports it, and fulfilled by that module only. """
+        with patch.object(FakeFulfillmentModule, 'supports_line', return_value=True) as mock_supports_line:
+            api.fulfill_order(self.order, self.order.lines)
+
+        self.assertEqual(mock_supports_line.call_count, self.order.lines.count())
+        self.assert_order_fulfilled(self.order)
+
+    @override_settings(FULFILLMENT_MODULES=['ecommerce.extensions.fulfillment.tests.modules.FakeFulfillmentModule'])
+    def test_fulfill_order_other_product_class(self):
+        """ Verify lines are not offered to the modules which do not fulfill their product class. """
+        with patch.object(FakeFulfillmentModule, 'product_class_names', ('Coupon',)):
+            with patch.object(FakeFulfillmentModule, 'supports_line') as mock_supports_line:
+                api.fulfill_order(self.order, self.order.lines)
+
+        self.assertFalse(mock_supports_line.called)
+        self.assertEqual(ORDER.FULFILLMENT_ERROR, self.order.status)
+        self.assertEqual(LINE.FULFILLMENT_CONFIGURATION_ERROR, self.order.lines.all()[0].status)
+
+    def test_get_fulfillment_module_registry(self):
+        """ Verify the modules are loaded once, and loaded again when the setting changes. """
+        registry = get_fulfillment_module_registry()
+        self.assertIs(get_fulfillment_module_registry(), registry)
+
+        with override_settings(
+                FULFILLMENT_MODULES=['ecommerce.extensions.fulfillment.tests.modules.FakeFulfillmentModule']
+        ):
+            self.assertEqual(get_fulfillment_module_registry().module_classes, [FakeFulfillmentModule])
+
+        self.assertEqual(get_fulfillment_module_registry().module_classes, registry.module_classes)
+
     @override_settings(FULFILLMENT_MODULES=['ecommerce.extensions.fulfillment.tests.modules.FakeFulfillmentModule',
                                             'ecommerce.extensions.fulfillment.tests.modules.NotARealModule'])
     def test_get_fulfillment_modules(self):
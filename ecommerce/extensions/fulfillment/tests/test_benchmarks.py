@@ -0,0 +1,130 @@
+"""
+Benchmarks for the enrollment of the seats of an order.
+
+These are deselected by default. Run them with:
+
+    pytest -m benchmark -s ecommerce/extensions/fulfillment/tests/test_benchmarks.py
+
+The enrollments are posted to a local stand-in for the LMS, which answers every enrollment after
+ENROLLMENT_LATENCY seconds. The timings are only printed, the benchmark checks the concurrent enrollments
+overlap from the number of requests the stand-in answered at the same time.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.test import override_settings
+from oscar.test import factories
+
+from ecommerce.courses.tests.factories import CourseFactory
+from ecommerce.extensions.fulfillment.modules import EnrollmentFulfillmentModule
+from ecommerce.extensions.fulfillment.status import LINE
+from ecommerce.extensions.test.factories import create_order
+from ecommerce.tests.factories import UserFactory
+from ecommerce.tests.testcases import TestCase
+
+BULK_ENROLLMENT_PATH = '/api/enrollment/v1/enrollments/bulk'
+ENROLLMENT_LATENCY = 0.2
+SEATS = 10
+
+
+class StandInLMSRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers the enrollment requests after ENROLLMENT_LATENCY seconds, and the bulk ones after twice as long.
+
+    The largest number of requests answered at the same time is kept in max_in_flight.
+    """
+    in_flight = 0
+    max_in_flight = 0
+    in_flight_lock = threading.Lock()
+
+    @classmethod
+    def reset(cls):
+        with cls.in_flight_lock:
+            cls.in_flight = cls.max_in_flight = 0
+
+    @classmethod
+    def _count_in_flight(cls, value):
+        with cls.in_flight_lock:
+            cls.in_flight += value
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        self._count_in_flight(1)
+        try:
+            if self.path == BULK_ENROLLMENT_PATH:
+                time.sleep(2 * ENROLLMENT_LATENCY)
+                body = json.dumps([{'status': 200}] * len(json.loads(data)))
+            else:
+                time.sleep(ENROLLMENT_LATENCY)
+                body = json.dumps({})
+        finally:
+            self._count_in_flight(-1)
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.mark.benchmark
+@override_settings(EDX_API_KEY='foo')
+class EnrollmentFulfillmentBenchmark(TestCase):
+    """ Compares the sequential, concurrent and bulk enrollment of the seats of an order. """
+
+    def setUp(self):
+        super(EnrollmentFulfillmentBenchmark, self).setUp()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandInLMSRequestHandler)
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.start()
+        self.addCleanup(server_thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.site_configuration.lms_url_root = 'http://127.0.0.1:{}'.format(server.server_port)
+        self.site_configuration.save()
+
+        basket = factories.BasketFactory(owner=UserFactory(), site=self.site)
+        for index in range(SEATS):
+            course = CourseFactory(id='course-v1:edX+Benchmark+Run{}'.format(index), partner=self.partner)
+            basket.add_product(course.create_or_update_seat('verified', False, 100), 1)
+        self.order = create_order(basket=basket, user=basket.owner)
+
+    def _time(self, **settings):
+        """ Returns how long enrolling the seats took, and the largest number of requests in flight at once. """
+        lines = list(self.order.lines.all())
+        StandInLMSRequestHandler.reset()
+        with override_settings(**settings):
+            start = time.perf_counter()
+            EnrollmentFulfillmentModule().fulfill_product(self.order, lines)
+            elapsed = time.perf_counter() - start
+        self.assertEqual({line.status for line in lines}, {LINE.COMPLETE})
+        return elapsed, StandInLMSRequestHandler.max_in_flight
+
+    def test_fulfill_product(self):
+        timings = (
+            ('sequential', 1, self._time(ENROLLMENT_FULFILLMENT_MAX_WORKERS=1)),
+            ('concurrent (4 workers)', 4, self._time(ENROLLMENT_FULFILLMENT_MAX_WORKERS=4)),
+            ('concurrent (10 workers)', 10, self._time(ENROLLMENT_FULFILLMENT_MAX_WORKERS=10)),
+            ('bulk', 1, self._time(ENROLLMENT_FULFILLMENT_BULK_API_PATH=BULK_ENROLLMENT_PATH)),
+        )
+
+        print('{seats} seats, {latency:.0f}ms per enrollment'.format(seats=SEATS, latency=ENROLLMENT_LATENCY * 1000))
+        for name, __, (elapsed, max_in_flight) in timings:
+            print('{name:24} {elapsed:6.2f}s, {max_in_flight} in flight'.format(
+                name=name + ':', elapsed=elapsed, max_in_flight=max_in_flight
+            ))
+
+        for name, max_workers, (__, max_in_flight) in timings:
+            if max_workers == 1:
+                self.assertEqual(max_in_flight, 1, msg=name)
+            else:
+                self.assertGreater(max_in_flight, 1, msg=name)
+                self.assertLessEqual(max_in_flight, max_workers, msg=name)
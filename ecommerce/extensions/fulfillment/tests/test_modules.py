@@ -3,6 +3,7 @@
 
 import datetime
 import json
+import threading
 import uuid
 from decimal import Decimal
 from urllib.parse import urlencode
@@ -27,7 +28,7 @@ from ecommerce.core.constants import (
     ISO_8601_FORMAT,
     SEAT_PRODUCT_CLASS_NAME
 )
-from ecommerce.core.url_utils import get_lms_enrollment_api_url, get_lms_entitlement_api_url
+from ecommerce.core.url_utils import get_lms_enrollment_api_url, get_lms_entitlement_api_url, get_lms_url
 from ecommerce.coupons.tests.mixins import CouponMixin
 from ecommerce.courses.constants import CertificateType
 from ecommerce.courses.models import Course
@@ -334,6 +335,121 @@ class EnrollmentFulfillmentModuleTests(
         EnrollmentFulfillmentModule().fulfill_product(self.order, list(self.order.lines.all()))
         self.assertEqual(LINE.FULFILLMENT_SERVER_ERROR, self.order.lines.all()[0].status)
 
+    def create_multiple_seats_order(self, count=3):
+        """ Create an order with one seat in each of count courses, and return its lines. """
+        basket = factories.BasketFactory(owner=self.user, site=self.site)
+        for index in range(count):
+            course = CourseFactory(id='course-v1:edX+DemoX+Demo{}'.format(index), partner=self.partner)
+            basket.add_product(course.create_or_update_seat(self.certificate_type, False, 100), 1)
+        self.order = create_order(number=3, basket=basket, user=self.user)
+        return list(self.order.lines.all())
+
+    @responses.activate
+    @override_settings(ENROLLMENT_FULFILLMENT_MAX_WORKERS=3)
+    def test_enrollment_module_fulfill_concurrently(self):
+        """ Verify the seats of an order are enrolled concurrently, and audited line by line. """
+        lines = self.create_multiple_seats_order()
+        # No enrollment is answered before all of them are requested, which fails unless they are requested together.
+        all_requested = threading.Barrier(len(lines))
+
+        def enroll(request):  # pylint: disable=unused-argument
+            all_requested.wait(5)
+            return 200, {}, json.dumps({})
+
+        responses.add_callback(responses.POST, get_lms_enrollment_api_url(), callback=enroll, content_type=JSON)
+
+        with LogCapture(LOGGER_NAME) as logger:
+            EnrollmentFulfillmentModule().fulfill_product(self.order, lines)
+            for line in lines:
+                logger.check_present(
+                    (
+                        LOGGER_NAME,
+                        'INFO',
+                        'line_fulfilled: course_id="{}", credit_provider="None", mode="{}", order_line_id="{}", '
+                        'order_number="{}", product_class="{}", user_id="{}"'.format(
+                            line.product.attr.course_key,
+                            mode_for_product(line.product),
+                            line.id,
+                            self.order.number,
+                            SEAT_PRODUCT_CLASS_NAME,
+                            self.user.id,
+                        )
+                    )
+                )
+
+        self.assertFalse(all_requested.broken)
+        self.assertEqual([line.status for line in self.order.lines.all()], [LINE.COMPLETE] * 3)
+        self.assertEqual(
+            sorted(json.loads(call.request.body)['course_details']['course_id'] for call in responses.calls),
+            sorted(line.product.attr.course_key for line in lines)
+        )
+
+    @override_settings(ENROLLMENT_FULFILLMENT_MAX_WORKERS=3, ENROLLMENT_FULFILLMENT_ORDER_DEADLINE=0.1)
+    def test_enrollment_module_order_deadline(self):
+        """ Verify the seats not enrolled within the deadline of the order receive a timeout error status. """
+        lines = self.create_multiple_seats_order()
+        slow_course_key = lines[1].product.attr.course_key
+        slow_enrollment_released = threading.Event()
+        self.addCleanup(slow_enrollment_released.set)
+
+        def post_to_enrollment_api(data, **kwargs):  # pylint: disable=unused-argument
+            if data['course_details']['course_id'] == slow_course_key:
+                slow_enrollment_released.wait(5)
+            return mock.Mock(status_code=200)
+
+        with mock.patch.object(
+            EnrollmentFulfillmentModule, '_post_to_enrollment_api', side_effect=post_to_enrollment_api
+        ):
+            EnrollmentFulfillmentModule().fulfill_product(self.order, lines)
+
+        self.assertEqual(
+            [line.status for line in self.order.lines.all()],
+            [LINE.COMPLETE, LINE.FULFILLMENT_TIMEOUT_ERROR, LINE.COMPLETE]
+        )
+        self.assertEqual(self.order.notes.get().message, 'Fulfillment of order failed due to a request time out.')
+
+    @responses.activate
+    @override_settings(ENROLLMENT_FULFILLMENT_BULK_API_PATH='/api/enrollment/v1/enrollments/bulk')
+    def test_enrollment_module_fulfill_in_bulk(self):
+        """ Verify the seats of an order are enrolled with a single request to the bulk enrollment endpoint. """
+        bulk_url = get_lms_url('/api/enrollment/v1/enrollments/bulk')
+        responses.add(
+            responses.POST, bulk_url, status=200, content_type=JSON,
+            json=[{'status': 200}, {'status': 400, 'message': 'Oops!'}, {'status': 200}]
+        )
+        lines = self.create_multiple_seats_order()
+
+        EnrollmentFulfillmentModule().fulfill_product(self.order, lines)
+
+        self.assertEqual(
+            [line.status for line in self.order.lines.all()],
+            [LINE.COMPLETE, LINE.FULFILLMENT_SERVER_ERROR, LINE.COMPLETE]
+        )
+        self.assertEqual(self.order.notes.get().message, 'Oops!')
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(
+            [data['course_details']['course_id'] for data in json.loads(responses.calls[0].request.body)],
+            [line.product.attr.course_key for line in lines]
+        )
+
+    @responses.activate
+    @ddt.data(
+        (500, {'message': 'Oops!'}, 'Oops!'),
+        (200, [{'status': 200}], '(No detail provided.)'),
+    )
+    @ddt.unpack
+    @override_settings(ENROLLMENT_FULFILLMENT_BULK_API_PATH='/api/enrollment/v1/enrollments/bulk')
+    def test_enrollment_module_fulfill_in_bulk_error(self, status_code, body, reason):
+        """ Verify every seat receives a server-side error status if the bulk enrollment fails as a whole. """
+        bulk_url = get_lms_url('/api/enrollment/v1/enrollments/bulk')
+        responses.add(responses.POST, bulk_url, status=status_code, json=body, content_type=JSON)
+        lines = self.create_multiple_seats_order(count=2)
+
+        EnrollmentFulfillmentModule().fulfill_product(self.order, lines)
+
+        self.assertEqual([line.status for line in self.order.lines.all()], [LINE.FULFILLMENT_SERVER_ERROR] * 2)
+        self.assertEqual([note.message for note in self.order.notes.all()], [reason] * 2)
+
     @responses.activate
     def test_revoke_product(self):
         """ The method should call the Enrollment API to un-enroll the student, and return True. """
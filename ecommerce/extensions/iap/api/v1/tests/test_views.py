@@ -31,6 +31,7 @@ from ecommerce.extensions.iap.api.v1.constants import (
     ERROR_ALREADY_PURCHASED,
     ERROR_BASKET_ID_NOT_PROVIDED,
     ERROR_BASKET_NOT_FOUND,
+    ERROR_DURING_ANDROID_REFUND_EXECUTION,
     ERROR_DURING_IOS_REFUND_EXECUTION,
     ERROR_DURING_ORDER_CREATION,
     ERROR_DURING_PAYMENT_HANDLING,
@@ -61,7 +62,12 @@ from ecommerce.extensions.iap.api.v1.constants import (
 from ecommerce.extensions.iap.api.v1.google_validator import GooglePlayValidator
 from ecommerce.extensions.iap.api.v1.ios_validator import IOSValidator
 from ecommerce.extensions.iap.api.v1.serializers import MobileOrderSerializer
-from ecommerce.extensions.iap.api.v1.views import AndroidRefundView, MobileCoursePurchaseExecutionView
+from ecommerce.extensions.iap.api.v1.views import (
+    AndroidRefundView,
+    MobileCoursePurchaseExecutionView,
+    clear_android_publisher_services
+)
+from ecommerce.extensions.iap.models import IAPProcessorConfiguration
 from ecommerce.extensions.iap.processors.android_iap import AndroidIAP
 from ecommerce.extensions.iap.processors.ios_iap import IOSIAP
 from ecommerce.extensions.order.utils import UserAlreadyPlacedOrder
@@ -818,6 +824,37 @@ class AndroidRefundTests(BaseRefundTests):
     logger_name = 'ecommerce.extensions.iap.api.v1.views'
     processor_name = AndroidIAP.NAME
 
+    def setUp(self):
+        super(AndroidRefundTests, self).setUp()
+        clear_android_publisher_services()
+        self.addCleanup(clear_android_publisher_services)
+
+    def enter_context(self, context_manager):
+        """ Enter the context manager until the end of the test. """
+        result = context_manager.__enter__()
+        self.addCleanup(context_manager.__exit__, None, None, None)
+        return result
+
+    def mock_voided_purchases(self, *pages):
+        """ Mock the Google service, with the voidedpurchases api returning the given pages. """
+        mock_credential_method = self.enter_context(
+            mock.patch.object(ServiceAccountCredentials, 'from_json_keyfile_dict')
+        )
+        mock_credential_method.return_value.authorize.return_value = None
+        mock_build = self.enter_context(mock.patch('ecommerce.extensions.iap.api.v1.views.build'))
+        self.enter_context(mock.patch('httplib2.Http'))
+        mock_list = mock_build.return_value.purchases.return_value.voidedpurchases.return_value.list
+        mock_list.return_value.execute.side_effect = pages
+        return mock_build, mock_list
+
+    def create_original_purchases(self):
+        """ Create the purchase of every voided purchase, each by a different user. """
+        for refund in self.mock_processor_response['voidedPurchases']:
+            basket = BasketFactory(site=self.site, owner=self.create_user())
+            basket.add_product(self.verified_product)
+            PaymentProcessorResponse.objects.create(basket=basket, transaction_id=refund['orderId'],
+                                                    processor_name=self.processor_name, response={})
+
     def check_record_not_found_log(self, logger, msg_t):
         response = self.client.get(self.path)
         self.assert_ok_response(response)
@@ -903,6 +940,106 @@ class AndroidRefundTests(BaseRefundTests):
             with LogCapture(self.logger_name) as logger:
                 self.check_record_not_found_log(logger, ERROR_ORDER_NOT_FOUND_FOR_REFUND)
 
+    def test_pages_followed(self):
+        """ Verify the refunds of every page of the voidedpurchases api are processed. """
+        first_page, second_page = [
+            {'voidedPurchases': [refund]} for refund in self.mock_processor_response['voidedPurchases']
+        ]
+        first_page['tokenPagination'] = {'nextPageToken': 'next_page'}
+        __, mock_list = self.mock_voided_purchases(first_page, second_page)
+
+        with LogCapture(self.logger_name) as logger:
+            self.check_record_not_found_log(logger, ERROR_TRANSACTION_NOT_FOUND_FOR_REFUND)
+
+        self.assertEqual(mock_list.call_count, 2)
+        self.assertNotIn('token', mock_list.call_args_list[0][1])
+        self.assertEqual(mock_list.call_args_list[1][1]['token'], 'next_page')
+
+    def test_service_reused(self):
+        """ Verify the Google service is built once for the configured credentials. """
+        mock_build, __ = self.mock_voided_purchases(self.mock_processor_response, self.mock_processor_response)
+
+        self.assert_ok_response(self.client.get(self.path))
+        self.assert_ok_response(self.client.get(self.path))
+
+        self.assertEqual(mock_build.call_count, 1)
+
+    def test_original_purchases_loaded_at_once(self):
+        """ Verify the first response of every transaction is loaded with one query. """
+        self.create_original_purchases()
+        original_purchases = list(PaymentProcessorResponse.objects.order_by('id'))
+        PaymentProcessorResponse.objects.create(basket=original_purchases[0].basket, transaction_id=self.order_id_one,
+                                                processor_name=self.processor_name, response={})
+
+        with self.assertNumQueries(1):
+            loaded_purchases = AndroidRefundView().get_original_purchases(
+                [self.order_id_one, self.order_id_two, self.invalid_transaction_id]
+            )
+
+        self.assertEqual(loaded_purchases, {
+            self.order_id_one: original_purchases[0],
+            self.order_id_two: original_purchases[1],
+        })
+
+    def test_checkpoint(self):
+        """ Verify refunds are fetched from just past the latest refund processed by the previous call. """
+        # Fetch refunds from before the voided purchases, unless there is a checkpoint.
+        iap_configuration = IAPProcessorConfiguration.get_solo()
+        iap_configuration.android_refunds_age_in_days = 10000
+        iap_configuration.save()
+        self.create_original_purchases()
+        __, mock_list = self.mock_voided_purchases()
+
+        def list_voided_purchases(**kwargs):
+            voided_purchases = [
+                refund for refund in self.mock_processor_response['voidedPurchases']
+                if int(refund['voidedTimeMillis']) >= kwargs['startTime']
+            ]
+            return mock.Mock(execute=mock.Mock(return_value={'voidedPurchases': voided_purchases}))
+
+        mock_list.side_effect = list_voided_purchases
+        with mock.patch.object(AndroidRefundView, '_refund_purchase', return_value=True) as mock_refund_purchase:
+            self.assert_ok_response(self.client.get(self.path))
+            self.assertEqual(mock_refund_purchase.call_count, 2)
+
+            with LogCapture(self.logger_name) as logger:
+                self.assert_ok_response(self.client.get(self.path))
+            logger.check()
+            self.assertEqual(mock_refund_purchase.call_count, 2)
+
+        latest_voided_time = int(self.mock_processor_response['voidedPurchases'][1]['voidedTimeMillis'])
+        self.assertEqual(mock_list.call_args_list[1][1]['startTime'], latest_voided_time + 1)
+        checkpoint = IAPProcessorConfiguration.get_solo().android_refunds_checkpoint
+        self.assertEqual(round(checkpoint.timestamp() * 1000), latest_voided_time + 1)
+
+    def test_checkpoint_kept_at_failed_refund(self):
+        """ Verify the checkpoint is not moved past a refund which failed. """
+        self.create_original_purchases()
+        self.mock_voided_purchases(self.mock_processor_response)
+
+        with mock.patch.object(AndroidRefundView, '_refund_purchase', side_effect=[Exception, True]), \
+                LogCapture(self.logger_name) as logger:
+            self.assert_ok_response(self.client.get(self.path))
+
+        logger.check((self.logger_name, 'ERROR', ERROR_DURING_ANDROID_REFUND_EXECUTION % self.order_id_one))
+        failed_voided_time = int(self.mock_processor_response['voidedPurchases'][0]['voidedTimeMillis'])
+        checkpoint = IAPProcessorConfiguration.get_solo().android_refunds_checkpoint
+        self.assertEqual(round(checkpoint.timestamp() * 1000), failed_voided_time)
+
+    @override_settings(ANDROID_REFUND_MAX_WORKERS=2)
+    def test_concurrent_refunds(self):
+        """ Verify the refunds of different users are all processed when they are processed concurrently. """
+        self.create_original_purchases()
+        self.mock_voided_purchases(self.mock_processor_response)
+
+        with mock.patch.object(AndroidRefundView, '_refund_purchase', return_value=True) as mock_refund_purchase:
+            self.assert_ok_response(self.client.get(self.path))
+
+        self.assertEqual(
+            sorted(call[0][0] for call in mock_refund_purchase.call_args_list),
+            [self.order_id_one, self.order_id_two]
+        )
+
 
 class IOSRefundTests(BaseRefundTests):
     path = reverse('iap:ios-refund')
@@ -1,15 +1,20 @@
 import datetime
+import json
 import logging
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import app_store_notifications_v2_validator as asn2
 import httplib2
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
+from django.db import connections, transaction
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.utils.html import escape
+from django.utils.timezone import now
 from django.utils.translation import ugettext as _
 from edx_django_utils import monitoring as monitoring_utils
 from edx_rest_framework_extensions.permissions import LoginRedirectIfUnauthenticated
@@ -22,6 +27,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from threadlocals.threadlocals import set_thread_variable
 
 from ecommerce.extensions.analytics.utils import track_segment_event
 from ecommerce.extensions.api.v2.views.checkout import CheckoutView
@@ -39,6 +45,7 @@ from ecommerce.extensions.iap.api.v1.constants import (
     ERROR_ALREADY_PURCHASED,
     ERROR_BASKET_ID_NOT_PROVIDED,
     ERROR_BASKET_NOT_FOUND,
+    ERROR_DURING_ANDROID_REFUND_EXECUTION,
     ERROR_DURING_IOS_REFUND_EXECUTION,
     ERROR_DURING_ORDER_CREATION,
     ERROR_DURING_PAYMENT_HANDLING,
@@ -89,6 +96,14 @@ logger = logging.getLogger(__name__)
 Product = get_model('catalogue', 'Product')
 PaymentProcessorResponse = get_model('payment', 'PaymentProcessorResponse')
 
+# The Google Play Developer API services built by each thread, by credentials.
+_android_publisher_services = threading.local()
+
+
+def clear_android_publisher_services():
+    """ Forgets the Google Play Developer API services built by this thread. """
+    _android_publisher_services.__dict__.clear()
+
 
 class MobileBasketAddItemsView(BasketLogicMixin, APIView):
     """
@@ -260,15 +275,40 @@ class BaseRefund(APIView):
     """ Base refund class for iOS and Android refunds """
     authentication_classes = ()
 
-    def refund(self, transaction_id, processor_response):
-        """ Get a transaction id and create a refund against that transaction. """
-        is_refunded = False
-        original_purchase = PaymentProcessorResponse.objects.filter(transaction_id=transaction_id,
-                                                                    processor_name=self.processor_name).first()
+    def get_original_purchases(self, transaction_ids):
+        """ Returns the first payment processor response of each of the given transactions, by transaction id. """
+        original_purchases = {}
+        responses = PaymentProcessorResponse.objects.filter(
+            transaction_id__in=transaction_ids, processor_name=self.processor_name
+        ).select_related('basket__owner').order_by('id')
+        for response in responses:
+            original_purchases.setdefault(response.transaction_id, response)
+        return original_purchases
+
+    def refund(self, transaction_id, processor_response, original_purchase=None):
+        """
+        Get a transaction id and create a refund against that transaction.
+
+        The original purchase of the transaction is looked up, unless it is given.
+        """
+        if original_purchase is None:
+            original_purchase = PaymentProcessorResponse.objects.filter(transaction_id=transaction_id,
+                                                                        processor_name=self.processor_name).first()
         if not original_purchase:
             logger.error(ERROR_TRANSACTION_NOT_FOUND_FOR_REFUND, transaction_id, self.processor_name)
-            return is_refunded
+            return False
+
+        try:
+            return self._refund_purchase(transaction_id, processor_response, original_purchase)
+        except RefundCompletionException:
+            return False
+
+    def _refund_purchase(self, transaction_id, processor_response, original_purchase):
+        """
+        Create a refund against the original purchase of a transaction.
 
+        Returns whether a refund was created, and raises RefundCompletionException if it could not be completed.
+        """
         basket = original_purchase.basket
         user = basket.owner
         course_key = basket.all_lines().first().product.attr.course_key
@@ -279,7 +319,7 @@ class BaseRefund(APIView):
                 if not refunds:
                     monitoring_utils.set_custom_attribute('iap_no_order_to_refund', transaction_id)
                     logger.error(ERROR_ORDER_NOT_FOUND_FOR_REFUND, transaction_id, self.processor_name)
-                    return is_refunded
+                    return False
 
                 refund = refunds[0]
                 refund.approve(revoke_fulfillment=True)
@@ -291,12 +331,11 @@ class BaseRefund(APIView):
                                                         transaction_id=transaction_id,
                                                         response=processor_response, basket=basket)
                 logger.info(LOGGER_REFUND_SUCCESSFUL, transaction_id, self.processor_name)
-                is_refunded = True
+                return True
 
         except RefundCompletionException:
             logger.exception(ERROR_REFUND_NOT_COMPLETED, user.username, course_key, self.processor_name)
-
-        return is_refunded
+            raise
 
 
 class AndroidRefundView(BaseRefund):
@@ -308,35 +347,124 @@ class AndroidRefundView(BaseRefund):
 
     def get(self, request):
         """
-        Get all refunds in last 3 days from voidedpurchases api
-        and call refund method on every refund.
+        Get all refunds since the checkpoint, within the refunds age in days, from voidedpurchases api
+        and refund every one of them.
+
+        The checkpoint is then moved to the earliest refund which failed, so that it is fetched again by the
+        next call, or else just past the latest refund, as the start time of the voidedpurchases api is inclusive.
         """
 
         partner_short_code = request.site.siteconfiguration.partner.short_code
         configuration = settings.PAYMENT_PROCESSOR_CONFIG[partner_short_code.lower()][self.processor_name.lower()]
         service = self._get_service(configuration)
 
-        refunds_age = IAPProcessorConfiguration.get_solo().android_refunds_age_in_days
-        refunds_time = datetime.datetime.now() - datetime.timedelta(days=refunds_age)
-        refunds_time_in_ms = round(refunds_time.timestamp() * 1000)
-        refund_list = service.purchases().voidedpurchases()
-        refunds = refund_list.list(packageName=configuration['google_bundle_id'],
-                                   startTime=refunds_time_in_ms).execute()
-        for refund in refunds.get('voidedPurchases', []):
-            self.refund(refund['orderId'], refund)
+        iap_configuration = IAPProcessorConfiguration.get_solo()
+        refunds_time = now() - datetime.timedelta(days=iap_configuration.android_refunds_age_in_days)
+        if iap_configuration.android_refunds_checkpoint:
+            refunds_time = max(refunds_time, iap_configuration.android_refunds_checkpoint)
+        refunds = self._get_voided_purchases(service, configuration['google_bundle_id'], refunds_time)
+
+        original_purchases = self.get_original_purchases([refund['orderId'] for refund in refunds])
+        failed_refunds = self._refund_voided_purchases(refunds, original_purchases)
+
+        checkpoint_refunds = failed_refunds or refunds
+        if checkpoint_refunds:
+            voided_times = [int(refund['voidedTimeMillis']) for refund in checkpoint_refunds]
+            checkpoint_time = min(voided_times) if failed_refunds else max(voided_times) + 1
+            iap_configuration.android_refunds_checkpoint = datetime.datetime.fromtimestamp(
+                checkpoint_time / 1000, tz=datetime.timezone.utc
+            )
+            iap_configuration.save(update_fields=['android_refunds_checkpoint'])
 
         return Response()
 
+    @staticmethod
+    def _get_voided_purchases(service, package_name, start_time):
+        """ Returns the purchases voided since the given time, from every page of the voidedpurchases api. """
+        refund_list = service.purchases().voidedpurchases()
+        list_kwargs = {
+            'packageName': package_name,
+            'startTime': round(start_time.timestamp() * 1000),
+        }
+        refunds = []
+        page_tokens = set()
+        while True:
+            response = refund_list.list(**list_kwargs).execute()
+            refunds.extend(response.get('voidedPurchases', []))
+            page_token = response.get('tokenPagination', {}).get('nextPageToken')
+            if not page_token or page_token in page_tokens:
+                return refunds
+            page_tokens.add(page_token)
+            list_kwargs['token'] = page_token
+
+    def _refund_voided_purchase(self, refund, original_purchase):
+        """ Refunds a voided purchase, returning False if the refund failed and must be fetched again. """
+        transaction_id = refund['orderId']
+        if not original_purchase:
+            logger.error(ERROR_TRANSACTION_NOT_FOUND_FOR_REFUND, transaction_id, self.processor_name)
+            return True
+
+        try:
+            self._refund_purchase(transaction_id, refund, original_purchase)
+        except RefundCompletionException:
+            return False
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(ERROR_DURING_ANDROID_REFUND_EXECUTION, transaction_id)
+            return False
+        return True
+
+    def _refund_voided_purchases(self, refunds, original_purchases):
+        """
+        Refunds the voided purchases, and returns those which failed.
+
+        The refunds of a user are processed one after the other, as they may be for the same orders. The refunds
+        of different users are processed concurrently by ANDROID_REFUND_MAX_WORKERS threads if there are several.
+        """
+        def refund_voided_purchases(user_refunds):
+            return [
+                refund for refund in user_refunds
+                if not self._refund_voided_purchase(refund, original_purchases.get(refund['orderId']))
+            ]
+
+        refunds_by_user = OrderedDict()
+        for refund in refunds:
+            original_purchase = original_purchases.get(refund['orderId'])
+            user_id = original_purchase.basket.owner_id if original_purchase else None
+            refunds_by_user.setdefault(user_id, []).append(refund)
+
+        max_workers = min(settings.ANDROID_REFUND_MAX_WORKERS, len(refunds_by_user))
+        if max_workers <= 1:
+            return refund_voided_purchases(refunds)
+
+        def refund_voided_purchases_in_thread(user_refunds):
+            # Revoking the fulfillment of the orders calls the LMS of the site of the current request.
+            set_thread_variable('request', self.request)
+            try:
+                return refund_voided_purchases(user_refunds)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            failed_refunds = executor.map(refund_voided_purchases_in_thread, refunds_by_user.values())
+            return [refund for user_failed_refunds in failed_refunds for refund in user_failed_refunds]
+
     def _get_service(self, configuration):
-        """ Create a service to interact with google api. """
-        play_console_credentials = configuration.get('google_service_account_key_file')
-        credentials = ServiceAccountCredentials.from_json_keyfile_dict(play_console_credentials,
-                                                                       GOOGLE_PUBLISHER_API_SCOPE)
-        http = httplib2.Http(timeout=self.timeout)
-        http = credentials.authorize(http)
+        """
+        Return a service to interact with google api.
 
-        service = build("androidpublisher", "v3", http=http)
-        return service
+        The service of the configured credentials is built once per thread, as its http client is not thread-safe.
+        """
+        play_console_credentials = configuration.get('google_service_account_key_file')
+        service_key = (json.dumps(play_console_credentials, sort_keys=True), self.timeout)
+        services = _android_publisher_services.__dict__.setdefault('services', {})
+        if service_key not in services:
+            credentials = ServiceAccountCredentials.from_json_keyfile_dict(play_console_credentials,
+                                                                           GOOGLE_PUBLISHER_API_SCOPE)
+            http = httplib2.Http(timeout=self.timeout)
+            http = credentials.authorize(http)
+
+            services[service_key] = build("androidpublisher", "v3", http=http)
+        return services[service_key]
 
 
 class IOSRefundView(BaseRefund):
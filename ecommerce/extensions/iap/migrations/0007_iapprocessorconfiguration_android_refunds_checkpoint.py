@@ -0,0 +1,18 @@
+# Generated by Django 3.2.23 on 2026-10-19 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iap', '0006_iapprocessorconfiguration_mobile_team_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iapprocessorconfiguration',
+            name='android_refunds_checkpoint',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Time from which the next fetch of Android refunds starts, unless it is older than their age in days.'),
+        ),
+    ]
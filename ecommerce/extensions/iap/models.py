@@ -22,6 +22,14 @@ class IAPProcessorConfiguration(SingletonModel):
         )
     )
 
+    android_refunds_checkpoint = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_(
+            'Time from which the next fetch of Android refunds starts, unless it is older than their age in days.'
+        )
+    )
+
     mobile_team_email = models.EmailField(
         default='',
         verbose_name=_('mobile team email'),
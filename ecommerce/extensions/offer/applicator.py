@@ -7,6 +7,8 @@ from oscar.apps.offer.applicator import Applicator as OscarApplicator
 from oscar.core.loading import get_model
 
 from ecommerce.enterprise.api import get_enterprise_id_for_user
+from ecommerce.extensions.offer.catalog_membership import CatalogQueryMembershipResolver
+from ecommerce.extensions.offer.snapshot import get_offer_snapshot
 
 logger = logging.getLogger(__name__)
 BUNDLE = 'bundle_identifier'
@@ -38,6 +40,17 @@ class Applicator(OscarApplicator):
                 we get an error when trying to create the bundle_id BasketAttribute.
         """
         offers = self.get_offers(basket, user, request, bundle_id)
+        if basket.site:
+            # Resolve catalog query membership of the basket lines for all offers at once, rather than
+            # letting every dynamic catalog offer query the Discovery Service on its own.
+            CatalogQueryMembershipResolver.for_site(basket.site).prefetch_for_offers(basket, offers)
+            if basket.owner:
+                # Ask the enterprise catalog service which catalogs contain the basket courses for all the
+                # enterprise offers at once, rather than once for every enterprise offer.
+                # Imported here since the enterprise conditions import the basket utils, which load this module.
+                # pylint: disable=import-outside-toplevel
+                from ecommerce.enterprise.conditions import EnterpriseBasketFacts
+                EnterpriseBasketFacts.for_basket(basket).prefetch_catalog_memberships(offers)
         self.apply_offers(basket, offers)
 
     def get_offers(self, basket, user=None, request=None, bundle_id=None):  # pylint: disable=arguments-differ
@@ -48,7 +61,7 @@ class Applicator(OscarApplicator):
         basket. As an example, if the basket has a bundle ID or an enterprise customer
         UUID, gets only the site offers associated with that specific bundle or enterprise
         customer, rather than all site offers. Otherwise, gets the site offers not associated
-        with a bundle.
+        with a bundle. The site offers are looked up in the offer snapshot of the process.
 
         Returns:
             list of Offer: A sorted list of all the offers that apply to the basket.
@@ -72,6 +85,30 @@ class Applicator(OscarApplicator):
             )
         )
 
+    def get_basket_offers(self, basket, user):
+        """
+        Return the offers of the vouchers applied to the basket.
+
+        Oscar ignores the vouchers of unsaved baskets, this also returns the offers of the vouchers held by an
+        InMemoryBasket.
+        """
+        InMemoryBasket = get_model('basket', 'InMemoryBasket')
+        if not isinstance(basket, InMemoryBasket):
+            return super(Applicator, self).get_basket_offers(basket, user)
+
+        offers = []
+        if not user:
+            return offers
+
+        for voucher in basket.in_memory_vouchers:
+            available_to_user, __ = voucher.is_available_to_user(user=user)
+            if voucher.is_active() and available_to_user:
+                basket_offers = voucher.offers.all()
+                for offer in basket_offers:
+                    offer.set_voucher(voucher)
+                offers = list(chain(offers, basket_offers))
+        return offers
+
     def get_site_offers(self):
         """
         Return other site offers that are available to baskets without bundle ids or
@@ -79,13 +116,7 @@ class Applicator(OscarApplicator):
 
         Excludes: Bundle and Enterprise offers.
         """
-        ConditionalOffer = get_model('offer', 'ConditionalOffer')
-        qs = ConditionalOffer.active.filter(
-            offer_type=ConditionalOffer.SITE,
-            condition__program_uuid__isnull=True,
-            condition__enterprise_customer_uuid__isnull=True,
-        )
-        return qs.select_related('condition', 'benefit')
+        return get_offer_snapshot().get_site_offers()
 
     def _get_enterprise_offers(self, site, user):
         """
@@ -93,12 +124,7 @@ class Applicator(OscarApplicator):
         """
         enterprise_id = get_enterprise_id_for_user(site, user)
         if enterprise_id:
-            ConditionalOffer = get_model('offer', 'ConditionalOffer')
-            offers = ConditionalOffer.active.filter(
-                offer_type=ConditionalOffer.SITE,
-                condition__enterprise_customer_uuid=enterprise_id
-            )
-            return offers.select_related('condition', 'benefit')
+            return get_offer_snapshot().get_enterprise_offers(enterprise_id)
 
         return []
 
@@ -113,18 +139,16 @@ class Applicator(OscarApplicator):
             list of Offer: List of all the offers applicable to the program.
         """
         BasketAttribute = get_model('basket', 'BasketAttribute')
-        BasketAttributeType = get_model('basket', 'BasketAttributeType')
-        ConditionalOffer = get_model('offer', 'ConditionalOffer')
 
-        bundle_attributes = BasketAttribute.objects.filter(
-            basket=basket,
-            attribute_type=BasketAttributeType.objects.get(name=BUNDLE)
-        )
-        program_uuid = bundle_id if bundle_attributes.count() == 0 else bundle_attributes.first().value_text
+        program_uuid = bundle_id
+        if basket.id:
+            bundle_attribute = BasketAttribute.objects.filter(
+                basket=basket,
+                attribute_type__name=BUNDLE
+            ).values_list('value_text', flat=True).first()
+            if bundle_attribute is not None:
+                program_uuid = bundle_attribute
         if program_uuid:
-            offers = ConditionalOffer.active.filter(
-                offer_type=ConditionalOffer.SITE, condition__program_uuid=program_uuid
-            )
-            return offers.select_related('condition', 'benefit')
+            return get_offer_snapshot().get_program_offers(program_uuid)
 
         return []
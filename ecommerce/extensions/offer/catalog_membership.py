@@ -0,0 +1,214 @@
+"""
+Batched resolution of Discovery catalog query membership for basket products.
+
+Dynamic (catalog query) ranges decide whether a basket line is applicable by asking the
+Discovery Service whether the line's course run or course is part of the range's query.
+The resolver defined here answers those questions for every candidate offer of a request
+at once: it memoizes answers for the lifetime of the request, reads the shared cache with a
+single multi-get and only asks the Discovery Service about the identifiers that are still
+unknown.
+"""
+import logging
+from collections import defaultdict
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.cache import cache
+from edx_django_utils.cache import RequestCache
+
+from ecommerce.core.utils import deprecated_traverse_pagination, get_cache_key
+
+logger = logging.getLogger(__name__)
+
+CATALOG_QUERY_MEMBERSHIP_NAMESPACE = 'catalog_query_membership'
+
+
+def get_line_catalog_identifier(line):
+    """
+    Returns the Discovery identifier used to check catalog membership of a basket line.
+
+    Seats are identified by their course run ID, entitlements by their course UUID.
+    """
+    if line.product.is_seat_product:
+        return line.product.course.id
+    return line.product.attr.UUID
+
+
+def filter_paid_course_lines(lines, applicable_range):
+    """ Filters out lines that aren't seats or entitlements or that don't have a paid certificate type. """
+    return [
+        line for line in lines
+        if (line.product.is_seat_product or line.product.is_course_entitlement_product) and
+        hasattr(line.product.attr, 'certificate_type') and
+        line.product.attr.certificate_type.lower() in applicable_range.course_seat_types
+    ]
+
+
+def fetch_catalog_course_run_ids(site, catalog_id):
+    """
+    Returns the keys of every course run of the courses contained in a Discovery catalog.
+
+    This walks every page of the catalog's courses and is meant to be used to build
+    membership indexes outside of the request cycle.
+
+    Raises:
+        RequestException: if the Discovery Service could not be reached.
+    """
+    api_client = site.siteconfiguration.oauth_api_client
+    discovery_api_url = urljoin(f"{site.siteconfiguration.discovery_api_url}/", f"catalogs/{catalog_id}/courses/")
+    response = api_client.get(discovery_api_url)
+    response.raise_for_status()
+    courses = deprecated_traverse_pagination(response.json(), api_client, discovery_api_url)
+    return frozenset(course_run['key'] for course in courses for course_run in course.get('course_runs', []))
+
+
+class CatalogQueryMembershipResolver:
+    """
+    Per-request resolver for the membership of course runs and courses in Discovery catalog queries.
+
+    Use `for_site` to get the resolver shared by everything running in the current request.
+    """
+
+    def __init__(self, site):
+        self.site = site
+        self._memberships = {}
+
+    @property
+    def partner_code(self):
+        return self.site.siteconfiguration.partner.short_code
+
+    @classmethod
+    def for_site(cls, site):
+        """ Returns the resolver for the given site, creating it once per request. """
+        request_cache = RequestCache(CATALOG_QUERY_MEMBERSHIP_NAMESPACE)
+        cached_response = request_cache.get_cached_response(site.domain)
+        if cached_response.is_found:
+            return cached_response.value
+
+        resolver = cls(site)
+        request_cache.set(site.domain, resolver)
+        return resolver
+
+    def _get_cache_key(self, query, identifier):
+        return get_cache_key(
+            site_domain=self.site.domain,
+            partner_code=self.partner_code,
+            resource='catalog_query.contains',
+            course_id=identifier,
+            query=query
+        )
+
+    def _load_from_cache(self, pairs):
+        """ Reads the memberships of the given (query, identifier, is_seat) pairs from the shared cache at once. """
+        cache_keys = {self._get_cache_key(query, identifier): (query, identifier) for query, identifier, __ in pairs}
+        for cache_key, value in cache.get_many(list(cache_keys)).items():
+            self._memberships[cache_keys[cache_key]] = bool(value)
+
+    def _fetch_from_discovery(self, query, course_run_ids, course_uuids):
+        """
+        Asks the Discovery Service which of the given course runs and courses belong to the query.
+
+        Raises:
+            RequestException: if the Discovery Service could not be reached.
+        """
+        api_client = self.site.siteconfiguration.oauth_api_client
+        discovery_api_url = urljoin(
+            f"{self.site.siteconfiguration.discovery_api_url}/",
+            "catalog/query_contains/"
+        )
+        response = api_client.get(
+            discovery_api_url,
+            params={
+                "course_run_ids": ','.join(course_run_ids),
+                "course_uuids": ','.join(course_uuids),
+                "query": query,
+                "partner": self.partner_code
+            }
+        )
+        response.raise_for_status()
+        response = response.json()
+
+        logger.info("Discovery Service results for query: '%s', response: %s", query, response)
+
+        # Convert to int, because this is what memcached will return.
+        memberships = {str(identifier): int(response[str(identifier)]) for identifier in course_run_ids + course_uuids}
+        cache.set_many(
+            {self._get_cache_key(query, identifier): in_range for identifier, in_range in memberships.items()},
+            settings.COURSES_API_CACHE_TIMEOUT
+        )
+        for identifier, in_range in memberships.items():
+            self._memberships[(query, identifier)] = bool(in_range)
+
+    def resolve(self, pairs):
+        """
+        Makes sure the membership of every given pair is known.
+
+        Arguments:
+            pairs (iterable): (query, identifier, is_seat) tuples where identifier is a course run ID
+                if is_seat is True and a course UUID otherwise.
+
+        Raises:
+            RequestException: if the Discovery Service could not be reached for one of the queries.
+        """
+        pending = {
+            (query, str(identifier), is_seat) for query, identifier, is_seat in pairs
+            if (query, str(identifier)) not in self._memberships
+        }
+        if not pending:
+            return
+
+        self._load_from_cache(pending)
+
+        uncached = defaultdict(lambda: ([], []))
+        for query, identifier, is_seat in sorted(pending):
+            if (query, identifier) not in self._memberships:
+                uncached[query][0 if is_seat else 1].append(identifier)
+
+        # The Discovery endpoint evaluates a single query per call, so misses are grouped per query.
+        for query, (course_run_ids, course_uuids) in uncached.items():
+            self._fetch_from_discovery(query, course_run_ids, course_uuids)
+
+    def contains(self, query, identifier):
+        """ Returns whether the identifier belongs to the query. Only valid for pairs already resolved. """
+        return self._memberships[(query, str(identifier))]
+
+    def get_lines_in_range(self, lines, query):
+        """
+        Returns the subset of lines whose course run or course belongs to the query, preserving their order.
+
+        Raises:
+            RequestException: if the Discovery Service could not be reached.
+        """
+        identifiers = [(line, str(get_line_catalog_identifier(line))) for line in lines]
+        self.resolve((query, identifier, line.product.is_seat_product) for line, identifier in identifiers)
+        return [line for line, identifier in identifiers if self.contains(query, identifier)]
+
+    def prefetch_for_offers(self, basket, offers):
+        """
+        Resolves the membership of the basket lines for the catalog query ranges of all given offers at once.
+
+        Failures are only logged, each offer reports its own failure when its benefit is evaluated.
+        """
+        ranges = [
+            offer.benefit.range for offer in offers
+            if offer.benefit.range and offer.benefit.range.catalog_query is not None
+        ]
+        lines = list(basket.all_lines()) if ranges else []
+        if not lines:
+            return
+
+        pairs = set()
+        for applicable_range in ranges:
+            for line in filter_paid_course_lines(lines, applicable_range):
+                pairs.add((
+                    applicable_range.catalog_query,
+                    str(get_line_catalog_identifier(line)),
+                    line.product.is_seat_product,
+                ))
+
+        try:
+            self.resolve(pairs)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.warning(
+                'Failed to prefetch catalog query membership for basket [%s]. Message: %s', basket.id, err
+            )
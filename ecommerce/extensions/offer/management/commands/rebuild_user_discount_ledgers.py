@@ -0,0 +1,75 @@
+"""
+Django management command to rebuild the user discount ledgers of offers from the order history.
+
+The ledgers of the orders placed before they existed are filled by a migration, this command is meant to
+repair them.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from oscar.core.loading import get_model
+
+from ecommerce.extensions.fulfillment.status import ORDER
+from ecommerce.extensions.refund.status import REFUND
+
+ConditionalOffer = get_model('offer', 'ConditionalOffer')
+OrderDiscount = get_model('order', 'OrderDiscount')
+Refund = get_model('refund', 'Refund')
+UserDiscountLedger = get_model('offer', 'UserDiscountLedger')
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the discount ledgers of the users of the offers with a per user discount limit.
+
+    Example:
+
+        ./manage.py rebuild_user_discount_ledgers --offer-id 1234
+    """
+
+    help = 'Rebuild the user discount ledgers of offers from the order history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--offer-id',
+            dest='offer_ids',
+            action='append',
+            type=int,
+            default=[],
+            help='ID of the offer to rebuild the ledgers of. Defaults to all offers with a per user discount limit.',
+        )
+
+    @staticmethod
+    def rebuild(offer):
+        """
+        Replaces the user discount ledgers of the offer with the sum of the discounts of its completed orders.
+        """
+        refunded_order_ids = Refund.objects.filter(status=REFUND.COMPLETE).values_list('order_id', flat=True)
+        user_discounts = OrderDiscount.objects.filter(
+            offer_id=offer.id, order__user__isnull=False, order__status=ORDER.COMPLETE
+        ).exclude(
+            order_id__in=refunded_order_ids
+        ).order_by().values('order__user_id').annotate(amount=Sum('amount'))
+
+        with transaction.atomic():
+            # Lock the offer, which the orders placed with it update, while its ledgers are replaced.
+            ConditionalOffer.objects.select_for_update().filter(id=offer.id).first()
+            UserDiscountLedger.objects.filter(offer=offer).delete()
+            ledgers = UserDiscountLedger.objects.bulk_create([
+                UserDiscountLedger(offer=offer, user_id=user_discount['order__user_id'], amount=user_discount['amount'])
+                for user_discount in user_discounts
+            ])
+        return ledgers
+
+    def handle(self, *args, **options):
+        offers = ConditionalOffer.objects.filter(max_user_discount__isnull=False)
+        if options['offer_ids']:
+            offers = ConditionalOffer.objects.filter(id__in=options['offer_ids'])
+
+        for offer in offers:
+            ledgers = self.rebuild(offer)
+            logger.info('Rebuilt the discount ledgers of %d users of offer [%d].', len(ledgers), offer.id)
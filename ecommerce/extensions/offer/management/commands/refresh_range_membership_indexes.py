@@ -0,0 +1,60 @@
+"""
+Django management command to refresh the membership indexes of course catalog ranges.
+
+Command is meant to be run periodically by Jenkins, more often than RANGE_MEMBERSHIP_INDEX_CACHE_TIMEOUT.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+from oscar.core.loading import get_model
+
+from ecommerce.core.models import SiteConfiguration
+
+logger = logging.getLogger(__name__)
+Range = get_model('offer', 'Range')
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the cached course run and product indexes used by Range.contains_product.
+
+    Example:
+
+        ./manage.py refresh_range_membership_indexes --site-domain example.com
+    """
+
+    help = 'Refresh the cached membership indexes of course catalog ranges.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--site-domain',
+            dest='site_domains',
+            action='append',
+            default=[],
+            help='Domain of the site to refresh the indexes for. Defaults to all sites.',
+        )
+
+    def handle(self, *args, **options):
+        site_configurations = SiteConfiguration.objects.select_related('site', 'partner')
+        if options['site_domains']:
+            site_configurations = site_configurations.filter(site__domain__in=options['site_domains'])
+
+        course_catalog_ranges = list(Range.objects.filter(course_catalog__isnull=False))
+        for site_configuration in site_configurations:
+            site = site_configuration.site
+            for _range in course_catalog_ranges:
+                try:
+                    course_run_ids = _range.refresh_course_run_index(site)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception(
+                        'Failed to refresh the course run index of range [%d] for site [%s].', _range.id, site.domain
+                    )
+                    continue
+                logger.info(
+                    'Refreshed the course run index of range [%d] for site [%s] with %d course runs.',
+                    _range.id, site.domain, len(course_run_ids)
+                )
+
+        for _range in Range.objects.filter(catalog__isnull=False).select_related('catalog'):
+            _range.invalidate_catalog_product_ids()
+            _range.get_catalog_product_ids()
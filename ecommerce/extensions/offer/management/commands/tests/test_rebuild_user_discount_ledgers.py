@@ -0,0 +1,77 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management import call_command
+from oscar.core.loading import get_model
+from oscar.test.factories import OrderDiscountFactory, OrderFactory
+from testfixtures import LogCapture
+
+from ecommerce.extensions.fulfillment.status import ORDER
+from ecommerce.extensions.refund.status import REFUND
+from ecommerce.extensions.refund.tests.factories import RefundFactory
+from ecommerce.extensions.test.factories import ConditionalOfferFactory
+from ecommerce.tests.factories import UserFactory
+from ecommerce.tests.testcases import TestCase
+
+UserDiscountLedger = get_model('offer', 'UserDiscountLedger')
+LOGGER_NAME = 'ecommerce.extensions.offer.management.commands.rebuild_user_discount_ledgers'
+
+
+class RebuildUserDiscountLedgersTests(TestCase):
+    """Tests for rebuild_user_discount_ledgers management command."""
+
+    def setUp(self):
+        super(RebuildUserDiscountLedgersTests, self).setUp()
+        self.offer = ConditionalOfferFactory(max_user_discount=500)
+        self.users = UserFactory.create_batch(2)
+        for user, amount in zip(self.users, (10, 20)):
+            for order in OrderFactory.create_batch(2, user=user, status=ORDER.COMPLETE):
+                OrderDiscountFactory(order=order, offer_id=self.offer.id, amount=amount)
+
+        open_order = OrderFactory(user=self.users[0], status=ORDER.OPEN)
+        OrderDiscountFactory(order=open_order, offer_id=self.offer.id, amount=50)
+
+        refunded_order = OrderFactory(user=self.users[0], status=ORDER.COMPLETE)
+        OrderDiscountFactory(order=refunded_order, offer_id=self.offer.id, amount=40)
+        RefundFactory(order=refunded_order, user=self.users[0], status=REFUND.COMPLETE)
+
+    def test_rebuild(self):
+        """Verify the ledgers are replaced with the discounts of the completed orders which have not been refunded."""
+        UserDiscountLedger.objects.all().delete()
+        UserDiscountLedger.objects.create(offer=self.offer, user=UserFactory(), amount=5)
+
+        with LogCapture(LOGGER_NAME) as log:
+            call_command('rebuild_user_discount_ledgers')
+
+        log.check((LOGGER_NAME, 'INFO', 'Rebuilt the discount ledgers of 2 users of offer [{}].'.format(self.offer.id)))
+        self.assertEqual(
+            dict(UserDiscountLedger.objects.values_list('user_id', 'amount')),
+            {self.users[0].id: 20, self.users[1].id: 40}
+        )
+
+    def test_rebuild_offer(self):
+        """Verify only the ledgers of the given offers are rebuilt."""
+        other_offer = ConditionalOfferFactory()
+        OrderDiscountFactory(
+            order=OrderFactory(user=self.users[0], status=ORDER.COMPLETE), offer_id=other_offer.id, amount=30
+        )
+        UserDiscountLedger.objects.all().delete()
+
+        call_command('rebuild_user_discount_ledgers', '--offer-id', other_offer.id)
+
+        self.assertEqual(
+            list(UserDiscountLedger.objects.values_list('offer_id', 'user_id', 'amount')),
+            [(other_offer.id, self.users[0].id, 30)]
+        )
+
+    def test_fill_user_discount_ledgers_migration(self):
+        """Verify the migration fills the ledgers of the offers with a per user discount limit."""
+        migration = import_module('ecommerce.extensions.offer.migrations.0057_fill_user_discount_ledgers')
+        UserDiscountLedger.objects.all().delete()
+
+        migration.fill_user_discount_ledgers(apps, None)
+
+        self.assertEqual(
+            dict(UserDiscountLedger.objects.values_list('user_id', 'amount')),
+            {self.users[0].id: 20, self.users[1].id: 40}
+        )
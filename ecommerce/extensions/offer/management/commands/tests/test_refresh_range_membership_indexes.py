@@ -0,0 +1,61 @@
+import mock
+from django.core.management import call_command
+from oscar.core.loading import get_model
+from oscar.test import factories
+from testfixtures import LogCapture
+
+from ecommerce.tests.testcases import TestCase
+
+Catalog = get_model('catalogue', 'Catalog')
+Range = get_model('offer', 'Range')
+LOGGER_NAME = 'ecommerce.extensions.offer.management.commands.refresh_range_membership_indexes'
+
+
+class RefreshRangeMembershipIndexesTests(TestCase):
+    """Tests for refresh_range_membership_indexes management command."""
+
+    def setUp(self):
+        super(RefreshRangeMembershipIndexesTests, self).setUp()
+        self.course_catalog_range = factories.RangeFactory(course_catalog=1, course_seat_types='verified')
+
+    def test_refresh_course_run_index(self):
+        """Verify the course run index of course catalog ranges is refreshed for the given site."""
+        with mock.patch.object(Range, 'refresh_course_run_index', return_value=frozenset(['a', 'b'])) as refresh:
+            with LogCapture(LOGGER_NAME) as log:
+                call_command('refresh_range_membership_indexes', '--site-domain', self.site.domain)
+
+        refresh.assert_called_once_with(self.site)
+        log.check((
+            LOGGER_NAME,
+            'INFO',
+            'Refreshed the course run index of range [{}] for site [{}] with 2 course runs.'.format(
+                self.course_catalog_range.id, self.site.domain
+            )
+        ))
+
+    def test_refresh_course_run_index_failure(self):
+        """Verify a failing range is logged and does not stop the command."""
+        with mock.patch.object(Range, 'refresh_course_run_index', side_effect=Exception):
+            with LogCapture(LOGGER_NAME) as log:
+                call_command('refresh_range_membership_indexes', '--site-domain', self.site.domain)
+
+        log.check((
+            LOGGER_NAME,
+            'ERROR',
+            'Failed to refresh the course run index of range [{}] for site [{}].'.format(
+                self.course_catalog_range.id, self.site.domain
+            )
+        ))
+
+    def test_refresh_catalog_product_ids(self):
+        """Verify the catalog product IDs of catalog ranges are rebuilt."""
+        product = factories.create_product()
+        catalog = Catalog.objects.create(partner=self.partner)
+        catalog.stock_records.add(factories.create_stockrecord(product))
+        catalog_range = factories.RangeFactory(catalog=catalog)
+
+        with mock.patch.object(Range, 'refresh_course_run_index', return_value=frozenset()):
+            call_command('refresh_range_membership_indexes', '--site-domain', 'unknown.example.com')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog_range.get_catalog_product_ids(), frozenset([product.id]))
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.23 on 2026-10-19 01:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('offer', '0055_auto_20231108_1355'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDiscountLedger',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('offer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_discount_ledgers', to='offer.conditionaloffer')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discount_ledgers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('offer', 'user')},
+            },
+        ),
+    ]
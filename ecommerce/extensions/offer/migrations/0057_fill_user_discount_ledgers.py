@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Sum
+
+from ecommerce.extensions.fulfillment.status import ORDER
+from ecommerce.extensions.refund.status import REFUND
+
+
+def fill_user_discount_ledgers(apps, schema_editor):
+    """ Fill the user discount ledgers of the offers with a per user discount limit from their completed orders. """
+    ConditionalOffer = apps.get_model('offer', 'ConditionalOffer')
+    OrderDiscount = apps.get_model('order', 'OrderDiscount')
+    Refund = apps.get_model('refund', 'Refund')
+    UserDiscountLedger = apps.get_model('offer', 'UserDiscountLedger')
+
+    refunded_order_ids = Refund.objects.filter(status=REFUND.COMPLETE).values_list('order_id', flat=True)
+    for offer in ConditionalOffer.objects.filter(max_user_discount__isnull=False):
+        user_discounts = OrderDiscount.objects.filter(
+            offer_id=offer.id, order__user__isnull=False, order__status=ORDER.COMPLETE
+        ).exclude(
+            order_id__in=refunded_order_ids
+        ).order_by().values('order__user_id').annotate(amount=Sum('amount'))
+
+        UserDiscountLedger.objects.filter(offer_id=offer.id).delete()
+        UserDiscountLedger.objects.bulk_create([
+            UserDiscountLedger(
+                offer_id=offer.id, user_id=user_discount['order__user_id'], amount=user_discount['amount']
+            )
+            for user_discount in user_discounts
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offer', '0056_userdiscountledger'),
+        ('order', '0028_alter_lineattribute_value'),
+        ('refund', '0008_auto_20210526_2005'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_user_discount_ledgers, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 import logging
 import re
 from datetime import datetime
+from decimal import Decimal
 from urllib.parse import urljoin
 
 import boto3
@@ -11,8 +12,9 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
-from django.db.models.signals import post_delete
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete
 from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 from django_extensions.db.models import TimeStampedModel
@@ -32,6 +34,12 @@ from simple_history.models import HistoricalRecords
 from threadlocals.threadlocals import get_current_request
 
 from ecommerce.core.utils import get_cache_key, log_message_and_raise_validation_error
+from ecommerce.extensions.fulfillment.status import ORDER
+from ecommerce.extensions.offer.catalog_membership import (
+    CatalogQueryMembershipResolver,
+    fetch_catalog_course_run_ids,
+    filter_paid_course_lines
+)
 from ecommerce.extensions.offer.constants import (
     EMAIL_TEMPLATE_TYPES,
     NUDGE_EMAIL_CYCLE,
@@ -46,6 +54,7 @@ from ecommerce.extensions.offer.constants import (
     OfferUsageEmailTypes
 )
 from ecommerce.extensions.offer.utils import format_assigned_offer_email
+from ecommerce.extensions.refund.status import REFUND
 
 OFFER_PRIORITY_ENTERPRISE = 10
 OFFER_PRIORITY_VOUCHER = 20
@@ -81,49 +90,6 @@ class Benefit(AbstractBenefit):
         if self.value > 100:
             log_message_and_raise_validation_error('Percentage discount cannot be greater than 100')
 
-    def _filter_for_paid_course_products(self, lines, applicable_range):
-        """" Filters out products that aren't seats or entitlements or that don't have a paid certificate type. """
-        return [
-            line for line in lines
-            if (line.product.is_seat_product or line.product.is_course_entitlement_product) and
-            hasattr(line.product.attr, 'certificate_type') and
-            line.product.attr.certificate_type.lower() in applicable_range.course_seat_types
-        ]
-
-    def _identify_uncached_product_identifiers(self, lines, domain, partner_code, query):
-        """
-        Checks the cache to see if each line is in the catalog range specified by the given query
-        and tracks identifiers for which discovery service data is still needed.
-        """
-        uncached_course_run_ids = []
-        uncached_course_uuids = []
-
-        applicable_lines = lines
-        for line in applicable_lines:
-            if line.product.is_seat_product:
-                product_id = line.product.course.id
-            else:  # All lines passed to this method should either have a seat or an entitlement product
-                product_id = line.product.attr.UUID
-
-            cache_key = get_cache_key(
-                site_domain=domain,
-                partner_code=partner_code,
-                resource='catalog_query.contains',
-                course_id=product_id,
-                query=query
-            )
-            in_catalog_range_cached_response = TieredCache.get_cached_response(cache_key)
-
-            if not in_catalog_range_cached_response.is_found:
-                if line.product.is_seat_product:
-                    uncached_course_run_ids.append({'id': product_id, 'cache_key': cache_key, 'line': line})
-                else:
-                    uncached_course_uuids.append({'id': product_id, 'cache_key': cache_key, 'line': line})
-            elif not in_catalog_range_cached_response.value:
-                applicable_lines.remove(line)
-
-        return uncached_course_run_ids, uncached_course_uuids, applicable_lines
-
     def get_applicable_lines(self, offer, basket, range=None):  # pylint: disable=redefined-builtin
         """
         Returns the basket lines for which the benefit is applicable.
@@ -133,64 +99,21 @@ class Benefit(AbstractBenefit):
         if applicable_range and applicable_range.catalog_query is not None:
 
             query = applicable_range.catalog_query
-            applicable_lines = self._filter_for_paid_course_products(basket.all_lines(), applicable_range)
-
-            site = basket.site
-            partner_code = site.siteconfiguration.partner.short_code
-            course_run_ids, course_uuids, applicable_lines = self._identify_uncached_product_identifiers(
-                applicable_lines, site.domain, partner_code, query
-            )
-
-            if course_run_ids or course_uuids:
-                # Hit Discovery Service to determine if remaining courses and runs are in the range.
-                api_client = site.siteconfiguration.oauth_api_client
-                discovery_api_url = urljoin(
-                    f"{site.siteconfiguration.discovery_api_url}/",
-                    "catalog/query_contains/"
-                )
-                try:
-                    response = api_client.get(
-                        discovery_api_url,
-                        params={
-                            "course_run_ids": ','.join([metadata['id'] for metadata in course_run_ids]),
-                            "course_uuids": ','.join([metadata['id'] for metadata in course_uuids]),
-                            "query": query,
-                            "partner": partner_code
-                        }
-                    )
-                    response.raise_for_status()
-                    response = response.json()
-                except (ReqConnectionError, RequestException, Timeout) as err:  # pylint: disable=bare-except
-                    logger.exception(
-                        '[Code Redemption Failure] Unable to apply benefit because we failed to query the '
-                        'Discovery Service for catalog data. '
-                        'User: %s, Offer: %s, Basket: %s, Message: %s',
-                        basket.owner.username, offer.id, basket.id, err
-                    )
-                    raise Exception(
-                        'Failed to contact Discovery Service to retrieve offer catalog_range data.'
-                    ) from err
-
-                logger.info(
-                    "Discovery Service results for basket: [%s], offer: [%s], query: '%s', response: %s",
-                    basket.id,
-                    offer.id,
-                    query,
-                    response,
+            applicable_lines = filter_paid_course_lines(basket.all_lines(), applicable_range)
+
+            resolver = CatalogQueryMembershipResolver.for_site(basket.site)
+            try:
+                applicable_lines = resolver.get_lines_in_range(applicable_lines, query)
+            except (ReqConnectionError, RequestException, Timeout) as err:  # pylint: disable=bare-except
+                logger.exception(
+                    '[Code Redemption Failure] Unable to apply benefit because we failed to query the '
+                    'Discovery Service for catalog data. '
+                    'User: %s, Offer: %s, Basket: %s, Message: %s',
+                    basket.owner.username, offer.id, basket.id, err
                 )
-
-                # Cache range-state individually for each course or run identifier and remove lines not in the range.
-                for metadata in course_run_ids + course_uuids:
-                    in_range = response[str(metadata['id'])]
-
-                    # Convert to int, because this is what memcached will return, and the request cache should return
-                    # the same value.
-                    # Note: once the TieredCache is fixed to handle this case, we could remove this line.
-                    in_range = int(in_range)
-                    TieredCache.set_all_tiers(metadata['cache_key'], in_range, settings.COURSES_API_CACHE_TIMEOUT)
-
-                    if not in_range:
-                        applicable_lines.remove(metadata['line'])
+                raise Exception(
+                    'Failed to contact Discovery Service to retrieve offer catalog_range data.'
+                ) from err
 
             logger.info(
                 "Basket [%s] with offer [%s] has applicable lines: %s",
@@ -212,6 +135,7 @@ class ConditionalOffer(AbstractConditionalOffer):
         (MONTHLY, 'Monthly'),
     ]
     UPDATABLE_OFFER_FIELDS = ['email_domains', 'max_uses']
+    USAGE_FIELDS = ('num_applications', 'total_discount', 'num_orders')
     email_domains = models.CharField(max_length=255, blank=True, null=True)
     sales_force_id = models.CharField(max_length=30, blank=True, null=True, default=None)
     salesforce_opportunity_line_item = models.CharField(max_length=30, blank=True, null=True)
@@ -252,6 +176,11 @@ class ConditionalOffer(AbstractConditionalOffer):
         self.clean()
         super(ConditionalOffer, self).save(*args, **kwargs)  # pylint: disable=bad-super-call
 
+    def record_usage(self, discount):
+        # The offer may come from the offer snapshot, whose usage counters aren't kept up to date.
+        self.refresh_from_db(fields=self.USAGE_FIELDS)
+        super(ConditionalOffer, self).record_usage(discount)  # pylint: disable=bad-super-call
+
     def clean(self):
         self.clean_email_domains()
         self.clean_max_global_applications()  # Our frontend uses the name max_uses instead of max_global_applications
@@ -473,6 +402,7 @@ class Range(AbstractRange):
     def save(self, *args, **kwargs):  # pylint: disable=arguments-differ
         self.clean()
         super(Range, self).save(*args, **kwargs)  # pylint: disable=bad-super-call
+        self.invalidate_catalog_product_ids()
 
     def clean(self):
         """ Validation for model fields. """
@@ -535,6 +465,64 @@ class Range(AbstractRange):
                              'Product: %s, Message: %s, Range: %s', product.id, exc, self.id)
             raise Exception('Unable to connect to Discovery Service for catalog contains endpoint.') from exc
 
+    def _get_course_run_index_cache_key(self, site):
+        # The course catalog is part of the key, so that the index of a previous catalog of the range is not used.
+        return get_cache_key(
+            site_domain=site.domain,
+            resource='range.course_run_index',
+            range_id=self.id,
+            course_catalog=self.course_catalog,
+        )
+
+    def _get_catalog_product_ids_cache_key(self):
+        return get_cache_key(resource='range.catalog_product_ids', range_id=self.id)
+
+    def get_course_run_index(self, site):
+        """
+        Returns the course run keys of the course catalog of this range, or None if the index has not been built.
+        """
+        cached_response = TieredCache.get_cached_response(self._get_course_run_index_cache_key(site))
+        return cached_response.value if cached_response.is_found else None
+
+    def refresh_course_run_index(self, site):
+        """
+        Fetches every course run of the course catalog of this range from the Discovery Service and caches them.
+
+        This is expensive for large catalogs and is meant to be run in the background by the
+        refresh_range_membership_indexes management command.
+        """
+        course_run_ids = fetch_catalog_course_run_ids(site, self.course_catalog)
+        TieredCache.set_all_tiers(
+            self._get_course_run_index_cache_key(site), course_run_ids, settings.RANGE_MEMBERSHIP_INDEX_CACHE_TIMEOUT
+        )
+        return course_run_ids
+
+    def get_catalog_product_ids(self):
+        """
+        Returns the IDs of the products with a stock record in the catalog of this range.
+        """
+        cache_key = self._get_catalog_product_ids_cache_key()
+        cached_response = TieredCache.get_cached_response(cache_key)
+        if cached_response.is_found:
+            return cached_response.value
+
+        product_ids = frozenset(self.catalog.stock_records.values_list('product', flat=True))
+        TieredCache.set_all_tiers(cache_key, product_ids, settings.RANGE_MEMBERSHIP_INDEX_CACHE_TIMEOUT)
+        return product_ids
+
+    def invalidate_catalog_product_ids(self):
+        TieredCache.delete_all_tiers(self._get_catalog_product_ids_cache_key())
+
+    def _course_catalog_contains_product(self, product):
+        request = get_current_request()
+        course_run_ids = self.get_course_run_index(request.site)
+        if course_run_ids is not None and product.course_id in course_run_ids:
+            return True
+
+        # The index is a snapshot of the catalog, so a miss is confirmed with the Discovery Service.
+        response = self.catalog_contains_product(product)
+        return response['courses'][product.course_id]
+
     def contains_product(self, product):
         """
         Assert if the range contains the product.
@@ -544,15 +532,12 @@ class Range(AbstractRange):
         if self.course_catalog and self.course_seat_types:
             # Product certificate type should belongs to range seat types.
             if product.attr.certificate_type.lower() in self.course_seat_types:  # pylint: disable=unsupported-membership-test
-                response = self.catalog_contains_product(product)
                 # Range can have a catalog query and 'regular' products in it,
                 # therefor an OR is used to check for both possibilities.
-                contains_product = ((response['courses'][product.course_id]) or contains_product)
+                contains_product = self._course_catalog_contains_product(product) or contains_product
 
         elif self.catalog:
-            contains_product = (
-                product.id in self.catalog.stock_records.values_list('product', flat=True) or contains_product
-            )
+            contains_product = product.id in self.get_catalog_product_ids() or contains_product
 
         if not contains_product:
             logger.warning('[Code Redemption Failure] Course catalog for Range does not contain the Product. '
@@ -708,6 +693,24 @@ class TemplateFileAttachment(models.Model):
         return 'name={}, size={}, url={}, template={}'.format(self.name, self.size, self.url, self.template)
 
 
+@receiver(m2m_changed, sender='catalogue.Catalog_stock_records')
+def invalidate_range_catalog_product_ids(
+        sender, instance, action, reverse, pk_set, **kwargs
+):  # pylint: disable=unused-argument
+    """ Drop the cached catalog product IDs of ranges whose catalog stock records changed. """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    ranges = Range.objects.filter(catalog__isnull=False)
+    if not reverse:
+        ranges = ranges.filter(catalog=instance)
+    elif pk_set is not None:
+        ranges = ranges.filter(catalog__in=pk_set)
+
+    for _range in ranges:
+        _range.invalidate_catalog_product_ids()
+
+
 @receiver(post_delete, sender=TemplateFileAttachment)
 def delete_files_from_s3(sender, instance, using, **kwargs):  # pylint: disable=unused-argument
     delete_file_from_s3_with_key(instance.name)
@@ -813,6 +816,85 @@ class OfferUsageEmail(TimeStampedModel):
         return record
 
 
+class UserDiscountLedger(models.Model):
+    """
+    The discount a user got from an offer, kept up to date as orders are placed and refunded.
+
+    The amount is the sum of the discounts of the completed orders the user placed with the offer, less the
+    discounts of these orders which have been refunded. It is added to when an order is completed, and taken from
+    when the first refund of a completed order is completed, in the same transaction. This saves aggregating the
+    order history of the user every time a basket is checked against the per user discount limit of an offer.
+    """
+    offer = models.ForeignKey('offer.ConditionalOffer', related_name='user_discount_ledgers', on_delete=models.CASCADE)
+    user = models.ForeignKey('core.User', related_name='discount_ledgers', on_delete=models.CASCADE)
+    amount = models.DecimalField(decimal_places=2, max_digits=12, default=0)
+
+    class Meta:
+        unique_together = (('offer', 'user'),)
+
+    @classmethod
+    def add(cls, offer_id, user_id, amount):
+        """
+        Adds the amount, which can be negative, to the discount the user got from the offer.
+        """
+        ledgers = cls.objects.filter(offer_id=offer_id, user_id=user_id)
+        if ledgers.update(amount=F('amount') + amount):
+            return
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(offer_id=offer_id, user_id=user_id, amount=amount)
+        except IntegrityError:
+            # The ledger was created by a concurrent order.
+            ledgers.update(amount=F('amount') + amount)
+
+    @classmethod
+    def record_order_discount(cls, order_discount):
+        """
+        Adds a discount of a completed order to the discount the user who placed the order got from its offer.
+        """
+        order = order_discount.order
+        if order_discount.offer_id and order.user_id and order.status == ORDER.COMPLETE:
+            cls.add(order_discount.offer_id, order.user_id, order_discount.amount)
+
+    @classmethod
+    def record_order(cls, order):
+        """
+        Adds the discounts of an order which has just been completed to the discounts the user who placed it got
+        from their offers, unless the order was refunded first.
+        """
+        if not order.user_id or order.refunds.filter(status=REFUND.COMPLETE).exists():
+            return
+
+        for order_discount in order.discounts.all():
+            if order_discount.offer_id:
+                cls.add(order_discount.offer_id, order.user_id, order_discount.amount)
+
+    @classmethod
+    def credit_refund(cls, refund):
+        """
+        Takes the discounts of the order of a completed refund from the discounts the user who placed it got from
+        their offers, unless the order was not completed or was already refunded.
+        """
+        order = refund.order
+        if not order.user_id or order.status != ORDER.COMPLETE:
+            return
+        if order.refunds.filter(status=REFUND.COMPLETE).exclude(id=refund.id).exists():
+            return
+
+        for order_discount in order.discounts.all():
+            if order_discount.offer_id:
+                cls.add(order_discount.offer_id, order.user_id, -order_discount.amount)
+
+    @classmethod
+    def get_amount(cls, offer, user):
+        """
+        Returns the discount the user got from the offer.
+        """
+        amount = cls.objects.filter(offer=offer, user_id=user.id).values_list('amount', flat=True).first()
+        return amount or Decimal(0.00)
+
+
 class CodeAssignmentNudgeEmailTemplates(AbstractBaseEmailTemplate):
     """
     This model keeps track of all the saved templates for nudge emails.
@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from oscar.apps.offer.benefits import (
+    AbsoluteDiscountBenefit,
+    FixedPriceBenefit,
+    MultibuyDiscountBenefit,
+    PercentageDiscountBenefit,
+    ShippingAbsoluteDiscountBenefit,
+    ShippingBenefit,
+    ShippingFixedPriceBenefit,
+    ShippingPercentageDiscountBenefit
+)
+from oscar.apps.offer.conditions import CountCondition, CoverageCondition, ValueCondition
+from oscar.core.loading import get_model
+
+from ecommerce.enterprise.benefits import EnterpriseAbsoluteDiscountBenefit, EnterprisePercentageDiscountBenefit
+from ecommerce.enterprise.conditions import AssignableEnterpriseCustomerCondition, EnterpriseCustomerCondition
+from ecommerce.extensions.offer.dynamic_conditional_offer import (
+    DynamicDiscountCondition,
+    DynamicPercentageDiscountBenefit
+)
+from ecommerce.extensions.offer.snapshot import bump_offer_snapshot_version, is_offer_snapshot_holding
+from ecommerce.extensions.order.benefits import ManualEnrollmentOrderDiscountBenefit
+from ecommerce.extensions.order.conditions import ManualEnrollmentOrderDiscountCondition
+from ecommerce.programs.benefits import AbsoluteDiscountBenefitWithoutRange, PercentageDiscountBenefitWithoutRange
+from ecommerce.programs.conditions import ProgramCourseRunSeatsCondition
+
+Benefit = get_model('offer', 'Benefit')
+Condition = get_model('offer', 'Condition')
+ConditionalOffer = get_model('offer', 'ConditionalOffer')
+Range = get_model('offer', 'Range')
+
+# The proxy models of conditions and benefits are senders of their own.
+OFFER_SNAPSHOT_SENDERS = (
+    Range,
+    Condition,
+    CountCondition,
+    CoverageCondition,
+    ValueCondition,
+    DynamicDiscountCondition,
+    EnterpriseCustomerCondition,
+    AssignableEnterpriseCustomerCondition,
+    ManualEnrollmentOrderDiscountCondition,
+    ProgramCourseRunSeatsCondition,
+    Benefit,
+    AbsoluteDiscountBenefit,
+    FixedPriceBenefit,
+    MultibuyDiscountBenefit,
+    PercentageDiscountBenefit,
+    ShippingBenefit,
+    ShippingAbsoluteDiscountBenefit,
+    ShippingFixedPriceBenefit,
+    ShippingPercentageDiscountBenefit,
+    DynamicPercentageDiscountBenefit,
+    EnterpriseAbsoluteDiscountBenefit,
+    EnterprisePercentageDiscountBenefit,
+    ManualEnrollmentOrderDiscountBenefit,
+    AbsoluteDiscountBenefitWithoutRange,
+    PercentageDiscountBenefitWithoutRange,
+)
+
+
+def invalidate_offer_snapshot(sender, **kwargs):  # pylint: disable=unused-argument
+    """ Make the processes rebuild their offer snapshot once a condition, benefit or range changes. """
+    bump_offer_snapshot_version()
+
+
+for offer_snapshot_sender in OFFER_SNAPSHOT_SENDERS:
+    post_save.connect(
+        invalidate_offer_snapshot,
+        sender=offer_snapshot_sender,
+        dispatch_uid='offer.offer_snapshot_post_save_callback',
+    )
+    post_delete.connect(
+        invalidate_offer_snapshot,
+        sender=offer_snapshot_sender,
+        dispatch_uid='offer.offer_snapshot_post_delete_callback',
+    )
+
+
+@receiver(post_save, sender=ConditionalOffer, dispatch_uid='offer.offer_snapshot_offer_post_save_callback')
+def invalidate_offer_snapshot_on_offer_save(
+        sender, instance, update_fields, **kwargs
+):  # pylint: disable=unused-argument
+    """
+    Make the processes rebuild their offer snapshot once an offer changes.
+
+    Recording the usage of an offer in an order or a refund only changes its usage counters, which the snapshot
+    doesn't keep up to date, so the snapshot is kept unless the offer is no longer held in it as it is.
+    """
+    if update_fields and set(update_fields) <= set(ConditionalOffer.USAGE_FIELDS):
+        return
+
+    if not is_offer_snapshot_holding(instance):
+        bump_offer_snapshot_version()
+
+
+@receiver(post_delete, sender=ConditionalOffer, dispatch_uid='offer.offer_snapshot_offer_post_delete_callback')
+def invalidate_offer_snapshot_on_offer_delete(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """ Make the processes rebuild their offer snapshot once an offer it holds is deleted. """
+    if not is_offer_snapshot_holding(instance, deleted=True):
+        bump_offer_snapshot_version()
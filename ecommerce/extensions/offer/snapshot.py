@@ -0,0 +1,169 @@
+"""
+Process-wide snapshot of the site offers the Applicator chooses from.
+
+The snapshot holds the open site offers, with their condition, benefit and range, indexed by program UUID and
+enterprise customer UUID, so that getting the offers of a basket doesn't query the database. It is stamped with
+a version kept in the shared cache, and rebuilt when the version changes: saving or deleting an offer, condition,
+benefit or range bumps the version, and the version expires after OFFER_SNAPSHOT_TIMEOUT seconds. Saving an offer
+the snapshot already holds as it is, apart from its usage counters, doesn't bump the version, so that placing an
+order doesn't make every process rebuild its snapshot.
+"""
+import copy
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from edx_django_utils.cache import TieredCache
+from oscar.core.loading import get_model
+
+from ecommerce.core.utils import get_cache_key
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _get_version_key():
+    return get_cache_key(resource_name='offer_snapshot_version')
+
+
+def _to_uuid(value):
+    """ Returns the given UUID or UUID string as a UUID, or None if it isn't one. """
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+class OfferSnapshot:
+    """
+    The open site offers, indexed by the program and enterprise customer their condition is for.
+
+    The offers keep the order of the ConditionalOffer model. Every lookup filters out the offers which aren't
+    active at that time, and returns copies of the offers, which the caller can change.
+    """
+
+    def __init__(self, version, offers):
+        self.version = version
+        self.offers = {offer.id: offer for offer in offers}
+        self.site_offers = []
+        self.program_offers = defaultdict(list)
+        self.enterprise_offers = defaultdict(list)
+        for offer in offers:
+            condition = offer.condition
+            if condition.program_uuid:
+                self.program_offers[condition.program_uuid].append(offer)
+            elif condition.enterprise_customer_uuid:
+                self.enterprise_offers[condition.enterprise_customer_uuid].append(offer)
+            else:
+                self.site_offers.append(offer)
+
+    @classmethod
+    def load(cls, version):
+        """ Returns a snapshot of the open site offers in the database, stamped with the given version. """
+        ConditionalOffer = get_model('offer', 'ConditionalOffer')
+        offers = ConditionalOffer.objects.filter(
+            offer_type=ConditionalOffer.SITE,
+            status=ConditionalOffer.OPEN,
+        ).select_related('condition', 'benefit__range')
+        return cls(version, list(offers))
+
+    def holds(self, offer, deleted=False):
+        """
+        Returns whether the snapshot holds the given offer as it is, apart from its usage counters.
+
+        An offer which isn't an open site offer, or is deleted, is held as it is if the snapshot doesn't have it.
+        """
+        held_offer = self.offers.get(offer.id)
+        if deleted or offer.offer_type != offer.SITE or offer.status != offer.OPEN:
+            return held_offer is None
+        if held_offer is None:
+            return False
+        fields = [
+            field for field in offer._meta.concrete_fields  # pylint: disable=protected-access
+            if field.name not in offer.USAGE_FIELDS
+        ]
+        return all(getattr(offer, field.attname) == getattr(held_offer, field.attname) for field in fields)
+
+    @staticmethod
+    def _get_active(offers):
+        cutoff = now()
+        return [
+            copy.copy(offer) for offer in offers
+            if (offer.start_datetime is None or offer.start_datetime <= cutoff) and
+            (offer.end_datetime is None or offer.end_datetime >= cutoff)
+        ]
+
+    def get_site_offers(self):
+        """ Returns the active offers which are neither for a program nor for an enterprise customer. """
+        return self._get_active(self.site_offers)
+
+    def get_program_offers(self, program_uuid):
+        """ Returns the active offers for the given program. """
+        return self._get_active(self.program_offers.get(_to_uuid(program_uuid), []))
+
+    def get_enterprise_offers(self, enterprise_customer_uuid):
+        """ Returns the active offers for the given enterprise customer. """
+        return self._get_active(self.enterprise_offers.get(_to_uuid(enterprise_customer_uuid), []))
+
+
+def get_offer_snapshot_version():
+    """ Returns the current version of the offer snapshot, starting a new one if it expired. """
+    version_key = _get_version_key()
+    cached_response = TieredCache.get_cached_response(version_key)
+    if cached_response.is_found:
+        return cached_response.value
+
+    version = uuid.uuid4().hex
+    TieredCache.set_all_tiers(version_key, version, settings.OFFER_SNAPSHOT_TIMEOUT)
+    return version
+
+
+def _bump_offer_snapshot_version():
+    TieredCache.set_all_tiers(_get_version_key(), uuid.uuid4().hex, settings.OFFER_SNAPSHOT_TIMEOUT)
+
+
+def bump_offer_snapshot_version():
+    """
+    Makes every process rebuild its offer snapshot.
+
+    The version is bumped again once the current transaction is committed, so that a snapshot loaded before
+    the changes are visible is not kept.
+    """
+    _bump_offer_snapshot_version()
+    transaction.on_commit(_bump_offer_snapshot_version)
+
+
+def get_offer_snapshot():
+    """ Returns the offer snapshot of this process, rebuilding it if its version is not the current one. """
+    global _snapshot  # pylint: disable=global-statement
+    version = get_offer_snapshot_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = OfferSnapshot.load(version)
+            snapshot = _snapshot
+    return snapshot
+
+
+def is_offer_snapshot_holding(offer, deleted=False):
+    """
+    Returns whether the current offer snapshot of this process holds the given offer as it is.
+
+    The snapshot isn't loaded if this process doesn't have the current one, since the offer is being changed.
+    """
+    snapshot = _snapshot
+    return snapshot is not None and snapshot.version == get_offer_snapshot_version() and \
+        snapshot.holds(offer, deleted=deleted)
+
+
+def clear_offer_snapshot():
+    """ Forgets the offer snapshot of this process. """
+    global _snapshot  # pylint: disable=global-statement
+    with _snapshot_lock:
+        _snapshot = None
@@ -0,0 +1,108 @@
+"""
+Benchmarks for getting the offers to apply to a basket.
+
+These are deselected by default. Run them with:
+
+    pytest -m benchmark -s ecommerce/extensions/offer/tests/test_benchmarks.py
+
+A basket load gets the offers for a basket with one line, and applies them as the basket middleware does, with
+SITE_OFFERS site offers, PROGRAM_OFFERS program offers and ENTERPRISE_OFFERS enterprise offers in the database.
+Applying the offers also checks their conditions, which is the same with and without the snapshot.
+"""
+import time
+from functools import partial
+from uuid import uuid4
+
+import mock
+import pytest
+from oscar.core.loading import get_model
+from oscar.test import factories
+
+from ecommerce.extensions.offer.applicator import Applicator
+from ecommerce.extensions.offer.snapshot import clear_offer_snapshot
+from ecommerce.extensions.test.factories import ConditionalOfferFactory, ConditionFactory, ProgramOfferFactory
+from ecommerce.tests.factories import UserFactory
+from ecommerce.tests.testcases import TestCase
+
+BasketAttribute = get_model('basket', 'BasketAttribute')
+BasketAttributeType = get_model('basket', 'BasketAttributeType')
+ConditionalOffer = get_model('offer', 'ConditionalOffer')
+
+BUNDLE = 'bundle_identifier'
+SITE_OFFERS = 5
+PROGRAM_OFFERS = 20
+ENTERPRISE_OFFERS = 20
+DURATION = 2
+
+
+class QueryingApplicator(Applicator):
+    """ The Applicator as it was before the offer snapshot, querying the offers for every basket load. """
+
+    def get_site_offers(self):
+        return ConditionalOffer.active.filter(
+            offer_type=ConditionalOffer.SITE,
+            condition__program_uuid__isnull=True,
+            condition__enterprise_customer_uuid__isnull=True,
+        ).select_related('condition', 'benefit__range')
+
+    def _get_enterprise_offers(self, site, user):
+        return []
+
+    def _get_program_offers(self, basket, bundle_id):
+        bundle_attributes = BasketAttribute.objects.filter(
+            basket=basket,
+            attribute_type=BasketAttributeType.objects.get(name=BUNDLE)
+        )
+        program_uuid = bundle_id if bundle_attributes.count() == 0 else bundle_attributes.first().value_text
+        if program_uuid:
+            return ConditionalOffer.active.filter(
+                offer_type=ConditionalOffer.SITE, condition__program_uuid=program_uuid
+            ).select_related('condition', 'benefit__range')
+        return []
+
+
+@pytest.mark.benchmark
+class ApplicatorBenchmark(TestCase):
+    """ Compares the basket loads per second with the offers queried for every load, and looked up in the snapshot. """
+
+    def setUp(self):
+        super(ApplicatorBenchmark, self).setUp()
+        self.addCleanup(clear_offer_snapshot)
+        ConditionalOfferFactory.create_batch(SITE_OFFERS)
+        ProgramOfferFactory.create_batch(PROGRAM_OFFERS)
+        for __ in range(ENTERPRISE_OFFERS):
+            ConditionalOfferFactory(condition=ConditionFactory(program_uuid=None, enterprise_customer_uuid=uuid4()))
+
+        self.user = UserFactory()
+        self.basket = factories.create_basket()
+        self.basket.owner = self.user
+        self.basket.save()
+
+    def _loads_per_second(self, load):
+        loads = 0
+        with mock.patch('ecommerce.extensions.offer.applicator.get_enterprise_id_for_user', return_value=None):
+            start = time.perf_counter()
+            while time.perf_counter() - start < DURATION:
+                self.basket.reset_offer_applications()
+                load()
+                loads += 1
+            elapsed = time.perf_counter() - start
+        return loads / elapsed
+
+    def test_apply(self):
+        rates = []
+        for name, applicator in (('queried', QueryingApplicator()), ('snapshot', Applicator())):
+            rates.append((
+                name,
+                self._loads_per_second(partial(applicator.get_offers, self.basket, user=self.user)),
+                self._loads_per_second(partial(applicator.apply, self.basket, user=self.user)),
+            ))
+
+        print('{offers} offers in the database, basket loads/s'.format(
+            offers=SITE_OFFERS + PROGRAM_OFFERS + ENTERPRISE_OFFERS
+        ))
+        print('{:10} {:>12} {:>12}'.format('', 'get_offers', 'apply'))
+        for name, get_offers_rate, apply_rate in rates:
+            print('{name:10} {get_offers:12.0f} {apply:12.0f}'.format(
+                name=name + ':', get_offers=get_offers_rate, apply=apply_rate
+            ))
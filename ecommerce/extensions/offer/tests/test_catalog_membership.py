@@ -0,0 +1,95 @@
+import mock
+import responses
+from edx_django_utils.cache import RequestCache, TieredCache
+from oscar.core.loading import get_model
+from oscar.test import factories
+
+from ecommerce.coupons.tests.mixins import DiscoveryMockMixin
+from ecommerce.extensions.catalogue.tests.mixins import DiscoveryTestMixin
+from ecommerce.extensions.offer.applicator import Applicator
+from ecommerce.extensions.offer.catalog_membership import CatalogQueryMembershipResolver
+from ecommerce.tests.factories import UserFactory
+from ecommerce.tests.testcases import TestCase
+
+Range = get_model('offer', 'Range')
+
+
+class CatalogQueryMembershipResolverTests(DiscoveryTestMixin, DiscoveryMockMixin, TestCase):
+    """ Tests for the per-request catalog query membership resolver. """
+
+    def setUp(self):
+        super(CatalogQueryMembershipResolverTests, self).setUp()
+        TieredCache.dangerous_clear_all_tiers()
+        self.basket = factories.BasketFactory(site=self.site, owner=UserFactory())
+        self.entitlement = self.create_entitlement_product()
+        self.course, self.seat = self.create_course_and_seat()
+        self.basket.add_product(self.entitlement)
+        self.basket.add_product(self.seat)
+        self.offers = [self._create_catalog_query_offer('uuid:*'), self._create_catalog_query_offer('key:*')]
+        self.mock_access_token_response()
+
+    def _create_catalog_query_offer(self, query):
+        _range = factories.RangeFactory(course_seat_types=','.join(Range.ALLOWED_SEAT_TYPES[1:]), catalog_query=query)
+        return factories.ConditionalOfferFactory(benefit=factories.BenefitFactory(range=_range))
+
+    def _mock_query_contains(self, query, absent_ids=()):
+        self.mock_catalog_query_contains_endpoint(
+            course_run_ids=[self.course.id], course_uuids=[str(self.entitlement.attr.UUID)],
+            absent_ids=list(absent_ids), query=query, discovery_api_url=self.site_configuration.discovery_api_url
+        )
+
+    def _get_discovery_calls(self):
+        return [call for call in responses.calls if 'query_contains' in call.request.url]
+
+    @responses.activate
+    def test_prefetch_for_offers(self):
+        """ Verify a single Discovery call per query serves every offer evaluated afterwards. """
+        self._mock_query_contains('uuid:*')
+        self._mock_query_contains('key:*', absent_ids=[self.course.id])
+
+        CatalogQueryMembershipResolver.for_site(self.site).prefetch_for_offers(self.basket, self.offers)
+        self.assertEqual(len(self._get_discovery_calls()), 2)
+
+        lines = list(self.basket.all_lines())
+        first_offer, second_offer = self.offers
+        self.assertEqual(
+            [line for __, line in first_offer.benefit.get_applicable_lines(first_offer, self.basket)], lines
+        )
+        self.assertEqual(
+            [line for __, line in second_offer.benefit.get_applicable_lines(second_offer, self.basket)], lines[:1]
+        )
+        self.assertEqual(len(self._get_discovery_calls()), 2)
+
+    @responses.activate
+    def test_resolve_reads_shared_cache(self):
+        """ Verify memberships cached by an earlier request are read without contacting Discovery. """
+        self._mock_query_contains('uuid:*', absent_ids=[self.course.id])
+        self._mock_query_contains('key:*')
+        CatalogQueryMembershipResolver.for_site(self.site).prefetch_for_offers(self.basket, self.offers)
+
+        # Simulate a new request: the request cache is gone, the shared cache is still populated.
+        RequestCache.clear_all_namespaces()
+        resolver = CatalogQueryMembershipResolver.for_site(self.site)
+        resolver.resolve([('uuid:*', self.course.id, True), ('key:*', self.entitlement.attr.UUID, False)])
+        self.assertFalse(resolver.contains('uuid:*', self.course.id))
+        self.assertTrue(resolver.contains('key:*', self.entitlement.attr.UUID))
+        self.assertEqual(len(self._get_discovery_calls()), 2)
+
+    @responses.activate
+    def test_prefetch_failure_is_logged(self):
+        """ Verify prefetch failures are only logged and left for the offers to report. """
+        with self.assertLogs('ecommerce.extensions.offer.catalog_membership', level='WARNING'):
+            CatalogQueryMembershipResolver.for_site(self.site).prefetch_for_offers(self.basket, self.offers)
+
+        with self.assertRaises(Exception):
+            self.offers[0].benefit.get_applicable_lines(self.offers[0], self.basket)
+
+    @responses.activate
+    def test_applicator_prefetches_memberships(self):
+        """ Verify the applicator resolves memberships for all candidate offers before applying them. """
+        self._mock_query_contains('uuid:*')
+        self._mock_query_contains('key:*')
+
+        with mock.patch.object(Applicator, 'get_offers', return_value=self.offers):
+            Applicator().apply(self.basket, self.basket.owner)
+        self.assertEqual(len(self._get_discovery_calls()), 2)
@@ -230,6 +230,87 @@ class RangeTests(CouponMixin, DiscoveryTestMixin, DiscoveryMockMixin, TestCase):
         # doesn't have the provide course seat types.
         self._assert_num_requests(0)
 
+    def _mock_catalog_courses_endpoint(self, catalog_id, course_run_ids):
+        responses.add(
+            responses.GET,
+            '{}courses/'.format(
+                self.build_discovery_catalogs_url(self.site_configuration.discovery_api_url, catalog_id)
+            ),
+            json={
+                'next': None,
+                'results': [{'key': 'edX+DemoX', 'course_runs': [{'key': key} for key in course_run_ids]}],
+            },
+            content_type='application/json'
+        )
+
+    def test_course_catalog_range_contains_product_from_index(self):
+        """
+        Verify that "contains_product" answers from the course run index without calling
+        the Discovery Service, and confirms index misses with the contains endpoint.
+        """
+        course, seat = self.create_course_and_seat()
+        __, other_seat = self.create_course_and_seat(course_id='edX/Other/Course')
+        course_catalog = 1
+        self.range.course_seat_types = 'verified'
+        self.range.course_catalog = course_catalog
+        self.range.save()
+
+        self.mock_access_token_response()
+        self._mock_catalog_courses_endpoint(course_catalog, [course.id])
+        self.assertIsNone(self.range.get_course_run_index(self.site))
+        self.assertEqual(self.range.refresh_course_run_index(self.site), frozenset([course.id]))
+        self._assert_num_requests(2)
+
+        self.assertTrue(self.range.contains_product(seat))
+        self._assert_num_requests(2)
+
+        self.mock_catalog_contains_endpoint(
+            discovery_api_url=self.site_configuration.discovery_api_url, catalog_id=course_catalog,
+            course_run_ids=[other_seat.course_id]
+        )
+        self.assertTrue(self.range.contains_product(other_seat))
+        self._assert_num_requests(3)
+
+    def test_course_run_index_of_previous_course_catalog_not_used(self):
+        """
+        Verify that the course run index of the previous course catalog of a range is not used once it changes.
+        """
+        course, seat = self.create_course_and_seat()
+        self.range.course_seat_types = 'verified'
+        self.range.course_catalog = 1
+        self.range.save()
+
+        self.mock_access_token_response()
+        self._mock_catalog_courses_endpoint(1, [course.id])
+        self.range.refresh_course_run_index(self.site)
+
+        self.range.course_catalog = 2
+        self.range.save()
+        self.assertIsNone(self.range.get_course_run_index(self.site))
+
+        responses.add(
+            responses.GET,
+            '{}contains/'.format(self.build_discovery_catalogs_url(self.site_configuration.discovery_api_url, 2)),
+            json={'courses': {course.id: False}},
+            content_type='application/json'
+        )
+        self.assertFalse(self.range.contains_product(seat))
+
+    def test_catalog_range_contains_product_cached(self):
+        """
+        Verify that the catalog product IDs are cached and invalidated when the catalog stock records change.
+        """
+        self.range_with_catalog.save()
+        self.assertTrue(self.range_with_catalog.contains_product(self.product))
+
+        other_product = factories.create_product()
+        # Only Oscar's own range products lookup hits the database.
+        with self.assertNumQueries(1):
+            self.assertFalse(self.range_with_catalog.contains_product(other_product))
+
+        self.catalog.stock_records.add(factories.create_stockrecord(other_product))
+        self.assertTrue(self.range_with_catalog.contains_product(other_product))
+
     def test_query_range_all_products(self):
         """
         all_products() should return seats from the query.
@@ -0,0 +1,137 @@
+import datetime
+from uuid import uuid4
+
+from django.apps import apps
+from django.utils.timezone import now
+from oscar.core.loading import get_model
+from oscar.test.factories import BenefitFactory, RangeFactory
+
+from ecommerce.extensions.offer.applicator import Applicator
+from ecommerce.extensions.offer.receivers import OFFER_SNAPSHOT_SENDERS
+from ecommerce.extensions.offer.snapshot import clear_offer_snapshot, get_offer_snapshot
+from ecommerce.extensions.test.factories import (
+    ConditionalOfferFactory,
+    ConditionFactory,
+    ProgramOfferFactory,
+    create_basket,
+    create_order
+)
+from ecommerce.tests.testcases import TestCase
+
+Benefit = get_model('offer', 'Benefit')
+Condition = get_model('offer', 'Condition')
+ConditionalOffer = get_model('offer', 'ConditionalOffer')
+
+
+class OfferSnapshotTests(TestCase):
+    """ Tests for the process-wide snapshot of the site offers. """
+
+    def setUp(self):
+        super(OfferSnapshotTests, self).setUp()
+        self.addCleanup(clear_offer_snapshot)
+
+    def test_snapshot_reused(self):
+        """ Verify the offers are looked up without queries once the snapshot is loaded. """
+        offer = ConditionalOfferFactory()
+        get_offer_snapshot()
+
+        with self.assertNumQueries(0):
+            site_offers = get_offer_snapshot().get_site_offers()
+
+        self.assertIn(offer, site_offers)
+
+    def test_indexed_offers(self):
+        """ Verify the program and enterprise offers are only returned for their program or enterprise customer. """
+        site_offer = ConditionalOfferFactory()
+        program_offer = ProgramOfferFactory()
+        enterprise_customer_uuid = uuid4()
+        enterprise_offer = ConditionalOfferFactory(
+            condition=ConditionFactory(program_uuid=None, enterprise_customer_uuid=enterprise_customer_uuid)
+        )
+
+        snapshot = get_offer_snapshot()
+        site_offers = snapshot.get_site_offers()
+        self.assertIn(site_offer, site_offers)
+        self.assertNotIn(program_offer, site_offers)
+        self.assertNotIn(enterprise_offer, site_offers)
+        self.assertEqual(snapshot.get_program_offers(str(program_offer.condition.program_uuid)), [program_offer])
+        self.assertEqual(snapshot.get_enterprise_offers(str(enterprise_customer_uuid)), [enterprise_offer])
+        self.assertEqual(snapshot.get_program_offers('not-a-uuid'), [])
+
+    def test_rebuilt_when_offers_change(self):
+        """ Verify the snapshot is rebuilt once an offer, or its condition, is saved or deleted. """
+        snapshot = get_offer_snapshot()
+        offer = ConditionalOfferFactory()
+        self.assertIsNot(get_offer_snapshot(), snapshot)
+        self.assertIn(offer, get_offer_snapshot().get_site_offers())
+
+        offer.condition.program_uuid = uuid4()
+        offer.condition.save()
+        self.assertNotIn(offer, get_offer_snapshot().get_site_offers())
+
+        offer.delete()
+        self.assertEqual(get_offer_snapshot().get_program_offers(offer.condition.program_uuid), [])
+
+    def test_inactive_offers_excluded(self):
+        """ Verify the offers outside of their dates are not returned. """
+        ended_offer = ConditionalOfferFactory(end_datetime=now() - datetime.timedelta(days=1))
+        future_offer = ConditionalOfferFactory(start_datetime=now() + datetime.timedelta(days=1))
+
+        site_offers = get_offer_snapshot().get_site_offers()
+
+        self.assertNotIn(ended_offer, site_offers)
+        self.assertNotIn(future_offer, site_offers)
+
+    def test_copies_returned(self):
+        """ Verify the offers returned can be changed without changing the snapshot. """
+        offer = ConditionalOfferFactory()
+        snapshot = get_offer_snapshot()
+
+        site_offer = next(site_offer for site_offer in snapshot.get_site_offers() if site_offer == offer)
+        site_offer.set_voucher('voucher')
+
+        for site_offer in snapshot.get_site_offers():
+            self.assertIsNone(site_offer.get_voucher())
+
+    def test_kept_when_order_placed(self):
+        """ Verify placing orders with an offer records its usage without rebuilding the snapshot. """
+        _range = RangeFactory(includes_all_products=True)
+        offer = ConditionalOfferFactory(
+            condition=ConditionFactory(range=_range, value=1, program_uuid=None),
+            benefit=BenefitFactory(range=_range),
+        )
+        snapshot = get_offer_snapshot()
+
+        for __ in range(2):
+            basket = create_basket()
+            Applicator().apply(basket, basket.owner)
+            self.assertEqual(basket.offer_discounts[0]['offer'], offer)
+            create_order(basket=basket, user=basket.owner)
+            self.assertIs(get_offer_snapshot(), snapshot)
+
+        offer.refresh_from_db()
+        self.assertEqual(offer.num_orders, 2)
+
+    def test_rebuilt_when_offer_consumed(self):
+        """ Verify the snapshot is rebuilt once recording the usage of an offer consumes it. """
+        offer = ConditionalOfferFactory(max_global_applications=1)
+        snapshot = get_offer_snapshot()
+
+        offer.record_usage({'freq': 1, 'discount': 1})
+
+        self.assertIsNot(get_offer_snapshot(), snapshot)
+        self.assertNotIn(offer, get_offer_snapshot().get_site_offers())
+
+    def test_kept_when_voucher_offer_saved(self):
+        """ Verify saving an offer which isn't a site offer doesn't rebuild the snapshot. """
+        offer = ConditionalOfferFactory(offer_type=ConditionalOffer.VOUCHER)
+        snapshot = get_offer_snapshot()
+
+        offer.save()
+        self.assertIs(get_offer_snapshot(), snapshot)
+
+    def test_condition_and_benefit_proxies_connected(self):
+        """ Verify every proxy model of conditions and benefits rebuilds the snapshot once saved or deleted. """
+        for model in apps.get_models():
+            if model._meta.proxy and issubclass(model, (Condition, Benefit)):  # pylint: disable=protected-access
+                self.assertIn(model, OFFER_SNAPSHOT_SENDERS)
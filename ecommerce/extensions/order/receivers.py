@@ -0,0 +1,62 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from oscar.core.loading import get_class, get_model
+
+from ecommerce.extensions.basket.utils import clear_basket_calculate_cache
+from ecommerce.extensions.fulfillment.status import ORDER
+from ecommerce.extensions.order.utils import UserAlreadyPlacedOrder
+from ecommerce.extensions.refund.status import REFUND
+
+Order = get_model('order', 'Order')
+OrderDiscount = get_model('order', 'OrderDiscount')
+OrderLine = get_model('order', 'Line')
+Refund = get_model('refund', 'Refund')
+RefundLine = get_model('refund', 'RefundLine')
+UserDiscountLedger = get_model('offer', 'UserDiscountLedger')
+order_status_changed = get_class('order.signals', 'order_status_changed')
+
+
+@receiver(post_save, sender=OrderLine, dispatch_uid='order.order_line_saved_callback')
+@receiver(post_save, sender=RefundLine, dispatch_uid='order.refund_line_saved_callback')
+def clear_user_already_placed_order_cache(sender, **kwargs):  # pylint: disable=unused-argument
+    """ Forgets the products the users were found to have purchased, once an order or a refund changes. """
+    UserAlreadyPlacedOrder.clear_cache()
+
+
+@receiver(post_save, sender=Order, dispatch_uid='order.order_saved_callback')
+def clear_basket_calculate_cache_on_order(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """ Forgets the basket calculations cached for a user once they place an order. """
+    if created and instance.user:
+        clear_basket_calculate_cache(instance.user)
+
+
+@receiver(post_save, sender=Refund, dispatch_uid='order.refund_completed_callback')
+def clear_basket_calculate_cache_on_refund(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """ Forgets the basket calculations cached for a user once one of their orders is refunded. """
+    if instance.status == REFUND.COMPLETE:
+        clear_basket_calculate_cache(instance.user)
+
+
+@receiver(post_save, sender=OrderDiscount, dispatch_uid='order.order_discount_saved_callback')
+def record_order_discount(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """ Adds the discounts of the completed orders to the discount ledgers of their users. """
+    if created:
+        UserDiscountLedger.record_order_discount(instance)
+
+
+@receiver(order_status_changed, dispatch_uid='order.order_status_changed_callback')
+def record_completed_order(sender, order, new_status, **kwargs):  # pylint: disable=unused-argument
+    """ Adds the discounts of the orders being completed to the discount ledgers of their users. """
+    if new_status == ORDER.COMPLETE:
+        UserDiscountLedger.record_order(order)
+
+
+@receiver(post_save, sender=Refund, dispatch_uid='order.refund_saved_callback')
+def credit_completed_refund(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """
+    Takes the discounts of the orders of the refunds created as complete from the discount ledgers of their users.
+
+    The refunds completed later are credited by Refund.set_status.
+    """
+    if created and instance.status == REFUND.COMPLETE:
+        UserDiscountLedger.credit_refund(instance)
@@ -1,13 +1,19 @@
 
 
 import ddt
+from oscar.core.loading import get_model
 from oscar.test import factories
 
 from ecommerce.core.constants import COUPON_PRODUCT_CLASS_NAME
 from ecommerce.extensions.fulfillment.status import ORDER
-from ecommerce.extensions.test.factories import create_basket, create_order
+from ecommerce.extensions.refund.status import REFUND
+from ecommerce.extensions.refund.tests.factories import RefundFactory
+from ecommerce.extensions.test.factories import ConditionalOfferFactory, create_basket, create_order
+from ecommerce.tests.factories import UserFactory
 from ecommerce.tests.testcases import TestCase
 
+UserDiscountLedger = get_model('offer', 'UserDiscountLedger')
+
 
 @ddt.ddt
 class OrderTests(TestCase):
@@ -32,6 +38,33 @@ class OrderTests(TestCase):
         self.order.save()
         self.assertFalse(self.order.is_fulfillable)
 
+    @ddt.data(ORDER.OPEN, ORDER.FULFILLMENT_ERROR)
+    def test_discounts_recorded_when_completed(self, status):
+        """
+        The discounts of an order should be added to the discount ledger of its user once the order is completed.
+        """
+        user = UserFactory()
+        offer = ConditionalOfferFactory(max_user_discount=150)
+        order = create_order(user=user, status=status)
+        factories.OrderDiscountFactory(order=order, offer_id=offer.id, amount=40)
+        self.assertEqual(UserDiscountLedger.get_amount(offer, user), 0)
+
+        order.set_status(ORDER.COMPLETE)
+        self.assertEqual(UserDiscountLedger.get_amount(offer, user), 40)
+
+    def test_refunded_discounts_not_recorded_when_completed(self):
+        """
+        The discounts of an order refunded before it is completed should not be added to the discount ledger.
+        """
+        user = UserFactory()
+        offer = ConditionalOfferFactory(max_user_discount=150)
+        order = create_order(user=user, status=ORDER.FULFILLMENT_ERROR)
+        factories.OrderDiscountFactory(order=order, offer_id=offer.id, amount=40)
+        RefundFactory(order=order, user=user, status=REFUND.COMPLETE)
+
+        order.set_status(ORDER.COMPLETE)
+        self.assertEqual(UserDiscountLedger.get_amount(offer, user), 0)
+
     def test_contains_coupon(self):
         self.assertFalse(self.order.contains_coupon)
 
@@ -9,7 +9,6 @@ import mock
 import pytz
 import responses
 from django.test.client import RequestFactory
-from edx_django_utils.cache import TieredCache
 from oscar.core.loading import get_class, get_model
 from oscar.test.factories import BasketFactory
 from requests import Timeout
@@ -237,10 +236,9 @@ class UserAlreadyPlacedOrderTests(RefundTestMixin, TestCase):
             "order_number": "EDX-100014"
         }
         responses.add(
-            responses.GET, get_lms_entitlement_api_url() +
-            'entitlements/' + self.course_entitlement_uuid + '/',
+            responses.GET, get_lms_entitlement_api_url() + 'entitlements/',
             status=200,
-            json=body,
+            json={'results': [dict(body, uuid=self.course_entitlement_uuid)]},
             content_type='application/json'
         )
         self.assertFalse(
@@ -269,9 +267,9 @@ class UserAlreadyPlacedOrderTests(RefundTestMixin, TestCase):
         }
         responses.add(
             responses.GET,
-            get_lms_entitlement_api_url() + 'entitlements/' + self.course_entitlement_uuid + '/',
+            get_lms_entitlement_api_url() + 'entitlements/',
             status=200,
-            json=body,
+            json={'results': [dict(body, uuid=self.course_entitlement_uuid)]},
             content_type='application/json'
         )
         self.assertTrue(
@@ -282,6 +280,27 @@ class UserAlreadyPlacedOrderTests(RefundTestMixin, TestCase):
             )
         )
 
+    @responses.activate
+    def test_unknown_entitlement_order(self):
+        """
+        Test the case that the LMS does not know the entitlement of the order of the user
+        """
+        self.mock_access_token_response()
+        responses.add(
+            responses.GET,
+            get_lms_entitlement_api_url() + 'entitlements/',
+            status=200,
+            json={'results': []},
+            content_type='application/json'
+        )
+        self.assertFalse(
+            UserAlreadyPlacedOrder.user_already_placed_order(
+                user=self.user,
+                product=self.course_entitlement,
+                site=self.site
+            )
+        )
+
     @responses.activate
     def test_refunded_entitlement_order_connection_timeout(self):
         """
@@ -289,7 +308,7 @@ class UserAlreadyPlacedOrderTests(RefundTestMixin, TestCase):
         """
         responses.add(
             responses.GET,
-            get_lms_entitlement_api_url() + 'entitlements/' + self.course_entitlement_uuid + '/',
+            get_lms_entitlement_api_url() + 'entitlements/',
             status=200,
             body=Timeout(),
             content_type='application/json',
@@ -326,45 +345,57 @@ class UserAlreadyPlacedOrderTests(RefundTestMixin, TestCase):
         product = self.get_order_product(order=refund.order)
         self.assertFalse(UserAlreadyPlacedOrder.user_already_placed_order(user=user, product=product, site=self.site))
 
-    @ddt.data(('Open', False), ('Revocation Error', False), ('Denied', False), ('Complete', True))
-    @ddt.unpack
-    def test_is_order_line_refunded(self, refund_line_status, is_refunded):
+    def test_already_placed_order_cached(self):
         """
-        Tests the functionality of is_order_line_refunded method.
+        Test the purchase of a product is looked up once per request, until an order or a refund changes.
         """
-        user = self.create_user()
-        refund = RefundFactory(user=user)
-        refund_line = RefundLine.objects.get(refund=refund)
-        refund_line.status = refund_line_status
+        self.assertTrue(
+            UserAlreadyPlacedOrder.user_already_placed_order(user=self.user, product=self.product, site=self.site)
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                UserAlreadyPlacedOrder.user_already_placed_order(user=self.user, product=self.product, site=self.site)
+            )
+
+        refund = self.create_refund(order=self.order)
+        refund_line = refund.lines.first()
+        refund_line.status = 'Complete'
         refund_line.save()
-        self.assertEqual(UserAlreadyPlacedOrder.is_order_line_refunded(refund_line.order_line), is_refunded)
+        self.assertFalse(
+            UserAlreadyPlacedOrder.user_already_placed_order(user=self.user, product=self.product, site=self.site)
+        )
 
     @responses.activate
-    def test_is_entitlement_expired_cached(self):
+    def test_entitlements_expiry_fetched_at_once(self):
         """
-        Test that entitlement's expired status gets cached
-
-        We expect 2 calls to set_all_tiers in the is_entitlement_expired
-        method due to:
-            - the site_configuration api setup
-            - the result being cached
+        Test the entitlements of all the orders of the user for a product are fetched from the LMS in one call.
         """
         self.mock_access_token_response()
-
-        self.course_entitlement.expires = EXPIRED_DATE
+        order = self.create_order(entitlement=True, user=self.user)
+        other_entitlement_uuid = '222'
+        order.lines.first().attributes.update(value=other_entitlement_uuid)
+        entitlements_url = get_lms_entitlement_api_url() + 'entitlements/'
         responses.add(
             responses.GET,
-            get_lms_entitlement_api_url() + 'entitlements/' + self.course_entitlement_uuid + '/',
+            entitlements_url,
             status=200,
-            json={},
+            json={'results': [
+                {'uuid': self.course_entitlement_uuid, 'expired_at': '2017-12-16T21:36:19.279647Z'},
+                {'uuid': other_entitlement_uuid, 'expired_at': None},
+            ]},
             content_type='application/json'
         )
 
-        with mock.patch.object(TieredCache, 'set_all_tiers', wraps=TieredCache.set_all_tiers) as mocked_set_all_tiers:
-            mocked_set_all_tiers.assert_not_called()
-
-            _ = UserAlreadyPlacedOrder.is_entitlement_expired(self.course_entitlement_uuid, site=self.site)
-            self.assertEqual(mocked_set_all_tiers.call_count, 2)
-
-            _ = UserAlreadyPlacedOrder.is_entitlement_expired(self.course_entitlement_uuid, site=self.site)
-            self.assertEqual(mocked_set_all_tiers.call_count, 2)
+        self.assertTrue(
+            UserAlreadyPlacedOrder.user_already_placed_order(
+                user=self.user,
+                product=self.course_entitlement,
+                site=self.site
+            )
+        )
+        entitlement_calls = [call for call in responses.calls if call.request.url.startswith(entitlements_url)]
+        self.assertEqual(len(entitlement_calls), 1)
+        self.assertEqual(
+            sorted(responses.calls[-1].request.params['uuid'].split(',')),
+            sorted([self.course_entitlement_uuid, other_entitlement_uuid])
+        )
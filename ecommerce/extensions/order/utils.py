@@ -5,7 +5,8 @@ import logging
 
 import waffle
 from django.conf import settings
-from edx_django_utils.cache import TieredCache
+from django.db.models import Exists, OuterRef, Subquery
+from edx_django_utils.cache import RequestCache, TieredCache
 from oscar.apps.order.utils import OrderCreator as OscarOrderCreator
 from oscar.core.loading import get_model
 from requests.exceptions import ConnectionError as ReqConnectionError  # pylint: disable=ungrouped-imports
@@ -18,7 +19,7 @@ from ecommerce.referrals.models import Referral
 
 logger = logging.getLogger(__name__)
 
-Option = get_model('catalogue', 'Option')
+LineAttribute = get_model('order', 'LineAttribute')
 Order = get_model('order', 'Order')
 OrderLine = get_model('order', 'Line')
 RefundLine = get_model('refund', 'RefundLine')
@@ -130,36 +131,75 @@ class UserAlreadyPlacedOrder:
     """
     Provides utils methods to check if user has already placed an order
     """
+    CACHE_NAMESPACE = 'order.user_already_placed_order'
+    ENTITLEMENTS_PAGE_SIZE = 100
 
     @staticmethod
-    def is_entitlement_expired(entitlement_uuid, site):
+    def _get_entitlement_cache_key(entitlement_uuid, site):
+        partner_short_code = site.siteconfiguration.partner.short_code
+        return 'course_entitlement_detail_{}{}'.format(entitlement_uuid, partner_short_code)
+
+    @staticmethod
+    def get_entitlements_expiry(entitlement_uuids, site):
         """
-        Checks to see if a given entitlement is expired.
+        Returns when the given entitlements expired.
+
+        The entitlements which are not cached are fetched from the LMS at once, ENTITLEMENTS_PAGE_SIZE at a time.
 
         Args:
-            entitlement_uuid: UUID
+            entitlement_uuids: list of UUID
             site: (Site)
 
         Returns:
-            bool: True if the entitlement is expired
+            dict: The date each entitlement expired at, or None if it is not expired, keyed by entitlement UUID.
+                Entitlements unknown to the LMS are left out.
 
+        Raises:
+            ConnectTimeout, ConnectionError, HTTPError: if the entitlements could not be fetched from the LMS.
         """
+        expiry = {}
+        uncached_uuids = []
+        for entitlement_uuid in entitlement_uuids:
+            key = UserAlreadyPlacedOrder._get_entitlement_cache_key(entitlement_uuid, site)
+            entitlement_cached_response = TieredCache.get_cached_response(key)
+            if entitlement_cached_response.is_found:
+                expiry[entitlement_uuid] = entitlement_cached_response.value.get('expired_at')
+            else:
+                uncached_uuids.append(entitlement_uuid)
+
         api_client = site.siteconfiguration.oauth_api_client
-        entitlement_url = site.siteconfiguration.build_lms_url(f"api/entitlements/v1/entitlements/{entitlement_uuid}/")
-        partner_short_code = site.siteconfiguration.partner.short_code
-        key = 'course_entitlement_detail_{}{}'.format(entitlement_uuid, partner_short_code)
-        entitlement_cached_response = TieredCache.get_cached_response(key)
-        if entitlement_cached_response.is_found:
-            entitlement = entitlement_cached_response.value
-        else:
-            logger.debug('Trying to get entitlement {%s}', entitlement_uuid)
-            entitlement = api_client.get(entitlement_url).json()
-            TieredCache.set_all_tiers(key, entitlement, settings.COURSES_API_CACHE_TIMEOUT)
+        entitlements_url = site.siteconfiguration.build_lms_url('api/entitlements/v1/entitlements/')
+        page_size = UserAlreadyPlacedOrder.ENTITLEMENTS_PAGE_SIZE
+        for start in range(0, len(uncached_uuids), page_size):
+            uuids = uncached_uuids[start:start + page_size]
+            logger.debug('Trying to get entitlements {%s}', uuids)
+            response = api_client.get(entitlements_url, params={'uuid': ','.join(uuids), 'page_size': page_size})
+            response.raise_for_status()
+            for entitlement in response.json()['results']:
+                key = UserAlreadyPlacedOrder._get_entitlement_cache_key(entitlement['uuid'], site)
+                TieredCache.set_all_tiers(key, entitlement, settings.COURSES_API_CACHE_TIMEOUT)
+                expiry[entitlement['uuid']] = entitlement.get('expired_at')
+
+        logger.debug('Entitlements expired at {%s}', expiry)
+        return expiry
 
-        expired = entitlement.get('expired_at')
-        logger.debug('Entitlement {%s} expired = {%s}', entitlement_uuid, expired)
+    @staticmethod
+    def get_purchased_order_lines(user, product):
+        """
+        Returns the order lines of the user for the product which have not been refunded.
 
-        return expired
+        The lines are annotated with the UUID of the entitlement they granted, if any, as entitlement_uuid.
+        """
+        refund_lines = RefundLine.objects.filter(order_line=OuterRef('pk'), status=REFUND_LINE.COMPLETE)
+        entitlement_attributes = LineAttribute.objects.filter(line=OuterRef('pk'), option__code='course_entitlement')
+        return OrderLine.objects.filter(product=product, order__user=user).filter(~Exists(refund_lines)).annotate(
+            entitlement_uuid=Subquery(entitlement_attributes.values('value')[:1])
+        )
+
+    @staticmethod
+    def clear_cache():
+        """ Forgets the products the users were found to have purchased during this request. """
+        RequestCache(UserAlreadyPlacedOrder.CACHE_NAMESPACE).clear()
 
     @staticmethod
     def user_already_placed_order(user, product, site):
@@ -179,35 +219,43 @@ class UserAlreadyPlacedOrder:
         Notes:
             If the switch with the name `ecommerce.extensions.order.constants.DISABLE_REPEAT_ORDER_SWITCH_NAME`
             is active this check will be disabled, and this method will already return `False`.
+
+            The result is cached for the rest of the request, until an order line or a refund line is saved.
         """
         if waffle.switch_is_active(DISABLE_REPEAT_ORDER_CHECK_SWITCH_NAME):
             return False
 
-        entitlement_option = Option.objects.get(code='course_entitlement')
+        request_cache = RequestCache(UserAlreadyPlacedOrder.CACHE_NAMESPACE)
+        cache_key = '{site}.{user}.{product}'.format(site=site.id if site else None, user=user.id, product=product.id)
+        cached_response = request_cache.get_cached_response(cache_key)
+        if cached_response.is_found:
+            return cached_response.value
 
-        orders_lines = OrderLine.objects.filter(product=product, order__user=user)
-        for order_line in orders_lines:
-            if not UserAlreadyPlacedOrder.is_order_line_refunded(order_line):
-                if not order_line.product.is_course_entitlement_product:
-                    return True
+        already_placed_order = UserAlreadyPlacedOrder._user_already_placed_order(user, product, site)
+        request_cache.set(cache_key, already_placed_order)
+        return already_placed_order
 
-                entitlement_uuid = order_line.attributes.get(option=entitlement_option).value
-                try:
-                    if not UserAlreadyPlacedOrder.is_entitlement_expired(entitlement_uuid, site):
-                        return True
-                except (ConnectTimeout, ReqConnectionError, HTTPError):
-                    logger.exception(
-                        'Unable to get entitlement info [%s] due to a network problem',
-                        entitlement_uuid
-                    )
+    @staticmethod
+    def _user_already_placed_order(user, product, site):
+        orders_lines = UserAlreadyPlacedOrder.get_purchased_order_lines(user, product)
+        if not product.is_course_entitlement_product:
+            return orders_lines.exists()
 
-        return False
+        entitlement_uuids = [uuid for uuid in orders_lines.values_list('entitlement_uuid', flat=True) if uuid]
+        if not entitlement_uuids:
+            return False
 
-    @staticmethod
-    def is_order_line_refunded(order_line):
-        """
-        checks if the order line is refunded
-        Returns:
-            boolean: True if order line is refunded else false
-        """
-        return RefundLine.objects.filter(order_line=order_line, status=REFUND_LINE.COMPLETE).exists()
+        try:
+            entitlements_expiry = UserAlreadyPlacedOrder.get_entitlements_expiry(entitlement_uuids, site)
+        except (ConnectTimeout, ReqConnectionError, HTTPError):
+            logger.exception(
+                'Unable to get entitlement info [%s] due to a network problem',
+                ', '.join(entitlement_uuids)
+            )
+            return False
+
+        # The entitlements unknown to the LMS are not purchases.
+        return any(
+            entitlement_uuid in entitlements_expiry and not entitlements_expiry[entitlement_uuid]
+            for entitlement_uuid in entitlement_uuids
+        )
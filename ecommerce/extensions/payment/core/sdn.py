@@ -4,7 +4,9 @@ import io
 import logging
 import re
 import string
+import threading
 import unicodedata
+from collections import defaultdict
 from datetime import datetime, timezone
 from urllib.parse import urlencode
 
@@ -89,17 +91,100 @@ def checkSDNFallback(name, city, country):
         4. If a subset of words match, it still counts as a match
         5. Capitalization doesn’t matter
     """
-    hit_count = 0
-    records = SDNFallbackData.get_current_records_and_filter_by_source_and_type(
-        'Specially Designated Nationals (SDN) - Treasury Department', 'Individual'
-    )
-    records = records.filter(countries__contains=country)
-    processed_name, processed_city = process_text(name), process_text(city)
-    for record in records:
-        record_names, record_addresses = set(record.names.split()), set(record.addresses.split())
-        if (processed_name.issubset(record_names) and processed_city.issubset(record_addresses)):
-            hit_count = hit_count + 1
-    return hit_count
+    index = SDNFallbackIndex.get_current()
+    return index.count_matches(process_text(name), process_text(city), country)
+
+
+class SDNFallbackIndex:
+    """
+    In-process inverted index over the current SDN fallback records.
+
+    Maps every processed name token, address token and country code of the SDN individuals to the IDs of
+    the records containing it, so a lookup intersects a few posting lists instead of scanning every record
+    of the country. The index is built once per process for each imported SDN csv and is rebuilt only when
+    the 'Current' SDNFallbackMetadata row changes, i.e. after swap_all_states promotes a new import.
+    """
+    SOURCE = 'Specially Designated Nationals (SDN) - Treasury Department'
+    SDN_TYPE = 'Individual'
+
+    _current = None
+    _lock = threading.Lock()
+
+    def __init__(self, version):
+        self.version = version
+        self.names = defaultdict(set)
+        self.addresses = defaultdict(set)
+        self.countries = defaultdict(set)
+
+    @staticmethod
+    def _get_version(metadata):
+        return metadata.id, metadata.file_checksum, metadata.import_timestamp
+
+    @classmethod
+    def get_current(cls):
+        """
+        Return the index of the current SDN fallback records, building it if the current import changed.
+
+        Raises:
+            SDNFallbackDataEmptyError: if the SDN csv has never been imported.
+        """
+        metadata = SDNFallbackMetadata.get_current()
+        version = cls._get_version(metadata)
+        index = cls._current
+        if index is None or index.version != version:
+            with cls._lock:
+                index = cls._current
+                if index is None or index.version != version:
+                    index = cls.build(metadata)
+                    cls._current = index
+        return index
+
+    @classmethod
+    def build(cls, metadata):
+        """
+        Build the index from the SDN individuals imported with the given SDNFallbackMetadata.
+        """
+        index = cls(cls._get_version(metadata))
+        records = SDNFallbackData.objects.filter(
+            sdn_fallback_metadata=metadata, source=cls.SOURCE, sdn_type=cls.SDN_TYPE
+        ).values_list('id', 'names', 'addresses', 'countries')
+        for record_id, names, addresses, countries in records.iterator():
+            for token in names.split():
+                index.names[token].add(record_id)
+            for token in addresses.split():
+                index.addresses[token].add(record_id)
+            for country_code in countries.split():
+                index.countries[country_code].add(record_id)
+
+        logger.info(
+            'SDNFallback: Built the fallback index for metadata [%d] with %d name and %d address tokens.',
+            metadata.id, len(index.names), len(index.addresses)
+        )
+        return index
+
+    def count_matches(self, name_tokens, city_tokens, country):
+        """
+        Count the records of the country whose names contain all name tokens and addresses contain all city tokens.
+
+        Args:
+            name_tokens (set): Processed name, see process_text.
+            city_tokens (set): Processed city, see process_text.
+            country (str): ISO 3166-1 alpha-2 country code.
+
+        Returns:
+            int: Number of matching records.
+        """
+        postings = [self.countries.get(country, set())]
+        postings += [self.names.get(token, set()) for token in name_tokens]
+        postings += [self.addresses.get(token, set()) for token in city_tokens]
+        # Intersect starting from the rarest token so the working set stays small.
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            if not matches:
+                break
+            matches &= posting
+        return len(matches)
 
 
 class SDNClient:
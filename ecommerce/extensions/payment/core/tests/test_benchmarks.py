@@ -0,0 +1,106 @@
+"""
+Benchmarks for the SDN fallback check.
+
+These are deselected by default. Download the consolidated screening list from
+https://data.trade.gov/downloadable_consolidated_screening_list/v1/consolidated.csv and run them with:
+
+    SDN_FALLBACK_BENCHMARK_CSV=/path/to/consolidated.csv \
+        pytest -m benchmark -s ecommerce/extensions/payment/core/tests/test_benchmarks.py
+
+Without SDN_FALLBACK_BENCHMARK_CSV a synthetic csv of comparable size is used.
+"""
+import os
+import random
+import string
+import time
+
+import pytest
+
+from ecommerce.extensions.payment.core.sdn import (
+    SDNFallbackIndex,
+    checkSDNFallback,
+    populate_sdn_fallback_data_and_metadata,
+    process_text
+)
+from ecommerce.extensions.payment.models import SDNFallbackData
+from ecommerce.tests.testcases import TestCase
+
+CSV_HEADER = '_id,source,type,name,addresses,alt_names,ids\n'
+SYNTHETIC_RECORDS = 12000
+LOOKUPS = 500
+
+
+def _random_words(count):
+    return ' '.join(''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))) for _ in range(count))
+
+
+def _synthetic_csv():
+    rows = []
+    for record_id in range(SYNTHETIC_RECORDS):
+        rows.append('{id},{source},Individual,{name},"{address}, {country}",{alt_names},'.format(
+            id=record_id,
+            source=SDNFallbackIndex.SOURCE,
+            name=_random_words(3),
+            address=_random_words(5),
+            country=random.choice(('IR', 'KP', 'SY', 'CU', 'RU', 'VE')),
+            alt_names=_random_words(2),
+        ))
+    return CSV_HEADER + '\n'.join(rows)
+
+
+def _scan_matches(name, city, country):
+    """ Previous implementation of checkSDNFallback, which scanned every record of the country. """
+    records = SDNFallbackData.get_current_records_and_filter_by_source_and_type(
+        SDNFallbackIndex.SOURCE, SDNFallbackIndex.SDN_TYPE
+    ).filter(countries__contains=country)
+    processed_name, processed_city = process_text(name), process_text(city)
+    return sum(
+        1 for record in records
+        if processed_name.issubset(set(record.names.split())) and
+        processed_city.issubset(set(record.addresses.split()))
+    )
+
+
+@pytest.mark.benchmark
+class SDNFallbackBenchmark(TestCase):
+    """ Compares the indexed SDN fallback lookup with a full scan of the country's records. """
+
+    def _time(self, check, lookups):
+        start = time.perf_counter()
+        hits = [check(name, city, country) for name, city, country in lookups]
+        return time.perf_counter() - start, hits
+
+    def test_check_sdn_fallback(self):
+        csv_path = os.environ.get('SDN_FALLBACK_BENCHMARK_CSV')
+        if csv_path:
+            with open(csv_path, encoding='utf-8') as csv_file:
+                csv_string = csv_file.read()
+        else:
+            csv_string = _synthetic_csv()
+        populate_sdn_fallback_data_and_metadata(csv_string)
+
+        records = list(SDNFallbackData.get_current_records_and_filter_by_source_and_type(
+            SDNFallbackIndex.SOURCE, SDNFallbackIndex.SDN_TYPE
+        ).exclude(countries=''))
+        lookups = []
+        for record in random.sample(records, min(LOOKUPS, len(records))):
+            # Half of the lookups hit a record, the other half only share its country.
+            names = record.names.split()
+            name = ' '.join(names[:2]) if len(lookups) % 2 else _random_words(2)
+            lookups.append((name, ' '.join(record.addresses.split()[:1]), record.countries.split()[0]))
+
+        start = time.perf_counter()
+        SDNFallbackIndex.get_current()
+        build_time = time.perf_counter() - start
+
+        scan_time, scan_hits = self._time(_scan_matches, lookups)
+        index_time, index_hits = self._time(checkSDNFallback, lookups)
+
+        self.assertEqual(scan_hits, index_hits)
+        print('{records} records, {lookups} lookups, index built in {build:.2f}s'.format(
+            records=len(records), lookups=len(lookups), build=build_time
+        ))
+        print('scan:  {total:8.3f}s {per:8.3f}ms/lookup'.format(total=scan_time, per=scan_time * 1000 / len(lookups)))
+        print('index: {total:8.3f}s {per:8.3f}ms/lookup'.format(
+            total=index_time, per=index_time * 1000 / len(lookups)
+        ))
@@ -16,6 +16,7 @@ from requests.exceptions import HTTPError, Timeout
 from ecommerce.core.models import User
 from ecommerce.extensions.payment.core.sdn import (
     SDNClient,
+    SDNFallbackIndex,
     checkSDN,
     checkSDNFallback,
     extract_country_information,
@@ -519,6 +520,34 @@ Port Andrewport, OR 39456, EE",,,,,,,,,,,,,,http://douglas.com/,Misty Johnson,CV
         sdn_fallback_hit_count = checkSDNFallback('Juan Cruz', 'North Kristinaport', 'SN')
         self.assertEqual(sdn_fallback_hit_count, 2)
 
+    def test_sdn_fallback_index_reused(self):
+        """
+        Verify the fallback index is built once per import and later lookups only read the current metadata.
+        """
+        csv_string = self.csv_header + """94734218,Specially Designated Nationals (SDN) - Treasury Department,96663868,Individual,material,Juan M. de la Cruz,Dr.,"North Kristinaport, HI 91033, SN",,,,,,,,,,,,,,https://www.cruz.org/,Wendy Brock,DJ,1944-03-05,Faroe Islands,PK,http://juan.org/,CI"""  # pylint: disable=line-too-long
+        populate_sdn_fallback_data_and_metadata(csv_string)
+        self.assertEqual(checkSDNFallback('Juan Cruz', 'North Kristinaport', 'SN'), 1)
+        index = SDNFallbackIndex.get_current()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(checkSDNFallback('Wendy', 'Kristinaport', 'SN'), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(checkSDNFallback('Wendy', 'Kristinaport', 'EE'), 0)
+        self.assertIs(SDNFallbackIndex.get_current(), index)
+
+    def test_sdn_fallback_index_rebuilt_after_import(self):
+        """
+        Verify the fallback index is rebuilt once a new SDN csv becomes the current import.
+        """
+        csv_string = self.csv_header + """94734218,Specially Designated Nationals (SDN) - Treasury Department,96663868,Individual,material,Juan M. de la Cruz,Dr.,"North Kristinaport, HI 91033, SN",,,,,,,,,,,,,,https://www.cruz.org/,Wendy Brock,DJ,1944-03-05,Faroe Islands,PK,http://juan.org/,CI"""  # pylint: disable=line-too-long
+        populate_sdn_fallback_data_and_metadata(csv_string)
+        self.assertEqual(checkSDNFallback('Sarah Jones', 'Port Andrewport', 'EE'), 0)
+
+        populate_sdn_fallback_data_and_metadata(csv_string + """
+37539856,Specially Designated Nationals (SDN) - Treasury Department,55159852,Individual,hotel,Sarah Jones,Mrs.,"Port Andrewport, OR 39456, EE",,,,,,,,,,,,,,http://douglas.com/,Misty Johnson,CV,1998-02-15,Ukraine,BO,https://townsend.com/,TM""")  # pylint: disable=line-too-long
+        self.assertEqual(checkSDNFallback('Sarah Jones', 'Port Andrewport', 'EE'), 1)
+        self.assertEqual(checkSDNFallback('Juan Cruz', 'North Kristinaport', 'SN'), 1)
+
 
 class SDNFallbackTestsWithoutSetup(TestCase):
     def test_SDNFallback_empty_data(self):
@@ -215,6 +215,24 @@ class SDNFallbackMetadata(TimeStampedModel):
                 )
                 raise
 
+    @classmethod
+    def get_current(cls):
+        """
+        Return the metadata row in the 'Current' import_state.
+
+        Raises:
+            SDNFallbackDataEmptyError: if the SDN csv has never been imported.
+        """
+        try:
+            return SDNFallbackMetadata.objects.get(import_state='Current')
+        # The 'get' relies on the manage command having been run. If it fails, tell engineer what's needed
+        except SDNFallbackMetadata.DoesNotExist as fallback_metadata_no_exist:
+            logger.warning(
+                "SDNFallback: SDNFallbackMetadata is empty! Run this: "
+                "./manage.py populate_sdn_fallback_data_and_metadata"
+            )
+            raise SDNFallbackDataEmptyError from fallback_metadata_no_exist
+
     @classmethod
     def _swap_state(cls, import_state):
         """
@@ -274,15 +292,7 @@ class SDNFallbackData(models.Model):
         """
         Query the records that have 'Current' import state, and filter by source and sdn_type.
         """
-        try:
-            current_metadata = SDNFallbackMetadata.objects.get(import_state='Current')
-        # The 'get' relies on the manage command having been run. If it fails, tell engineer what's needed
-        except SDNFallbackMetadata.DoesNotExist as fallback_metadata_no_exist:
-            logger.warning(
-                "SDNFallback: SDNFallbackMetadata is empty! Run this: "
-                "./manage.py populate_sdn_fallback_data_and_metadata"
-            )
-            raise SDNFallbackDataEmptyError from fallback_metadata_no_exist
+        current_metadata = SDNFallbackMetadata.get_current()
         query_params = {'source': source, 'sdn_fallback_metadata': current_metadata, 'sdn_type': sdn_type}
         return SDNFallbackData.objects.filter(**query_params)
 
@@ -24,6 +24,12 @@ def get_basket_program_uuid(basket):
     Returns:
         string: The program UUID if the basket is associated with a bundled purchase, otherwise None.
     """
+    if 'basketattribute_set' in getattr(basket, '_prefetched_objects_cache', {}):
+        for bundle_attribute in basket.basketattribute_set.all():
+            if bundle_attribute.attribute_type.name == 'bundle_identifier':
+                return bundle_attribute.value_text
+        return None
+
     try:
         attribute_type = BasketAttributeType.objects.get(name='bundle_identifier')
     except BasketAttributeType.DoesNotExist:
@@ -3,7 +3,7 @@
 import logging
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import ugettext_lazy as _
 from django_extensions.db.models import TimeStampedModel
 from oscar.apps.payment.exceptions import PaymentError
@@ -24,6 +24,7 @@ ConditionalOffer = get_model('offer', 'ConditionalOffer')
 OrderDiscount = get_model('order', 'OrderDiscount')
 PaymentEvent = get_model('order', 'PaymentEvent')
 PaymentEventType = get_model('order', 'PaymentEventType')
+UserDiscountLedger = get_model('offer', 'UserDiscountLedger')
 post_refund = get_class('refund.signals', 'post_refund')
 
 
@@ -89,6 +90,17 @@ class Refund(StatusMixin, TimeStampedModel):
         """Returns all possible statuses for a refund."""
         return list(getattr(settings, cls.pipeline_setting).keys())
 
+    def set_status(self, new_status):
+        """Set a new status for this refund.
+
+        Once the refund is complete, the discounts of the order are taken from the discount ledgers of its user,
+        in the same transaction, unless the order was already refunded.
+        """
+        with transaction.atomic():
+            super(Refund, self).set_status(new_status)
+            if new_status == REFUND.COMPLETE:
+                UserDiscountLedger.credit_refund(self)
+
     @classmethod
     def create_with_lines(cls, order, lines):
         """Given an order and order lines, creates a Refund with corresponding RefundLines.
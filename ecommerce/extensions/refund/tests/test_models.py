@@ -14,7 +14,7 @@ from ecommerce.extensions.refund.exceptions import InvalidStatus
 from ecommerce.extensions.refund.status import REFUND, REFUND_LINE
 from ecommerce.extensions.refund.tests.factories import RefundFactory, RefundLineFactory
 from ecommerce.extensions.refund.tests.mixins import RefundTestMixin
-from ecommerce.extensions.test.factories import EnterpriseOfferFactory
+from ecommerce.extensions.test.factories import ConditionalOfferFactory, EnterpriseOfferFactory
 from ecommerce.tests.factories import UserFactory
 from ecommerce.tests.testcases import TestCase
 
@@ -23,6 +23,7 @@ post_refund = get_class('refund.signals', 'post_refund')
 Refund = get_model('refund', 'Refund')
 Source = get_model('payment', 'Source')
 ConditionalOffer = get_model('offer', 'ConditionalOffer')
+UserDiscountLedger = get_model('offer', 'UserDiscountLedger')
 
 LOGGER_NAME = 'ecommerce.extensions.analytics.utils'
 REFUND_MODEL_LOGGER_NAME = 'ecommerce.extensions.refund.models'
@@ -327,6 +328,25 @@ class RefundTests(RefundTestMixin, StatusTestsMixin, TestCase):
         assert offer.status == ConditionalOffer.CONSUMED
         assert offer.total_discount == 150
 
+    def test_approve_credits_user_discount_ledger(self):
+        """
+        Test that the discounts of the order are taken from the discount ledger of the user once, when the first
+        refund of the order is completed.
+        """
+        user = UserFactory()
+        order = self.create_order(user=user)
+        offer = ConditionalOfferFactory(max_user_discount=150)
+        OrderDiscountFactory(order=order, offer_id=offer.id, frequency=1, amount=100)
+        assert UserDiscountLedger.get_amount(offer, user) == 100
+
+        refunds = [RefundFactory(order=order, user=user), RefundFactory(order=order, user=user)]
+        for refund in refunds:
+            with mock.patch.object(models, 'revoke_fulfillment_for_refund') as mock_revoke:
+                mock_revoke.return_value = True
+                self.assertTrue(refund.approve())
+
+        assert UserDiscountLedger.get_amount(offer, user) == 0
+
     def test_approve_payment_error(self):
         """
         If payment refund fails, the Refund status should be set to Payment Refund Error, and the RefundLine
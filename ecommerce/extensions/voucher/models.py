@@ -52,6 +52,9 @@ class Voucher(AbstractVoucher):
     )
 
     def is_available_to_user(self, user=None):
+        if 'applications' in getattr(self, '_prefetched_objects_cache', {}):
+            return self._is_available_to_user_from_prefetched_applications(user)
+
         is_available, message = super(Voucher, self).is_available_to_user(user)  # pylint: disable=bad-super-call
 
         if self.usage == self.MULTI_USE_PER_CUSTOMER:
@@ -64,6 +67,31 @@ class Voucher(AbstractVoucher):
 
         return is_available, message
 
+    def _is_available_to_user_from_prefetched_applications(self, user):
+        """
+        Same as is_available_to_user, answered from the prefetched applications of the voucher.
+        """
+        applications = self.applications.all()
+        is_available, message = False, ''
+        if self.usage == self.SINGLE_USE:
+            is_available = not applications
+            if not is_available:
+                message = _('This voucher has already been used')
+        elif self.usage == self.MULTI_USE:
+            is_available = True
+        elif self.usage == self.ONCE_PER_CUSTOMER:
+            if not user.is_authenticated:
+                message = _('This voucher is only available to signed in users')
+            else:
+                is_available = not any(application.user_id == user.id for application in applications)
+                if not is_available:
+                    message = _('You have already used this voucher in a previous order')
+        elif self.usage == self.MULTI_USE_PER_CUSTOMER:
+            is_available = not any(application.user_id != user.id for application in applications)
+            if not is_available:
+                message = _('This voucher is assigned to another user.')
+        return is_available, message
+
     def save(self, *args, **kwargs):
         self.clean()
         super(Voucher, self).save(*args, **kwargs)  # pylint: disable=bad-super-call
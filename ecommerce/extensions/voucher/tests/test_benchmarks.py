@@ -0,0 +1,52 @@
+"""
+Benchmarks for bulk voucher code generation.
+
+These are deselected by default, run them with:
+
+    pytest -m benchmark -s ecommerce/extensions/voucher/tests/test_benchmarks.py
+"""
+import datetime
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from oscar.core.loading import get_model
+
+from ecommerce.extensions.test.factories import ConditionalOfferFactory
+from ecommerce.extensions.voucher.utils import create_vouchers_and_attach_offers
+from ecommerce.tests.testcases import TestCase
+
+Voucher = get_model('voucher', 'Voucher')
+
+QUANTITIES = (1000, 10000, 100000)
+
+
+@pytest.mark.benchmark
+class VoucherCodeGenerationBenchmark(TestCase):
+    """ Measures how voucher creation throughput scales with the number of codes. """
+
+    def test_create_vouchers_and_attach_offers(self):
+        offer = ConditionalOfferFactory()
+        now = datetime.datetime.now()
+
+        for quantity in QUANTITIES:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                vouchers = create_vouchers_and_attach_offers(
+                    code=None,
+                    end_datetime=now + datetime.timedelta(days=1),
+                    enterprise_customer=None,
+                    enterprise_offers=[],
+                    name='Benchmark {}'.format(quantity),
+                    offers=[offer],
+                    quantity=quantity,
+                    start_datetime=now,
+                    voucher_type=Voucher.SINGLE_USE,
+                )
+                elapsed = time.perf_counter() - start
+
+            self.assertEqual(len(vouchers), quantity)
+            print('{quantity:>7} codes: {elapsed:8.2f}s {rate:10.0f} codes/s {queries:>6} queries'.format(
+                quantity=quantity, elapsed=elapsed, rate=quantity / elapsed, queries=len(queries)
+            ))
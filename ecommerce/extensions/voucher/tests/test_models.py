@@ -1,8 +1,10 @@
 
 
 import datetime
+import itertools
 
 import ddt
+from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
 from django.utils.timezone import now
 from oscar.core.loading import get_model
@@ -126,6 +128,31 @@ class VoucherTests(TestCase):
         is_available, message = voucher.is_available_to_user(user2)
         assert (is_available, message) == (False, 'This voucher is assigned to another user.')
 
+    @ddt.data(*itertools.product(
+        (Voucher.SINGLE_USE, Voucher.MULTI_USE, Voucher.ONCE_PER_CUSTOMER, Voucher.MULTI_USE_PER_CUSTOMER),
+        ((), (0,), (1,), (0, 1)),
+    ))
+    @ddt.unpack
+    def test_is_available_to_user_with_prefetched_applications(self, usage, applied_user_indexes):
+        """
+        Verify the availability of a voucher is the same, without queries, when its applications are prefetched,
+        whoever used the voucher before.
+        """
+        voucher = factories.VoucherFactory(**dict(self.data, usage=usage))
+        voucher.offers.add(factories.ConditionalOfferFactory())
+        users = [UserFactory(email='test1@example.com'), UserFactory(email='test2@example.com')]
+        for index in applied_user_indexes:
+            voucher.record_usage(OrderFactory(user=users[index]), users[index])
+
+        if usage != Voucher.MULTI_USE_PER_CUSTOMER:
+            users.append(AnonymousUser())
+
+        prefetched_voucher = Voucher.objects.prefetch_related('applications').get(id=voucher.id)
+        for user in users:
+            with self.assertNumQueries(0):
+                availability = prefetched_voucher.is_available_to_user(user)
+            self.assertEqual(availability, voucher.is_available_to_user(user))
+
     def test_slots_available_for_assignment_no_enterprise_offer(self):
         """ Verify that a voucher with no enterprise offer returns none for slots_available_for_assignment. """
         voucher = Voucher.objects.create(**self.data)
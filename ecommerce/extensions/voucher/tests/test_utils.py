@@ -4,10 +4,12 @@
 import uuid
 
 import ddt
+import mock
 import responses
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.translation import ugettext_lazy as _
 from factory.fuzzy import FuzzyText
 from oscar.templatetags.currency_filters import currency
@@ -35,6 +37,8 @@ from ecommerce.extensions.test.factories import create_order, prepare_voucher
 from ecommerce.extensions.voucher.utils import (
     create_vouchers,
     generate_coupon_report,
+    generate_coupon_report_rows,
+    generate_unique_codes,
     get_voucher_and_products_from_code,
     get_voucher_discount_info,
     update_voucher_offer
@@ -53,6 +57,7 @@ ProductCategory = get_model('catalogue', 'ProductCategory')
 ProductClass = get_model('catalogue', 'ProductClass')
 StockRecord = get_model('partner', 'StockRecord')
 Voucher = get_model('voucher', 'Voucher')
+VoucherOffer = get_model('voucher', 'Voucher_offers')
 
 VOUCHER_CODE = "XMASC0DE"
 VOUCHER_CODE_LENGTH = 1
@@ -302,6 +307,54 @@ class UtilTests(CouponMixin, DiscoveryMockMixin, DiscoveryTestMixin, LmsApiMockM
         with self.assertRaises(ValueError):
             create_vouchers(**self.data)
 
+    def test_generate_unique_codes(self):
+        """
+        Test that generated codes are distinct, skip existing voucher codes and
+        are checked against the database once per batch.
+        """
+        existing_codes = ['AAAA', 'BBBB']
+        generated_codes = iter(existing_codes + ['CCCC', 'AAAA', 'DDDD', 'EEEE', 'FFFF'])
+        for code in existing_codes:
+            VoucherFactory(code=code, name=code)
+
+        with mock.patch(
+            'ecommerce.extensions.voucher.utils._generate_random_code', lambda length: next(generated_codes)
+        ):
+            with self.assertNumQueries(2):
+                codes = generate_unique_codes(3, 4, batch_size=3)
+
+        self.assertEqual(sorted(codes), ['CCCC', 'DDDD', 'EEEE'])
+
+    @override_settings(VOUCHER_CODE_LENGTH=VOUCHER_CODE_LENGTH)
+    def test_generate_unique_codes_exhausted(self):
+        """
+        Test that a ValueError is raised when there are not enough unused codes of the given length.
+        """
+        with self.assertRaises(ValueError):
+            generate_unique_codes(33, VOUCHER_CODE_LENGTH)
+
+    def test_create_vouchers_query_count(self):
+        """
+        Test that the number of queries to create vouchers does not grow with their quantity.
+        """
+        self.data['voucher_type'] = Voucher.SINGLE_USE
+        self.data['quantity'] = 1
+        create_vouchers(**self.data)
+
+        self.data['quantity'] = 2
+        with CaptureQueriesContext(connection) as few_vouchers_queries:
+            create_vouchers(**self.data)
+
+        self.data['quantity'] = 50
+        with CaptureQueriesContext(connection) as queries:
+            vouchers = create_vouchers(**self.data)
+
+        self.assertEqual(len(queries), len(few_vouchers_queries))
+        self.assertEqual(len({voucher.code for voucher in vouchers}), 50)
+        self.assertEqual(
+            VoucherOffer.objects.filter(voucher__in=[voucher.id for voucher in vouchers]).count(), 50
+        )
+
     def test_create_discount_coupon(self):
         """
         Test discount voucher creation with specified code
@@ -669,6 +722,32 @@ class UtilTests(CouponMixin, DiscoveryMockMixin, DiscoveryTestMixin, LmsApiMockM
         self.assertEqual(rows[-1]['Redeemed By Username'], self.user.username)
         self.assertEqual(rows[-1]['Redeemed For Course ID'], self.course.id)
 
+    def _count_coupon_report_queries(self, coupon_vouchers, chunk_size):
+        field_names, rows = generate_coupon_report_rows(coupon_vouchers, chunk_size=chunk_size)
+        self.assertIn('Order Number', field_names)
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(rows)
+        return len(queries), rows
+
+    def test_generate_coupon_report_rows_query_count(self):
+        """ Verify the number of queries per chunk of vouchers does not depend on the number of redemptions. """
+        self.setup_coupons_for_report()
+        vouchers = self.coupon_vouchers.first().vouchers.all()
+        num_queries, rows = self._count_coupon_report_queries(self.coupon_vouchers, chunk_size=100)
+        self.assertEqual(len(rows), 1 + len(vouchers))
+
+        self.use_voucher('TESTORDER1', vouchers[0], self.user)
+        self.use_voucher('TESTORDER2', vouchers[1], self.user, add_entitlement=True)
+        self.use_voucher('TESTORDER3', vouchers[1], UserFactory())
+        redeemed_num_queries, rows = self._count_coupon_report_queries(self.coupon_vouchers, chunk_size=100)
+        self.assertEqual(len(rows), 1 + len(vouchers) + 3)
+        # Redemptions add the applications, order lines and entitlement UUID lookups, once per chunk.
+        self.assertEqual(redeemed_num_queries, num_queries + 3)
+
+        chunked_num_queries, chunked_rows = self._count_coupon_report_queries(self.coupon_vouchers, chunk_size=1)
+        self.assertEqual(chunked_rows, rows)
+        self.assertGreater(chunked_num_queries, redeemed_num_queries)
+
     def test_generate_coupon_report_for_query_coupon_with_multi_line_order(self):
         """
         Test that coupon report for a query coupon that was used on multi-line order
@@ -6,11 +6,14 @@ import datetime
 import hashlib
 import logging
 import uuid
+from collections import defaultdict
 from decimal import Decimal, DecimalException
 
 import dateutil.parser
 import pytz
 from django.conf import settings
+from django.db.models import Case, F, IntegerField, Prefetch, Q, Value, When
+from django.db.models.functions import Coalesce, NullIf
 from django.urls import reverse
 from django.utils.translation import ugettext_lazy as _
 from edx_django_utils.cache import TieredCache
@@ -39,8 +42,10 @@ Benefit = get_model('offer', 'Benefit')
 Condition = get_model('offer', 'Condition')
 ConditionalOffer = get_model('offer', 'ConditionalOffer')
 CouponVouchers = get_model('voucher', 'CouponVouchers')
+Line = get_model('order', 'Line')
 Order = get_model('order', 'Order')
 Product = get_model('catalogue', 'Product')
+ProductAttributeValue = get_model('catalogue', 'ProductAttributeValue')
 ProductCategory = get_model('catalogue', 'ProductCategory')
 Range = get_model('offer', 'Range')
 StockRecord = get_model('partner', 'StockRecord')
@@ -48,6 +53,10 @@ Voucher = get_model('voucher', 'Voucher')
 VoucherApplication = get_model('voucher', 'VoucherApplication')
 VoucherOffer = get_model('voucher', 'Voucher_offers')
 
+COUPON_REPORT_CHUNK_SIZE = 1000
+VOUCHER_CODE_BATCH_SIZE = 1000
+VOUCHER_CODE_MAX_ATTEMPTS = 100
+
 
 def _add_redemption_course_ids(new_row_to_append, header_row, redemption_course_ids):
     if any(row in [_('Catalog Query'), _('Program UUID')] for row in header_row):
@@ -195,11 +204,12 @@ def _get_info_for_coupon_report(coupon, voucher):
     return coupon_data
 
 
-def _get_voucher_info_for_coupon_report(voucher):
-    offer = voucher.best_offer
+def _get_voucher_info_for_coupon_report(voucher, offer=None, redemption_url=None):
+    offer = offer or voucher.best_offer
     status = _get_voucher_status(voucher, offer)
-    path = '{path}?code={code}'.format(path=reverse('coupons:offer'), code=voucher.code)
-    url = get_ecommerce_url(path)
+    if redemption_url is None:
+        redemption_url = get_ecommerce_url(reverse('coupons:offer'))
+    url = '{url}?code={code}'.format(url=redemption_url, code=voucher.code)
 
     # Set the max_uses_count for single-use vouchers to 1,
     # for other usage limitations (once per customer and multi-use)
@@ -226,11 +236,61 @@ def _get_voucher_info_for_coupon_report(voucher):
     return coupon_data
 
 
-def _get_redemption_course_ids(voucher_application):
+def get_prefetched_best_offer(voucher):
+    """
+    Same as Voucher.best_offer, computed from offers prefetched with their conditions.
+    """
+    offers = list(voucher.offers.all())
+    for offer in offers:
+        if offer.condition.enterprise_customer_uuid:
+            return offer
+
+    range_offers = [offer for offer in offers if offer.condition.range_id is not None]
+    if range_offers:
+        return min(range_offers, key=lambda offer: (-offer.priority, offer.pk))
+    return min(offers, key=lambda offer: offer.date_created)
+
+
+def get_available_slots_expression(max_global_applications):
+    """
+    Same as Voucher.calculate_available_slots, as an expression over vouchers annotated with `num_assignments`.
+
+    Arguments:
+        max_global_applications (Expression): The max global applications of the enterprise offer of the vouchers.
+    """
+    max_global_applications = NullIf(max_global_applications, Value(0))
+    single_assignment = Q(usage__in=[Voucher.SINGLE_USE, Voucher.MULTI_USE_PER_CUSTOMER])
+    return Case(
+        When(single_assignment & (Q(num_orders__gt=0) | Q(num_assignments__gt=0)), then=Value(0)),
+        When(single_assignment, then=Coalesce(max_global_applications, Value(1))),
+        default=(
+            Coalesce(max_global_applications, Value(OFFER_MAX_USES_DEFAULT)) - F('num_orders') - F('num_assignments')
+        ),
+        output_field=IntegerField(),
+    )
+
+
+def _get_entitlement_uuids(products):
+    """
+    Return the course UUIDs of the given entitlement products, keyed by product id, using a single query.
+    """
+    product_ids = {product.id for product in products} | {product.parent_id for product in products}
+    attribute_values = ProductAttributeValue.objects.filter(
+        attribute__code='UUID', product_id__in=product_ids
+    ).values_list('product_id', 'value_text')
+    uuids = dict(attribute_values)
+    return {
+        product.id: uuids.get(product.id, uuids.get(product.parent_id))
+        for product in products
+    }
+
+
+def _get_redemption_course_ids(voucher_application, entitlement_uuids=None):
     """
     Return list of course ids where voucher is applied
     Args:
         voucher_application: voucher application object
+        entitlement_uuids (dict): Optional course UUIDs of the entitlement products keyed by product id.
 
     Returns:
          list of course ids where voucher is applied.
@@ -239,7 +299,10 @@ def _get_redemption_course_ids(voucher_application):
     for line in voucher_application.order.lines.all():
         if line.product:
             if line.product.is_course_entitlement_product:
-                redemption_course_ids.append(line.product.attr.UUID)
+                if entitlement_uuids is not None:
+                    redemption_course_ids.append(entitlement_uuids[line.product.id])
+                else:
+                    redemption_course_ids.append(line.product.attr.UUID)
             else:
                 redemption_course_ids.append(line.product.course_id)
         else:
@@ -247,16 +310,85 @@ def _get_redemption_course_ids(voucher_application):
     return redemption_course_ids
 
 
-def generate_coupon_report(coupon_vouchers):
+def _get_voucher_applications(voucher_ids):
     """
-    Generate coupon report data
+    Return the applications of the given vouchers keyed by voucher id, along with the course UUIDs of
+    the entitlement products they were redeemed for, using a fixed number of queries.
+    """
+    lines = Line.objects.select_related('product__product_class', 'product__parent__product_class')
+    applications = VoucherApplication.objects.filter(voucher_id__in=voucher_ids).select_related(
+        'user', 'order'
+    ).prefetch_related(Prefetch('order__lines', queryset=lines))
+
+    applications_by_voucher = defaultdict(list)
+    entitlement_products = []
+    for application in applications:
+        applications_by_voucher[application.voucher_id].append(application)
+        entitlement_products.extend(
+            line.product for line in application.order.lines.all()
+            if line.product and line.product.is_course_entitlement_product
+        )
+
+    return applications_by_voucher, _get_entitlement_uuids(entitlement_products)
+
+
+def _iter_voucher_rows_for_coupon_report(coupon_voucher, header_row, chunk_size):
+    """
+    Yield the report rows of every voucher of the coupon, fetching vouchers and their redemptions chunk by chunk.
+    """
+    redemption_url = get_ecommerce_url(reverse('coupons:offer'))
+    offers = ConditionalOffer.objects.select_related('condition', 'benefit')
+    voucher_ids = list(coupon_voucher.vouchers.values_list('id', flat=True))
+
+    for index in range(0, len(voucher_ids), chunk_size):
+        chunk_ids = voucher_ids[index:index + chunk_size]
+        vouchers = Voucher.objects.filter(id__in=chunk_ids).prefetch_related(Prefetch('offers', queryset=offers))
+        vouchers_by_id = {voucher.id: voucher for voucher in vouchers}
+        applications_by_voucher, entitlement_uuids = _get_voucher_applications(
+            [voucher.id for voucher in vouchers_by_id.values() if voucher.num_orders > 0]
+        )
+
+        for voucher_id in chunk_ids:
+            voucher = vouchers_by_id[voucher_id]
+            row = _get_voucher_info_for_coupon_report(
+                voucher, offer=get_prefetched_best_offer(voucher), redemption_url=redemption_url
+            )
+
+            for item in (_('Order Number'), _('Redeemed By Username'),):
+                row[item] = ''
+
+            yield row
+
+            for application in applications_by_voucher[voucher_id]:
+                redemption_course_ids = _get_redemption_course_ids(application, entitlement_uuids)
+
+                new_row = row.copy()
+                _add_redemption_course_ids(new_row, header_row, redemption_course_ids)
+                new_row.update({
+                    _('Status'): _('Redeemed'),
+                    _('Order Number'): application.order.number,
+                    _('Redeemed By Username'): application.user.username,
+                    _('Maximum Coupon Usage'): 1,
+                    _('Redemption Count'): 1,
+                })
+                yield new_row
+
+
+def generate_coupon_report_rows(coupon_vouchers, chunk_size=COUPON_REPORT_CHUNK_SIZE):
+    """
+    Generate coupon report data lazily.
+
+    The coupon level data of the first coupon is computed eagerly, so lookup errors are raised
+    before the first row is consumed, while voucher rows are only fetched from the database,
+    a chunk of vouchers at a time, while the rows are being iterated over.
 
     Args:
-        coupon_vouchers (List[CouponVouchers]): List of coupon_vouchers the report should be generated for
+        coupon_vouchers (Iterable[CouponVouchers]): coupon_vouchers the report should be generated for
+        chunk_size (int): Number of vouchers fetched per batch of queries
 
     Returns:
         List[str]
-        List[dict]
+        Iterator[dict]
     """
 
     field_names = [
@@ -288,48 +420,34 @@ def generate_coupon_report(coupon_vouchers):
         _('Coupon Expiry Date'),
         _('Email Domains'),
     ]
-    rows = []
 
-    for coupon_voucher in coupon_vouchers:
+    def _get_coupon_row(coupon_voucher):
         coupon = coupon_voucher.coupon
-        client = Invoice.objects.get(order__lines__product=coupon).business_client.name
-        rows.append(_get_info_for_coupon_report(coupon, coupon_voucher.vouchers.first()))
-        rows[0][_('Client')] = client
-
-        for voucher in coupon_voucher.vouchers.all().prefetch_related('offers'):
-            row = _get_voucher_info_for_coupon_report(voucher)
-
-            for item in (_('Order Number'), _('Redeemed By Username'),):
-                row[item] = ''
+        coupon_row = _get_info_for_coupon_report(coupon, coupon_voucher.vouchers.first())
+        coupon_row[_('Client')] = Invoice.objects.get(order__lines__product=coupon).business_client.name
+        return coupon_row
 
-            rows.append(row)
+    coupon_vouchers = iter(coupon_vouchers)
+    first_coupon_voucher = next(coupon_vouchers, None)
+    if first_coupon_voucher is None:
+        return field_names, iter([])
 
-            if voucher.num_orders > 0:
-                voucher_applications = VoucherApplication.objects.filter(
-                    voucher=voucher).prefetch_related('user', 'order__lines')
+    header_row = _get_coupon_row(first_coupon_voucher)
 
-                for application in voucher_applications:
-                    redemption_course_ids = _get_redemption_course_ids(application)
-                    redemption_user_username = application.user.username
+    def _iter_rows():
+        yield header_row
+        yield from _iter_voucher_rows_for_coupon_report(first_coupon_voucher, header_row, chunk_size)
+        for coupon_voucher in coupon_vouchers:
+            yield _get_coupon_row(coupon_voucher)
+            yield from _iter_voucher_rows_for_coupon_report(coupon_voucher, header_row, chunk_size)
 
-                    new_row = row.copy()
-                    _add_redemption_course_ids(new_row, rows[0], redemption_course_ids)
-                    new_row.update({
-                        _('Status'): _('Redeemed'),
-                        _('Order Number'): application.order.number,
-                        _('Redeemed By Username'): redemption_user_username,
-                        _('Maximum Coupon Usage'): 1,
-                        _('Redemption Count'): 1,
-                    })
-                    rows.append(new_row)
-
-    if _('Program UUID') in rows[0]:
+    if _('Program UUID') in header_row:
         field_names.remove(_('Course ID'))
         field_names.remove(_('Organization'))
         field_names.remove(_('Catalog Query'))
         field_names.remove(_('Course Seat Types'))
         field_names.remove(_('Redeemed For Course ID'))
-    elif _('Catalog Query') in rows[0]:
+    elif _('Catalog Query') in header_row:
         field_names.remove(_('Course ID'))
         field_names.remove(_('Organization'))
         field_names.remove(_('Program UUID'))
@@ -340,7 +458,22 @@ def generate_coupon_report(coupon_vouchers):
         field_names.remove(_('Redeemed For Course IDs'))
         field_names.remove(_('Program UUID'))
 
-    return field_names, rows
+    return field_names, _iter_rows()
+
+
+def generate_coupon_report(coupon_vouchers):
+    """
+    Generate coupon report data
+
+    Args:
+        coupon_vouchers (List[CouponVouchers]): List of coupon_vouchers the report should be generated for
+
+    Returns:
+        List[str]
+        List[dict]
+    """
+    field_names, rows = generate_coupon_report_rows(coupon_vouchers)
+    return field_names, list(rows)
 
 
 def generate_offer_name(coupon_id, benefit_type, benefit_value, offer_number=None, is_enterprise=False):
@@ -488,6 +621,12 @@ def get_or_create_enterprise_offer(
     return offer
 
 
+def _generate_random_code(length):
+    h = hashlib.sha256()
+    h.update(uuid.uuid4().bytes)
+    return base64.b32encode(h.digest())[0:length].decode('utf-8')
+
+
 def _generate_code_string(length):
     """
     Create a string of random characters of specified length
@@ -501,16 +640,55 @@ def _generate_code_string(length):
     Returns:
         str
     """
+    return generate_unique_codes(1, length)[0]
+
+
+def generate_unique_codes(quantity, length, batch_size=VOUCHER_CODE_BATCH_SIZE):
+    """
+    Create a list of distinct random codes of specified length that are not used by any existing voucher.
+
+    Candidate codes are generated a batch at a time and deduplicated in memory, so collisions with
+    existing vouchers are checked with a single query per batch.
+
+    Args:
+        quantity (int): Number of codes to generate.
+        length (int): Defines the length of randomly generated codes.
+        batch_size (int): Maximum number of codes checked against the database per query.
+
+    Raises:
+        ValueError raised if length is less than one, or if unused codes could not be found.
+
+    Returns:
+        List[str]
+    """
     if length < 1:
         raise ValueError("Voucher code length must be a positive number.")
 
-    h = hashlib.sha256()
-    h.update(uuid.uuid4().bytes)
-    voucher_code = base64.b32encode(h.digest())[0:length].decode('utf-8')
-    if Voucher.objects.filter(code__iexact=voucher_code).exists():
-        return _generate_code_string(length)
-
-    return voucher_code
+    codes = []
+    generated = set()
+    attempts = 0
+    while len(codes) < quantity:
+        attempts += 1
+        if attempts > VOUCHER_CODE_MAX_ATTEMPTS:
+            raise ValueError("Unable to generate [{}] unique voucher codes of length [{}].".format(quantity, length))
+
+        candidates = set()
+        batch_quantity = min(quantity - len(codes), batch_size)
+        # Bound the number of draws so short code lengths with few free codes cannot loop forever.
+        for __ in range(batch_quantity * 2):
+            code = _generate_random_code(length)
+            if code not in generated:
+                candidates.add(code)
+                generated.add(code)
+                if len(candidates) == batch_quantity:
+                    break
+
+        existing_codes = {code.upper() for code in Voucher.objects.filter(code__in=candidates).values_list(
+            'code', flat=True
+        )}
+        codes.extend(code for code in candidates if code not in existing_codes)
+
+    return codes
 
 
 def create_new_voucher(code, end_datetime, name, start_datetime, voucher_type):
@@ -530,23 +708,54 @@ def create_new_voucher(code, end_datetime, name, start_datetime, voucher_type):
     Returns:
         Voucher
     """
-    voucher_code = code or _generate_code_string(settings.VOUCHER_CODE_LENGTH)
+    return bulk_create_vouchers([code or _generate_code_string(settings.VOUCHER_CODE_LENGTH)],
+                                end_datetime, name, start_datetime, voucher_type)[0]
+
+
+def bulk_create_vouchers(codes, end_datetime, name, start_datetime, voucher_type):
+    """
+    Creates a voucher for each of the given codes with a single INSERT per batch.
+
+    Args:
+        codes (List[str]): Codes of the vouchers.
+        end_datetime (datetime): Voucher end date.
+        name (str): Voucher name, suffixed with the code of each voucher.
+        start_datetime (datetime): Voucher start date.
+        voucher_type (str): Voucher usage.
+
+    Returns:
+        List[Voucher], in the same order as the codes.
+    """
     if not isinstance(start_datetime, datetime.datetime):
         start_datetime = dateutil.parser.parse(start_datetime)
 
     if not isinstance(end_datetime, datetime.datetime):
         end_datetime = dateutil.parser.parse(end_datetime)
 
-    name = name[:128 - len(voucher_code)] + voucher_code
-    voucher = Voucher.objects.create(
-        name=name,
-        code=voucher_code,
-        usage=voucher_type,
-        start_datetime=start_datetime,
-        end_datetime=end_datetime,
-    )
+    vouchers = []
+    for code in codes:
+        voucher = Voucher(
+            name=name[:128 - len(code)] + code,
+            code=code.upper(),
+            usage=voucher_type,
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+        )
+        # bulk_create does not call save, which is where vouchers are validated.
+        voucher.clean()
+        vouchers.append(voucher)
 
-    return voucher
+    Voucher.objects.bulk_create(vouchers, batch_size=VOUCHER_CODE_BATCH_SIZE)
+
+    # Not every database backend returns the primary keys of bulk created rows, fetch them by code.
+    for index in range(0, len(vouchers), VOUCHER_CODE_BATCH_SIZE):
+        batch = vouchers[index:index + VOUCHER_CODE_BATCH_SIZE]
+        ids_by_code = dict(
+            Voucher.objects.filter(code__in=[voucher.code for voucher in batch]).values_list('code', 'id')
+        )
+        for voucher in batch:
+            voucher.id = ids_by_code[voucher.code]
+    return vouchers
 
 
 def create_vouchers_and_attach_offers(
@@ -577,17 +786,12 @@ def create_vouchers_and_attach_offers(
     Returns:
         List[Voucher]
     """
-    vouchers = []
+    codes = [code] * quantity if code else generate_unique_codes(quantity, settings.VOUCHER_CODE_LENGTH)
+    vouchers = bulk_create_vouchers(codes, end_datetime, name, start_datetime, voucher_type)
+
     voucher_offers = []
     enterprise_voucher_offers = []
-    for i in range(quantity):
-        voucher = create_new_voucher(
-            end_datetime=end_datetime,
-            start_datetime=start_datetime,
-            voucher_type=voucher_type,
-            code=code,
-            name=name
-        )
+    for i, voucher in enumerate(vouchers):
         voucher_offers.append(
             VoucherOffer(voucher=voucher, conditionaloffer=offers[i] if len(offers) > 1 else offers[0])
         )
@@ -598,10 +802,9 @@ def create_vouchers_and_attach_offers(
                     conditionaloffer=enterprise_offers[i] if len(enterprise_offers) > 1 else enterprise_offers[0]
                 )
             )
-        vouchers.append(voucher)
 
-    VoucherOffer.objects.bulk_create(voucher_offers)
-    VoucherOffer.objects.bulk_create(enterprise_voucher_offers)
+    VoucherOffer.objects.bulk_create(voucher_offers, batch_size=VOUCHER_CODE_BATCH_SIZE)
+    VoucherOffer.objects.bulk_create(enterprise_voucher_offers, batch_size=VOUCHER_CODE_BATCH_SIZE)
     return vouchers
 
 
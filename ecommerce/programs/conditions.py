@@ -2,9 +2,13 @@
 
 import logging
 import operator
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import parse_qs, urlparse
 
 from django.conf import settings
-from edx_django_utils.cache import TieredCache
+from django.core.cache import cache
+from edx_django_utils.cache import DEFAULT_REQUEST_CACHE, TieredCache
 from oscar.apps.offer import utils as oscar_utils
 from oscar.core.loading import get_model
 from requests.exceptions import ConnectionError as ReqConnectionError
@@ -13,11 +17,30 @@ from requests.exceptions import HTTPError, RequestException, Timeout
 from ecommerce.core.utils import deprecated_traverse_pagination, get_cache_key
 from ecommerce.extensions.offer.decorators import check_condition_applicability
 from ecommerce.extensions.offer.mixins import SingleItemConsumptionConditionMixin
-from ecommerce.programs.utils import get_program
+from ecommerce.programs.utils import get_program, get_program_index
 
 Condition = get_model('offer', 'Condition')
 logger = logging.getLogger(__name__)
 
+# Bounded pool, shared by all requests of the process, used to fetch user ownership data from LMS concurrently.
+lms_ownership_executor = ThreadPoolExecutor(
+    max_workers=settings.LMS_OWNERSHIP_FETCH_MAX_WORKERS, thread_name_prefix='lms-ownership'
+)
+
+
+def _fetch_lms_resource(client, endpoint, params, cache_key):
+    """
+    Retrieve a page of an LMS resource and cache it in the django cache.
+
+    This runs on lms_ownership_executor and may complete after the request stopped waiting for it, in which
+    case the cached page is used by the next request of the user. It must not use the database or the request cache.
+    """
+    response = client.get(endpoint, params=params)
+    response.raise_for_status()
+    data = response.json() or []
+    cache.set(cache_key, data, settings.LMS_API_CACHE_TIMEOUT)
+    return data
+
 
 class ProgramCourseRunSeatsCondition(SingleItemConsumptionConditionMixin, Condition):
     class Meta:
@@ -28,84 +51,122 @@ class ProgramCourseRunSeatsCondition(SingleItemConsumptionConditionMixin, Condit
     def name(self):
         return 'Basket contains a seat for every course in program {}'.format(self.program_uuid)
 
-    def _get_applicable_skus(self, site_configuration):
-        """ SKUs to which this condition applies. """
-        program_skus = set()
+    def _get_program_index(self, site_configuration):
+        """ ProgramIndex of the program to which this condition applies, None if the program is unavailable. """
         program = get_program(self.program_uuid, site_configuration)
         if program:
-            applicable_seat_types = program['applicable_seat_types']
+            return get_program_index(program, site_configuration)
+        return None
 
-            for course in program['courses']:
-                for course_run in course['course_runs']:
-                    program_skus.update(
-                        {seat['sku'] for seat in course_run['seats'] if seat['type'] in applicable_seat_types}
-                    )
-                for entitlement in course['entitlements']:
-                    if entitlement['mode'].lower() in applicable_seat_types:
-                        program_skus.add(entitlement['sku'])
-        return program_skus
-
-    def _get_lms_resource_for_user(self, basket, resource_name, client, endpoint):
-        cache_key = get_cache_key(
-            site_domain=basket.site.domain,
-            resource=resource_name,
-            username=basket.owner.username,
-        )
-        data_list_cached_response = TieredCache.get_cached_response(cache_key)
-        if data_list_cached_response.is_found:
-            return data_list_cached_response.value
+    def _get_applicable_skus(self, site_configuration):
+        """ SKUs to which this condition applies. """
+        program_index = self._get_program_index(site_configuration)
+        return program_index.applicable_skus if program_index else frozenset()
 
-        user = basket.owner.username
-        try:
-            response = client.get(endpoint, params={"user": user})
-            response.raise_for_status()
-            data_list = response.json() or []
-            TieredCache.set_all_tiers(cache_key, data_list, settings.LMS_API_CACHE_TIMEOUT)
-        except (ReqConnectionError, RequestException, Timeout) as exc:
-            logger.error('Failed to retrieve %s : %s', resource_name, str(exc))
-            data_list = []
-        return data_list
-
-    def _get_lms_resource(self, basket, resource_name, client, endpoint):
-        if not basket.owner:
-            return []
-        return self._get_lms_resource_for_user(basket, resource_name, client, endpoint)
+    def _get_lms_resource_cache_key(self, basket, resource_name, page=None):
+        kwargs = {'site_domain': basket.site.domain, 'resource': resource_name, 'username': basket.owner.username}
+        if page:
+            kwargs['page'] = page
+        return get_cache_key(**kwargs)
+
+    def _get_lms_resources_for_user(self, basket, client, resources, deadline):
+        """
+        Retrieves LMS resources for the basket owner concurrently, each one from the cache if possible.
+
+        Args:
+            basket (Basket): Basket of the user.
+            client (requests.Session): OAuthAPIClient of the site.
+            resources (list): (resource_name, endpoint, params) tuples, where params are extra query parameters.
+            deadline (float): time.monotonic() value after which resources still being retrieved are skipped.
+
+        Returns:
+            list: Data of each resource, in the order of resources. None for resources which could not be retrieved.
+        """
+        results = [None] * len(resources)
+        futures = {}
+        for position, (resource_name, endpoint, params) in enumerate(resources):
+            cache_key = self._get_lms_resource_cache_key(basket, resource_name, (params or {}).get('page'))
+            data_list_cached_response = TieredCache.get_cached_response(cache_key)
+            if data_list_cached_response.is_found:
+                results[position] = data_list_cached_response.value
+                continue
+
+            params = dict(params or {}, user=basket.owner.username)
+            future = lms_ownership_executor.submit(_fetch_lms_resource, client, endpoint, params, cache_key)
+            futures[future] = (position, resource_name, cache_key)
+
+        done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+        for future in done:
+            position, resource_name, cache_key = futures[future]
+            try:
+                results[position] = future.result()
+            except (ReqConnectionError, RequestException, Timeout) as exc:
+                logger.error('Failed to retrieve %s : %s', resource_name, str(exc))
+                continue
+            # The page is already in the django cache, set by _fetch_lms_resource.
+            DEFAULT_REQUEST_CACHE.set(cache_key, results[position])
+
+        for future in not_done:
+            future.cancel()
+            logger.warning(
+                'Timed out retrieving %s for user [%s], continuing without it.',
+                futures[future][1], basket.owner.username
+            )
+        return results
+
+    def _get_paginated_lms_resource_for_user(self, basket, resource_name, client, endpoint, response, deadline):
+        """
+        Retrieves the remaining pages of a paginated LMS resource concurrently and concatenates their results.
+
+        Pages which could not be retrieved before the deadline are skipped.
+        """
+        if not isinstance(response, dict):
+            return response or []
+
+        results = list(response.get('results', []))
+        next_page = response.get('next')
+        if not next_page:
+            return results
+
+        querystring = parse_qs(urlparse(next_page).query, keep_blank_values=True)
+        num_pages = response.get('num_pages')
+        if 'page' not in querystring or not num_pages:
+            return deprecated_traverse_pagination(response, client, endpoint)
+
+        querystring.pop('user', None)
+        pages = range(int(querystring['page'][0]), num_pages + 1)
+        resources = [(resource_name, endpoint, dict(querystring, page=page)) for page in pages]
+        for page_response in self._get_lms_resources_for_user(basket, client, resources, deadline):
+            if isinstance(page_response, dict):
+                results += page_response.get('results', [])
+        return results
 
     def _get_user_ownership_data(self, basket, retrieve_entitlements=False):
         """
         Retrieves existing enrollments and entitlements for a user from LMS
+
+        Enrollments, entitlements and the later pages of entitlements are retrieved concurrently within
+        settings.LMS_OWNERSHIP_FETCH_TIMEOUT. Whatever could not be retrieved in time is treated as not owned.
         """
         enrollments = []
         entitlements = []
 
         site_configuration = basket.site.siteconfiguration
-        if site_configuration.enable_partial_program:
+        if site_configuration.enable_partial_program and basket.owner:
             client = site_configuration.oauth_api_client
-            enrollments = self._get_lms_resource(
-                basket, 'enrollments', client, site_configuration.enrollments_api_url
-            )
-            entitlements_api_url = site_configuration.entitlements_api_url
+            deadline = time.monotonic() + settings.LMS_OWNERSHIP_FETCH_TIMEOUT
+            resources = [('enrollments', site_configuration.enrollments_api_url, None)]
             if retrieve_entitlements:
-                response = self._get_lms_resource(
-                    basket, 'entitlements', client, entitlements_api_url
+                resources.append(('entitlements', site_configuration.entitlements_api_url, None))
+
+            responses = self._get_lms_resources_for_user(basket, client, resources, deadline)
+            enrollments = responses[0] or []
+            if retrieve_entitlements:
+                entitlements = self._get_paginated_lms_resource_for_user(
+                    basket, 'entitlements', client, site_configuration.entitlements_api_url, responses[1], deadline
                 )
-                if isinstance(response, dict):
-                    entitlements = deprecated_traverse_pagination(
-                        response, client, entitlements_api_url
-                    )
-                else:
-                    entitlements = response
         return enrollments, entitlements
 
-    def _has_entitlements(self, program):
-        """
-        Determines whether an entitlement product exists for any course in the program.
-        """
-        for course in program['courses']:
-            if course['entitlements']:
-                return True
-        return False
-
     @check_condition_applicability()
     def is_satisfied(self, offer, basket):  # pylint: disable=unused-argument
         """
@@ -129,45 +190,27 @@ class ProgramCourseRunSeatsCondition(SingleItemConsumptionConditionMixin, Condit
         else:
             return False
 
-        retrieve_entitlements = self._has_entitlements(program)
-        enrollments, entitlements = self._get_user_ownership_data(basket, retrieve_entitlements)
-
-        for course in program['courses']:
-            # If the user is already enrolled in a course, we do not need to check their basket for it
-            if any(enrollment['course_details']['course_id'] in [run['key'] for run in course['course_runs']] and
-                   enrollment['mode'] in applicable_seat_types for enrollment in enrollments):
-                continue
-            if any(course['uuid'] == entitlement['course_uuid'] and
-                   entitlement['mode'] in applicable_seat_types for entitlement in entitlements):
-                continue
+        program_index = get_program_index(program, basket.site.siteconfiguration)
+        enrollments, entitlements = self._get_user_ownership_data(basket, program_index.has_entitlements)
+
+        # If the user is already enrolled in or entitled to a course, we do not need to check their basket for it
+        owned_course_uuids = {
+            program_index.run_key_to_course_uuid.get(enrollment['course_details']['course_id'])
+            for enrollment in enrollments if enrollment['mode'] in applicable_seat_types
+        }
+        owned_course_uuids.update(
+            entitlement['course_uuid'] for entitlement in entitlements
+            if entitlement['mode'] in applicable_seat_types
+        )
 
-            # If the  basket has no SKUs left, but we still have courses over which
-            # to iterate, the user cannot meet the condition that all courses be represented.
-            if not basket_skus:
-                return False
-
-            # Get all of the SKUs that can satisfy this course
-            skus = set()
-            for course_run in course['course_runs']:
-                skus.update({seat['sku'] for seat in course_run['seats'] if seat['type'] in applicable_seat_types})
-            for entitlement in course['entitlements']:
-                if entitlement['mode'].lower() in applicable_seat_types:
-                    skus.add(entitlement['sku'])
-
-            # The lack of a difference in the set of SKUs in the basket and the course indicates that
-            # that there is no intersection. Therefore, the basket contains no SKUs for the current course.
-            # Because the user is also not enrolled in the course, it follows that the program condition is not met.
-            diff = basket_skus.difference(skus)
-            if diff == basket_skus:
-                return False
-
-            # If there is a difference between the basket SKUs and course SKUs, it represents the basket SKUs
-            # minus the SKUs for the current course. Since we have already verified the course is represented,
-            # its SKUs can be safely removed from the set of SKUs in the basket being checked. Note that this
-            # does NOT affect the actual basket, just our copy of its SKUs.
-            basket_skus = diff
-
-        return True
+        # Every other course of the program must be represented by at least one SKU in the basket.
+        basket_course_uuids = {
+            program_index.sku_to_course_uuid[sku] for sku in basket_skus if sku in program_index.sku_to_course_uuid
+        }
+        return all(
+            course_uuid in owned_course_uuids or course_uuid in basket_course_uuids
+            for course_uuid in program_index.course_uuids
+        )
 
     def can_apply_condition(self, line):
         """ Determines whether the condition can be applied to a given basket line. """
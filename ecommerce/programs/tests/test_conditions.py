@@ -1,13 +1,20 @@
 
 
+import threading
+import time
+
 import ddt
 import mock
 import responses
+from django.core.cache import cache
 from oscar.core.loading import get_model
 from oscar.test.factories import BasketFactory
 from requests import HTTPError, RequestException, Timeout
+from responses import matchers
+from testfixtures import LogCapture
 
 from ecommerce.core.constants import COURSE_ENTITLEMENT_PRODUCT_CLASS_NAME
+from ecommerce.core.url_utils import get_lms_entitlement_api_url
 from ecommerce.courses.models import Course
 from ecommerce.extensions.test import factories
 from ecommerce.programs.tests.mixins import ProgramTestMixin
@@ -276,27 +283,123 @@ class ProgramCourseRunSeatsConditionTests(ProgramTestMixin, TestCase):
             mock_processing_entitlements.assert_not_called()
 
     @responses.activate
-    def test_get_lms_resource_for_user_caching_none(self):
+    def test_get_lms_resources_for_user_caching_none(self):
         """
         LMS resource should be properly cached when enrollments is None.
         """
         basket = BasketFactory(site=self.site, owner=UserFactory())
-        resource_name = 'test_resource_name'
+        resources = [('test_resource_name', 'fake-url', None)]
         mock_client = mock.Mock()
         mock_client.get.return_value.json.return_value = None
 
-        return_value = self.condition._get_lms_resource_for_user(basket, resource_name, mock_client, 'fake-url')  # pylint: disable=protected-access
+        return_value = self.condition._get_lms_resources_for_user(  # pylint: disable=protected-access
+            basket, mock_client, resources, time.monotonic() + 5
+        )
 
-        self.assertEqual(return_value, [])
+        self.assertEqual(return_value, [[]])
         self.assertEqual(mock_client.get.call_count, 1, 'Endpoint should be called before caching.')
 
         mock_client.reset_mock()
 
-        return_value = self.condition._get_lms_resource_for_user(basket, resource_name, mock_client, 'fake-url')  # pylint: disable=protected-access
+        return_value = self.condition._get_lms_resources_for_user(  # pylint: disable=protected-access
+            basket, mock_client, resources, time.monotonic() + 5
+        )
 
-        self.assertEqual(return_value, [])
+        self.assertEqual(return_value, [[]])
         self.assertEqual(mock_client.get.call_count, 0, 'Endpoint should NOT be called after caching.')
 
+    def test_get_lms_resources_for_user_deadline(self):
+        """
+        Resources should be retrieved concurrently, the ones not retrieved before the deadline skipped, and cached
+        once retrieved.
+        """
+        basket = BasketFactory(site=self.site, owner=UserFactory())
+        resources = [('enrollments', 'enrollments-url', None), ('entitlements', 'entitlements-url', None)]
+        cache_key = self.condition._get_lms_resource_cache_key(  # pylint: disable=protected-access
+            basket, 'entitlements'
+        )
+        # Neither resource is answered before both are requested, which fails unless they are requested together.
+        all_requested = threading.Barrier(len(resources))
+        slow_response = threading.Event()
+        entitlements_cached = threading.Event()
+
+        def get(url, params):  # pylint: disable=unused-argument
+            all_requested.wait(5)
+            response = mock.Mock()
+            response.json.return_value = [url]
+            if url == 'entitlements-url':
+                slow_response.wait(5)
+            return response
+
+        def cache_set(key, *args, **kwargs):
+            cache.set(key, *args, **kwargs)
+            if key == cache_key:
+                entitlements_cached.set()
+
+        mock_client = mock.Mock()
+        mock_client.get.side_effect = get
+        with mock.patch('ecommerce.programs.conditions.cache') as mock_cache:
+            mock_cache.set.side_effect = cache_set
+            with LogCapture(LOGGER_NAME) as logger:
+                deadline = time.monotonic() + 2
+                return_value = self.condition._get_lms_resources_for_user(  # pylint: disable=protected-access
+                    basket, mock_client, resources, deadline
+                )
+                logger.check((
+                    LOGGER_NAME,
+                    'WARNING',
+                    'Timed out retrieving entitlements for user [{}], continuing without it.'.format(
+                        basket.owner.username
+                    )
+                ))
+            self.assertEqual(return_value, [['enrollments-url'], None])
+            self.assertFalse(all_requested.broken)
+
+            # Once the slow page arrives, it is cached for the next request of the user.
+            slow_response.set()
+            self.assertTrue(entitlements_cached.wait(5))
+
+        mock_client.reset_mock()
+        return_value = self.condition._get_lms_resources_for_user(  # pylint: disable=protected-access
+            basket, mock_client, resources, time.monotonic() + 2
+        )
+        self.assertEqual(return_value, [['enrollments-url'], ['entitlements-url']])
+        mock_client.get.assert_not_called()
+
+    @responses.activate
+    def test_is_satisfied_with_paginated_entitlements(self):
+        """
+        The later pages of the user's entitlements should be retrieved and taken into account.
+        """
+        offer = factories.ProgramOfferFactory(partner=self.partner, condition=self.condition)
+        basket = BasketFactory(site=self.site, owner=UserFactory())
+        program = self.mock_program_detail_endpoint(
+            self.condition.program_uuid, self.site_configuration.discovery_api_url
+        )
+        self.mock_user_data(basket.owner.username)
+        entitlements_url = get_lms_entitlement_api_url() + 'entitlements/'
+        for page, course in enumerate(program['courses'], start=1):
+            params = {'user': basket.owner.username}
+            if page > 1:
+                params['page'] = str(page)
+            responses.add(
+                method=responses.GET,
+                url=entitlements_url,
+                match=[matchers.query_param_matcher(params)],
+                json={
+                    'count': len(program['courses']),
+                    'num_pages': len(program['courses']),
+                    'current_page': page,
+                    'results': [{'mode': 'verified', 'course_uuid': course['uuid']}],
+                    'next': '{}?page={}&user={}'.format(entitlements_url, page + 1, basket.owner.username)
+                            if page < len(program['courses']) else None,
+                },
+                content_type='application/json'
+            )
+        basket.add_product(self.test_product)
+
+        self.assertTrue(self.condition.is_satisfied(offer, basket))
+
     @responses.activate
     def test_is_satisfied_with_non_active_program(self):
         """
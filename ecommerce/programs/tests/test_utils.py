@@ -11,7 +11,7 @@ from testfixtures import LogCapture
 
 from ecommerce.programs.api import ProgramsApiClient
 from ecommerce.programs.tests.mixins import ProgramTestMixin
-from ecommerce.programs.utils import get_program
+from ecommerce.programs.utils import build_program_index, get_program, get_program_index
 from ecommerce.tests.testcases import TestCase
 
 LOGGER_NAME = 'ecommerce.programs.utils'
@@ -50,3 +50,54 @@ class UtilTests(ProgramTestMixin, TestCase):
                 self.assertIsNone(response)
                 msg = 'Failed to retrieve program details for {}'.format(self.program_uuid)
                 logger.check((LOGGER_NAME, 'DEBUG', msg))
+
+
+class ProgramIndexTests(TestCase):
+    def setUp(self):
+        super(ProgramIndexTests, self).setUp()
+        self.program = {
+            'uuid': str(uuid.uuid4()),
+            'modified': '2020-01-01T00:00:00Z',
+            'applicable_seat_types': ['verified'],
+            'courses': [
+                {
+                    'uuid': 'course-a',
+                    'course_runs': [
+                        {'key': 'course-v1:a+1', 'seats': [{'type': 'verified', 'sku': 'A1'}]},
+                        {'key': 'course-v1:a+2', 'seats': [{'type': 'audit', 'sku': 'A2'}]},
+                    ],
+                    'entitlements': [{'mode': 'Verified', 'sku': 'AE'}],
+                },
+                {
+                    'uuid': 'course-b',
+                    'course_runs': [{'key': 'course-v1:b+1', 'seats': [{'type': 'verified', 'sku': 'B1'}]}],
+                    'entitlements': [],
+                },
+            ],
+        }
+
+    def test_build_program_index(self):
+        """ The index should map applicable SKUs and run keys to their course. """
+        program_index = build_program_index(self.program)
+        self.assertEqual(program_index.course_uuids, ['course-a', 'course-b'])
+        self.assertEqual(program_index.sku_to_course_uuid, {'A1': 'course-a', 'AE': 'course-a', 'B1': 'course-b'})
+        self.assertEqual(program_index.applicable_skus, frozenset(['A1', 'AE', 'B1']))
+        self.assertEqual(program_index.run_key_to_course_uuid, {
+            'course-v1:a+1': 'course-a',
+            'course-v1:a+2': 'course-a',
+            'course-v1:b+1': 'course-b',
+        })
+        self.assertTrue(program_index.has_entitlements)
+
+    def test_get_program_index_cached_per_modified(self):
+        """ The index should be cached until the program's modified timestamp changes. """
+        site_configuration = self.site.siteconfiguration
+        program_index = get_program_index(self.program, site_configuration)
+
+        with mock.patch('ecommerce.programs.utils.build_program_index', wraps=build_program_index) as mock_build:
+            self.assertEqual(get_program_index(self.program, site_configuration), program_index)
+            mock_build.assert_not_called()
+
+            self.program['modified'] = '2020-01-02T00:00:00Z'
+            get_program_index(self.program, site_configuration)
+            mock_build.assert_called_once_with(self.program)
@@ -1,14 +1,29 @@
 
 
 import logging
+from collections import namedtuple
 
+from django.conf import settings
+from edx_django_utils.cache import TieredCache
 from requests.exceptions import ConnectionError as ReqConnectionError
 from requests.exceptions import HTTPError, Timeout
 
+from ecommerce.core.utils import get_cache_key
 from ecommerce.programs.api import ProgramsApiClient
 
 log = logging.getLogger(__name__)
 
+# Compact view of a program used to evaluate program offers:
+#   course_uuids: UUIDs of the program's courses, in program order.
+#   sku_to_course_uuid: maps the SKU of every applicable seat and entitlement to its course's UUID.
+#   applicable_skus: the keys of sku_to_course_uuid, as a frozenset.
+#   run_key_to_course_uuid: maps every course run key to its course's UUID.
+#   has_entitlements: whether any course of the program has an entitlement product.
+ProgramIndex = namedtuple(
+    'ProgramIndex',
+    ['course_uuids', 'sku_to_course_uuid', 'applicable_skus', 'run_key_to_course_uuid', 'has_entitlements']
+)
+
 
 def get_program(program_uuid, siteconfiguration):
     """
@@ -34,3 +49,70 @@ def get_program(program_uuid, siteconfiguration):
         log.debug("Failed to retrieve program details for %s", program_uuid)
 
     return response
+
+
+def build_program_index(program):
+    """
+    Walks the courses, runs and seats of the program once and returns its ProgramIndex.
+
+    Args:
+        program (dict): Program details, as returned by get_program.
+
+    Returns:
+        ProgramIndex
+    """
+    applicable_seat_types = program['applicable_seat_types']
+    course_uuids = []
+    sku_to_course_uuid = {}
+    run_key_to_course_uuid = {}
+    has_entitlements = False
+
+    for course in program['courses']:
+        course_uuid = course['uuid']
+        course_uuids.append(course_uuid)
+        for course_run in course['course_runs']:
+            run_key_to_course_uuid[course_run['key']] = course_uuid
+            for seat in course_run['seats']:
+                if seat['type'] in applicable_seat_types:
+                    sku_to_course_uuid.setdefault(seat['sku'], course_uuid)
+        for entitlement in course['entitlements']:
+            has_entitlements = True
+            if entitlement['mode'].lower() in applicable_seat_types:
+                sku_to_course_uuid.setdefault(entitlement['sku'], course_uuid)
+
+    return ProgramIndex(
+        course_uuids=course_uuids,
+        sku_to_course_uuid=sku_to_course_uuid,
+        applicable_skus=frozenset(sku_to_course_uuid),
+        run_key_to_course_uuid=run_key_to_course_uuid,
+        has_entitlements=has_entitlements,
+    )
+
+
+def get_program_index(program, siteconfiguration):
+    """
+    Returns the ProgramIndex of the program, cached per program UUID and modified timestamp.
+
+    The index is cached for ``settings.PROGRAM_CACHE_TIMEOUT`` seconds, like the program itself, and a
+    new modified timestamp of the program results in a new index.
+
+    Args:
+        program (dict): Program details, as returned by get_program.
+        siteconfiguration (SiteConfiguration): Site configuration the program was retrieved for.
+
+    Returns:
+        ProgramIndex
+    """
+    cache_key = get_cache_key(
+        site_domain=siteconfiguration.site.domain,
+        resource='program_index',
+        program_uuid=program['uuid'],
+        modified=program.get('modified'),
+    )
+    program_index_cached_response = TieredCache.get_cached_response(cache_key)
+    if program_index_cached_response.is_found:
+        return program_index_cached_response.value
+
+    program_index = build_program_index(program)
+    TieredCache.set_all_tiers(cache_key, program_index, settings.PROGRAM_CACHE_TIMEOUT)
+    return program_index
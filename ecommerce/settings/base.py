@@ -268,6 +268,9 @@ PROGRAM_CACHE_TIMEOUT = 3600  # Value is in seconds.
 # Cache catalog results from the enterprise and discovery service.
 CATALOG_RESULTS_CACHE_TIMEOUT = 86400
 
+# Cache range membership indexes, refreshed by the refresh_range_membership_indexes command.
+RANGE_MEMBERSHIP_INDEX_CACHE_TIMEOUT = 86400  # Value is in seconds.
+
 # Cache timeout for enterprise customer results from the enterprise service.
 ENTERPRISE_CUSTOMER_RESULTS_CACHE_TIMEOUT = 3600  # Value is in seconds
 
@@ -277,9 +280,18 @@ CREDIT_PROVIDER_CACHE_TIMEOUT = 600
 
 # Anonymous User Calculate Cache timeout
 ANONYMOUS_BASKET_CALCULATE_CACHE_TIMEOUT = 3600  # Value is in seconds.
+# Timeout of the basket calculations cached per user, which are also forgotten when the user places an order.
+BASKET_CALCULATE_CACHE_TIMEOUT = 900  # Value is in seconds.
+
+# Time after which the processes rebuild their snapshot of the site offers, even if no offer changed.
+OFFER_SNAPSHOT_TIMEOUT = 300  # Value is in seconds.
 
 # LMS API settings used for fetching information from LMS
 LMS_API_CACHE_TIMEOUT = 30  # Value is in seconds.
+# Threads shared by all requests of a process to fetch enrollments and entitlements for program offers.
+LMS_OWNERSHIP_FETCH_MAX_WORKERS = 8
+# Overall deadline for fetching the enrollments and entitlements of a user for program offers.
+LMS_OWNERSHIP_FETCH_TIMEOUT = 5  # Value is in seconds.
 
 # Add here custom payment processor urls. For instance:
 # EXTRA_PAYMENT_PROCESSOR_URLS = {
@@ -664,6 +676,15 @@ EDX_DRF_EXTENSIONS = {
 # created for the Enrollment code products.
 ENROLLMENT_CODE_EXIPRATION_DATE = datetime.datetime.now() + datetime.timedelta(weeks=520)
 ENROLLMENT_FULFILLMENT_TIMEOUT = 7
+# Number of seats of an order enrolled concurrently by the EnrollmentFulfillmentModule.
+# With 1, the seats are enrolled one after the other.
+ENROLLMENT_FULFILLMENT_MAX_WORKERS = 1
+# Time, in seconds, allowed to enroll all the seats of an order concurrently or in bulk.
+# Seats not enrolled by then are marked with a timeout error.
+ENROLLMENT_FULFILLMENT_ORDER_DEADLINE = 30
+# Optional LMS path of an endpoint enrolling several seats at once. It receives the list of the Enrollment API
+# POST data of the seats, and returns the list of their results, in the same order, e.g. [{"status": 200}].
+ENROLLMENT_FULFILLMENT_BULK_API_PATH = None
 
 # Affiliate cookie key
 AFFILIATE_COOKIE_KEY = 'affiliate_id'
@@ -841,6 +862,9 @@ ECOMMERCE_PAYMENT_PROCESSOR_CONFIG = {
         },
     }
 }
+# Number of Android refunds of different users processed concurrently by the AndroidRefundView.
+# With 1, the refunds are processed one after the other.
+ANDROID_REFUND_MAX_WORKERS = 1
 MEDIA_STORAGE_BACKEND = {
     'DEFAULT_FILE_STORAGE': 'django.core.files.storage.FileSystemStorage',
     'MEDIA_ROOT': MEDIA_ROOT,
@@ -854,6 +878,11 @@ CACHES = {
 BACKEND_SERVICE_EDX_OAUTH2_KEY = "ecommerce-backend-service-key"
 BACKEND_SERVICE_EDX_OAUTH2_SECRET = "ecommerce-backend-service-secret"
 BACKEND_SERVICE_EDX_OAUTH2_PROVIDER_URL = "http://127.0.0.1:8000/oauth2"
+# Connection pools kept by the OAuth API client of each site, and connections kept alive per pool (host).
+OAUTH_API_CLIENT_POOL_CONNECTIONS = 10
+OAUTH_API_CLIENT_POOL_MAXSIZE = 20
+# The OAuth API clients fetch a new access token when theirs expires within this margin.
+OAUTH_API_CLIENT_TOKEN_REFRESH_MARGIN = 60  # Value is in seconds.
 EXTRA_APPS = []
 API_ROOT = None
 
@@ -882,6 +911,12 @@ FAVICON_URL = None
 ENTERPRISE_EMAIL_FILE_ATTACHMENTS_BUCKET_NAME = ''
 ENTERPRISE_EMAIL_FILE_ATTACHMENTS_BUCKET_LOCATION = 'us-east-1'  # change this when developing with your own bucket
 
+# Maximum number of events waiting to be sent to Braze by each process. Events tracked while the queue
+# is full are dropped.
+BRAZE_EVENT_QUEUE_SIZE = 1000
+# Timeout, in seconds, of the requests sending events to Braze.
+BRAZE_EVENT_TIMEOUT = 5
+
 BRAZE_OFFER_DIGEST_CAMPAIGN = ''
 BRAZE_OFFER_LOW_BALANCE_CAMPAIGN = ''
 BRAZE_OFFER_NO_BALANCE_CAMPAIGN = ''
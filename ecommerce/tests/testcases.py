@@ -4,9 +4,10 @@ from django.conf import settings
 from django.test import LiveServerTestCase as DjangoLiveServerTestCase
 from django.test import TestCase as DjangoTestCase
 from django.test import TransactionTestCase as DjangoTransactionTestCase
-from edx_django_utils.cache import TieredCache
+from edx_django_utils.cache import RequestCache, TieredCache
 from oscar.test.factories import CategoryFactory
 
+from ecommerce.core.api_clients import clear_oauth_api_clients
 from ecommerce.tests.mixins import SiteMixin, TestServerUrlMixin, TestWaffleFlagMixin, UserMixin
 
 # When all unit tests are run, the catalog category table will sometimes be empty. However, if only a single test
@@ -22,10 +23,16 @@ class TieredCacheMixin:
 
     def setUp(self):
         TieredCache.dangerous_clear_all_tiers()
+        # Only the default namespace of the request cache is cleared along with the tiered cache.
+        RequestCache.clear_all_namespaces()
+        # The OAuth API clients hold their access token in addition to the cache.
+        clear_oauth_api_clients()
         super(TieredCacheMixin, self).setUp()
 
     def tearDown(self):
         TieredCache.dangerous_clear_all_tiers()
+        RequestCache.clear_all_namespaces()
+        clear_oauth_api_clients()
         super(TieredCacheMixin, self).tearDown()
 
 
@@ -5,9 +5,12 @@
 
 import logging
 import os
+from functools import lru_cache
 
 import waffle
 from django.conf import ImproperlyConfigured, settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from path import Path
 from threadlocals.threadlocals import get_current_request
 
@@ -45,16 +48,14 @@ def get_current_theme():
     site_theme = get_current_site_theme()
     if not site_theme:
         return None
-    try:
-        return Theme(
-            name=site_theme.theme_dir_name,
-            theme_dir_name=site_theme.theme_dir_name,
-            themes_base_dir=get_theme_base_dir(site_theme.theme_dir_name),
-        )
-    except ValueError as e:
-        # Log exception message and return None, so that open source theme is used instead
-        logger.exception('Theme not found in any of the themes dirs. [%s]', e)
-        return None
+
+    theme = get_theme_registry().get(site_theme.theme_dir_name)
+    if not theme:
+        # Log the error and return None, so that open source theme is used instead
+        logger.error('Theme not found in any of the themes dirs. [%s]', _get_theme_not_found_message(
+            site_theme.theme_dir_name
+        ))
+    return theme
 
 
 def get_theme_base_dir(theme_dir_name, suppress_error=False):
@@ -67,18 +68,21 @@ def get_theme_base_dir(theme_dir_name, suppress_error=False):
     Returns:
         (str): Base directory that contains the given theme
     """
-    for themes_dir in get_theme_base_dirs():
-        if theme_dir_name in (_dir for _dir in os.listdir(themes_dir) if is_theme_dir(themes_dir / _dir)):
-            return themes_dir
+    theme = get_theme_registry().get(theme_dir_name)
+    if theme:
+        return theme.themes_base_dir
 
     if suppress_error:
         return None
 
-    raise ValueError(
-        "Theme '{theme}' not found in any of the following themes dirs, \nTheme dirs: \n{dir}".format(
-            theme=theme_dir_name,
-            dir=get_theme_base_dirs(),
-        ))
+    raise ValueError(_get_theme_not_found_message(theme_dir_name))
+
+
+def _get_theme_not_found_message(theme_dir_name):
+    return "Theme '{theme}' not found in any of the following themes dirs, \nTheme dirs: \n{dir}".format(
+        theme=theme_dir_name,
+        dir=get_theme_base_dirs(),
+    )
 
 
 def is_comprehensive_theming_enabled():
@@ -176,13 +180,49 @@ def get_themes(themes_dir=None):
     if not is_comprehensive_theming_enabled():
         return []
 
-    themes_dirs = [Path(themes_dir)] if themes_dir else get_theme_base_dirs()
+    if not themes_dir:
+        return list(get_theme_registry().themes)
+
     # pick only directories and discard files in themes directory
+    themes_dir = Path(themes_dir)
+    return [Theme(name, name, themes_dir) for name in get_theme_dirs(themes_dir)]
+
+
+class ThemeRegistry:
+    """
+    The themes of the COMPREHENSIVE_THEME_DIRS, by theme directory name.
+
+    A theme found in several themes dirs is looked up in the first of them.
+    """
+
+    def __init__(self, themes):
+        self.themes = tuple(themes)
+        self._themes_by_dir_name = {}
+        for theme in self.themes:
+            self._themes_by_dir_name.setdefault(theme.theme_dir_name, theme)
+
+    def get(self, theme_dir_name):
+        """ Returns the theme of the given directory name, or None if there is none. """
+        return self._themes_by_dir_name.get(theme_dir_name)
+
+
+@lru_cache(maxsize=None)
+def get_theme_registry():
+    """
+    Returns the registry of the themes, listing the COMPREHENSIVE_THEME_DIRS once per process.
+
+    Themes added to the themes dirs are only picked up by processes started after.
+    """
     themes = []
-    for tdir in themes_dirs:
-        themes.extend([Theme(name, name, tdir) for name in get_theme_dirs(tdir)])
+    for themes_dir in get_theme_base_dirs():
+        themes.extend(Theme(name, name, themes_dir) for name in get_theme_dirs(themes_dir))
+    return ThemeRegistry(themes)
+
 
-    return themes
+@receiver(setting_changed)
+def reset_theme_registry(setting, **kwargs):  # pylint: disable=unused-argument
+    if setting == 'COMPREHENSIVE_THEME_DIRS':
+        get_theme_registry.cache_clear()
 
 
 def get_theme_dirs(themes_dir=None):
@@ -2,7 +2,12 @@
 
 from django.conf import settings
 from django.contrib.sites.models import Site
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from edx_django_utils.cache import TieredCache
+
+from ecommerce.core.utils import get_cache_key
 
 
 class SiteTheme(models.Model):
@@ -22,6 +27,9 @@ class SiteTheme(models.Model):
         Get SiteTheme object for given site, returns default site theme if it can not
         find a theme for the given site and `DEFAULT_SITE_THEME` setting has a proper value.
 
+        The theme of a site is cached for THEME_CACHE_TIMEOUT seconds, or until a theme of the site is
+        saved or deleted.
+
         Args:
             site (django.contrib.sites.models.Site): site object related to the current site.
 
@@ -31,9 +39,38 @@ class SiteTheme(models.Model):
         if not site:
             return None
 
-        theme = site.themes.first()
+        cache_key = SiteTheme._get_cache_key(site.id)
+        cached_response = TieredCache.get_cached_response(cache_key)
+        if cached_response.is_found:
+            theme = cached_response.value
+        else:
+            theme = site.themes.first()
+            TieredCache.set_all_tiers(cache_key, theme, settings.THEME_CACHE_TIMEOUT)
 
         if (not theme) and settings.DEFAULT_SITE_THEME:
             theme = SiteTheme(site=site, theme_dir_name=settings.DEFAULT_SITE_THEME)
 
         return theme
+
+    @staticmethod
+    def _get_cache_key(site_id):
+        return get_cache_key(resource_name='site_theme', site_id=site_id)
+
+    @staticmethod
+    def invalidate_theme(site_id):
+        """
+        Drop the cached theme of the given site.
+
+        The theme is dropped again once the current transaction is committed, so that a theme read before the
+        changes are visible is not kept.
+        """
+        cache_key = SiteTheme._get_cache_key(site_id)
+        TieredCache.delete_all_tiers(cache_key)
+        transaction.on_commit(lambda: TieredCache.delete_all_tiers(cache_key))
+
+
+@receiver(post_save, sender=SiteTheme, dispatch_uid='theming.site_theme_post_save_callback')
+@receiver(post_delete, sender=SiteTheme, dispatch_uid='theming.site_theme_post_delete_callback')
+def invalidate_site_theme(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """ Drop the cached theme of the site of a saved or deleted site theme. """
+    SiteTheme.invalidate_theme(instance.site_id)
@@ -15,6 +15,7 @@ from ecommerce.theming.helpers import (
     get_current_theme,
     get_theme_base_dir,
     get_theme_base_dirs,
+    get_theme_registry,
     get_themes
 )
 from ecommerce.theming.test_utils import with_comprehensive_theme
@@ -195,3 +196,28 @@ class TestHelpers(TestCase):
         Tests get_theme_base_dir returns None if theme is not found istead of raising an error.
         """
         self.assertIsNone(get_theme_base_dir("non-existent-theme", suppress_error=True))
+
+    @with_comprehensive_theme('test-theme')
+    def test_get_current_theme_from_registry(self):
+        """
+        Tests get_current_theme does not list the themes dirs once the theme registry is built.
+        """
+        get_theme_registry()
+
+        with patch('ecommerce.theming.helpers.os.listdir') as mock_listdir:
+            theme = get_current_theme()
+
+        self.assertEqual(theme.theme_dir_name, 'test-theme')
+        mock_listdir.assert_not_called()
+
+    def test_theme_registry_reset(self):
+        """
+        Tests the theme registry is rebuilt when the themes dirs change.
+        """
+        self.assertIsNone(get_theme_base_dir('red-theme', suppress_error=True))
+
+        themes_dir = settings.DJANGO_ROOT + "/themes"
+        with override_settings(COMPREHENSIVE_THEME_DIRS=[themes_dir]):
+            self.assertEqual(get_theme_base_dir('red-theme'), themes_dir)
+
+        self.assertIsNone(get_theme_base_dir('red-theme', suppress_error=True))
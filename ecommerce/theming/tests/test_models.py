@@ -0,0 +1,43 @@
+"""
+Tests for theming models.
+"""
+from django.contrib.sites.models import Site
+
+from ecommerce.tests.testcases import TestCase
+from ecommerce.theming.models import SiteTheme
+
+
+class SiteThemeTests(TestCase):
+    """
+    Test the theme of a site is cached until a theme of the site changes.
+    """
+
+    def setUp(self):
+        super(SiteThemeTests, self).setUp()
+        self.site, __ = Site.objects.get_or_create(domain='test-theme.org', name='test-theme.org')
+
+    def test_get_theme_cached(self):
+        """
+        Tests the theme of a site is only queried once.
+        """
+        site_theme = SiteTheme.objects.create(site=self.site, theme_dir_name='test-theme')
+        self.assertEqual(SiteTheme.get_theme(self.site), site_theme)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(SiteTheme.get_theme(self.site), site_theme)
+
+    def test_get_theme_invalidated(self):
+        """
+        Tests the theme of a site is queried again once a theme of the site is saved or deleted.
+        """
+        self.assertEqual(SiteTheme.get_theme(self.site).theme_dir_name, 'test-theme')
+
+        site_theme = SiteTheme.objects.create(site=self.site, theme_dir_name='test-theme-2')
+        self.assertEqual(SiteTheme.get_theme(self.site).theme_dir_name, 'test-theme-2')
+
+        site_theme.theme_dir_name = 'test-theme-3'
+        site_theme.save()
+        self.assertEqual(SiteTheme.get_theme(self.site).theme_dir_name, 'test-theme-3')
+
+        site_theme.delete()
+        self.assertEqual(SiteTheme.get_theme(self.site).theme_dir_name, 'test-theme')